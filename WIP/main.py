@@ -2,12 +2,14 @@
 Punto de entrada del pipeline de biometria facial Edge (WIP).
 
 Hasta ahora:
-  - Carga configuracion desde configs.settings (modo RTSP/SNAP/USB, MAX_FPS, display, etc.)
+  - Carga configuracion desde configs.settings (modo RTSP/SNAP/USB/FILE, MAX_FPS, display, etc.)
     y valida parametros con validar_todo().
-  - Arranca captura con utils.capture_cameras.CaptureCameras (hilo productor, warmup,
-    limite de FPS y reconexion segun el modo).
-  - Bucle principal: get_frame() -> log debug; opcional ventana OpenCV si
-    DISPLAY_IS_ENABLE=true (env). Salir: Ctrl+C o tecla q en la ventana.
+  - Arranca captura con utils.multi_camera.GestorCamaras: una o varias
+    utils.capture_cameras.CaptureCameras (hilo productor por camara, warmup, limite de FPS
+    y reconexion segun el modo). Varias camaras con CAMARAS_CONFIG=camaras.json.
+  - Bucle principal (unico consumidor): siguiente_frame() segun POLITICA_SCHEDULER -> log
+    debug; opcional ventana OpenCV por camara si DISPLAY_IS_ENABLE=true (env).
+    Salir: Ctrl+C o tecla q en la ventana.
 
 Sin modelos de inferencia todavia (deteccion/embeddings pendientes).
 
@@ -16,10 +18,11 @@ Ejemplo:
   python main.py
 
   DISPLAY_IS_ENABLE=true CONFIG_MODO=USB python main.py
+  CONFIG_MODO=FILE FILE_VIDEO_PATH=../videos/prueba.mp4 python main.py
+  CAMARAS_CONFIG=camaras.json POLITICA_SCHEDULER=mas_antiguo python main.py
 """
 import logging
 import sys
-import time
 from pathlib import Path
 
 import cv2
@@ -46,7 +49,7 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from configs import settings as s  # noqa: E402
-from utils.capture_cameras import CaptureCameras  # noqa: E402
+from utils.multi_camera import GestorCamaras, cargar_config_camaras  # noqa: E402
 
 # ejecutando_pipeline = True
 
@@ -62,26 +65,28 @@ from utils.capture_cameras import CaptureCameras  # noqa: E402
 if __name__ == "__main__":
     s.validar_todo()
 
-    ventana = "pipeline"
     if s.DISPLAY_IS_ENABLE:
-        cv2.namedWindow(ventana, cv2.WINDOW_NORMAL)
         logging.info("Display activo (q en ventana para salir).")
 
-    input_manager = CaptureCameras().start()
+    fuentes = cargar_config_camaras(s.CAMARAS_CONFIG) if s.CAMARAS_CONFIG else [{"nombre": s.MODO}]
+    input_manager = GestorCamaras(fuentes, politica=s.POLITICA_SCHEDULER).start()
 
-    logging.info("Pipeline de captura en marcha (sin modelos). Ctrl+C para salir.")
+    logging.info(
+        f"Pipeline de captura en marcha (sin modelos): {len(fuentes)} camara(s), "
+        f"politica={s.POLITICA_SCHEDULER}. Ctrl+C para salir."
+    )
 
     try:
         while True:
-            has_frame, frame = input_manager.get_frame()
+            item = input_manager.siguiente_frame(timeout=0.05)
 
-            if has_frame and frame is not None:
+            if item is not None:
                 # TODO: deteccion, embeddings, etc.
-                h, w = frame.shape[:2]
-                logging.debug(f"Frame listo para procesar: {w}x{h}")
+                h, w = item.frame.shape[:2]
+                logging.debug(f"Frame listo para procesar [{item.nombre}]: {w}x{h}")
 
                 if s.DISPLAY_IS_ENABLE:
-                    cv2.imshow(ventana, frame)
+                    cv2.imshow(f"pipeline {item.nombre}", item.frame)
                     if cv2.waitKey(1) & 0xFF == ord("q"):
                         logging.info("Salida solicitada desde ventana (q).")
                         break
@@ -90,7 +95,6 @@ if __name__ == "__main__":
                     if cv2.waitKey(1) & 0xFF == ord("q"):
                         logging.info("Salida solicitada desde ventana (q).")
                         break
-                time.sleep(0.001)
 
     except KeyboardInterrupt:
         logging.warning("Interrupcion por teclado. Cerrando...")
@@ -100,6 +104,7 @@ if __name__ == "__main__":
 
     finally:
         logging.info("Liberando hardware y sockets...")
+        logging.info(input_manager.resumen())
         input_manager.stop()
         if s.DISPLAY_IS_ENABLE:
             cv2.destroyAllWindows()
@@ -0,0 +1,221 @@
+"""
+Prueba de reproduccion de video de la compuerta de movimiento
+(``utils/compuerta_movimiento.py``) delante de RetinaFace ONNX: cuanta inferencia se ahorra y
+si se pierde alguna entrada.
+
+Por defecto genera ``--camaras`` videos de pasillo casi vacio (fondo fijo con ruido de
+sensor, MJPG) de ``--segundos`` a ``--fps`` con ``--entradas`` personas cruzando el plano
+(recorte de ``Retinaface-Models/test.jpg``). Con ``--video`` usa grabaciones reales (una por
+camara). Los frames se leen del archivo con ``t = indice / fps``, asi los timeouts de la FSM
+son los del video aunque la prueba vaya mas rapida o mas lenta que el tiempo real.
+
+1. Referencia: RetinaFace en todos los frames. Entradas = tramos con detecciones (separados
+   por mas de ``--hueco-seg`` sin cara).
+2. Con compuerta: ``CompuertasCamaras`` decide por camara; el detector (determinista) solo se
+   cuenta en los frames que pasan y su resultado alimenta la FSM.
+
+Por camara: % de frames sin inferencia (tras la calibracion del fondo), entradas vistas /
+totales y retraso de la primera deteccion en cada entrada; tiempo de CPU de la compuerta frente
+al de la inferencia ahorrada.
+Falla si alguna camara omite menos de ``--min-omitidos`` o si se pierde una entrada.
+
+Ejemplo:
+  python bench/bench_compuerta_movimiento.py
+  python bench/bench_compuerta_movimiento.py --segundos 600 --entradas 6 --timeout-seg 5
+  python bench/bench_compuerta_movimiento.py --video pasillo_a.mp4 pasillo_b.mp4 --min-omitidos 0.8
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.escena_pasillo import (  # noqa: E402
+    ALTO,
+    ANCHO,
+    con_ruido,
+    escribir_video,
+    fondo_pasillo,
+    leer_video,
+    recorte_persona,
+    ruidos_sensor,
+)
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+from utils.backend_inferencia import BackendORT, preprocesador  # noqa: E402
+from utils.compuerta_movimiento import CompuertasCamaras, ParametrosMovimiento  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+DURACION_ENTRADA_S = 4.0
+
+
+def escribir_pasillo(path: Path, fps: float, segundos: float, entradas: int, semilla: int) -> None:
+    """Fondo fijo + ruido; ``entradas`` cruces de izquierda a derecha repartidos en el video."""
+    rng = np.random.default_rng(semilla)
+    fondo = fondo_pasillo(rng, puertas=True)
+    persona, _ = recorte_persona("persona_a")
+    persona = cv2.resize(persona, None, fx=0.6, fy=0.6, interpolation=cv2.INTER_AREA)
+    ph, pw = persona.shape[:2]
+    ruidos = ruidos_sensor(rng, 8)
+
+    tramo = segundos / entradas
+    inicios = [(k + rng.uniform(0.2, 0.6)) * tramo for k in range(entradas)]
+
+    def frames():
+        for i in range(int(segundos * fps)):
+            t = i / fps
+            frame = fondo.copy()
+            for t0 in inicios:
+                if t0 <= t < t0 + DURACION_ENTRADA_S:
+                    x = int((t - t0) / DURACION_ENTRADA_S * (ANCHO + pw)) - pw
+                    x0, x1 = max(x, 0), min(x + pw, ANCHO)
+                    if x1 > x0:
+                        frame[ALTO - ph :, x0:x1] = persona[:, x0 - x : x1 - x]
+            yield con_ruido(frame, ruidos[i % len(ruidos)])
+
+    escribir_video(path, frames(), fps)
+
+
+class Detector:
+    def __init__(self, score: float) -> None:
+        self.backend = BackendORT(RETINAFACE_ONNX, hilos=1).cargar()
+        self.prep = preprocesador(self.backend.entrada, RETINAFACE_MEAN_BGR)
+        self.score = score
+
+    def __call__(self, frame: np.ndarray) -> int:
+        h, w = frame.shape[:2]
+        tensor, meta = self.prep.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
+        dets = retinaface_dets_topk_desde_rknn_outputs(
+            list(self.backend.infer_batch(tensor)),
+            img_width=w,
+            img_height=h,
+            aspect_ratio=meta.aspect_ratio,
+            offset_x=meta.offset_x,
+            offset_y=meta.offset_y,
+            score_deteccion=self.score,
+        )
+        return int(dets.shape[0])
+
+
+def entradas_referencia(caras: list[int], fps: float, hueco_seg: float) -> list[tuple[int, int]]:
+    """Tramos [inicio, fin] de frames con cara; un hueco de mas de ``hueco_seg`` separa tramos."""
+    tramos: list[tuple[int, int]] = []
+    hueco = int(round(hueco_seg * fps))
+    for i, n in enumerate(caras):
+        if n == 0:
+            continue
+        if tramos and i - tramos[-1][1] <= hueco:
+            tramos[-1] = (tramos[-1][0], i)
+        else:
+            tramos.append((i, i))
+    return tramos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reproduccion de video: compuerta de movimiento vs inferir todo.")
+    parser.add_argument("--video", type=str, nargs="*", default=[], help="Videos grabados (uno por camara).")
+    parser.add_argument("--camaras", type=int, default=2, help="Videos sinteticos si no hay --video.")
+    parser.add_argument("--segundos", type=float, default=300.0)
+    parser.add_argument("--fps", type=float, default=5.0)
+    parser.add_argument("--entradas", type=int, default=4, help="Personas que cruzan en cada video sintetico.")
+    parser.add_argument("--timeout-seg", type=float, default=10.0)
+    parser.add_argument("--movimiento-pixeles", type=int, default=1000)
+    parser.add_argument("--score", type=float, default=0.5)
+    parser.add_argument("--hueco-seg", type=float, default=1.0)
+    parser.add_argument("--min-omitidos", type=float, default=0.8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rutas = [Path(v) for v in args.video]
+        if not rutas:
+            for c in range(args.camaras):
+                rutas.append(Path(tmp) / f"pasillo{c}.avi")
+                escribir_pasillo(rutas[-1], args.fps, args.segundos, args.entradas, semilla=c)
+        videos = {f"cam{c}_{r.stem}": leer_video(r) for c, r in enumerate(rutas)}
+
+    detector = Detector(args.score)
+    detector(next(iter(videos.values()))[0][0])  # calentamiento
+
+    # 1) Referencia: detector en todos los frames.
+    caras: dict[str, list[int]] = {}
+    t_inferencia = 0.0
+    n_inferencias = 0
+    for nombre, (frames, _) in videos.items():
+        t0 = time.perf_counter()
+        caras[nombre] = [detector(f) for f in frames]
+        t_inferencia += time.perf_counter() - t0
+        n_inferencias += len(frames)
+    ms_inferencia = 1000.0 * t_inferencia / n_inferencias
+
+    # 2) Con compuerta: camaras intercaladas como las entregaria GestorCamaras.
+    params = ParametrosMovimiento(timeout_seg=args.timeout_seg, movimiento_pixeles=args.movimiento_pixeles)
+    compuertas = CompuertasCamaras(params)
+    inferidos: dict[str, list[bool]] = {nombre: [] for nombre in videos}
+    t_compuerta = 0.0
+    for i in range(max(len(frames) for frames, _ in videos.values())):
+        for nombre, (frames, fps) in videos.items():
+            if i >= len(frames):
+                continue
+            t = i / fps
+            t0 = time.perf_counter()
+            inferir = compuertas.evaluar(nombre, frames[i], t)
+            t_compuerta += time.perf_counter() - t0
+            inferidos[nombre].append(inferir)
+            if inferir:
+                compuertas.registrar_resultado(nombre, caras[nombre][i] > 0, t)
+
+    print(
+        f"{len(videos)} video(s), RetinaFace ONNX {ms_inferencia:.1f} ms/frame, timeout {args.timeout_seg:g} s, "
+        f"umbral MOG2 {args.movimiento_pixeles} px"
+    )
+    fallos = []
+    total_frames = total_decididos = total_inferidos = 0
+    for nombre, (frames, fps) in videos.items():
+        c = compuertas.compuerta(nombre)
+        tramos = entradas_referencia(caras[nombre], fps, args.hueco_seg)
+        vistas, retrasos = 0, []
+        for ini, fin in tramos:
+            primera = next((i for i in range(ini, fin + 1) if inferidos[nombre][i] and caras[nombre][i]), None)
+            if primera is not None:
+                vistas += 1
+                retrasos.append((primera - ini) / fps)
+        total_frames += c.frames
+        total_decididos += c.decididos
+        total_inferidos += c.inferidos
+        retraso = f"retraso max {max(retrasos):.2f} s" if retrasos else "sin entradas"
+        print(
+            f"  {nombre}: {len(frames)} frames ({len(frames) / fps:.0f} s, {c.calibracion} de calibracion) | inferidos {c.inferidos} | "
+            f"omitidos {100.0 * c.fraccion_omitida:5.1f}% | entradas vistas {vistas}/{len(tramos)} ({retraso})"
+        )
+        if c.fraccion_omitida < args.min_omitidos:
+            fallos.append(f"{nombre}: omitidos {100.0 * c.fraccion_omitida:.1f}% < {100.0 * args.min_omitidos:.0f}%")
+        if vistas < len(tramos):
+            fallos.append(f"{nombre}: {len(tramos) - vistas} entrada(s) perdida(s)")
+        if not tramos and not args.video:
+            fallos.append(f"{nombre}: el detector no vio ninguna entrada en el video sintetico")
+
+    # Sin contar la calibracion del fondo: solo los frames que la compuerta decide omitir.
+    ahorro_ms = (total_decididos - total_inferidos) * ms_inferencia
+    print(
+        f"  CPU: compuerta {1000.0 * t_compuerta / total_frames:.2f} ms/frame ({1000.0 * t_compuerta:.0f} ms en total) "
+        f"frente a {ahorro_ms:.0f} ms de inferencia ahorrada"
+    )
+    print(f"  {compuertas.resumen()}")
+    if fallos:
+        raise SystemExit("; ".join(fallos))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark / prueba del doble stream (``utils/dual_stream.py``) con dos videos locales (modo FILE)
+en lugar del sub y el main stream RTSP.
+
+Genera un "sub" (640x480) y un "main" (``--ancho-main`` x ``--alto-main``) del mismo contenido
+(cara de ``Retinaface-Models/test.jpg`` desplazandose), con el indice de frame codificado en
+binario en una franja superior. Durante ``--segundos``:
+
+- RetinaFace ONNX sobre cada frame del sub stream.
+- Con caras: ``prestar_main(t_sub)`` y MobileFaceNet sobre el recorte del frame main.
+- Se decodifica el indice de ambos frames: el desfase en frames mide la alineacion temporal.
+
+Reporta el reparto de desfases, los ms de RetinaFace sobre el sub frente al main completo, el
+tamano de la cara recortada en cada stream y la similitud del embedding de la cara recortada del
+main alineado (y del sub) contra el del main detectado directamente. Falla si menos del
+``--min-alineados`` de los frames con cara encuentra un frame main a <= 1 frame de distancia.
+
+Ejemplo:
+  python bench/bench_dual_stream.py
+  python bench/bench_dual_stream.py --fps 25 --segundos 8 --ancho-main 2560 --alto-main 1920
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_INPUT_HEIGHT,
+    RETINAFACE_INPUT_WIDTH,
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+from utils.dual_stream import CapturaDobleStream  # noqa: E402
+from utils.face_embedding import EmbedderMobileFaceNet, bbox_crop_with_margin  # noqa: E402
+from utils.image_utils import letterbox_bgr  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+MFN_PATH = ROOT / "mobilenet_modelos" / "MobileFaceNet.onnx"
+BITS_INDICE = 10
+FRANJA_FRAC = 1.0 / 24.0  # alto de la franja con el indice, relativo al alto del frame
+
+
+def _con_indice(frame: np.ndarray, i: int) -> np.ndarray:
+    h, w = frame.shape[:2]
+    alto = int(h * FRANJA_FRAC)
+    paso = w // BITS_INDICE
+    frame[:alto] = 0
+    for b in range(BITS_INDICE):
+        if (i >> b) & 1:
+            frame[:alto, b * paso : (b + 1) * paso] = 255
+    return frame
+
+
+def leer_indice(frame: np.ndarray) -> int:
+    h, w = frame.shape[:2]
+    alto = int(h * FRANJA_FRAC)
+    paso = w // BITS_INDICE
+    i = 0
+    for b in range(BITS_INDICE):
+        bloque = frame[alto // 4 : 3 * alto // 4, b * paso + paso // 4 : (b + 1) * paso - paso // 4]
+        if float(bloque.mean()) > 127.0:
+            i |= 1 << b
+    return i
+
+
+def escribir_videos(dir_: Path, n: int, fps: float, wh_main: tuple[int, int]) -> tuple[Path, Path]:
+    base = cv2.imread(str(ROOT / "Retinaface-Models" / "test.jpg"))
+    if base is None:
+        raise SystemExit("No se pudo leer Retinaface-Models/test.jpg")
+    lienzo = cv2.resize(base, wh_main, interpolation=cv2.INTER_CUBIC)
+    rutas = (dir_ / "sub.avi", dir_ / "main.avi")
+    vw_sub = cv2.VideoWriter(str(rutas[0]), cv2.VideoWriter_fourcc(*"MJPG"), fps, (640, 480))
+    vw_main = cv2.VideoWriter(str(rutas[1]), cv2.VideoWriter_fourcc(*"MJPG"), fps, wh_main)
+    paso = wh_main[0] // (4 * n)
+    for i in range(n):
+        main = _con_indice(np.roll(lienzo, i * paso, axis=1), i)
+        vw_main.write(main)
+        sub = cv2.resize(np.roll(lienzo, i * paso, axis=1), (640, 480), interpolation=cv2.INTER_AREA)
+        vw_sub.write(_con_indice(sub, i))
+    vw_sub.release()
+    vw_main.release()
+    return rutas
+
+
+def detectar(session, frame: np.ndarray) -> np.ndarray:
+    h, w = frame.shape[:2]
+    lb, meta = letterbox_bgr(frame, (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT), RETINAFACE_LETTERBOX_FILL)
+    x = (lb.astype(np.float32) - RETINAFACE_MEAN_BGR).transpose(2, 0, 1)[np.newaxis]
+    out = session.run(None, {session.get_inputs()[0].name: np.ascontiguousarray(x)})
+    return retinaface_dets_topk_desde_rknn_outputs(
+        list(out),
+        img_width=w,
+        img_height=h,
+        aspect_ratio=meta.aspect_ratio,
+        offset_x=meta.offset_x,
+        offset_y=meta.offset_y,
+        score_deteccion=0.5,
+    )
+
+
+def _ms(fn, repeticiones: int = 10) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / repeticiones
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark doble stream sub/main.")
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--segundos", type=float, default=6.0)
+    parser.add_argument("--ancho-main", type=int, default=1920)
+    parser.add_argument("--alto-main", type=int, default=1440)
+    parser.add_argument("--min-alineados", type=float, default=0.8)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(RETINAFACE_ONNX), providers=["CPUExecutionProvider"])
+    embedder = EmbedderMobileFaceNet(
+        ort.InferenceSession(str(MFN_PATH), providers=["CPUExecutionProvider"])
+    )
+    wh_main = (args.ancho_main, args.alto_main)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        n = int(args.fps * 4)
+        sub_path, main_path = escribir_videos(Path(tmp), n, args.fps, wh_main)
+
+        cap = cv2.VideoCapture(str(main_path))
+        _, main0 = cap.read()
+        cap.release()
+        cap = cv2.VideoCapture(str(sub_path))
+        _, sub0 = cap.read()
+        cap.release()
+        if leer_indice(main0) != 0 or leer_indice(sub0) != 0:
+            raise SystemExit("No se pudo leer el indice de frame codificado")
+        t_sub = _ms(lambda: detectar(session, sub0))
+        t_main = _ms(lambda: detectar(session, main0))
+        d_main = detectar(session, main0)
+        if d_main.shape[0] == 0:
+            raise SystemExit("RetinaFace no detecta la cara de prueba en el main")
+
+        doble = CapturaDobleStream(
+            url_sub=str(sub_path), url_main=str(main_path), modo="FILE", max_fps=0,
+            max_desfase_s=1.5 / args.fps,
+        ).start()
+        time.sleep(1.0)
+        desfases: Counter[int] = Counter()
+        con_cara = sims_main = sims_sub = 0.0
+        lados = {"sub": [], "main": []}
+        t_fin = time.monotonic() + args.segundos
+        while time.monotonic() < t_fin:
+            ok, frame, _, t_frame = doble.sub.get_frame_info()
+            if not ok:
+                time.sleep(0.002)
+                continue
+            dets = detectar(session, frame)
+            if dets.shape[0] == 0:
+                continue
+            con_cara += 1
+            main = doble.prestar_main(t_frame, frame.shape)
+            if main is None:
+                continue
+            with main:
+                desfases[leer_indice(main.vista) - leer_indice(frame)] += 1
+                dets_main = main.a_main(dets[:1])
+                emb_main = embedder.embeddings_de_dets(main.vista, dets_main)[0]
+                # Referencia: la misma cara detectada directamente en el frame main.
+                ref = detectar(session, main.vista)
+                if ref.shape[0] == 0:
+                    continue
+                emb_ref = embedder.embeddings_de_dets(main.vista, ref[:1])[0]
+                h, w = main.vista.shape[:2]
+                x1, _, x2, _ = bbox_crop_with_margin(dets_main[0], w, h, 0.15)
+                lados["main"].append(x2 - x1)
+            emb_sub = embedder.embeddings_de_dets(frame, dets[:1])[0]
+            x1, _, x2, _ = bbox_crop_with_margin(dets[0], 640, 480, 0.15)
+            lados["sub"].append(x2 - x1)
+            sims_main += float(emb_main @ emb_ref)
+            sims_sub += float(emb_sub @ emb_ref)
+        doble.stop()
+
+    alineados = desfases[-1] + desfases[0] + desfases[1]
+    n_emb = max(len(lados["main"]), 1)
+    print(
+        f"sub 640x480 / main {wh_main[0]}x{wh_main[1]} a {args.fps:g} fps | "
+        f"RetinaFace sub={t_sub:.1f} ms vs main={t_main:.1f} ms por frame"
+    )
+    print(
+        f"  frames con cara={int(con_cara)} | {doble.resumen()} | "
+        f"desfase en frames {dict(sorted(desfases.items()))}"
+    )
+    print(
+        f"  ancho recorte cara: sub={np.mean(lados['sub']):.0f}px main={np.mean(lados['main']):.0f}px | "
+        f"sim vs main directo: recorte main alineado={sims_main / n_emb:.3f} "
+        f"recorte sub={sims_sub / n_emb:.3f}"
+    )
+    if con_cara == 0 or alineados < args.min_alineados * con_cara:
+        raise SystemExit(f"Solo {alineados}/{int(con_cara)} frames con main a <= 1 frame")
+
+
+if __name__ == "__main__":
+    main()
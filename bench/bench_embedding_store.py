@@ -0,0 +1,96 @@
+"""
+Benchmark de arranque: directorio de ``.npy`` (uno por persona) vs almacen memmap
+(``utils/embedding_store.py``).
+
+Genera N identidades sinteticas en un directorio temporal con ambos formatos, mide el tiempo
+de abrir cada uno y construir la ``GaleriaEmbeddings``, el coste de un alta en el almacen y
+verifica que las dos galerias dan el mismo top-1. Tambien comprueba que una fila huerfana
+(alta cortada tras escribir la matriz) se descarta en el siguiente alta.
+
+Ejemplo:
+  python bench/bench_embedding_store.py
+  python bench/bench_embedding_store.py --tamanos 1000 50000
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.embedding_store import ARCHIVO_MATRIZ, AlmacenEmbeddings  # noqa: E402
+from utils.face_embedding import MOBILEFACENET_EMB_DIM, l2_normalize_filas  # noqa: E402
+from utils.face_gallery import GaleriaEmbeddings  # noqa: E402
+
+
+def _verificar_fila_huerfana(directorio: Path) -> None:
+    almacen = AlmacenEmbeddings(directorio)
+    rng = np.random.default_rng(3)
+    a, b = rng.normal(size=(2, MOBILEFACENET_EMB_DIM)).astype(np.float32)
+    almacen.agregar("a", a)
+    with open(directorio / ARCHIVO_MATRIZ, "ab") as f:
+        f.write(b"\x00" * (MOBILEFACENET_EMB_DIM * 4 + 7))  # alta cortada a medias
+    almacen = AlmacenEmbeddings(directorio)
+    if len(almacen) != 1:
+        raise SystemExit("la fila huerfana no deberia contar")
+    almacen.agregar("b", b)
+    if almacen.nombres() != ["a", "b"] or not np.allclose(
+        almacen.matriz[1], l2_normalize_filas(b[np.newaxis])[0]
+    ):
+        raise SystemExit("el alta tras una fila huerfana no quedo en la fila 1")
+    print("Fila huerfana descartada OK")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark almacen memmap vs .npy.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--altas", type=int, default=200, help="Altas medidas en el almacen.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _verificar_fila_huerfana(Path(tmp) / "huerfana")
+
+    for n in args.tamanos:
+        rng = np.random.default_rng(0)
+        embs = l2_normalize_filas(rng.normal(size=(n, MOBILEFACENET_EMB_DIM)).astype(np.float32))
+        with tempfile.TemporaryDirectory() as tmp:
+            dir_npy = Path(tmp) / "npy"
+            dir_npy.mkdir()
+            for i in range(n):
+                np.save(str(dir_npy / f"id{i:06d}.npy"), embs[i])
+            almacen = AlmacenEmbeddings(Path(tmp) / "store")
+            for i in range(n):
+                almacen.agregar(f"id{i:06d}", embs[i], t_enrolamiento=0.0)
+
+            t0 = time.perf_counter()
+            gal_npy = GaleriaEmbeddings.desde_directorio_npy(dir_npy)
+            t_npy = (time.perf_counter() - t0) * 1000.0
+
+            t0 = time.perf_counter()
+            gal_store = AlmacenEmbeddings(Path(tmp) / "store").a_galeria()
+            t_store = (time.perf_counter() - t0) * 1000.0
+
+            probes = embs[:: max(1, n // 16)]
+            if gal_npy.buscar(probes).nombres != gal_store.buscar(probes).nombres:
+                raise SystemExit(f"N={n}: top-1 distinto entre .npy y almacen")
+
+            t0 = time.perf_counter()
+            for i in range(args.altas):
+                almacen.agregar(f"nuevo{i}", embs[i])
+            t_alta = (time.perf_counter() - t0) * 1e6 / args.altas
+
+        print(
+            f"N={n:6d} | arranque .npy={t_npy:.1f} ms | almacen={t_store:.1f} ms "
+            f"(x{t_npy / max(t_store, 1e-9):.0f}) | alta={t_alta:.0f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark del indice ANN IVF / IVF-PQ (``utils/face_ann.py``) contra la galeria exacta
+(``utils/face_gallery.py``).
+
+Galeria sintetica con estructura (identidades agrupadas alrededor de centros, como los
+embeddings reales que no son ruido isotropico) y sondas = identidad enrolada + ruido. Para
+cada ``nprobe`` reporta recall@1 respecto al top-1 exacto, latencia por sonda y memoria.
+Tambien comprueba que guardar/cargar da los mismos resultados.
+
+Ejemplo:
+  python bench/bench_face_ann.py
+  python bench/bench_face_ann.py --n 100000 --nlist 512 --m-pq 16 --nprobe 4 8 16 32
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.face_ann import IndiceIVF  # noqa: E402
+from utils.face_embedding import MOBILEFACENET_EMB_DIM, l2_normalize_filas  # noqa: E402
+from utils.face_gallery import GaleriaEmbeddings  # noqa: E402
+
+
+def galeria_sintetica(n: int, grupos: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centros = rng.normal(size=(grupos, MOBILEFACENET_EMB_DIM))
+    asign = rng.integers(0, grupos, size=n)
+    x = centros[asign] + 1.2 * rng.normal(size=(n, MOBILEFACENET_EMB_DIM))
+    return l2_normalize_filas(x.astype(np.float32))
+
+
+def sondas_de(embs: np.ndarray, q: int, ruido: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(embs.shape[0], size=q, replace=False)
+    x = embs[idx] + ruido * rng.normal(size=(q, embs.shape[1])).astype(np.float32) / np.sqrt(
+        embs.shape[1]
+    )
+    return l2_normalize_filas(x)
+
+
+def _ms_por_sonda(fn, q: int, reps: int = 3) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / (reps * q)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ANN IVF/PQ vs exacto.")
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = ~sqrt(N).")
+    parser.add_argument("--m-pq", type=int, default=16, help="Subespacios PQ (0 = solo IVF).")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--sondas", type=int, default=200)
+    parser.add_argument("--ruido", type=float, default=0.6)
+    args = parser.parse_args()
+
+    embs = galeria_sintetica(args.n, grupos=max(16, args.n // 500), seed=0)
+    probes = sondas_de(embs, args.sondas, args.ruido, seed=1)
+    nlist = args.nlist or int(np.sqrt(args.n))
+
+    galeria = GaleriaEmbeddings.desde_matriz([str(i) for i in range(args.n)], embs)
+    exacto = galeria.buscar(probes, k=1).filas[:, 0]
+    t_exacto = _ms_por_sonda(lambda: galeria.buscar(probes, k=1), args.sondas)
+    print(
+        f"N={args.n} nlist={nlist} | exacto: {t_exacto:.3f} ms/sonda "
+        f"| memoria={galeria.matriz.nbytes / 1e6:.1f} MB"
+    )
+
+    for m_pq in sorted({0, args.m_pq}):
+        indice = IndiceIVF(nlist, m_pq=m_pq)
+        t0 = time.perf_counter()
+        indice.entrenar(embs)
+        indice.agregar(embs, np.arange(args.n))
+        indice.buscar(probes[:1])
+        t_build = time.perf_counter() - t0
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "ivf.npz"
+            indice.guardar(path)
+            cargado = IndiceIVF.cargar(path)
+        a = indice.buscar(probes, k=5, nprobe=4)
+        b = cargado.buscar(probes, k=5, nprobe=4)
+        if not (np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1])):
+            raise SystemExit("guardar/cargar cambia los resultados")
+
+        nombre = f"IVF-PQ m={m_pq}" if m_pq else "IVF plano"
+        print(f"{nombre}: construir={t_build:.1f} s | memoria={indice.nbytes / 1e6:.1f} MB")
+        for nprobe in args.nprobe:
+            ids, _ = indice.buscar(probes, k=1, nprobe=nprobe)
+            recall = float(np.mean(ids[:, 0] == exacto))
+            t = _ms_por_sonda(lambda: indice.buscar(probes, k=1, nprobe=nprobe), args.sondas)
+            print(
+                f"  nprobe={nprobe:3d} | recall@1={recall:.3f} | {t:.3f} ms/sonda "
+                f"(x{t_exacto / max(t, 1e-9):.1f} vs exacto)"
+            )
+
+
+if __name__ == "__main__":
+    main()
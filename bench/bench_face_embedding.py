@@ -0,0 +1,92 @@
+"""
+Benchmark de embeddings MobileFaceNet para N caras por frame (``utils/face_embedding.py``).
+
+Compara el ONNX original (batch fijo 1 -> una llamada ORT por cara) con el ONNX de batch
+dinamico (una llamada para todas las caras) y verifica que los embeddings coinciden.
+
+El ONNX en lote se genera con:
+  python export_models/exp_mobilefacenet_batch_onnx.py
+
+Ejemplo:
+  python bench/bench_face_embedding.py
+  python bench/bench_face_embedding.py --caras 1 4 8 16
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.face_embedding import EmbedderMobileFaceNet  # noqa: E402
+
+MFN_PATH = ROOT / "mobilenet_modelos" / "MobileFaceNet.onnx"
+MFN_BATCH_PATH = ROOT / "mobilenet_modelos" / "MobileFaceNet_batch.onnx"
+
+
+def crops_sinteticos(n: int, seed: int = 0) -> list[np.ndarray]:
+    img = cv2.imread(str(ROOT / "Retinaface-Models" / "test.jpg"))
+    if img is None:
+        raise SystemExit("No se pudo leer Retinaface-Models/test.jpg")
+    rng = np.random.default_rng(seed)
+    h, w = img.shape[:2]
+    crops = []
+    for _ in range(n):
+        lado = int(rng.integers(40, min(h, w) // 2))
+        x = int(rng.integers(0, w - lado))
+        y = int(rng.integers(0, h - lado))
+        crops.append(img[y : y + lado, x : x + lado])
+    return crops
+
+
+def _ms(fn, iters: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / iters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark MobileFaceNet en lote.")
+    parser.add_argument("--caras", type=int, nargs="+", default=[1, 3, 8, 16])
+    parser.add_argument("--iters", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=1, help="intra_op_num_threads ORT.")
+    args = parser.parse_args()
+
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = args.threads
+    prov = ["CPUExecutionProvider"]
+    emb_1 = EmbedderMobileFaceNet(ort.InferenceSession(str(MFN_PATH), so, providers=prov), 16)
+    emb_n = None
+    if MFN_BATCH_PATH.is_file():
+        sess_n = ort.InferenceSession(str(MFN_BATCH_PATH), so, providers=prov)
+        emb_n = EmbedderMobileFaceNet(sess_n, 16)
+    else:
+        print(f"[AVISO] No existe {MFN_BATCH_PATH.name}: solo se mide el fallback batch 1.")
+
+    for n in args.caras:
+        crops = crops_sinteticos(n)
+        t_1 = _ms(lambda: emb_1.embeddings_de_crops(crops), args.iters)
+        linea = f"caras={n:3d} | batch fijo 1 ({n} llamadas)={t_1:.2f} ms"
+        if emb_n is not None:
+            a = emb_1.embeddings_de_crops(crops)
+            b = emb_n.embeddings_de_crops(crops)
+            err = float(np.max(np.abs(a - b))) if n else 0.0
+            if err > 1e-4:
+                raise SystemExit(f"caras={n}: embeddings en lote difieren (max {err:.2e})")
+            t_n = _ms(lambda: emb_n.embeddings_de_crops(crops), args.iters)
+            linea += f" | lote (1 llamada)={t_n:.2f} ms | x{t_1 / max(t_n, 1e-9):.2f}"
+        print(linea)
+
+
+if __name__ == "__main__":
+    main()
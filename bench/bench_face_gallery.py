@@ -0,0 +1,132 @@
+"""
+Benchmark + verificacion de la galeria 1:N (``utils/face_gallery.py``).
+
+Para 1k / 10k / 100k identidades sinteticas (128-d) compara:
+
+- bucle: un ``np.dot`` por identidad enrolada (como comparar contra cada ``.npy``).
+- argsort: matmul + orden completo de las N similitudes.
+- galeria: matmul + ``argpartition`` (``GaleriaEmbeddings.buscar``).
+
+Verifica que el top-k de la galeria coincide con el argsort completo y que ``quitar`` /
+``agregar`` dejan la galeria igual que una reconstruida desde cero.
+
+Ejemplo:
+  python bench/bench_face_gallery.py
+  python bench/bench_face_gallery.py --tamanos 1000 10000 --sondas 8 --k 5
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.face_embedding import MOBILEFACENET_EMB_DIM, l2_normalize_filas  # noqa: E402
+from utils.face_gallery import GaleriaEmbeddings  # noqa: E402
+
+
+def embeddings_sinteticos(n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return l2_normalize_filas(rng.normal(size=(n, MOBILEFACENET_EMB_DIM)).astype(np.float32))
+
+
+def buscar_bucle(embs: np.ndarray, probes: np.ndarray) -> list[int]:
+    """Top-1 con un producto escalar por identidad (referencia lenta)."""
+    mejores = []
+    for p in probes:
+        mejor, mejor_sim = -1, -np.inf
+        for i in range(embs.shape[0]):
+            s = float(np.dot(embs[i], p))
+            if s > mejor_sim:
+                mejor, mejor_sim = i, s
+        mejores.append(mejor)
+    return mejores
+
+
+def buscar_argsort(embs: np.ndarray, probes: np.ndarray, k: int) -> np.ndarray:
+    sims = probes @ embs.T
+    return np.argsort(-sims, axis=1, kind="stable")[:, :k]
+
+
+def _verificar_altas_bajas(embs: np.ndarray) -> None:
+    n = embs.shape[0]
+    galeria = GaleriaEmbeddings(capacidad_inicial=16)
+    for i in range(n):
+        galeria.agregar(f"id{i}", embs[i])
+    quitados = set(range(0, n, 7))
+    for i in quitados:
+        if galeria.quitar(f"id{i}") != 1:
+            raise SystemExit(f"quitar id{i} no devolvio 1")
+    galeria.agregar("extra", embs[:3])
+    esperado = {f"id{i}" for i in range(n) if i not in quitados} | {"extra"}
+    if set(galeria.identidades) != esperado or len(galeria) != n - len(quitados) + 3:
+        raise SystemExit("identidades tras quitar/agregar no coinciden")
+    for fila in range(len(galeria)):
+        nombre = galeria.nombre_de_fila(fila)
+        if nombre == "extra":
+            continue
+        if not np.allclose(galeria.matriz[fila], embs[int(nombre[2:])], atol=1e-6):
+            raise SystemExit(f"fila {fila} ({nombre}) no corresponde a su embedding")
+    res = galeria.buscar(embs[8:11], k=1)
+    if [r[0] for r in res.nombres] != ["id8", "id9", "id10"]:
+        raise SystemExit(f"top-1 de sondas enroladas incorrecto: {res.nombres}")
+    print(f"Altas/bajas OK ({n} ids, {len(quitados)} bajas, 3 filas extra)")
+
+
+def _ms(fn, iters: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / iters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark galeria 1:N.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--sondas", type=int, default=4, help="Caras por frame a identificar.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--iters", type=int, default=20)
+    parser.add_argument(
+        "--max-bucle", type=int, default=10000, help="No medir el bucle por encima de N."
+    )
+    args = parser.parse_args()
+
+    _verificar_altas_bajas(embeddings_sinteticos(500, seed=1))
+
+    for n in args.tamanos:
+        embs = embeddings_sinteticos(n, seed=0)
+        probes = embs[:: max(1, n // args.sondas)][: args.sondas] + 0.05 * embeddings_sinteticos(
+            args.sondas, seed=2
+        )
+        galeria = GaleriaEmbeddings(capacidad_inicial=n)
+        t0 = time.perf_counter()
+        for i in range(n):
+            galeria.agregar(f"id{i}", embs[i])
+        t_alta = (time.perf_counter() - t0) * 1e6 / n
+
+        res = galeria.buscar(probes, k=args.k)
+        ref = buscar_argsort(embs, l2_normalize_filas(probes), args.k)
+        if not np.array_equal(res.filas, ref):
+            raise SystemExit(f"N={n}: top-{args.k} de la galeria distinto del argsort completo")
+
+        t_gal = _ms(lambda: galeria.buscar(probes, k=args.k), args.iters)
+        t_sort = _ms(lambda: buscar_argsort(embs, probes, args.k), args.iters)
+        linea = (
+            f"N={n:6d} | galeria={t_gal:.3f} ms | argsort={t_sort:.3f} ms "
+            f"| alta={t_alta:.1f} us/id | matriz={galeria.matriz.nbytes / 1e6:.1f} MB"
+        )
+        if n <= args.max_bucle:
+            t_bucle = _ms(lambda: buscar_bucle(embs, probes), 1)
+            linea += f" | bucle={t_bucle:.1f} ms (x{t_bucle / max(t_gal, 1e-9):.0f})"
+        print(linea)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark de asignaciones por frame: ``retrieve()`` + ``.copy()`` (como ``CaptureCameras`` +
+``UltimoFrameCamara.read_copy``) frente al anillo de buffers de ``utils/frame_ring.py``.
+
+Genera un video MJPG de alta resolucion (por defecto 2560x1920, el main stream de la camara)
+y lo lee en bucle con cada modo. Cada modo corre en un subproceso propio para que el pico de
+RSS no se mezcle. Reporta ms/frame, MB asignados por frame (pico de ``tracemalloc``; NumPy
+reporta sus buffers, incluidos los que crea OpenCV), fallos de pagina menores por frame y RSS
+maximo. Verifica antes que el anillo entrega los mismos pixeles que ``read()``.
+
+Ejemplo:
+  python bench/bench_frame_ring.py
+  python bench/bench_frame_ring.py --ancho 1280 --alto 720 --frames 300
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.frame_ring import AnilloFrames  # noqa: E402
+
+MODOS = ("copia", "anillo")
+
+
+def escribir_video(path: Path, ancho: int, alto: int, n: int) -> None:
+    vw = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 25, (ancho, alto))
+    if not vw.isOpened():
+        raise SystemExit(f"No se pudo crear el video de prueba: {path}")
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, size=(alto // 8, ancho // 8, 3), dtype=np.uint8)
+    base = cv2.resize(base, (ancho, alto), interpolation=cv2.INTER_LINEAR)
+    for i in range(n):
+        vw.write(np.roll(base, i * 8, axis=1))
+    vw.release()
+
+
+def _siguiente(cap: cv2.VideoCapture, video: Path) -> cv2.VideoCapture:
+    if cap.grab():
+        return cap
+    cap.release()
+    cap = cv2.VideoCapture(str(video))
+    cap.grab()
+    return cap
+
+
+def verificar(video: Path, n: int = 5) -> None:
+    ref = cv2.VideoCapture(str(video))
+    cap = cv2.VideoCapture(str(video))
+    anillo = AnilloFrames(3)
+    for i in range(n):
+        ok, esperado = ref.read()
+        cap.grab()
+        anillo.escribir_desde(cap)
+        with anillo.prestar() as p:
+            if not ok or not np.array_equal(p.vista, esperado) or p.vista.flags.writeable:
+                raise SystemExit(f"frame {i}: el anillo no coincide con read()")
+    if anillo.asignaciones > anillo.n_slots:
+        raise SystemExit(f"el anillo asigno {anillo.asignaciones} buffers (max 1 por slot)")
+    print(f"Anillo == read() en {n} frames; buffers asignados={anillo.asignaciones}")
+
+
+def medir(modo: str, video: Path, frames: int) -> dict:
+    cap = cv2.VideoCapture(str(video))
+    anillo = AnilloFrames(3)
+    for _ in range(5):  # calentamiento: buffers del anillo y decoder
+        cap = _siguiente(cap, video)
+        if modo == "anillo":
+            anillo.escribir_desde(cap)
+            anillo.prestar().liberar()
+        else:
+            cap.retrieve()[1].copy()
+
+    tracemalloc.start()
+    pico_total = 0
+    flt0 = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        cap = _siguiente(cap, video)
+        antes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        if modo == "anillo":
+            anillo.escribir_desde(cap)
+            p = anillo.prestar()
+            float(p.vista[0, 0, 0])  # el consumidor lee
+            p.liberar()
+        else:
+            ok, frame = cap.retrieve()  # CaptureCameras._publicar_frame
+            copia = frame.copy()  # UltimoFrameCamara.read_copy
+            float(copia[0, 0, 0])
+            del frame, copia
+        pico_total += tracemalloc.get_traced_memory()[1] - antes
+    dt = time.perf_counter() - t0
+    flt = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - flt0
+    tracemalloc.stop()
+    return {
+        "modo": modo,
+        "ms_frame": dt * 1000.0 / frames,
+        "mb_asignados_frame": pico_total / frames / 1e6,
+        "fallos_pagina_frame": flt / frames,
+        "rss_max_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark anillo de frames vs copia.")
+    parser.add_argument("--ancho", type=int, default=2560)
+    parser.add_argument("--alto", type=int, default=1920)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--solo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--video", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.solo:
+        print(json.dumps(medir(args.solo, Path(args.video), args.frames)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = Path(tmp) / "alta.avi"
+        escribir_video(video, args.ancho, args.alto, n=25)
+        verificar(video)
+        print(f"{args.ancho}x{args.alto} ({args.ancho * args.alto * 3 / 1e6:.1f} MB/frame)")
+        for modo in MODOS:
+            out = subprocess.run(
+                [sys.executable, __file__, "--solo", modo, "--video", str(video),
+                 "--frames", str(args.frames)],
+                capture_output=True, text=True, check=True,
+            )
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(
+                f"  {modo:7s} {r['ms_frame']:.2f} ms/frame | asignado={r['mb_asignados_frame']:.2f} "
+                f"MB/frame | fallos_pagina={r['fallos_pagina_frame']:.0f}/frame "
+                f"| RSS max={r['rss_max_mb']:.0f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
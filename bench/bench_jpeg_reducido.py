@@ -0,0 +1,153 @@
+"""
+Benchmark de decodificacion JPEG reducida (``utils/jpeg_reducido.py``) para Snaps grandes.
+
+Codifica un JPEG de ``--ancho`` x ``--alto`` (por defecto 2560x1920, ``SNAP_HTTP_URL_RES_FULL``)
+y compara, por entrada de detector (320x320 RetinaFace con letterbox, 640x640 YOLOv8 con
+resize directo):
+
+- completo: ``imdecode(IMREAD_COLOR)`` + letterbox / resize.
+- reducido: ``decodificar_reducido`` (``IMREAD_REDUCED_COLOR_f`` automatico) + letterbox / resize.
+
+Verifica con RetinaFace ONNX (CPU) que las detecciones del camino reducido, pasadas a
+coordenadas completas con ``a_completa``, coinciden con las del camino completo (mismo numero
+de caras, IoU >= ``--iou-min``) y que ``recorte`` da los mismos pixeles que recortar el frame
+decodificado completo.
+
+Ejemplo:
+  python bench/bench_jpeg_reducido.py
+  python bench/bench_jpeg_reducido.py --ancho 1920 --alto 1080 --repeticiones 50
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_INPUT_HEIGHT,
+    RETINAFACE_INPUT_WIDTH,
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+from utils.image_utils import letterbox_bgr  # noqa: E402
+from utils.jpeg_reducido import decodificar_reducido  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+ENTRADAS = (("RetinaFace 320 (letterbox)", (320, 320), True), ("YOLOv8 640 (resize)", (640, 640), False))
+
+
+def jpeg_grande(ancho: int, alto: int) -> bytes:
+    img = cv2.imread(str(ROOT / "Retinaface-Models" / "test.jpg"))
+    if img is None:
+        raise SystemExit("No se pudo leer Retinaface-Models/test.jpg")
+    img = cv2.resize(img, (ancho, alto), interpolation=cv2.INTER_CUBIC)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise SystemExit("imencode fallo")
+    return buf.tobytes()
+
+
+def _ms(fn, repeticiones: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / repeticiones
+
+
+def _ajustar(frame: np.ndarray, entrada_wh: tuple[int, int], letterbox: bool) -> np.ndarray:
+    if letterbox:
+        return letterbox_bgr(frame, entrada_wh, RETINAFACE_LETTERBOX_FILL)[0]
+    return cv2.resize(frame, entrada_wh, interpolation=cv2.INTER_AREA)
+
+
+def detectar(session, frame: np.ndarray) -> np.ndarray:
+    h, w = frame.shape[:2]
+    lb, meta = letterbox_bgr(frame, (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT), RETINAFACE_LETTERBOX_FILL)
+    x = (lb.astype(np.float32) - RETINAFACE_MEAN_BGR).transpose(2, 0, 1)[np.newaxis]
+    out = session.run(None, {session.get_inputs()[0].name: np.ascontiguousarray(x)})
+    return retinaface_dets_topk_desde_rknn_outputs(
+        list(out),
+        img_width=w,
+        img_height=h,
+        aspect_ratio=meta.aspect_ratio,
+        offset_x=meta.offset_x,
+        offset_y=meta.offset_y,
+        score_deteccion=0.5,
+    )
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def verificar(jpeg: bytes, iou_min: float) -> None:
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(RETINAFACE_ONNX), providers=["CPUExecutionProvider"])
+    completo = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    snap = decodificar_reducido(jpeg, (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT))
+    ref = detectar(session, completo)
+    red = snap.a_completa(detectar(session, snap.frame))
+    if ref.shape[0] == 0 or ref.shape[0] != red.shape[0]:
+        raise SystemExit(f"Caras: completo={ref.shape[0]} reducido={red.shape[0]}")
+    ious = []
+    for fila in ref:
+        mejor = max(range(red.shape[0]), key=lambda j: _iou(fila, red[j]))
+        ious.append(_iou(fila, red[mejor]))
+    if min(ious) < iou_min:
+        raise SystemExit(f"IoU minimo {min(ious):.3f} < {iou_min}")
+    x1, y1 = int(red[0, 0]), int(red[0, 1])
+    x2, y2 = int(np.ceil(red[0, 2])), int(np.ceil(red[0, 3]))
+    if not np.array_equal(snap.recorte(red[0, :4]), completo[y1:y2, x1:x2]):
+        raise SystemExit("recorte() no coincide con el frame completo")
+    print(
+        f"Detecciones reducido (1/{snap.factor}) == completo: {ref.shape[0]} caras, "
+        f"IoU min={min(ious):.3f}; recorte a resolucion completa OK"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark decode JPEG reducido.")
+    parser.add_argument("--ancho", type=int, default=2560)
+    parser.add_argument("--alto", type=int, default=1920)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--iou-min", type=float, default=0.8)
+    args = parser.parse_args()
+
+    jpeg = jpeg_grande(args.ancho, args.alto)
+    print(f"JPEG {args.ancho}x{args.alto} ({len(jpeg) / 1024:.0f} KB)")
+    verificar(jpeg, args.iou_min)
+    buf = np.frombuffer(jpeg, dtype=np.uint8)
+    for nombre, entrada, letterbox in ENTRADAS:
+        t_full = _ms(
+            lambda: _ajustar(cv2.imdecode(buf, cv2.IMREAD_COLOR), entrada, letterbox),
+            args.repeticiones,
+        )
+        snap = decodificar_reducido(jpeg, entrada, letterbox)
+        t_red = _ms(
+            lambda: _ajustar(decodificar_reducido(jpeg, entrada, letterbox).frame, entrada, letterbox),
+            args.repeticiones,
+        )
+        h, w = snap.frame.shape[:2]
+        print(
+            f"  {nombre:28s} completo={t_full:6.2f} ms | reducido 1/{snap.factor} ({w}x{h})="
+            f"{t_red:6.2f} ms | x{t_full / t_red:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
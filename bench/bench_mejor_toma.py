@@ -0,0 +1,288 @@
+"""
+Mejor toma por track (``utils/mejor_toma.py``) frente a embeber cada cara apta: llamadas a
+MobileFaceNet, acierto de la identificacion y coste de la puntuacion de calidad.
+
+Clip sintetico (MJPG, ``--segundos`` a ``--fps``) de un pasillo con dos personas enroladas
+(``Retinaface-Models/test.jpg`` e ``images/lily2.jpg``) que se mueven despacio con la cabeza
+inclinandose de lado a lado (alabeo de hasta ~35 grados) y tramos desenfocados. El recorte para
+MobileFaceNet no se alinea, asi que esas tomas dan similitudes bajas o identidades erroneas. La
+galeria tiene las dos caras (imagen original) y ``embeddings/angel1.npy``.
+
+RetinaFace se ejecuta una vez por frame analizado (``--fps-analisis``); sobre las mismas
+detecciones:
+
+1. ``por frame``: cada cara con score >= 0.90 (``MIN_SCORE_MEJOR_CARA_EMBEDDING``).
+2. ``tracker``: ``TrackerCaras`` embebe solo los frames que pide ``pendientes_embedding``.
+3. ``mejor toma k``: tracker + ``SelectorMejorToma`` con ``top_k`` = 1 y 3 (media de los
+   embeddings de las k tomas).
+
+Por modo: recortes embebidos (llamadas MobileFaceNet), decisiones (busquedas en la galeria) y
+fraccion de decisiones correctas (persona real con similitud >= 0.45), y fraccion de caras
+analizadas que muestran la identidad correcta. Falla si la mejor toma top-1 no reduce los
+recortes en ``--min-reduccion`` frente a ``por frame``, si acierta menos que ``por frame`` o si
+la calidad cuesta mas de ``--max-ms-calidad`` por cara.
+
+Ejemplo:
+  python bench/bench_mejor_toma.py
+  python bench/bench_mejor_toma.py --fps-analisis 5 --ventana-seg 1
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.escena_pasillo import (  # noqa: E402
+    ALTO,
+    ANCHO,
+    PERSONAS,
+    con_ruido,
+    escribir_video,
+    fondo_pasillo,
+    leer_video,
+    recorte_persona,
+    ruidos_sensor,
+)
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+from utils.backend_inferencia import BackendORT, preprocesador  # noqa: E402
+from utils.face_embedding import EmbedderMobileFaceNet  # noqa: E402
+from utils.face_gallery import GaleriaEmbeddings  # noqa: E402
+from utils.mejor_toma import ParametrosMejorToma, SelectorMejorToma, embeddings_de_tomas  # noqa: E402
+from utils.tracker_caras import PoliticaIdentidad, TrackerCaras  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+MOBILEFACENET_ONNX = ROOT / "mobilenet_modelos" / "MobileFaceNet.onnx"
+RETINAFACE_SCORE_DETECCION = 0.2
+MIN_SCORE_MEJOR_CARA_EMBEDDING = 0.90
+SIM_MIN_MATCH_VERIFICACION = 0.45
+# (t_ini, t_fin, x centro ida, x centro vuelta, base y, escala, periodo alabeo s, fase)
+ESCENA = {
+    "persona_a": (1.0, 45.0, 0.3, 0.45, 1.0, 0.5, 7.0, 0.0),
+    "persona_b": (12.0, 36.0, 0.8, 0.65, 0.95, 0.42, 5.0, 1.5),
+}
+ALABEO_MAX = 35.0
+PERIODO_DESENFOQUE_S = 6.0  # cada periodo, 1.5 s desenfocado
+
+
+def escribir_clip(path: Path, fps: float, segundos: float) -> list[dict[str, np.ndarray]]:
+    """Escribe el clip y devuelve, por frame, el centro real de la cara de cada persona visible."""
+    rng = np.random.default_rng(0)
+    fondo = fondo_pasillo(rng)
+    ruidos = ruidos_sensor(rng, 8)
+    sprites = {}
+    for nombre in ESCENA:
+        persona, cara = recorte_persona(nombre)
+        escala = ESCENA[nombre][5]
+        sprite = cv2.resize(persona, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+        centro = ((cara[0] + cara[2]) / 2, (cara[1] + cara[3]) / 2)
+        sprites[nombre] = (sprite, (float(centro[0]) * escala, float(centro[1]) * escala))
+    centros = []
+
+    def frames():
+        for i in range(int(segundos * fps)):
+            t = i / fps
+            frame = fondo.copy()
+            reales = {}
+            for nombre, (t0, t1, xa, xb, base, _, periodo, fase) in ESCENA.items():
+                if not t0 <= t <= t1:
+                    continue
+                sprite, (cx, cy) = sprites[nombre]
+                u = (t - t0) / (t1 - t0)
+                xc = xa + (xb - xa) * (0.5 - 0.5 * np.cos(2 * np.pi * u * 2))  # ida y vuelta, 2 veces
+                angulo = ALABEO_MAX * np.sin(2 * np.pi * t / periodo + fase)
+                ph, pw = sprite.shape[:2]
+                m = cv2.getRotationMatrix2D((cx, cy), angulo, 1.0)
+                girado = cv2.warpAffine(sprite, m, (pw, ph), flags=cv2.INTER_LINEAR)
+                mascara = cv2.warpAffine(np.full((ph, pw), 255, np.uint8), m, (pw, ph)) > 0
+                if (t + fase) % PERIODO_DESENFOQUE_S < 1.5:
+                    girado = cv2.GaussianBlur(girado, (0, 0), 3.0)
+                x, y = int(xc * ANCHO - pw / 2), int(base * ALTO) - ph
+                zona = frame[y : y + ph, x : x + pw]
+                zona[mascara] = girado[mascara]
+                reales[nombre] = np.array([x + cx, y + cy], dtype=np.float32)
+            centros.append(reales)
+            yield con_ruido(frame, ruidos[i % len(ruidos)])
+
+    escribir_video(path, frames(), fps)
+    return centros
+
+
+def persona_real(det: np.ndarray, centros: dict[str, np.ndarray]) -> str | None:
+    """Persona cuya cara real tiene el centro dentro de la caja detectada."""
+    for nombre, (cx, cy) in centros.items():
+        if det[0] <= cx <= det[2] and det[1] <= cy <= det[3]:
+            return nombre
+    return None
+
+
+def decision(sim: float, nombre: str | None) -> str | None:
+    return nombre if sim >= SIM_MIN_MATCH_VERIFICACION else None
+
+
+class Resultado:
+    def __init__(self) -> None:
+        self.decisiones = 0
+        self.correctas = 0
+        self.caras = 0  # caras analizadas de personas reales
+        self.mostradas_ok = 0
+
+    def buscar(self, galeria, embs, reales) -> tuple[np.ndarray, list[str | None]]:
+        res = galeria.buscar(embs, k=1)
+        nombres = [n[0] for n in res.nombres]
+        for sim, nombre, real in zip(res.sims[:, 0], nombres, reales):
+            self.decisiones += 1
+            self.correctas += real is not None and decision(float(sim), nombre) == real
+        return res.sims[:, 0], nombres
+
+    def mostrar(self, sims, nombres, reales) -> None:
+        for sim, nombre, real in zip(sims, nombres, reales):
+            if real is None:
+                continue
+            self.caras += 1
+            self.mostradas_ok += not np.isnan(sim) and decision(float(sim), nombre) == real
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mejor toma por track vs embeber cada cara apta.")
+    parser.add_argument("--segundos", type=float, default=48.0)
+    parser.add_argument("--fps", type=float, default=10.0)
+    parser.add_argument("--fps-analisis", type=float, default=2.0, help="MAX_FPS_ANALISIS del script.")
+    parser.add_argument("--ventana-seg", type=float, default=2.0)
+    parser.add_argument("--min-reduccion", type=float, default=0.7)
+    parser.add_argument("--max-ms-calidad", type=float, default=1.0)
+    args = parser.parse_args()
+
+    backend = BackendORT(RETINAFACE_ONNX, hilos=1).cargar()
+    prep = preprocesador(backend.entrada, RETINAFACE_MEAN_BGR)
+    opciones = ort.SessionOptions()
+    opciones.intra_op_num_threads = 1
+    embedder = EmbedderMobileFaceNet(
+        ort.InferenceSession(str(MOBILEFACENET_ONNX), opciones, providers=["CPUExecutionProvider"])
+    )
+    galeria = GaleriaEmbeddings()
+    galeria.agregar("angel1", np.load(str(ROOT / "embeddings" / "angel1.npy")).astype(np.float32).reshape(1, -1))
+    for nombre, (img, _, cara) in PERSONAS.items():
+        imagen = cv2.imread(str(ROOT / img))
+        galeria.agregar(nombre, embedder.embeddings_de_dets(imagen, np.array([cara], dtype=np.float32)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = Path(tmp) / "pasillo_mejor_toma.avi"
+        centros = escribir_clip(ruta, args.fps, args.segundos)
+        frames, fps = leer_video(ruta)
+    paso = max(1, int(round(fps / args.fps_analisis)))
+    analizados = []
+    for i in range(0, len(frames), paso):
+        frame = frames[i]
+        tensor, meta = prep.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
+        dets = retinaface_dets_topk_desde_rknn_outputs(
+            list(backend.infer_batch(tensor)),
+            img_width=ANCHO,
+            img_height=ALTO,
+            aspect_ratio=meta.aspect_ratio,
+            offset_x=meta.offset_x,
+            offset_y=meta.offset_y,
+            score_deteccion=RETINAFACE_SCORE_DETECCION,
+        )
+        reales = [persona_real(d, centros[i]) for d in dets]
+        analizados.append((i / fps, frame, dets, reales))
+
+    politica = PoliticaIdentidad(sim_match=SIM_MIN_MATCH_VERIFICACION)
+    resultados: dict[str, Resultado] = {}
+    recortes: dict[str, int] = {}
+
+    # 1) Por frame.
+    embedder.llamadas_run = 0
+    r = resultados["por frame"] = Resultado()
+    for _, frame, dets, reales in analizados:
+        sims = np.full((dets.shape[0],), np.nan, dtype=np.float32)
+        nombres: list[str | None] = [None] * dets.shape[0]
+        aptas = np.flatnonzero(dets[:, 4] >= MIN_SCORE_MEJOR_CARA_EMBEDDING)
+        if aptas.size:
+            s, n = r.buscar(galeria, embedder.embeddings_de_dets(frame, dets[aptas]), [reales[i] for i in aptas])
+            sims[aptas] = s
+            for j, i in enumerate(aptas):
+                nombres[i] = n[j]
+        r.mostrar(sims, nombres, reales)
+    recortes["por frame"] = embedder.llamadas_run
+
+    # 2) Tracker con cache de identidad.
+    embedder.llamadas_run = 0
+    r = resultados["tracker"] = Resultado()
+    tracker = TrackerCaras(politica=politica)
+    for t, frame, dets, reales in analizados:
+        ids = tracker.actualizar(dets, t)
+        aptas = np.flatnonzero(dets[:, 4] >= MIN_SCORE_MEJOR_CARA_EMBEDDING)
+        nuevas = aptas[tracker.pendientes_embedding(ids[aptas], t)]
+        if nuevas.size:
+            s, n = r.buscar(galeria, embedder.embeddings_de_dets(frame, dets[nuevas]), [reales[i] for i in nuevas])
+            tracker.registrar_identidades(ids[nuevas], n, s, t)
+        r.mostrar(*tracker.identidades(ids), reales)
+    recortes["tracker"] = embedder.llamadas_run
+
+    # 3) Tracker + mejor toma.
+    selectores = {}
+    for k in (1, 3):
+        nombre_modo = f"mejor toma top-{k}"
+        embedder.llamadas_run = 0
+        r = resultados[nombre_modo] = Resultado()
+        tracker = TrackerCaras(politica=politica)
+        selector = selectores[k] = SelectorMejorToma(ParametrosMejorToma(top_k=k, ventana_seg=args.ventana_seg))
+        real_de_track: dict[int, str | None] = {}
+        for t, frame, dets, reales in analizados:
+            ids = tracker.actualizar(dets, t)
+            for i in np.flatnonzero(tracker.pendientes_embedding(ids, t)):
+                selector.agregar(int(ids[i]), frame, dets[i], t)
+            for id_track, real in zip(ids, reales):
+                real_de_track[int(id_track)] = real
+            listos = selector.listos(t, tracker.tracks)
+            if listos:
+                s, n = r.buscar(
+                    galeria, embeddings_de_tomas(embedder, listos), [real_de_track[l.id_track] for l in listos]
+                )
+                tracker.registrar_identidades([l.id_track for l in listos], n, s, t)
+            r.mostrar(*tracker.identidades(ids), reales)
+        recortes[nombre_modo] = embedder.llamadas_run
+
+    n_caras = sum(len(reales) for *_, reales in analizados)
+    print(
+        f"{len(frames)} frames a {fps:g} fps, {len(analizados)} analizados ({args.fps_analisis:g} fps), "
+        f"{n_caras} caras detectadas, ventana {args.ventana_seg:g} s"
+    )
+    for nombre_modo, r in resultados.items():
+        print(
+            f"  {nombre_modo:17s} recortes MobileFaceNet {recortes[nombre_modo]:4d} | decisiones {r.decisiones:4d} "
+            f"correctas {100.0 * r.correctas / max(r.decisiones, 1):5.1f}% | caras con la identidad correcta "
+            f"{100.0 * r.mostradas_ok / max(r.caras, 1):5.1f}%"
+        )
+    for k, selector in selectores.items():
+        print(f"  top-{k}: {selector.resumen()}")
+
+    base, mejor = resultados["por frame"], resultados["mejor toma top-1"]
+    reduccion = 1.0 - recortes["mejor toma top-1"] / max(recortes["por frame"], 1)
+    ms_calidad = selectores[1].ms_calidad / max(selectores[1].candidatas, 1)
+    fallos = []
+    if reduccion < args.min_reduccion:
+        fallos.append(f"reduccion de recortes {100.0 * reduccion:.1f}% < {100.0 * args.min_reduccion:.0f}%")
+    if mejor.correctas / max(mejor.decisiones, 1) < base.correctas / max(base.decisiones, 1):
+        fallos.append("la mejor toma acierta menos decisiones que embeber cada cara")
+    if ms_calidad > args.max_ms_calidad:
+        fallos.append(f"calidad {ms_calidad:.3f} ms/cara > {args.max_ms_calidad} ms")
+    if fallos:
+        raise SystemExit("; ".join(fallos))
+
+
+if __name__ == "__main__":
+    main()
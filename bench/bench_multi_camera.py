@@ -0,0 +1,100 @@
+"""
+Prueba/benchmark del gestor multi-camara (``utils/multi_camera.py``) con videos locales en
+lugar de RTSP.
+
+Genera videos sinteticos (modo FILE, cada uno con su FPS) mas una fuente rota (ruta
+inexistente, ejercita la reconexion) y un unico consumidor que simula inferencia con
+``--worker-ms``. Para cada politica imprime por camara los frames servidos, los descartados
+y la espera media desde la captura hasta el consumidor. Falla si alguna camara sana no recibe
+servicio o si el reparto entre camaras queda muy desequilibrado con el consumidor saturado.
+
+Ejemplo:
+  python bench/bench_multi_camera.py
+  python bench/bench_multi_camera.py --fps 30 25 15 5 --worker-ms 40 --segundos 6
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.multi_camera import POLITICAS_SCHEDULER, GestorCamaras  # noqa: E402
+
+
+def escribir_video(path: Path, fps: float, n_frames: int, wh=(640, 480)) -> None:
+    w, h = wh
+    vw = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (w, h))
+    if not vw.isOpened():
+        raise SystemExit(f"No se pudo crear el video de prueba: {path}")
+    frame = np.zeros((h, w, 3), dtype=np.uint8)
+    for i in range(n_frames):
+        frame[:] = (i * 7) % 255
+        cv2.putText(frame, str(i), (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 3)
+        vw.write(frame)
+    vw.release()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark gestor multi-camara.")
+    parser.add_argument("--fps", type=float, nargs="+", default=[25.0, 25.0, 15.0, 5.0])
+    parser.add_argument("--worker-ms", type=float, default=30.0, help="Inferencia simulada.")
+    parser.add_argument("--segundos", type=float, default=4.0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fuentes = []
+        for i, fps in enumerate(args.fps):
+            path = Path(tmp) / f"cam{i}.avi"
+            escribir_video(path, fps, n_frames=int(fps * 2))  # corto: se reabre en bucle
+            fuentes.append({"nombre": f"cam{i}_{fps:g}fps", "modo": "FILE", "url": str(path)})
+        fuentes.append(
+            {"nombre": "rota", "modo": "FILE", "url": str(Path(tmp) / "no.avi"), "reintento_seg": 0.5}
+        )
+        fps_total = sum(args.fps)
+        print(
+            f"{len(args.fps)} videos ({fps_total:g} fps en total) + 1 fuente rota | "
+            f"consumidor {args.worker_ms:g} ms/frame (max {1000.0 / args.worker_ms:.0f} fps)"
+        )
+
+        for politica in POLITICAS_SCHEDULER:
+            gestor = GestorCamaras(
+                [dict(f, max_fps=0) for f in fuentes], politica=politica
+            ).start()
+            t_fin = time.monotonic() + args.segundos
+            while time.monotonic() < t_fin:
+                item = gestor.siguiente_frame(timeout=0.2)
+                if item is not None:
+                    time.sleep(args.worker_ms / 1000.0)
+            gestor.stop()
+
+            print(f"[{politica}]")
+            servidos = {}
+            for nombre, e in gestor.estadisticas.items():
+                servidos[nombre] = e.servidos
+                print(
+                    f"  {nombre:14s} servidos={e.servidos:4d} descartados={e.descartados:4d} "
+                    f"espera_media={e.espera_ms_media:6.1f} ms"
+                )
+            sanas = [v for k, v in servidos.items() if k != "rota"]
+            if min(sanas) == 0 or servidos["rota"] != 0:
+                raise SystemExit(f"{politica}: reparto incorrecto {servidos}")
+            # Consumidor saturado: las camaras mas rapidas que su cuota deben repartirse.
+            cuota = 1000.0 / args.worker_ms / len(args.fps)
+            rapidas = [servidos[f["nombre"]] for f, fps in zip(fuentes, args.fps) if fps > 2 * cuota]
+            if len(rapidas) > 1 and max(rapidas) > 2 * min(rapidas):
+                raise SystemExit(f"{politica}: camaras rapidas desequilibradas {servidos}")
+
+
+if __name__ == "__main__":
+    main()
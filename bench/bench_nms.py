@@ -0,0 +1,91 @@
+"""
+Benchmark + equivalencia de NMS (``utils/nms.py``).
+
+Para cada cantidad de candidatos compara ``nms_greedy`` (referencia) con ``nms_matriz``
+en ambas convenciones de area, y el NMS por clase en lote contra un bucle clase a clase.
+Si algun resultado difiere, el script termina con error.
+
+Ejemplo:
+  python bench/bench_nms.py
+  python bench/bench_nms.py --sizes 50 200 800 2000
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.nms import nms_greedy, nms_matriz  # noqa: E402
+
+
+def cajas_concurridas(n: int, seed: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Escena concurrida: ``n`` cajas agrupadas alrededor de ~n/8 objetos (float32)."""
+    rng = np.random.default_rng(seed)
+    n_obj = max(1, n // 8)
+    centros = rng.uniform(0, 640, size=(n_obj, 2))
+    lados = rng.uniform(20, 120, size=(n_obj, 2))
+    idx = rng.integers(0, n_obj, size=n)
+    c = centros[idx] + rng.normal(0, 6, size=(n, 2))
+    wh = lados[idx] * rng.uniform(0.85, 1.15, size=(n, 2))
+    boxes = np.concatenate([c - wh / 2, c + wh / 2], axis=1).astype(np.float32)
+    scores = rng.uniform(0.25, 1.0, size=n).astype(np.float32)
+    class_ids = rng.integers(0, 3, size=n)
+    return boxes, scores, class_ids
+
+
+def nms_por_clase_bucle(boxes, scores, class_ids, iou_thres, area_mas_uno):
+    keep = []
+    for c in np.unique(class_ids):
+        idx = np.flatnonzero(class_ids == c)
+        keep.extend(idx[nms_greedy(boxes[idx], scores[idx], iou_thres, area_mas_uno=area_mas_uno)])
+    keep = np.array(keep, dtype=np.int64)
+    return keep[np.argsort(-scores[keep], kind="stable")]
+
+
+def _ms(fn, iters: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / iters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark NMS greedy vs matriz.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 400, 1000])
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--iters", type=int, default=20)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        boxes, scores, class_ids = cajas_concurridas(n, seed=n)
+        for area_mas_uno in (False, True):
+            ref = nms_greedy(boxes, scores, args.iou, area_mas_uno=area_mas_uno)
+            new = nms_matriz(boxes, scores, args.iou, area_mas_uno=area_mas_uno)
+            if not np.array_equal(ref, new):
+                raise SystemExit(f"n={n} area_mas_uno={area_mas_uno}: nms_matriz != nms_greedy")
+        ref_cls = nms_por_clase_bucle(boxes, scores, class_ids, args.iou, False)
+        new_cls = nms_matriz(boxes, scores, args.iou, class_ids=class_ids)
+        if not np.array_equal(np.sort(ref_cls), np.sort(new_cls)):
+            raise SystemExit(f"n={n}: NMS por clase en lote != bucle por clase")
+
+        t_g = _ms(lambda: nms_greedy(boxes, scores, args.iou), args.iters)
+        t_m = _ms(lambda: nms_matriz(boxes, scores, args.iou), args.iters)
+        t_gc = _ms(
+            lambda: nms_por_clase_bucle(boxes, scores, class_ids, args.iou, False), args.iters
+        )
+        t_mc = _ms(lambda: nms_matriz(boxes, scores, args.iou, class_ids=class_ids), args.iters)
+        print(
+            f"n={n:5d} keep={ref.size:4d} equivalente=OK | greedy={t_g:.3f} ms "
+            f"matriz={t_m:.3f} ms | por clase: bucle={t_gc:.3f} ms lote={t_mc:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+Benchmark del pipeline completo RetinaFace + MobileFaceNet por etapas, solo CPU (sin placa).
+
+Reproduce un video (``--video``) o una carpeta de imagenes (``--imagenes``, por defecto
+``Retinaface-Models``) en bucle y mide cada etapa por separado:
+
+  letterbox -> preproceso -> inferencia RetinaFace (ORT) -> decode -> NMS ->
+  recorte (caja + margen + preproceso 112x112) -> embedding MobileFaceNet (ORT) -> matching
+
+El matching es ``GaleriaEmbeddings.buscar`` contra ``--galeria`` identidades sinteticas mas la
+primera cara del primer frame. Las etapas de caras solo cuentan en frames con caras aptas.
+
+Reporta por etapa p50/p95/p99 (ms), el throughput extremo a extremo (frames/s), los bytes
+asignados por frame (pico de ``tracemalloc`` por etapa, en una pasada aparte de
+``--frames-memoria`` frames para no mezclar su coste con los tiempos) y el RSS maximo. Con
+``--json`` escribe todo (mas commit, maquina y versiones) para comparar ejecuciones entre
+commits o placas; ``--json -`` lo imprime por stdout.
+
+El detector corre sobre ``utils/backend_inferencia.py`` (``--backend``, por defecto
+``BACKEND_INFERENCIA``): ``onnx`` en x86 / CI, ``rknn`` en la placa, o ``mock`` reproduciendo un
+``.npz`` grabado antes con ``--grabar`` (mismas fuentes y numero de frames para que las salidas
+correspondan a los frames). MobileFaceNet y el matching siguen en ORT (CPU).
+
+Antes verifica que el preproceso del backend coincide con el de los scripts y que las etapas
+separadas dan lo mismo que ``retinaface_dets_topk_desde_rknn_outputs`` y
+``EmbedderMobileFaceNet.embeddings_de_dets``.
+
+Ejemplo:
+  python bench/bench_pipeline.py
+  python bench/bench_pipeline.py --video videos/prueba.mp4 --frames 300 --json out.json
+  python bench/bench_pipeline.py --imagenes fotos/ --hilos 4 --json -
+  python bench/bench_pipeline.py --grabar /tmp/det.npz && python bench/bench_pipeline.py --backend mock --modelo /tmp/det.npz
+  python3 bench/bench_pipeline.py --backend rknn --modelo models/RetinaFace_mobile320_2.rknn   # en la placa
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Iterator
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from configs import settings as s  # noqa: E402
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_INPUT_HEIGHT,
+    RETINAFACE_INPUT_WIDTH,
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_candidatos_desde_outputs,
+    retinaface_dets_topk_desde_rknn_outputs,
+    retinaface_nms_candidatos,
+)
+from utils.backend_inferencia import (  # noqa: E402
+    BACKENDS,
+    BackendInferencia,
+    EntradaModelo,
+    GrabadorSalidas,
+    crear_backend,
+    preprocesador,
+)
+from utils.face_embedding import (  # noqa: E402
+    FACE_CROP_MARGIN_FRAC,
+    MOBILEFACENET_EMB_DIM,
+    MOBILEFACENET_HW,
+    EmbedderMobileFaceNet,
+    acepta_batch_dinamico,
+    bbox_crop_with_margin,
+    crop_bgr_a_mobilefacenet,
+    l2_normalize_filas,
+)
+from utils.face_gallery import GaleriaEmbeddings  # noqa: E402
+from utils.image_utils import LetterboxDestino, letterbox_bgr  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+MFN_PATH = ROOT / "mobilenet_modelos" / "MobileFaceNet.onnx"
+RETINAFACE_SCORE_PRE_NMS = 0.02
+RETINAFACE_SCORE_DETECCION = 0.2
+MIN_SCORE_EMBEDDING = 0.90
+MAX_CARAS = 8
+ETAPAS = ("letterbox", "preproceso", "inferencia", "decode", "nms", "recorte", "embedding", "matching")
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def frames_fuente(video: str | None, imagenes: str | None) -> Iterator[np.ndarray]:
+    """Frames BGR en bucle infinito desde un video o una carpeta de imagenes."""
+    if video:
+        cap = cv2.VideoCapture(video)
+        if not cap.isOpened():
+            raise SystemExit(f"No se pudo abrir el video: {video}")
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                cap.release()
+                cap = cv2.VideoCapture(video)
+                ok, frame = cap.read()
+                if not ok:
+                    raise SystemExit(f"Video sin frames: {video}")
+            yield frame
+    rutas = sorted(p for p in Path(imagenes).iterdir() if p.suffix.lower() in EXTENSIONES_IMAGEN)
+    imgs = [img for img in (cv2.imread(str(p)) for p in rutas) if img is not None]
+    if not imgs:
+        raise SystemExit(f"Sin imagenes legibles en {imagenes}")
+    while True:
+        yield from imgs
+
+
+class Pipeline:
+    """Etapas del pipeline con sus buffers; ``procesar`` llama a ``medir(etapa, fn)``."""
+
+    def __init__(self, det: BackendInferencia, hilos: int, galeria_n: int) -> None:
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = hilos
+        so.inter_op_num_threads = 1
+        self.det = det
+        # Preproceso decidido una vez segun el backend (float32 BGR NCHW en ONNX, uint8 RGB NHWC en RKNN).
+        self.preparar = preprocesador(det.entrada, RETINAFACE_MEAN_BGR)
+        # Lienzo fijo: resize directo a la ROI, barras y meta solo al cambiar de resolucion.
+        self.letterbox = LetterboxDestino((RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT), RETINAFACE_LETTERBOX_FILL)
+        self.mfn = ort.InferenceSession(str(MFN_PATH), so, providers=["CPUExecutionProvider"])
+        self.mfn_in = self.mfn.get_inputs()[0].name
+        self.mfn_out = self.mfn.get_outputs()[0].name
+        self.mfn_lote = acepta_batch_dinamico(self.mfn)
+        self.lote = np.empty((MAX_CARAS, 3, *MOBILEFACENET_HW), dtype=np.float32)
+        self.galeria_n = galeria_n
+        self.galeria: GaleriaEmbeddings | None = None
+
+    def crear_galeria(self, emb_real: np.ndarray | None) -> None:
+        rng = np.random.default_rng(0)
+        embs = rng.standard_normal((self.galeria_n, MOBILEFACENET_EMB_DIM)).astype(np.float32)
+        nombres = [f"sint{i:06d}" for i in range(self.galeria_n)]
+        if emb_real is not None:
+            embs = np.vstack([embs, emb_real[None]])
+            nombres.append("real")
+        self.galeria = GaleriaEmbeddings.desde_matriz(nombres, embs)
+
+    def _embedding(self, n: int) -> np.ndarray:
+        if self.mfn_lote:
+            out = self.mfn.run([self.mfn_out], {self.mfn_in: self.lote[:n]})[0]
+        else:
+            out = np.concatenate(
+                [self.mfn.run([self.mfn_out], {self.mfn_in: self.lote[i : i + 1]})[0] for i in range(n)]
+            )
+        return l2_normalize_filas(np.asarray(out, dtype=np.float32).reshape(n, -1))
+
+    def _recortes(self, frame: np.ndarray, dets: np.ndarray) -> int:
+        h, w = frame.shape[:2]
+        for i, det in enumerate(dets):
+            x1, y1, x2, y2 = bbox_crop_with_margin(det, w, h, FACE_CROP_MARGIN_FRAC)
+            crop_bgr_a_mobilefacenet(frame[y1 : y2 + 1, x1 : x2 + 1], self.lote[i])
+        return dets.shape[0]
+
+    def procesar(self, frame: np.ndarray, medir) -> tuple[np.ndarray, np.ndarray | None]:
+        h, w = frame.shape[:2]
+        lb, meta = medir("letterbox", lambda: self.letterbox(frame))
+        x = medir("preproceso", lambda: self.preparar(lb))
+        outs = medir("inferencia", lambda: self.det.infer_batch(x))
+        cand, landms = medir(
+            "decode",
+            lambda: retinaface_candidatos_desde_outputs(
+                list(outs),
+                img_width=w,
+                img_height=h,
+                aspect_ratio=meta.aspect_ratio,
+                offset_x=meta.offset_x,
+                offset_y=meta.offset_y,
+                score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
+            ),
+        )
+        dets = medir(
+            "nms",
+            lambda: retinaface_nms_candidatos(cand, landms, score_deteccion=RETINAFACE_SCORE_DETECCION),
+        )
+        aptas = dets[dets[:, 4] >= MIN_SCORE_EMBEDDING][:MAX_CARAS]
+        if aptas.shape[0] == 0:
+            return dets, None
+        n = medir("recorte", lambda: self._recortes(frame, aptas))
+        embs = medir("embedding", lambda: self._embedding(n))
+        if self.galeria is not None:
+            medir("matching", lambda: self.galeria.buscar(embs, k=1))
+        return dets, embs
+
+
+def preprocesar_referencia(entrada: EntradaModelo, canvas_bgr: np.ndarray) -> np.ndarray:
+    """Preproceso tal como lo escriben los scripts: RKNN uint8 RGB NHWC, ONNX float32 - media."""
+    if entrada.dtype == "uint8":
+        return np.expand_dims(cv2.cvtColor(canvas_bgr, cv2.COLOR_BGR2RGB), axis=0)
+    x32 = canvas_bgr.astype(np.float32)
+    if entrada.layout == "NHWC":
+        x32 -= RETINAFACE_MEAN_BGR.reshape(1, 1, 3)
+        return np.expand_dims(x32, axis=0)
+    feed = np.expand_dims(np.transpose(x32, (2, 0, 1)), axis=0)
+    feed -= RETINAFACE_MEAN_BGR.reshape(1, 3, 1, 1)
+    return feed
+
+
+def _sin_medir(_etapa: str, fn):
+    return fn()
+
+
+def verificar(pipe: Pipeline, frame: np.ndarray) -> np.ndarray | None:
+    capturado = {}
+
+    def capturar(etapa: str, fn):
+        capturado[etapa] = r = fn()
+        return r
+
+    dets, embs = pipe.procesar(frame, capturar)
+    h, w = frame.shape[:2]
+    lb, meta = letterbox_bgr(frame, (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT), RETINAFACE_LETTERBOX_FILL)
+    if not np.array_equal(capturado["preproceso"], preprocesar_referencia(pipe.det.entrada, lb)):
+        raise SystemExit("preprocesador(entrada) != preproceso de los scripts para este backend")
+    ref = retinaface_dets_topk_desde_rknn_outputs(
+        list(capturado["inferencia"]),
+        img_width=w,
+        img_height=h,
+        aspect_ratio=meta.aspect_ratio,
+        offset_x=meta.offset_x,
+        offset_y=meta.offset_y,
+        score_deteccion=RETINAFACE_SCORE_DETECCION,
+        score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
+    )
+    if not np.array_equal(dets, ref):
+        raise SystemExit("decode + NMS por etapas != retinaface_dets_topk_desde_rknn_outputs")
+    if embs is not None:
+        aptas = dets[dets[:, 4] >= MIN_SCORE_EMBEDDING][:MAX_CARAS]
+        esperados = EmbedderMobileFaceNet(pipe.mfn, max_batch=MAX_CARAS).embeddings_de_dets(frame, aptas)
+        if not np.allclose(embs, esperados, atol=1e-6):
+            raise SystemExit("recorte + embedding por etapas != EmbedderMobileFaceNet")
+    print(f"Etapas == funciones del repo ({dets.shape[0]} dets, {0 if embs is None else len(embs)} embeddings)")
+    return None if embs is None else embs[0]
+
+
+def _percentiles(muestras_ns: list[int]) -> dict:
+    if not muestras_ns:
+        return {"n": 0}
+    ms = np.asarray(muestras_ns, dtype=np.float64) / 1e6
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": len(ms), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "media_ms": float(ms.mean())}
+
+
+def medir_tiempos(pipe: Pipeline, fuente: Iterator[np.ndarray], frames: int) -> tuple[dict, float]:
+    muestras: dict[str, list[int]] = {e: [] for e in ETAPAS}
+
+    def medir(etapa: str, fn):
+        t0 = time.perf_counter_ns()
+        r = fn()
+        muestras[etapa].append(time.perf_counter_ns() - t0)
+        return r
+
+    procesado_ns = 0
+    for _ in range(frames):
+        frame = next(fuente)
+        t0 = time.perf_counter_ns()
+        pipe.procesar(frame, medir)
+        procesado_ns += time.perf_counter_ns() - t0
+    return {e: _percentiles(m) for e, m in muestras.items()}, frames / (procesado_ns / 1e9)
+
+
+def medir_memoria(pipe: Pipeline, fuente: Iterator[np.ndarray], frames: int) -> dict:
+    bytes_etapa: dict[str, list[int]] = {e: [] for e in ETAPAS}
+
+    def medir(etapa: str, fn):
+        antes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        r = fn()
+        bytes_etapa[etapa].append(tracemalloc.get_traced_memory()[1] - antes)
+        return r
+
+    tracemalloc.start()
+    for _ in range(frames):
+        pipe.procesar(next(fuente), medir)
+    tracemalloc.stop()
+    return {e: (float(np.mean(b)) if b else 0.0) for e, b in bytes_etapa.items()}
+
+
+def _commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "-C", str(ROOT), "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=10,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark por etapas RetinaFace + MobileFaceNet (CPU).")
+    parser.add_argument("--video", type=str, help="Video a reproducir en bucle.")
+    parser.add_argument("--imagenes", type=str, default=str(ROOT / "Retinaface-Models"))
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--frames-memoria", type=int, default=20)
+    parser.add_argument("--calentamiento", type=int, default=5)
+    parser.add_argument("--hilos", type=int, default=1, help="intra_op_num_threads de ORT.")
+    parser.add_argument("--galeria", type=int, default=1000, help="Identidades sinteticas para matching.")
+    parser.add_argument("--json", type=str, help="Ruta de salida JSON ('-' = stdout).")
+    parser.add_argument("--backend", choices=BACKENDS, default=s.BACKEND_INFERENCIA, help="Backend del detector.")
+    parser.add_argument(
+        "--modelo", type=str,
+        help="Modelo del detector (.onnx, .rknn o .npz grabado); por defecto RetinaFace_mobile320.onnx.",
+    )
+    parser.add_argument("--grabar", type=str, help="Guardar las salidas del detector en este .npz (para --backend mock).")
+    args = parser.parse_args()
+
+    if args.backend == "mock" and not args.modelo:
+        raise SystemExit("--backend mock necesita --modelo con un .npz grabado con --grabar")
+    modelo = args.modelo or str(RETINAFACE_ONNX)
+    kwargs = {"hilos": args.hilos} if args.backend == "onnx" else {}
+    det = crear_backend(args.backend, modelo, **kwargs).cargar()
+    if args.grabar:
+        det = GrabadorSalidas(det)
+    fuente = frames_fuente(args.video, None if args.video else args.imagenes)
+    pipe = Pipeline(det, args.hilos, args.galeria)
+    primero = next(fuente)
+    pipe.crear_galeria(verificar(pipe, primero))
+    for _ in range(args.calentamiento):
+        pipe.procesar(next(fuente), _sin_medir)
+
+    etapas, fps = medir_tiempos(pipe, fuente, args.frames)
+    memoria = medir_memoria(pipe, fuente, args.frames_memoria)
+    rss_max_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    for e in ETAPAS:
+        etapas[e]["bytes_asignados_frame"] = memoria[e]
+
+    h, w = primero.shape[:2]
+    print(
+        f"{args.frames} frames {w}x{h} | detector {det.nombre} {det.entrada.dtype} {det.entrada.layout} | "
+        f"ORT {ort.__version__} intra_op={args.hilos} | "
+        f"MobileFaceNet lote={'dinamico' if pipe.mfn_lote else 'fijo 1'} | galeria={len(pipe.galeria)}"
+    )
+    print(f"  {'etapa':11s} {'n':>5s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'KB/frame':>10s}")
+    for e in ETAPAS:
+        r = etapas[e]
+        if r["n"] == 0:
+            print(f"  {e:11s} {0:5d} {'-':>8s} {'-':>8s} {'-':>8s} {'-':>10s}")
+            continue
+        print(
+            f"  {e:11s} {r['n']:5d} {r['p50_ms']:8.3f} {r['p95_ms']:8.3f} {r['p99_ms']:8.3f} "
+            f"{r['bytes_asignados_frame'] / 1024:10.1f}"
+        )
+    print(f"  throughput={fps:.1f} frames/s | RSS max={rss_max_mb:.0f} MB")
+    if args.grabar:
+        print(f"Grabadas {det.guardar(args.grabar)} salidas del detector en {args.grabar}")
+
+    if args.json:
+        informe = {
+            "commit": _commit(),
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "maquina": {
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "opencv": cv2.__version__,
+                "onnxruntime": ort.__version__,
+            },
+            "config": {
+                "fuente": args.video or args.imagenes,
+                "resolucion": [w, h],
+                "frames": args.frames,
+                "frames_memoria": args.frames_memoria,
+                "hilos_ort": args.hilos,
+                "galeria": len(pipe.galeria),
+                "mobilefacenet_lote_dinamico": pipe.mfn_lote,
+                "backend_detector": det.nombre,
+                "entrada_detector": det.entrada._asdict(),
+                "modelo_detector": Path(modelo).name,
+                "mobilefacenet_onnx": MFN_PATH.name,
+            },
+            "etapas": etapas,
+            "throughput_fps": fps,
+            "rss_max_mb": rss_max_mb,
+        }
+        texto = json.dumps(informe, indent=2, default=float)
+        if args.json == "-":
+            print(texto)
+        else:
+            Path(args.json).write_text(texto + "\n", encoding="utf-8")
+            print(f"JSON: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
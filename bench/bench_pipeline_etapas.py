@@ -0,0 +1,236 @@
+"""
+Benchmark del pipeline por etapas (``utils/pipeline_etapas.py``) frente al bucle en serie de
+los scripts, con RetinaFace sobre ``utils/backend_inferencia.py``.
+
+Etapas: preproceso (letterbox fusionado sobre un tensor del ``PoolBuffers``) -> inferencia
+(``infer_batch``) -> postproceso (decode + NMS + dibujo sobre una copia del frame). Los frames
+entran a ``--fps-entrada`` (como una camara) durante ``--frames`` frames.
+
+- serie: las tres etapas en el mismo hilo, frame a frame (como los ``main()`` actuales).
+- etapas: un hilo por etapa y colas de ``--capacidad`` con descarte del mas antiguo.
+
+Backends:
+
+- ``mock`` (por defecto): reproduce salidas reales de RetinaFace ONNX grabadas al arrancar y
+  duerme ``--latencia-mock-ms`` por inferencia, como una NPU que no ocupa la CPU. Muestra el
+  solape que se ganaria en la placa aunque esta maquina tenga un solo nucleo.
+- ``onnx``: ORT en CPU; la ganancia depende de los nucleos libres. Ademas verifica que cada
+  frame entregado por el pipeline tiene las mismas detecciones que en serie.
+
+Reporta frames/s de salida, latencia extremo a extremo y, por etapa, profundidad de cola
+(actual / maxima), descartes y latencia media / p95.
+
+Ejemplo:
+  python bench/bench_pipeline_etapas.py
+  python bench/bench_pipeline_etapas.py --backend onnx --fps-entrada 30 --frames 150
+  python bench/bench_pipeline_etapas.py --latencia-mock-ms 40 --capacidad 1
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+from utils.backend_inferencia import (  # noqa: E402
+    BackendMock,
+    BackendORT,
+    GrabadorSalidas,
+    preprocesador,
+)
+from utils.pipeline_etapas import Etapa, PipelineEtapas, PoolBuffers  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+N_FRAMES_DISTINTOS = 30
+
+
+def frames_camara(n: int) -> list[np.ndarray]:
+    base = cv2.imread(str(ROOT / "Retinaface-Models" / "test.jpg"))
+    if base is None:
+        raise SystemExit("No se pudo leer Retinaface-Models/test.jpg")
+    paso = max(1, base.shape[1] // n)
+    return [np.roll(base, i * paso, axis=1) for i in range(n)]
+
+
+class Etapas:
+    """Funciones de cada etapa, compartidas por el modo serie y el pipeline."""
+
+    def __init__(self, backend, n_buffers: int) -> None:
+        self.backend = backend
+        self.pool = PoolBuffers(lambda: preprocesador(backend.entrada, RETINAFACE_MEAN_BGR), n_buffers)
+
+    def preproceso(self, item):
+        i, frame = item
+        prep = self.pool.tomar(timeout=1.0)
+        tensor, meta = prep.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
+        return i, frame, prep, tensor, meta
+
+    def inferencia(self, item):
+        i, frame, prep, tensor, meta = item
+        try:
+            outputs = self.backend.infer_batch(tensor)
+        finally:
+            self.pool.devolver(prep)
+        return i, frame, outputs, meta
+
+    def devolver_buffer(self, item) -> None:
+        self.pool.devolver(item[2])
+
+    @staticmethod
+    def postproceso(item):
+        i, frame, outputs, meta = item
+        h, w = frame.shape[:2]
+        dets = retinaface_dets_topk_desde_rknn_outputs(
+            list(outputs),
+            img_width=w,
+            img_height=h,
+            aspect_ratio=meta.aspect_ratio,
+            offset_x=meta.offset_x,
+            offset_y=meta.offset_y,
+            score_deteccion=0.5,
+        )
+        dibujo = frame.copy()
+        for d in dets:
+            di = d.astype(int)
+            cv2.rectangle(dibujo, (di[0], di[1]), (di[2], di[3]), (0, 0, 255), 2)
+            for k in range(5):
+                cv2.circle(dibujo, (di[5 + 2 * k], di[6 + 2 * k]), 1, (0, 255, 255), 5)
+        return i, dets, dibujo
+
+
+def crear_backend(args, frames: list[np.ndarray], tmp: Path):
+    ort_backend = BackendORT(RETINAFACE_ONNX, hilos=args.hilos).cargar()
+    if args.backend == "onnx":
+        return ort_backend
+    grabador = GrabadorSalidas(ort_backend)
+    prep = preprocesador(grabador.entrada, RETINAFACE_MEAN_BGR)
+    for f in frames:
+        grabador.infer_batch(prep.letterbox(f, RETINAFACE_LETTERBOX_FILL)[0])
+    ruta = tmp / "retinaface_mock.npz"
+    grabador.guardar(ruta)
+    return BackendMock(ruta, latencia_ms=args.latencia_mock_ms).cargar()
+
+
+def ejecutar_serie(etapas: Etapas, frames: list[np.ndarray], n: int, periodo: float) -> tuple[float, dict]:
+    dets_por_frame: dict[int, np.ndarray] = {}
+    t0 = time.perf_counter()
+    proximo = t0
+    for k in range(n):
+        # Como una camara: el siguiente frame no existe antes de su instante.
+        espera = proximo - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        proximo = max(proximo + periodo, time.perf_counter()) if periodo > 0 else proximo
+        i = k % len(frames)
+        _, dets, _ = etapas.postproceso(etapas.inferencia(etapas.preproceso((i, frames[i]))))
+        dets_por_frame.setdefault(i, dets)
+    return n / (time.perf_counter() - t0), dets_por_frame
+
+
+def ejecutar_pipeline(
+    etapas: Etapas, frames: list[np.ndarray], n: int, periodo: float, capacidad: int
+) -> tuple[float, list, PipelineEtapas]:
+    pipe = PipelineEtapas(
+        [
+            Etapa("preproceso", etapas.preproceso),
+            Etapa("inferencia", etapas.inferencia, al_descartar=etapas.devolver_buffer),
+            Etapa("postproceso", etapas.postproceso),
+        ],
+        capacidad=capacidad,
+        capacidad_salida=n,
+    ).start()
+    resultados = []
+    t0 = time.perf_counter()
+    t_ultimo = t0
+    proximo = t0
+    for k in range(n):
+        while True:
+            res = pipe.obtener(timeout=0)
+            if res is None:
+                break
+            resultados.append(res)
+            t_ultimo = time.perf_counter()
+        espera = proximo - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        proximo += periodo
+        i = k % len(frames)
+        pipe.poner((i, frames[i]))
+    # Vaciar: esperar a que no quede nada en vuelo (el tiempo cuenta hasta el ultimo entregado).
+    while True:
+        res = pipe.obtener(timeout=0.5)
+        if res is None:
+            break
+        resultados.append(res)
+        t_ultimo = time.perf_counter()
+    pipe.stop()
+    return len(resultados) / (t_ultimo - t0), resultados, pipe
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark pipeline por etapas vs serie.")
+    parser.add_argument("--backend", choices=("mock", "onnx"), default="mock")
+    parser.add_argument("--latencia-mock-ms", type=float, default=20.0)
+    parser.add_argument("--hilos", type=int, default=1, help="intra_op_num_threads de ORT.")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--fps-entrada", type=float, default=60.0, help="0 = sin ritmo (lo mas rapido posible).")
+    parser.add_argument("--capacidad", type=int, default=2)
+    args = parser.parse_args()
+
+    frames = frames_camara(N_FRAMES_DISTINTOS)
+    periodo = 1.0 / args.fps_entrada if args.fps_entrada > 0 else 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = crear_backend(args, frames, Path(tmp))
+        # Buffers: cola de inferencia + item en inferencia + el que se escribe.
+        etapas = Etapas(backend, n_buffers=args.capacidad + 2)
+        etapas.postproceso(etapas.inferencia(etapas.preproceso((0, frames[0]))))  # calentamiento
+
+        fps_serie, dets_serie = ejecutar_serie(etapas, frames, args.frames, periodo)
+        fps_pipe, resultados, pipe = ejecutar_pipeline(etapas, frames, args.frames, periodo, args.capacidad)
+
+    if etapas.pool.libres != etapas.pool.n:
+        raise SystemExit(f"PoolBuffers: {etapas.pool.n - etapas.pool.libres} buffers sin devolver")
+    if args.backend == "onnx":
+        # Mismas detecciones para cada frame entregado (el orden de llamadas no importa en ORT).
+        for res in resultados:
+            i, dets, _ = res.dato
+            if not np.array_equal(dets, dets_serie[i]):
+                raise SystemExit(f"Detecciones del pipeline != serie (frame {i}, seq {res.seq})")
+        print(f"Detecciones pipeline == serie en {len(resultados)} frames")
+    seqs = [r.seq for r in resultados]
+    if seqs != sorted(seqs):
+        raise SystemExit("El pipeline entrego frames fuera de orden")
+
+    est = pipe.estadisticas()
+    detalle = f" (latencia mock {args.latencia_mock_ms:g} ms)" if args.backend == "mock" else ""
+    print(
+        f"{args.frames} frames a {args.fps_entrada:g} fps, backend {backend.nombre}{detalle}, capacidad {args.capacidad}"
+    )
+    print(f"  serie:  {fps_serie:6.1f} frames/s")
+    print(
+        f"  etapas: {fps_pipe:6.1f} frames/s (x{fps_pipe / fps_serie:.2f}) | entregados {len(resultados)}/{args.frames} | "
+        f"latencia extremo a extremo {est['total']['latencia_media_ms']:.1f} ms (p95 {est['total']['latencia_p95_ms']:.1f})"
+    )
+    for nombre in ("preproceso", "inferencia", "postproceso"):
+        e = est[nombre]
+        print(
+            f"    {nombre:11s} n={e['procesados']:4d} cola max={e['profundidad_max']} desc={e['descartados']:3d} "
+            f"lat={e['latencia_media_ms']:6.2f} ms (p95 {e['latencia_p95_ms']:6.2f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Benchmark del pool de sesiones (``utils/pool_inferencia.py``): frames/s de RetinaFace frente al
+numero de sesiones N, con frames de ``--camaras`` camaras intercalados.
+
+Para cada N de ``--sesiones``: ``PoolInferencia`` con N backends (ORT con ``--hilos-sesion``
+hilos intra-op y 1 inter-op por sesion), letterbox fusionado sobre tensores de un
+``PoolBuffers`` (2 por sesion, devueltos al terminar cada ``Future``) y ``--frames`` envios tan
+rapido como admite el pool. Referencia: 1 sesion con N x ``--hilos-sesion`` hilos intra-op
+(mismos nucleos, sin pool).
+
+Comprueba que ``obtener`` entrega cada camara en orden de envio y, con ``onnx``, que las
+salidas de cada frame son identicas a las de una sesion sola.
+
+Backends:
+
+- ``onnx`` (por defecto): ORT en CPU; escala con los nucleos libres (en una maquina de un
+  nucleo N > 1 no gana nada).
+- ``mock``: salidas reales grabadas al arrancar y ``--latencia-mock-ms`` por inferencia, como
+  varios contextos NPU que no ocupan la CPU.
+
+Ejemplo:
+  python bench/bench_pool_inferencia.py
+  python bench/bench_pool_inferencia.py --sesiones 1,2,3 --hilos-sesion 1 --fijar-nucleos
+  python bench/bench_pool_inferencia.py --backend mock --latencia-mock-ms 25 --sesiones 1,2,4
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.aux_tools_retinaface import RETINAFACE_LETTERBOX_FILL, RETINAFACE_MEAN_BGR  # noqa: E402
+from utils.backend_inferencia import BackendORT, GrabadorSalidas, preprocesador  # noqa: E402
+from utils.pipeline_etapas import PoolBuffers  # noqa: E402
+from utils.pool_inferencia import PoolInferencia, fabrica_backend  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+N_FRAMES_DISTINTOS = 24
+
+
+def frames_camara(n: int) -> list[np.ndarray]:
+    base = cv2.imread(str(ROOT / "Retinaface-Models" / "test.jpg"))
+    if base is None:
+        raise SystemExit("No se pudo leer Retinaface-Models/test.jpg")
+    paso = max(1, base.shape[1] // n)
+    return [np.roll(base, i * paso, axis=1) for i in range(n)]
+
+
+def grabar_mock(frames: list[np.ndarray], tmp: Path) -> Path:
+    grabador = GrabadorSalidas(BackendORT(RETINAFACE_ONNX, hilos=1).cargar())
+    prep = preprocesador(grabador.entrada, RETINAFACE_MEAN_BGR)
+    for f in frames:
+        grabador.infer_batch(prep.letterbox(f, RETINAFACE_LETTERBOX_FILL)[0])
+    ruta = tmp / "retinaface_mock.npz"
+    grabador.guardar(ruta)
+    return ruta
+
+
+def ejecutar(pool: PoolInferencia, frames: list[np.ndarray], n_frames: int, camaras: int, prefijo: str = "cam"):
+    """Envia ``n_frames`` (camara = k % camaras); devuelve (frames/s, resultados, frame de cada seq)."""
+    buffers = PoolBuffers(lambda: preprocesador(pool.entrada, RETINAFACE_MEAN_BGR), 2 * pool.n)
+    resultados = []
+    frame_de: dict[tuple[str, int], int] = {}
+    seq_camara = [0] * camaras
+
+    def recoger(timeout: float | None) -> None:
+        while True:
+            res = pool.obtener(timeout)
+            if res is None:
+                return
+            resultados.append(res)
+            timeout = 0
+
+    t0 = time.perf_counter()
+    for k in range(n_frames):
+        c = k % camaras
+        i = k % len(frames)
+        prep = buffers.tomar(timeout=10.0)  # bloquea si todas las sesiones estan llenas
+        tensor, _ = prep.letterbox(frames[i], RETINAFACE_LETTERBOX_FILL)
+        fut = pool.enviar(tensor, camara=f"{prefijo}{c}")
+        fut.add_done_callback(lambda _f, p=prep: buffers.devolver(p))
+        frame_de[(f"{prefijo}{c}", seq_camara[c])] = i
+        seq_camara[c] += 1
+        recoger(0)
+    while len(resultados) < n_frames:
+        antes = len(resultados)
+        recoger(10.0)
+        if len(resultados) == antes:
+            raise SystemExit("El pool no entrego todos los resultados")
+    dt = time.perf_counter() - t0
+    return n_frames / dt, resultados, frame_de
+
+
+def verificar(resultados, frame_de, referencia) -> None:
+    ultimo: dict[str, int] = {}
+    for res in resultados:
+        if res.error is not None:
+            raise SystemExit(f"Error en el pool: {res.error!r}")
+        if res.seq != ultimo.get(res.camara, -1) + 1:
+            raise SystemExit(f"{res.camara}: seq {res.seq} fuera de orden (ultimo {ultimo.get(res.camara)})")
+        ultimo[res.camara] = res.seq
+        if referencia is not None:
+            ref = referencia[frame_de[(res.camara, res.seq)]]
+            if not all(np.array_equal(a, b) for a, b in zip(res.salidas, ref)):
+                raise SystemExit(f"{res.camara} seq {res.seq}: salidas != sesion unica")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark pool de sesiones: frames/s vs N.")
+    parser.add_argument("--backend", choices=("onnx", "mock"), default="onnx")
+    parser.add_argument("--latencia-mock-ms", type=float, default=20.0)
+    parser.add_argument("--sesiones", type=str, default="1,2,4", help="Lista de N separada por comas.")
+    parser.add_argument("--hilos-sesion", type=int, default=1, help="intra_op_num_threads por sesion ORT.")
+    parser.add_argument("--camaras", type=int, default=2)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--fijar-nucleos", action="store_true", help="Fija la sesion i al nucleo i (Linux).")
+    args = parser.parse_args()
+
+    sesiones = [int(x) for x in args.sesiones.split(",") if x.strip()]
+    frames = frames_camara(N_FRAMES_DISTINTOS)
+    nucleos = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+    n_cpu = len(nucleos) if nucleos else (os.cpu_count() or 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        referencia = None
+        if args.backend == "onnx":
+            crear = fabrica_backend("onnx", RETINAFACE_ONNX, hilos_ort=args.hilos_sesion)
+            unica = BackendORT(RETINAFACE_ONNX, hilos=args.hilos_sesion).cargar()
+            prep = preprocesador(unica.entrada, RETINAFACE_MEAN_BGR)
+            referencia = [
+                unica.infer_batch(prep.letterbox(f, RETINAFACE_LETTERBOX_FILL)[0]) for f in frames
+            ]
+            detalle = f"ORT {args.hilos_sesion} hilo(s) intra-op / 1 inter-op por sesion"
+        else:
+            crear = fabrica_backend("mock", grabar_mock(frames, Path(tmp)), latencia_ms=args.latencia_mock_ms)
+            detalle = f"mock {args.latencia_mock_ms:g} ms por inferencia"
+
+        print(
+            f"RetinaFace 320x320, {args.frames} frames de {args.camaras} camaras, {detalle}, "
+            f"{n_cpu} nucleo(s) de CPU"
+        )
+        base = None
+        for n in sesiones:
+            pool = PoolInferencia(crear, n, nucleos=nucleos if args.fijar_nucleos else None).start()
+            try:
+                ejecutar(pool, frames, 2 * n, args.camaras, prefijo="calentamiento")
+                fps, resultados, frame_de = ejecutar(pool, frames, args.frames, args.camaras)
+                inferencias = [s.inferencias for s in pool.sesiones]
+            finally:
+                pool.stop()
+            verificar(resultados, frame_de, referencia)
+            base = base or fps
+            linea = f"  N={n:2d}  {fps:7.1f} frames/s  x{fps / base:.2f}  inferencias por sesion {inferencias}"
+            if args.backend == "onnx" and n > 1:
+                # Mismos hilos en una sola sesion: separa el efecto del pool del de mas hilos intra-op.
+                grande = PoolInferencia(
+                    fabrica_backend("onnx", RETINAFACE_ONNX, hilos_ort=n * args.hilos_sesion), 1
+                ).start()
+                try:
+                    ejecutar(grande, frames, 2, args.camaras, prefijo="calentamiento")
+                    fps_1, res_1, frame_de_1 = ejecutar(grande, frames, args.frames, args.camaras)
+                finally:
+                    grande.stop()
+                verificar(res_1, frame_de_1, None)
+                linea += f" | 1 sesion x {n * args.hilos_sesion} hilos: {fps_1:.1f} frames/s"
+            print(linea)
+    print("Orden por camara correcto" + (" y salidas == sesion unica" if referencia is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Benchmark / prueba del preproceso RetinaFace con tensor preasignado
+(``preprocesador_retinaface_onnx`` / ``utils.backend_inferencia.PreprocesadorEntrada``) y del
+letterbox fusionado sobre ese tensor (``PreprocesadorEntrada.letterbox``).
+
+Compara contra ``_preprocess_for_onnx`` tal como estaba en los scripts (deduce NCHW / NHWC de
+``inp0_meta.shape`` en cada frame y crea la copia float32, la transpuesta y la resta):
+
+- Igualdad exacta del tensor y de las salidas ``session.run`` de RetinaFace ONNX (CPU).
+- ms por frame.
+- Bytes asignados por frame con ``tracemalloc`` (pico de cada llamada). Falla si el camino
+  preasignado supera ``--max-bytes`` en algun frame (objetivo: ninguna asignacion del tamano del
+  tensor, solo los pocos bytes de la llamada Python).
+
+Tambien comprueba las variantes sin modelo a mano: NHWC float32 y uint8 RGB NHWC (RKNN).
+
+Letterbox desde el frame de camara (640x427 por defecto): ``letterbox_bgr`` + preproceso frente a
+``letterbox`` fusionado (resize directo a la ROI, barras y ``LetterboxMeta`` solo al cambiar la
+resolucion): mismo tensor y meta, ms y bytes por frame. Falla si el fusionado supera
+``--max-bytes``, si el meta no se reutiliza entre frames de igual resolucion o si tras cambiar
+de resolucion (y volver) el tensor difiere.
+
+Ejemplo:
+  python bench/bench_preproceso_retinaface.py
+  python bench/bench_preproceso_retinaface.py --frames 500 --max-bytes 512
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_INPUT_HEIGHT,
+    RETINAFACE_INPUT_WIDTH,
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    preprocesador_retinaface_onnx,
+)
+from utils.backend_inferencia import EntradaModelo, preprocesador  # noqa: E402
+from utils.image_utils import letterbox_bgr  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+
+
+def _preprocess_for_onnx(inp0_meta, canvas_bgr: np.ndarray) -> np.ndarray:
+    """Version anterior de los scripts (referencia)."""
+    if canvas_bgr.dtype != np.uint8:
+        canvas_bgr = canvas_bgr.astype(np.uint8)
+    x32 = canvas_bgr.astype(np.float32)
+    dims = inp0_meta.shape
+    nchw = len(dims) == 4 and dims[1] == 3
+    nhwc = len(dims) == 4 and dims[-1] == 3
+    if len(dims) == 4 and dims[1] == RETINAFACE_INPUT_WIDTH:
+        nhwc = True
+    if not nchw and not nhwc:
+        nchw = True
+    if nhwc:
+        x32 -= RETINAFACE_MEAN_BGR.reshape(1, 1, 3)
+        return np.expand_dims(x32, axis=0)
+    chw = np.transpose(x32, (2, 0, 1))
+    feed = np.expand_dims(chw, axis=0)
+    feed -= RETINAFACE_MEAN_BGR.reshape(1, 3, 1, 1)
+    return feed
+
+
+def frames_camara(n: int) -> list[np.ndarray]:
+    """``test.jpg`` desplazada, como llegarian frames de una camara fija."""
+    base = cv2.imread(str(ROOT / "Retinaface-Models" / "test.jpg"))
+    if base is None:
+        raise SystemExit("No se pudo leer Retinaface-Models/test.jpg")
+    paso = max(1, base.shape[1] // n)
+    return [np.roll(base, i * paso, axis=1) for i in range(n)]
+
+
+def _letterbox(frame: np.ndarray) -> np.ndarray:
+    return letterbox_bgr(frame, (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT), RETINAFACE_LETTERBOX_FILL)[0]
+
+
+def _ms(fn, lienzos: list[np.ndarray]) -> float:
+    fn(lienzos[0])
+    t0 = time.perf_counter()
+    for c in lienzos:
+        fn(c)
+    return (time.perf_counter() - t0) * 1000.0 / len(lienzos)
+
+
+def bytes_por_llamada(fn, lienzos: list[np.ndarray]) -> int:
+    """Maximo, sobre los frames, del pico de memoria asignada durante una llamada."""
+    fn(lienzos[0])
+    tracemalloc.start()
+    peor = 0
+    for c in lienzos:
+        antes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(c)
+        peor = max(peor, tracemalloc.get_traced_memory()[1] - antes)
+    tracemalloc.stop()
+    return peor
+
+
+def verificar_variantes(lienzos: list[np.ndarray], max_bytes: int) -> None:
+    c = lienzos[0]
+    nhwc = preprocesador(EntradaModelo("NHWC", "float32", "BGR", 320, 320, 1), RETINAFACE_MEAN_BGR)
+    ref_nhwc = (c.astype(np.float32) - RETINAFACE_MEAN_BGR)[np.newaxis]
+    rknn = preprocesador(EntradaModelo("NHWC", "uint8", "RGB", 320, 320, 1))
+    ref_rknn = np.expand_dims(cv2.cvtColor(c, cv2.COLOR_BGR2RGB), axis=0)
+    for nombre, prep, ref in (("NHWC float32", nhwc, ref_nhwc), ("uint8 RGB NHWC (RKNN)", rknn, ref_rknn)):
+        if not np.array_equal(prep(c), ref):
+            raise SystemExit(f"{nombre}: tensor distinto de la referencia")
+        b = bytes_por_llamada(prep, lienzos)
+        if b > max_bytes:
+            raise SystemExit(f"{nombre}: {b} bytes por frame > {max_bytes}")
+        print(f"  {nombre:22s} == referencia, {b} B/frame")
+
+
+def verificar_letterbox(inp0, frames: list[np.ndarray], max_bytes: int) -> None:
+    fusionado = preprocesador_retinaface_onnx(inp0)
+    separado = preprocesador_retinaface_onnx(inp0)
+    otra = cv2.resize(frames[0], (frames[0].shape[0], frames[0].shape[1]))  # resolucion traspuesta
+    metas = set()
+    for i, f in enumerate(frames[:5] + [otra, frames[5 % len(frames)]]):
+        tensor, meta = fusionado.letterbox(f, RETINAFACE_LETTERBOX_FILL)
+        lienzo, meta_ref = letterbox_bgr(f, (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT), RETINAFACE_LETTERBOX_FILL)
+        if meta != meta_ref or not np.array_equal(tensor, separado(lienzo)):
+            raise SystemExit(f"letterbox fusionado != letterbox_bgr + preproceso (frame {i})")
+        if i < 5:
+            metas.add(id(meta))
+    if len(metas) != 1:
+        raise SystemExit("LetterboxMeta recalculado entre frames de igual resolucion")
+
+    w, h = frames[0].shape[1], frames[0].shape[0]
+    t_antes = _ms(lambda f: _preprocess_for_onnx(inp0, _letterbox(f)), frames)
+    t_sep = _ms(lambda f: separado(_letterbox(f)), frames)
+    t_fus = _ms(lambda f: fusionado.letterbox(f, RETINAFACE_LETTERBOX_FILL), frames)
+    b_antes = bytes_por_llamada(lambda f: _preprocess_for_onnx(inp0, _letterbox(f)), frames)
+    b_sep = bytes_por_llamada(lambda f: separado(_letterbox(f)), frames)
+    b_fus = bytes_por_llamada(lambda f: fusionado.letterbox(f, RETINAFACE_LETTERBOX_FILL), frames)
+    print(f"Letterbox {w}x{h} -> 320x320 + preproceso: fusionado == letterbox_bgr + preproceso, meta reutilizado")
+    print(f"  letterbox_bgr + _preprocess_for_onnx {t_antes:6.3f} ms/frame  {b_antes:9d} B/frame")
+    print(f"  letterbox_bgr + preasignado          {t_sep:6.3f} ms/frame  {b_sep:9d} B/frame")
+    print(f"  letterbox fusionado                  {t_fus:6.3f} ms/frame  {b_fus:9d} B/frame  x{t_antes / t_fus:.1f}")
+    if b_fus > max_bytes:
+        raise SystemExit(f"Letterbox fusionado asigna {b_fus} B por frame > {max_bytes}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark preproceso RetinaFace preasignado.")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--max-bytes", type=int, default=1024)
+    args = parser.parse_args()
+
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(RETINAFACE_ONNX), providers=["CPUExecutionProvider"])
+    inp0 = session.get_inputs()[0]
+    frames = frames_camara(args.frames)
+    lienzos = [_letterbox(f) for f in frames]
+    preparar = preprocesador_retinaface_onnx(inp0)
+
+    for c in lienzos[:5]:
+        antes = _preprocess_for_onnx(inp0, c)
+        ahora = preparar(c)
+        if not np.array_equal(antes, ahora):
+            raise SystemExit("Tensor preasignado != _preprocess_for_onnx")
+        outs_antes = session.run(None, {inp0.name: antes})
+        outs_ahora = session.run(None, {inp0.name: ahora})
+        if not all(np.array_equal(a, b) for a, b in zip(outs_antes, outs_ahora)):
+            raise SystemExit("Salidas RetinaFace distintas")
+    print(f"Entrada ONNX {inp0.shape} -> {preparar.entrada.layout} {preparar.entrada.dtype}; "
+          "tensor y salidas == _preprocess_for_onnx")
+
+    t_antes = _ms(lambda c: _preprocess_for_onnx(inp0, c), lienzos)
+    t_ahora = _ms(preparar, lienzos)
+    b_antes = bytes_por_llamada(lambda c: _preprocess_for_onnx(inp0, c), lienzos)
+    b_ahora = bytes_por_llamada(preparar, lienzos)
+    print(f"  _preprocess_for_onnx   {t_antes:6.3f} ms/frame  {b_antes:9d} B/frame")
+    print(f"  preasignado            {t_ahora:6.3f} ms/frame  {b_ahora:9d} B/frame  x{t_antes / t_ahora:.1f}")
+    if b_ahora > args.max_bytes:
+        raise SystemExit(f"Preproceso preasignado asigna {b_ahora} B por frame > {args.max_bytes}")
+    verificar_variantes(lienzos, args.max_bytes)
+    verificar_letterbox(inp0, frames, args.max_bytes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Micro-benchmark de priors RetinaFace: coste por frame de ``prior_box`` (bucles Python)
+frente a ``prior_box_cacheado`` (vectorizado + cache por tamano de entrada).
+
+Tambien verifica que el generador vectorizado produce exactamente las mismas anclas
+que la version original (320x320 y 640x640).
+
+Ejemplo:
+  python bench/bench_prior_box.py
+  python bench/bench_prior_box.py --iters 200
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_INPUT_HW,
+    RETINAFACE_INPUT_HW_640,
+    prior_box,
+    prior_box_cacheado,
+    prior_box_vectorizado,
+)
+
+
+def _ms_por_llamada(fn, iters: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / iters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de priors RetinaFace.")
+    parser.add_argument("--iters", type=int, default=50, help="Llamadas por medicion.")
+    args = parser.parse_args()
+
+    for hw in (RETINAFACE_INPUT_HW, RETINAFACE_INPUT_HW_640):
+        ref = prior_box(hw)
+        vec = prior_box_vectorizado(hw)
+        if not np.array_equal(ref, vec):
+            raise SystemExit(f"prior_box_vectorizado difiere de prior_box para {hw}")
+        if not np.array_equal(ref.astype(np.float32), prior_box_cacheado(hw)):
+            raise SystemExit(f"prior_box_cacheado difiere de prior_box para {hw}")
+
+        t_legacy = _ms_por_llamada(lambda: prior_box(hw), args.iters)
+        t_vec = _ms_por_llamada(lambda: prior_box_vectorizado(hw), args.iters)
+        t_cache = _ms_por_llamada(lambda: prior_box_cacheado(hw), args.iters * 100)
+        print(
+            f"{hw[0]}x{hw[1]} num_priors={ref.shape[0]} | "
+            f"prior_box={t_legacy:.3f} ms | vectorizado={t_vec:.3f} ms | "
+            f"cacheado={t_cache * 1000.0:.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Benchmark del modo keyframe (``utils/propagacion_cajas.py``): cajas de cara a la cadencia de la
+camara con RetinaFace ONNX solo cada ``N`` frames y flujo optico en los intermedios.
+
+Clip sintetico ``--segundos`` a ``--fps`` (pasillo + dos personas recortadas de
+``Retinaface-Models/test.jpg`` e ``images/lily2.jpg`` que cruzan, una acercandose); la caja real
+de cada cara se conoce en cada frame. Con ``--video`` usa una grabacion y la referencia es
+RetinaFace en todos los frames.
+
+Modos, todos con una caja por frame de la camara:
+
+- ``todos``: RetinaFace en cada frame (referencia de coste).
+- ``limitado``: RetinaFace a ``--fps-analisis`` (``MAX_FPS_ANALISIS`` de los scripts); entre
+  inferencias se reutiliza la ultima caja (lo que ve hoy el display).
+- ``keyframe N``: RetinaFace cada ``N`` frames + ``PropagadorCajas``; para cada N de
+  ``--cada-n``. ``N = fps / fps-analisis`` gasta lo mismo en detector que ``limitado``.
+
+Reporta IoU medio con la caja real (0 si no hay caja), fraccion de caras con IoU >= 0.5,
+llamadas al detector y ms por frame de detector y de propagacion. Falla si el keyframe con el
+mismo presupuesto que ``limitado`` no mejora el IoU medio en ``--min-mejora``.
+
+Ejemplo:
+  python bench/bench_propagacion_cajas.py
+  python bench/bench_propagacion_cajas.py --fps 30 --cada-n 3,5,15
+  python bench/bench_propagacion_cajas.py --video pasillo.mp4 --cada-n 4,8
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.escena_pasillo import (  # noqa: E402
+    ALTO,
+    ANCHO,
+    con_ruido,
+    escribir_video,
+    fondo_pasillo,
+    leer_video,
+    posicion,
+    recorte_persona,
+    ruidos_sensor,
+)
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+from utils.backend_inferencia import BackendORT, preprocesador  # noqa: E402
+from utils.nms import iou_matriz  # noqa: E402
+from utils.propagacion_cajas import PropagadorCajas  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+SCORE = 0.5
+# Trayectorias: (t_seg, x centro, base y, escala) interpoladas linealmente.
+TRAYECTORIAS = {
+    "persona_a": [(0.5, -0.1, 1.0, 0.45), (4.0, 0.5, 1.0, 0.45), (6.0, 0.5, 1.0, 0.8), (9.0, 1.2, 1.0, 0.8)],
+    "persona_b": [(3.0, 1.15, 0.95, 0.4), (8.5, -0.15, 0.95, 0.4)],
+}
+
+
+def clip_sintetico(fps: float, segundos: float) -> tuple[list[np.ndarray], list[np.ndarray]]:
+    """Frames y cajas reales ``(K, 4)`` de las caras visibles enteras en cada frame."""
+    rng = np.random.default_rng(0)
+    fondo = fondo_pasillo(rng)
+    ruidos = ruidos_sensor(rng, 8)
+    recortes = {nombre: recorte_persona(nombre) for nombre in TRAYECTORIAS}
+    frames, cajas = [], []
+    for i in range(int(segundos * fps)):
+        frame = fondo.copy()
+        reales = []
+        for nombre, (persona, cara) in recortes.items():
+            pos = posicion(TRAYECTORIAS[nombre], i / fps)
+            if pos is None:
+                continue
+            xc, base, escala = pos
+            sprite = cv2.resize(persona, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+            ph, pw = sprite.shape[:2]
+            x, y = int(xc * ANCHO - pw / 2), int(base * ALTO) - ph
+            x0, x1 = max(x, 0), min(x + pw, ANCHO)
+            if x1 <= x0:
+                continue
+            frame[y : y + ph, x0:x1] = sprite[:, x0 - x : x1 - x]
+            caja = cara * escala + [x, y, x, y]
+            if caja[0] >= 0 and caja[2] <= ANCHO:
+                reales.append(caja)
+        frames.append(con_ruido(frame, ruidos[i % len(ruidos)]))
+        cajas.append(np.array(reales, dtype=np.float32).reshape(-1, 4))
+    return frames, cajas
+
+
+class Detector:
+    def __init__(self) -> None:
+        self.backend = BackendORT(RETINAFACE_ONNX, hilos=1).cargar()
+        self.prep = preprocesador(self.backend.entrada, RETINAFACE_MEAN_BGR)
+        self.llamadas = 0
+        self.ms = 0.0
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        t0 = time.perf_counter()
+        h, w = frame.shape[:2]
+        tensor, meta = self.prep.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
+        dets = retinaface_dets_topk_desde_rknn_outputs(
+            list(self.backend.infer_batch(tensor)),
+            img_width=w,
+            img_height=h,
+            aspect_ratio=meta.aspect_ratio,
+            offset_x=meta.offset_x,
+            offset_y=meta.offset_y,
+            score_deteccion=SCORE,
+        )
+        self.llamadas += 1
+        self.ms += (time.perf_counter() - t0) * 1000.0
+        return dets
+
+
+def iou_por_cara(reales: np.ndarray, dets: np.ndarray) -> np.ndarray:
+    """Mejor IoU de cada caja real con las cajas del modo (0 sin cajas)."""
+    if reales.shape[0] == 0:
+        return np.zeros((0,), dtype=np.float32)
+    if dets.shape[0] == 0:
+        return np.zeros((reales.shape[0],), dtype=np.float32)
+    return iou_matriz(reales, dets[:, :4]).max(axis=1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark keyframe + flujo optico vs detector limitado.")
+    parser.add_argument("--video", type=str, default=None, help="Clip grabado (referencia = RetinaFace en todos).")
+    parser.add_argument("--segundos", type=float, default=10.0)
+    parser.add_argument("--fps", type=float, default=24.0)
+    parser.add_argument("--fps-analisis", type=float, default=2.0, help="MAX_FPS_ANALISIS de los scripts.")
+    parser.add_argument("--cada-n", type=str, default="3,6", help="N extra ademas de fps / fps-analisis.")
+    parser.add_argument("--min-mejora", type=float, default=0.1, help="Mejora minima del IoU medio.")
+    args = parser.parse_args()
+
+    detector = Detector()
+    if args.video:
+        frames, fps = leer_video(Path(args.video))
+        reales = [detector(f)[:, :4] for f in frames]
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Ida y vuelta por MJPG, como un clip grabado.
+            frames_sint, reales = clip_sintetico(args.fps, args.segundos)
+            ruta = Path(tmp) / "pasillo_keyframes.avi"
+            escribir_video(ruta, frames_sint, args.fps)
+            frames, fps = leer_video(ruta)
+    n_limitado = max(1, int(round(fps / args.fps_analisis)))
+    cadas = sorted({n_limitado, *(int(x) for x in args.cada_n.split(",") if x.strip())})
+    detector(frames[0])  # calentamiento
+
+    modos: dict[str, tuple[list[np.ndarray], int, float, float]] = {}
+    detector.llamadas, detector.ms = 0, 0.0
+    modos["todos"] = ([detector(f) for f in frames], detector.llamadas, detector.ms, 0.0)
+
+    detector.llamadas, detector.ms = 0, 0.0
+    salida, ultimas = [], None
+    for i, f in enumerate(frames):
+        if i % n_limitado == 0:
+            ultimas = detector(f)
+        salida.append(ultimas)
+    modos[f"limitado {args.fps_analisis:g} fps"] = (salida, detector.llamadas, detector.ms, 0.0)
+
+    for n in cadas:
+        detector.llamadas, detector.ms = 0, 0.0
+        propagador = PropagadorCajas(cada_n=n)
+        salida = [propagador.procesar(f, detector)[0] for f in frames]
+        modos[f"keyframe N={n}"] = (salida, detector.llamadas, detector.ms, propagador.ms_propagacion)
+
+    print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]} a {fps:g} fps, RetinaFace ONNX 320x320")
+    medias = {}
+    for nombre, (salida, llamadas, ms_det, ms_prop) in modos.items():
+        ious = np.concatenate([iou_por_cara(r, d) for r, d in zip(reales, salida)])
+        medias[nombre] = float(ious.mean()) if ious.size else 0.0
+        print(
+            f"  {nombre:18s} IoU medio {medias[nombre]:.3f} | IoU>=0.5 {100.0 * float((ious >= 0.5).mean()):5.1f}% | "
+            f"detector {llamadas:4d} llamadas {ms_det / len(frames):6.2f} ms/frame | "
+            f"propagacion {ms_prop / len(frames):5.2f} ms/frame"
+        )
+    mejora = medias[f"keyframe N={n_limitado}"] - medias[f"limitado {args.fps_analisis:g} fps"]
+    print(f"  keyframe N={n_limitado} (mismo detector que limitado): IoU medio {mejora:+.3f}")
+    if mejora < args.min_mejora:
+        raise SystemExit(f"El keyframe mejora el IoU medio solo {mejora:+.3f} < {args.min_mejora}")
+
+
+if __name__ == "__main__":
+    main()
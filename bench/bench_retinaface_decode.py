@@ -0,0 +1,142 @@
+"""
+Benchmark + regresion del postproceso RetinaFace.
+
+Compara ``retinaface_dets_desde_rknn_outputs`` (decodifica las 4200 anclas y filtra al final)
+con ``retinaface_dets_topk_desde_rknn_outputs`` (filtra por score y decodifica solo los
+candidatos). Con ``top_k=None`` ambas salidas deben ser identicas bit a bit; si no, el
+script termina con error.
+
+Salidas sinteticas con pocas caras (caso tipico: pasillo con 0-3 personas). Con ``--onnx``
+ademas usa las salidas reales de ``Retinaface-Models/RetinaFace_mobile320.onnx`` sobre
+``Retinaface-Models/test.jpg`` (requiere onnxruntime).
+
+Ejemplo:
+  python bench/bench_retinaface_decode.py
+  python bench/bench_retinaface_decode.py --faces 3 --iters 500 --onnx
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_INPUT_HEIGHT,
+    RETINAFACE_INPUT_WIDTH,
+    RETINAFACE_LETTERBOX_FILL,
+    prior_box_cacheado,
+    retinaface_dets_desde_rknn_outputs,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+
+FRAME_WH = (640, 480)
+
+
+def salidas_sinteticas(n_faces: int, seed: int) -> list[np.ndarray]:
+    """loc/conf/landm (1, 4200, k) float32 con ``n_faces`` grupos de anclas con score alto."""
+    rng = np.random.default_rng(seed)
+    n = prior_box_cacheado().shape[0]
+    loc = rng.normal(0.0, 1.0, size=(1, n, 4)).astype(np.float32)
+    landm = rng.normal(0.0, 1.0, size=(1, n, 10)).astype(np.float32)
+    face = (rng.uniform(0.0, 0.1, size=n) ** 2).astype(np.float32)
+    for centro in rng.choice(n, size=n_faces, replace=False):
+        vecinos = np.arange(max(0, centro - 4), min(n, centro + 5))
+        face[vecinos] = rng.uniform(0.5, 0.999, size=vecinos.size)
+    conf = np.stack([1.0 - face, face], axis=1)[np.newaxis].astype(np.float32)
+    return [loc, conf, landm]
+
+
+def salidas_onnx() -> tuple[list[np.ndarray], tuple[int, int], object]:
+    import cv2
+    import onnxruntime as ort
+
+    from utils.image_utils import letterbox_bgr
+
+    img = cv2.imread(str(ROOT / "Retinaface-Models" / "test.jpg"))
+    if img is None:
+        raise SystemExit("No se pudo leer Retinaface-Models/test.jpg")
+    sess = ort.InferenceSession(
+        str(ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"),
+        providers=["CPUExecutionProvider"],
+    )
+    canvas, meta = letterbox_bgr(
+        img, (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT), RETINAFACE_LETTERBOX_FILL
+    )
+    x = canvas.astype(np.float32) - np.array([104.0, 117.0, 123.0], dtype=np.float32)
+    feed = np.ascontiguousarray(np.transpose(x, (2, 0, 1))[np.newaxis])
+    outs = sess.run(None, {sess.get_inputs()[0].name: feed})
+    h, w = img.shape[:2]
+    return list(outs), (w, h), meta
+
+
+def _ms(fn, iters: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / iters
+
+
+def comparar(nombre: str, outputs: list[np.ndarray], kw: dict, iters: int) -> None:
+    ref = retinaface_dets_desde_rknn_outputs(outputs, **kw)
+    new = retinaface_dets_topk_desde_rknn_outputs(outputs, **kw)
+    if ref.dtype != new.dtype or ref.shape != new.shape or not np.array_equal(ref, new):
+        raise SystemExit(f"[{nombre}] REGRESION: la salida top-K no coincide con la original")
+    t_ref = _ms(lambda: retinaface_dets_desde_rknn_outputs(outputs, **kw), iters)
+    t_new = _ms(lambda: retinaface_dets_topk_desde_rknn_outputs(outputs, **kw), iters)
+    print(
+        f"[{nombre}] dets={ref.shape[0]} identico=OK | original={t_ref:.3f} ms | "
+        f"topk={t_new:.3f} ms | x{t_ref / max(t_new, 1e-9):.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark decode RetinaFace.")
+    parser.add_argument("--faces", type=int, default=3, help="Caras sinteticas por frame.")
+    parser.add_argument("--seeds", type=int, default=20, help="Frames sinteticos a comparar.")
+    parser.add_argument("--iters", type=int, default=200, help="Repeticiones por medicion.")
+    parser.add_argument("--onnx", action="store_true", help="Comparar tambien con salidas ONNX.")
+    args = parser.parse_args()
+
+    kw = dict(
+        img_width=FRAME_WH[0],
+        img_height=FRAME_WH[1],
+        aspect_ratio=0.5,
+        offset_x=0,
+        offset_y=40,
+        score_deteccion=0.2,
+        score_pre_nms=0.02,
+    )
+    for seed in range(args.seeds):
+        for n_faces in sorted({0, 1, args.faces}):
+            outs = salidas_sinteticas(n_faces, seed)
+            ref = retinaface_dets_desde_rknn_outputs(outs, **kw)
+            new = retinaface_dets_topk_desde_rknn_outputs(outs, **kw)
+            if ref.dtype != new.dtype or not np.array_equal(ref, new):
+                raise SystemExit(f"REGRESION seed={seed} faces={n_faces}")
+    print(f"Regresion sintetica OK ({args.seeds} seeds)")
+
+    comparar(f"sintetico {args.faces} caras", salidas_sinteticas(args.faces, 0), kw, args.iters)
+    comparar("sintetico 0 caras", salidas_sinteticas(0, 0), kw, args.iters)
+
+    if args.onnx:
+        outs, (w, h), meta = salidas_onnx()
+        kw_onnx = dict(
+            kw,
+            img_width=w,
+            img_height=h,
+            aspect_ratio=meta.aspect_ratio,
+            offset_x=meta.offset_x,
+            offset_y=meta.offset_y,
+        )
+        comparar("onnx test.jpg", outs, kw_onnx, args.iters)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark de inferencia por regiones de movimiento (``utils/roi_movimiento.py``) frente al
+frame completo, con RetinaFace ONNX detras de ``CompuertaMovimiento``.
+
+Escena sintetica ``--ancho x --alto`` (pasillo fijo con ruido): tras calibrar el fondo cruza
+una persona lejana (cara de ~``--cara-lejana`` px de ancho) y despues una cercana (~100 px).
+La posicion de la cara se conoce en cada frame (recorte de ``Retinaface-Models/test.jpg``).
+
+En los frames en que la compuerta pide inferencia:
+
+- frame completo: letterbox del frame a 320x320 + RetinaFace (``DetectorROI`` con
+  ``caja_frame``, identico a ``retinaface_dets_topk_desde_rknn_outputs``; se comprueba).
+- ROI: ``regiones_movimiento(compuerta.mascara)`` + ``DetectorROI`` sobre los recortes.
+
+Reporta por persona la fraccion de frames con la cara detectada (IoU >= 0.3 con la real), ms
+por frame (regiones + letterbox + inferencia + decode) y recortes por frame. Falla si ROI
+detecta menos caras que el frame completo en alguna de las dos pasadas, o si no mejora la
+lejana en al menos ``--min-mejora`` puntos.
+
+Ejemplo:
+  python bench/bench_roi_movimiento.py
+  python bench/bench_roi_movimiento.py --ancho 1920 --alto 1080 --cara-lejana 24 --movimiento-pixeles 40
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.escena_pasillo import con_ruido, fondo_pasillo, recorte_persona, ruidos_sensor  # noqa: E402
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+from utils.backend_inferencia import BackendORT, preprocesador  # noqa: E402
+from utils.compuerta_movimiento import CompuertaMovimiento, ParametrosMovimiento  # noqa: E402
+from utils.nms import iou_matriz  # noqa: E402
+from utils.roi_movimiento import DetectorROI, caja_frame, regiones_movimiento  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+SCORE = 0.5
+
+
+def escena(ancho: int, alto: int, cara_lejana: int, frames_cruce: int, rng: np.random.Generator):
+    """Genera (frame, caja_cara | None, persona) con calibracion, cruce lejano y cruce cercano."""
+    persona, cara_en_recorte = recorte_persona("persona_a")
+    fondo = fondo_pasillo(rng, ancho, alto)
+    ruidos = ruidos_sensor(rng, 6, ancho, alto)
+    ancho_cara = float(cara_en_recorte[2] - cara_en_recorte[0])
+    pasadas = [
+        ("lejana", cara_lejana / ancho_cara, int(alto * 0.45)),
+        ("cercana", 100 / ancho_cara, alto),
+    ]
+    k = 0
+
+    def ruido(frame):
+        nonlocal k
+        k += 1
+        return con_ruido(frame, ruidos[k % len(ruidos)])
+
+    for _ in range(25):
+        yield ruido(fondo), None, None
+    for nombre, escala, suelo in pasadas:
+        sprite = cv2.resize(persona, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+        ph, pw = sprite.shape[:2]
+        cara = cara_en_recorte * escala
+        for i in range(frames_cruce):
+            x = int(ancho * 0.1 + i / frames_cruce * (ancho * 0.8 - pw))
+            y = suelo - ph
+            frame = fondo.copy()
+            frame[y : y + ph, x : x + pw] = sprite
+            yield ruido(frame), cara + np.array([x, y, x, y], dtype=np.float32), nombre
+        for _ in range(10):
+            yield ruido(fondo), None, None
+
+
+def acierto(dets: np.ndarray, cara: np.ndarray) -> bool:
+    if dets.shape[0] == 0:
+        return False
+    return bool(iou_matriz(cara[np.newaxis], dets[:, :4]).max() >= 0.3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark RetinaFace por regiones de movimiento vs frame completo.")
+    parser.add_argument("--ancho", type=int, default=1280)
+    parser.add_argument("--alto", type=int, default=720)
+    parser.add_argument("--cara-lejana", type=int, default=32, help="Ancho en px de la cara lejana.")
+    parser.add_argument("--frames-cruce", type=int, default=40)
+    parser.add_argument(
+        "--movimiento-pixeles", type=int, default=150,
+        help="Umbral MOG2 (la persona lejana ocupa ~250 px de la mascara 320x240).",
+    )
+    parser.add_argument("--min-mejora", type=float, default=0.3, help="Mejora minima (fraccion) en la cara lejana.")
+    args = parser.parse_args()
+
+    backend = BackendORT(RETINAFACE_ONNX, hilos=1).cargar()
+    completo = DetectorROI(backend, max_regiones=1)
+    roi = DetectorROI(backend)
+    prep = preprocesador(backend.entrada, RETINAFACE_MEAN_BGR)
+    compuerta = CompuertaMovimiento(ParametrosMovimiento(movimiento_pixeles=args.movimiento_pixeles))
+    rng = np.random.default_rng(0)
+
+    stats = {
+        modo: {p: {"frames": 0, "aciertos": 0, "ms": 0.0, "recortes": 0} for p in ("lejana", "cercana")}
+        for modo in ("completo", "roi")
+    }
+    w, h = args.ancho, args.alto
+    for i, (frame, cara, persona) in enumerate(escena(w, h, args.cara_lejana, args.frames_cruce, rng)):
+        if not compuerta.evaluar(frame, i / 10.0) or persona is None:
+            continue
+
+        t0 = time.perf_counter()
+        dets_c = completo.detectar(frame, caja_frame(w, h), score_deteccion=SCORE)
+        ms_c = (time.perf_counter() - t0) * 1000.0
+
+        t0 = time.perf_counter()
+        cajas = regiones_movimiento(compuerta.mascara, (w, h))
+        if len(cajas) == 0:
+            cajas = caja_frame(w, h)
+        dets_r = roi.detectar(frame, cajas, score_deteccion=SCORE)
+        ms_r = (time.perf_counter() - t0) * 1000.0
+        compuerta.registrar_resultado(dets_r.shape[0] > 0, i / 10.0)
+
+        if stats["completo"][persona]["frames"] == 0:
+            # DetectorROI con el frame completo == camino de los scripts.
+            tensor, meta = prep.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
+            ref = retinaface_dets_topk_desde_rknn_outputs(
+                list(backend.infer_batch(tensor)),
+                img_width=w,
+                img_height=h,
+                aspect_ratio=meta.aspect_ratio,
+                offset_x=meta.offset_x,
+                offset_y=meta.offset_y,
+                score_deteccion=SCORE,
+            )
+            if not np.array_equal(ref, dets_c):
+                raise SystemExit("DetectorROI con caja_frame != retinaface_dets_topk_desde_rknn_outputs")
+
+        for modo, dets, ms, n in (("completo", dets_c, ms_c, 1), ("roi", dets_r, ms_r, len(cajas))):
+            e = stats[modo][persona]
+            e["frames"] += 1
+            e["aciertos"] += acierto(dets, cara)
+            e["ms"] += ms
+            e["recortes"] += n
+
+    print(f"Frame {w}x{h}, cara lejana ~{args.cara_lejana}px, cercana ~100px, RetinaFace ONNX 320x320")
+    fracciones = {}
+    for persona in ("lejana", "cercana"):
+        for modo in ("completo", "roi"):
+            e = stats[modo][persona]
+            if e["frames"] == 0:
+                raise SystemExit(f"La compuerta no pidio inferencia con la persona {persona}")
+            fracciones[(modo, persona)] = e["aciertos"] / e["frames"]
+            print(
+                f"  {persona:8s} {modo:9s} caras {e['aciertos']:3d}/{e['frames']:3d} "
+                f"({100.0 * fracciones[(modo, persona)]:5.1f}%)  {e['ms'] / e['frames']:6.2f} ms/frame  "
+                f"{e['recortes'] / e['frames']:.2f} recortes/frame"
+            )
+    for persona in ("lejana", "cercana"):
+        if fracciones[("roi", persona)] < fracciones[("completo", persona)]:
+            raise SystemExit(f"ROI detecta menos caras que el frame completo ({persona})")
+    mejora = fracciones[("roi", "lejana")] - fracciones[("completo", "lejana")]
+    if mejora < args.min_mejora:
+        raise SystemExit(f"ROI mejora la cara lejana solo {100.0 * mejora:.1f} puntos < {100.0 * args.min_mejora:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Benchmark del bus de frames en memoria compartida (``utils/shm_frame_bus.py``): captura e
+inferencia en procesos separados frente a hilos en un mismo proceso.
+
+1. Verificacion: el proceso principal publica frames conocidos y un proceso hijo adjuntado al
+   bus devuelve sus sumas de control (sin pickle de frames; solo los enteros).
+2. Throughput con un video local (modo FILE) y ``--workers`` consumidores que ejecutan el
+   pipeline RetinaFace ONNX (letterbox, preproceso, ORT 1 hilo, decode):
+   - hilos: ``CaptureCameras`` + N hilos en el mismo interprete (GIL compartido).
+   - procesos: ``proceso_captura_bus`` + N procesos adjuntados al bus.
+   Reporta frames procesados/s y resultados descartados por slot reutilizado.
+
+La ganancia depende de los nucleos libres (``os.cpu_count()``); en una maquina de 1 nucleo no
+hay paralelismo que ganar.
+
+Ejemplo:
+  python bench/bench_shm_frame_bus.py
+  python bench/bench_shm_frame_bus.py --workers 1 2 3 --segundos 8
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_INPUT_HEIGHT,
+    RETINAFACE_INPUT_WIDTH,
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+from utils.capture_cameras import CaptureCameras  # noqa: E402
+from utils.image_utils import letterbox_bgr  # noqa: E402
+from utils.shm_frame_bus import BusFramesCompartido, proceso_captura_bus  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+
+
+def _sesion():
+    import onnxruntime as ort
+
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = 1
+    so.inter_op_num_threads = 1
+    return ort.InferenceSession(str(RETINAFACE_ONNX), so, providers=["CPUExecutionProvider"])
+
+
+def pipeline_retinaface(session, frame: np.ndarray) -> int:
+    h, w = frame.shape[:2]
+    lb, meta = letterbox_bgr(frame, (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT), RETINAFACE_LETTERBOX_FILL)
+    x = (lb.astype(np.float32) - RETINAFACE_MEAN_BGR).transpose(2, 0, 1)[np.newaxis]
+    out = session.run(None, {session.get_inputs()[0].name: np.ascontiguousarray(x)})
+    dets = retinaface_dets_topk_desde_rknn_outputs(
+        list(out),
+        img_width=w,
+        img_height=h,
+        aspect_ratio=meta.aspect_ratio,
+        offset_x=meta.offset_x,
+        offset_y=meta.offset_y,
+        score_deteccion=0.2,
+    )
+    return int(dets.shape[0])
+
+
+def escribir_video(path: Path, n: int, fps: float) -> None:
+    img = cv2.imread(str(ROOT / "Retinaface-Models" / "test.jpg"))
+    if img is None:
+        raise SystemExit("No se pudo leer Retinaface-Models/test.jpg")
+    img = cv2.resize(img, (1280, 720))
+    vw = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (1280, 720))
+    for i in range(n):
+        vw.write(np.roll(img, i * 4, axis=1))
+    vw.release()
+
+
+def _hijo_sumas(nombre: str, n: int, cola) -> None:
+    bus = BusFramesCompartido.adjuntar(nombre)
+    vistas = []
+    seq = 0
+    while len(vistas) < n:
+        fb = bus.esperar(seq, timeout=5.0)
+        if fb is None:
+            break
+        vistas.append(int(fb.vista.sum(dtype=np.int64)))
+        seq = fb.seq
+        cola.put(seq)  # pide el siguiente
+    cola.put(vistas)
+    del fb
+    bus.cerrar()
+
+
+def verificar() -> None:
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, size=(480, 640, 3), dtype=np.uint8) for _ in range(5)]
+    bus = BusFramesCompartido(n_slots=3, max_bytes_frame=640 * 480 * 3)
+    cola = mp.Queue()
+    hijo = mp.Process(target=_hijo_sumas, args=(bus.nombre, len(frames), cola))
+    hijo.start()
+    for f in frames:
+        bus.publicar(f)
+        cola.get(timeout=10)  # espera a que el hijo lo lea
+    sumas = cola.get(timeout=10)
+    hijo.join()
+    bus.cerrar()
+    esperadas = [int(f.sum(dtype=np.int64)) for f in frames]
+    if sumas != esperadas:
+        raise SystemExit(f"El proceso lector vio otros pixeles: {sumas} != {esperadas}")
+    print(f"Verificacion entre procesos OK ({len(frames)} frames 640x480)")
+
+
+def _worker_proceso(nombre: str, parar, contador, invalidos) -> None:
+    session = _sesion()
+    bus = BusFramesCompartido.adjuntar(nombre)
+    seq = 0
+    while not parar.is_set():
+        fb = bus.esperar(seq, timeout=0.2)
+        if fb is None:
+            continue
+        seq = fb.seq
+        pipeline_retinaface(session, fb.vista)
+        if bus.sigue_valido(fb):
+            with contador.get_lock():
+                contador.value += 1
+        else:
+            with invalidos.get_lock():
+                invalidos.value += 1
+    del fb
+    bus.cerrar()
+
+
+def medir_procesos(video: Path, workers: int, segundos: float, slots: int) -> tuple[float, int]:
+    nombre = f"bench_bus_{os.getpid()}"
+    parar = mp.Event()
+    contador = mp.Value("q", 0)
+    invalidos = mp.Value("q", 0)
+    fuente = {"nombre": "video", "modo": "FILE", "url": str(video), "max_fps": 0}
+    cap = mp.Process(target=proceso_captura_bus, args=(nombre, fuente, parar, slots, 1280 * 720 * 3))
+    cap.start()
+    procs = [
+        mp.Process(target=_worker_proceso, args=(nombre, parar, contador, invalidos))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    time.sleep(1.0)  # arranque de sesiones ORT
+    c0 = contador.value
+    time.sleep(segundos)
+    c1 = contador.value
+    parar.set()
+    for p in procs + [cap]:
+        p.join(timeout=10)
+    return (c1 - c0) / segundos, int(invalidos.value)
+
+
+def medir_hilos(video: Path, workers: int, segundos: float) -> float:
+    camara = CaptureCameras(nombre="video", modo="FILE", url=str(video), max_fps=0).start()
+    parar = threading.Event()
+    cuenta = [0] * workers
+
+    def _worker(i: int) -> None:
+        session = _sesion()
+        while not parar.is_set():
+            ok, frame = camara.get_frame()
+            if not ok:
+                time.sleep(0.001)
+                continue
+            pipeline_retinaface(session, frame)
+            cuenta[i] += 1
+
+    hilos = [threading.Thread(target=_worker, args=(i,), daemon=True) for i in range(workers)]
+    for h in hilos:
+        h.start()
+    time.sleep(1.0)
+    c0 = sum(cuenta)
+    time.sleep(segundos)
+    c1 = sum(cuenta)
+    parar.set()
+    for h in hilos:
+        h.join(timeout=5)
+    camara.stop()
+    return (c1 - c0) / segundos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bus de frames en memoria compartida.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--segundos", type=float, default=5.0)
+    parser.add_argument("--slots", type=int, default=8, help="Slots del bus.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    verificar()
+    with tempfile.TemporaryDirectory() as tmp:
+        video = Path(tmp) / "video.avi"
+        escribir_video(video, n=60, fps=120.0)
+        print(f"Video 1280x720 a 120 fps | bus {args.slots} slots | nucleos={os.cpu_count()}")
+        for n in args.workers:
+            fps_hilos = medir_hilos(video, n, args.segundos)
+            fps_proc, invalidos = medir_procesos(video, n, args.segundos, args.slots)
+            print(
+                f"  workers={n} | hilos={fps_hilos:.1f} fps | procesos+bus={fps_proc:.1f} fps "
+                f"(x{fps_proc / max(fps_hilos, 1e-9):.2f}) | descartados por slot reutilizado={invalidos}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Benchmark de captura SNAP: bucle actual con ``requests.get`` por frame frente al cliente
+asyncio con conexiones keep-alive y peticiones en vuelo (``utils/snap_async.py``).
+
+Levanta un servidor HTTP local (proceso aparte) que imita el ``cmd=Snap`` de la camara: sirve
+un JPEG tras ``--latencia-ms`` (lo que tarda la camara en codificar) y cuenta las conexiones
+TCP aceptadas. Con ``--camaras`` fuentes apuntando al servidor mide snapshots/s en total:
+
+- ``requests.get``: un hilo por camara con el bucle original (``requests.get`` sin Session +
+  ``bytearray`` + ``imdecode``), como el ``_snap_loop`` anterior y ``obtener_frame_snap``.
+- ``CaptureCameras``: el ``_snap_loop`` actual (``requests.Session`` + ``np.frombuffer``).
+- ``asyncio``: ``ClienteSnapAsync`` con cada ``--en-vuelo-por-camara``.
+
+Antes verifica que el cliente asyncio decodifica lo mismo que ``imdecode`` sobre el JPEG
+servido, con ``Content-Length`` y con ``Transfer-Encoding: chunked``.
+
+Ejemplo:
+  python bench/bench_snap_async.py
+  python bench/bench_snap_async.py --camaras 4 --latencia-ms 80 --en-vuelo-por-camara 1 2 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import multiprocessing as mp
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import cv2
+import numpy as np
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.capture_cameras import CaptureCameras  # noqa: E402
+from utils.snap_async import ClienteSnapAsync, _get, _PoolConexiones, decodificar_jpeg  # noqa: E402
+
+
+def jpeg_prueba(ancho: int, alto: int) -> bytes:
+    img = cv2.imread(str(ROOT / "Retinaface-Models" / "test.jpg"))
+    if img is None:
+        raise SystemExit("No se pudo leer Retinaface-Models/test.jpg")
+    ok, buf = cv2.imencode(".jpg", cv2.resize(img, (ancho, alto)), [cv2.IMWRITE_JPEG_QUALITY, 85])
+    if not ok:
+        raise SystemExit("imencode fallo")
+    return buf.tobytes()
+
+
+def _servidor(puerto: int, jpeg: bytes, latencia_s: float, conexiones, listo) -> None:
+    class Snap(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive si el cliente lo usa
+        disable_nagle_algorithm = True  # cabecera y cuerpo van en envios separados
+
+        def setup(self) -> None:
+            super().setup()
+            with conexiones.get_lock():
+                conexiones.value += 1
+
+        def do_GET(self) -> None:
+            time.sleep(latencia_s)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            if "chunked" in self.path:
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(jpeg), 4096):
+                    parte = jpeg[i : i + 4096]
+                    self.wfile.write(f"{len(parte):x}\r\n".encode() + parte + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            self.send_header("Content-Length", str(len(jpeg)))
+            self.end_headers()
+            self.wfile.write(jpeg)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    class Servidor(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 128
+
+        def handle_error(self, request, client_address) -> None:
+            pass  # el cliente corta conexiones al parar cada medicion
+
+    srv = Servidor(("127.0.0.1", puerto), Snap)
+    listo.set()
+    srv.serve_forever()
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as sk:
+        sk.bind(("127.0.0.1", 0))
+        return sk.getsockname()[1]
+
+
+def verificar(base: str, jpeg: bytes) -> None:
+    esperado = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    async def _dos() -> tuple[bytes, bytes, int]:
+        pool = _PoolConexiones()
+        a = await _get(pool, f"{base}/snap", 5.0)
+        b = await _get(pool, f"{base}/snap?chunked=1", 5.0)
+        abiertas = pool.abiertas
+        pool.cerrar()
+        return a, b, abiertas
+
+    a, b, abiertas = asyncio.run(_dos())
+    for nombre, cuerpo in (("content-length", a), ("chunked", b)):
+        frame = decodificar_jpeg(cuerpo)
+        if cuerpo != jpeg or frame is None or not np.array_equal(frame, esperado):
+            raise SystemExit(f"El cliente asyncio no reproduce el JPEG servido ({nombre})")
+    if abiertas != 1:
+        raise SystemExit(f"Keep-alive no reutilizo la conexion ({abiertas} conexiones)")
+    print("Cliente asyncio == imdecode del JPEG (content-length y chunked, 1 conexion)")
+
+
+def _bucle_requests_original(url: str, parar: threading.Event, cuenta: list[int], i: int) -> None:
+    while not parar.is_set():
+        try:
+            response = requests.get(url, timeout=10)
+            if response.status_code != 200:
+                continue
+            image_array = np.asarray(bytearray(response.content), dtype=np.uint8)
+            frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+            if frame is not None and frame.size > 0:
+                cuenta[i] += 1
+        except requests.RequestException:
+            time.sleep(0.01)
+
+
+def medir_requests(urls: list[str], segundos: float) -> int:
+    parar = threading.Event()
+    cuenta = [0] * len(urls)
+    hilos = [
+        threading.Thread(target=_bucle_requests_original, args=(u, parar, cuenta, i), daemon=True)
+        for i, u in enumerate(urls)
+    ]
+    for h in hilos:
+        h.start()
+    time.sleep(segundos)
+    parar.set()
+    for h in hilos:
+        h.join(timeout=5)
+    return sum(cuenta)
+
+
+def medir_capture_cameras(urls: list[str], segundos: float) -> int:
+    camaras = [
+        CaptureCameras(nombre=f"snap{i}", modo="SNAP", url=u, max_fps=0, reintento_seg=0.1).start()
+        for i, u in enumerate(urls)
+    ]
+    time.sleep(segundos)
+    for c in camaras:
+        c.is_running = False
+    n = sum(c.latest_seq for c in camaras)
+    for c in camaras:
+        c.stop()
+    return n
+
+
+def medir_async(urls: list[str], segundos: float, por_camara: int) -> tuple[int, int]:
+    fuentes = [{"nombre": f"snap{i}", "url": u, "max_fps": 0, "reintento_seg": 0.1} for i, u in enumerate(urls)]
+    cliente = ClienteSnapAsync(
+        fuentes, en_vuelo=len(urls) * por_camara, en_vuelo_por_camara=por_camara
+    ).start()
+    time.sleep(segundos)
+    n = sum(c.latest_seq for c in cliente.camaras)
+    cliente.stop()
+    return n, sum(c.fuera_de_orden for c in cliente.camaras)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark SNAP asyncio vs requests.get.")
+    parser.add_argument("--camaras", type=int, default=3)
+    parser.add_argument("--latencia-ms", type=float, default=40.0, help="Latencia del Snap simulado.")
+    parser.add_argument("--en-vuelo-por-camara", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--ancho", type=int, default=640)
+    parser.add_argument("--alto", type=int, default=480)
+    parser.add_argument("--segundos", type=float, default=4.0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    jpeg = jpeg_prueba(args.ancho, args.alto)
+    puerto = _puerto_libre()
+    conexiones = mp.Value("q", 0)
+    listo = mp.Event()
+    srv = mp.Process(
+        target=_servidor,
+        args=(puerto, jpeg, args.latencia_ms / 1000.0, conexiones, listo),
+        daemon=True,
+    )
+    srv.start()
+    listo.wait(10)
+    base = f"http://127.0.0.1:{puerto}"
+    try:
+        verificar(base, jpeg)
+        urls = [f"{base}/cgi-bin/api.cgi?cmd=Snap&channel={i}" for i in range(args.camaras)]
+        print(
+            f"{args.camaras} camaras | JPEG {args.ancho}x{args.alto} ({len(jpeg) / 1024:.0f} KB) | "
+            f"latencia snap {args.latencia_ms:g} ms (techo secuencial "
+            f"{args.camaras * 1000.0 / args.latencia_ms:.0f} snaps/s)"
+        )
+
+        def _fila(nombre: str, n: int, extra: str = "") -> None:
+            c0 = conexiones.value
+            print(f"  {nombre:34s} {n / args.segundos:7.1f} snaps/s | conexiones TCP={c0:5d}{extra}")
+
+        conexiones.value = 0
+        _fila("requests.get (bucle original)", medir_requests(urls, args.segundos))
+        conexiones.value = 0
+        _fila("CaptureCameras SNAP (Session)", medir_capture_cameras(urls, args.segundos))
+        for k in args.en_vuelo_por_camara:
+            conexiones.value = 0
+            n, desorden = medir_async(urls, args.segundos, k)
+            _fila(f"asyncio en_vuelo={k}/camara", n, f" | fuera de orden={desorden}")
+    finally:
+        srv.terminate()
+        srv.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Reproduccion de un clip grabado con RetinaFace + MobileFaceNet ONNX: llamadas a MobileFaceNet
+embebiendo todas las caras aptas de cada frame frente a ``TrackerCaras``
+(``utils/tracker_caras.py``), que reutiliza la identidad de cada track.
+
+Por defecto escribe un clip sintetico (MJPG, ``--segundos`` a ``--fps``) de un pasillo con dos
+personas: la A (``Retinaface-Models/test.jpg``) entra, se queda quieta y luego se acerca a la
+camara; la B (``images/lily2.jpg``) cruza mientras A esta quieta. La galeria tiene las dos caras
+(embebidas de la imagen original) y los ``.npy`` de ``embeddings/``. Con ``--video`` usa una
+grabacion real y la galeria de ``--galeria-dir``.
+
+El clip se analiza a ``--fps-analisis`` (``MAX_FPS_ANALISIS`` del script) con ``t = indice /
+fps``. RetinaFace se ejecuta una vez por frame analizado; sobre las mismas detecciones:
+
+1. Referencia: embeddings de todas las caras con score >= 0.90 en cada frame.
+2. Tracker: embeddings solo de las caras que ``pendientes_embedding`` pide.
+
+Reporta caras embebidas, llamadas ``session.run`` de MobileFaceNet, reduccion, motivos de
+re-embedding y la fraccion de caras aptas con la misma decision (identidad o sin
+coincidencia) en los dos modos. Falla si la reduccion es menor que ``--min-reduccion`` o el
+acuerdo menor que ``--min-acuerdo``.
+
+Ejemplo:
+  python bench/bench_tracker_caras.py
+  python bench/bench_tracker_caras.py --refresco-seg 2 --fps-analisis 5
+  python bench/bench_tracker_caras.py --video entrada.mp4 --galeria-dir embeddings
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.escena_pasillo import (  # noqa: E402
+    ALTO,
+    ANCHO,
+    PERSONAS,
+    con_ruido,
+    escribir_video,
+    fondo_pasillo,
+    leer_video,
+    pegar,
+    posicion,
+    recorte_persona,
+    ruidos_sensor,
+)
+from utils.aux_tools_retinaface import (  # noqa: E402
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_dets_topk_desde_rknn_outputs,
+)
+from utils.backend_inferencia import BackendORT, preprocesador  # noqa: E402
+from utils.face_embedding import EmbedderMobileFaceNet  # noqa: E402
+from utils.face_gallery import GaleriaEmbeddings  # noqa: E402
+from utils.tracker_caras import PoliticaIdentidad, TrackerCaras  # noqa: E402
+
+RETINAFACE_ONNX = ROOT / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
+MOBILEFACENET_ONNX = ROOT / "mobilenet_modelos" / "MobileFaceNet.onnx"
+# Mismos umbrales que export_models/RetinaFace_from_cam_with_id.py.
+RETINAFACE_SCORE_DETECCION = 0.2
+MIN_SCORE_MEJOR_CARA_EMBEDDING = 0.90
+SIM_MIN_MATCH_VERIFICACION = 0.45
+# Trayectorias: (t_seg, x centro, base y, escala) interpoladas linealmente; fuera = invisible.
+TRAYECTORIAS = {
+    "persona_a": [(2.0, -0.2, 1.0, 0.45), (8.0, 0.3, 1.0, 0.45), (30.0, 0.3, 1.0, 0.45),
+                  (40.0, 0.45, 1.0, 0.8), (46.0, 1.3, 1.0, 0.8)],
+    "persona_b": [(12.0, 1.2, 0.95, 0.4), (26.0, -0.2, 0.95, 0.4)],
+}
+
+
+def escribir_clip(path: Path, fps: float, segundos: float) -> None:
+    rng = np.random.default_rng(0)
+    fondo = fondo_pasillo(rng)
+    ruidos = ruidos_sensor(rng, 8)
+    personas = {nombre: recorte_persona(nombre)[0] for nombre in TRAYECTORIAS}
+
+    def frames():
+        for i in range(int(segundos * fps)):
+            frame = fondo.copy()
+            for nombre, persona in personas.items():
+                pos = posicion(TRAYECTORIAS[nombre], i / fps)
+                if pos is None:
+                    continue
+                xc, base, escala = pos
+                sprite = cv2.resize(persona, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+                ph, pw = sprite.shape[:2]
+                pegar(frame, sprite, int(xc * ANCHO - pw / 2), int(base * ALTO) - ph)
+            yield con_ruido(frame, ruidos[i % len(ruidos)])
+
+    escribir_video(path, frames(), fps)
+
+
+def galeria_sintetica(embedder: EmbedderMobileFaceNet) -> GaleriaEmbeddings:
+    """Las dos personas del clip (cara de la imagen original) + ``embeddings/*.npy``."""
+    galeria = GaleriaEmbeddings.desde_directorio_npy(ROOT / "embeddings")
+    for nombre, (img, _, cara) in PERSONAS.items():
+        imagen = cv2.imread(str(ROOT / img))
+        galeria.agregar(nombre, embedder.embeddings_de_dets(imagen, np.array([cara], dtype=np.float32)))
+    return galeria
+
+
+def decisiones(sims: np.ndarray, nombres: list[str | None]) -> list[str | None]:
+    return [n if s >= SIM_MIN_MATCH_VERIFICACION else None for s, n in zip(sims, nombres)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Llamadas MobileFaceNet: todas las caras vs tracker con cache.")
+    parser.add_argument("--video", type=str, default=None, help="Clip grabado (por defecto uno sintetico).")
+    parser.add_argument("--galeria-dir", type=str, default=None, help="Galeria .npy para --video.")
+    parser.add_argument("--segundos", type=float, default=50.0)
+    parser.add_argument("--fps", type=float, default=10.0)
+    parser.add_argument("--fps-analisis", type=float, default=2.0, help="MAX_FPS_ANALISIS del script.")
+    parser.add_argument("--refresco-seg", type=float, default=5.0)
+    parser.add_argument("--min-reduccion", type=float, default=0.6)
+    parser.add_argument("--min-acuerdo", type=float, default=0.95)
+    args = parser.parse_args()
+
+    backend = BackendORT(RETINAFACE_ONNX, hilos=1).cargar()
+    prep = preprocesador(backend.entrada, RETINAFACE_MEAN_BGR)
+    opciones = ort.SessionOptions()
+    opciones.intra_op_num_threads = 1
+    session_mfn = ort.InferenceSession(str(MOBILEFACENET_ONNX), opciones, providers=["CPUExecutionProvider"])
+    embedder = EmbedderMobileFaceNet(session_mfn)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = Path(args.video) if args.video else Path(tmp) / "pasillo_tracker.avi"
+        if not args.video:
+            escribir_clip(ruta, args.fps, args.segundos)
+        frames, fps = leer_video(ruta)
+    if args.galeria_dir:
+        galeria = GaleriaEmbeddings.desde_directorio_npy(Path(args.galeria_dir))
+    else:
+        galeria = galeria_sintetica(embedder)
+    paso = max(1, int(round(fps / args.fps_analisis))) if args.fps_analisis > 0 else 1
+
+    # Detecciones de los frames analizados (comunes a los dos modos).
+    analizados = []
+    for i in range(0, len(frames), paso):
+        frame = frames[i]
+        h, w = frame.shape[:2]
+        tensor, meta = prep.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
+        dets = retinaface_dets_topk_desde_rknn_outputs(
+            list(backend.infer_batch(tensor)),
+            img_width=w,
+            img_height=h,
+            aspect_ratio=meta.aspect_ratio,
+            offset_x=meta.offset_x,
+            offset_y=meta.offset_y,
+            score_deteccion=RETINAFACE_SCORE_DETECCION,
+        )
+        analizados.append((i / fps, frame, dets))
+
+    # 1) Referencia: todas las caras aptas de cada frame.
+    embedder.llamadas_run = 0
+    ref: list[list[str | None]] = []
+    caras_ref = 0
+    t0 = time.perf_counter()
+    for _, frame, dets in analizados:
+        aptas = np.flatnonzero(dets[:, 4] >= MIN_SCORE_MEJOR_CARA_EMBEDDING)
+        caras_ref += aptas.size
+        if aptas.size == 0:
+            ref.append([])
+            continue
+        res = galeria.buscar(embedder.embeddings_de_dets(frame, dets[aptas]), k=1)
+        ref.append(decisiones(res.sims[:, 0], [n[0] for n in res.nombres]))
+    t_ref = time.perf_counter() - t0
+    llamadas_ref = embedder.llamadas_run
+
+    # 2) Tracker con identidad por track.
+    embedder.llamadas_run = 0
+    tracker = TrackerCaras(
+        politica=PoliticaIdentidad(sim_match=SIM_MIN_MATCH_VERIFICACION, refresco_seg=args.refresco_seg)
+    )
+    iguales = 0
+    t_tracker = 0.0
+    t0 = time.perf_counter()
+    for k, (t, frame, dets) in enumerate(analizados):
+        t1 = time.perf_counter()
+        ids = tracker.actualizar(dets, t)
+        aptas = np.flatnonzero(dets[:, 4] >= MIN_SCORE_MEJOR_CARA_EMBEDDING)
+        nuevas = aptas[tracker.pendientes_embedding(ids[aptas], t)]
+        t_tracker += time.perf_counter() - t1
+        if nuevas.size:
+            res = galeria.buscar(embedder.embeddings_de_dets(frame, dets[nuevas]), k=1)
+            tracker.registrar_identidades(ids[nuevas], [n[0] for n in res.nombres], res.sims[:, 0], t)
+        sims, nombres = tracker.identidades(ids[aptas])
+        iguales += sum(a == b for a, b in zip(decisiones(sims, nombres), ref[k]))
+    t_trk = time.perf_counter() - t0
+    llamadas_trk = embedder.llamadas_run
+
+    if caras_ref == 0:
+        raise SystemExit("Ninguna cara apta en el clip")
+    reduccion = 1.0 - tracker.embeddings / caras_ref
+    acuerdo = iguales / caras_ref
+    print(
+        f"{len(frames)} frames a {fps:g} fps, {len(analizados)} analizados ({args.fps_analisis:g} fps), "
+        f"{caras_ref} caras aptas, galeria {len(galeria.identidades)} identidades"
+    )
+    print(f"  todas las caras: {caras_ref} embeddings, {llamadas_ref} llamadas MobileFaceNet, {1000.0 * t_ref:.0f} ms")
+    print(
+        f"  tracker:         {tracker.embeddings} embeddings, {llamadas_trk} llamadas MobileFaceNet, "
+        f"{1000.0 * t_trk:.0f} ms (tracker {1000.0 * t_tracker / len(analizados):.2f} ms/frame)"
+    )
+    print(f"  reduccion {100.0 * reduccion:.1f}% | misma decision {100.0 * acuerdo:.1f}% | {tracker.resumen()}")
+    if reduccion < args.min_reduccion:
+        raise SystemExit(f"Reduccion {100.0 * reduccion:.1f}% < {100.0 * args.min_reduccion:.0f}%")
+    if acuerdo < args.min_acuerdo:
+        raise SystemExit(f"Misma decision en {100.0 * acuerdo:.1f}% < {100.0 * args.min_acuerdo:.0f}% de las caras")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark + equivalencia del postproceso YOLOv8 (``utils/yolov8_post.py``).
+
+"antes" es la version que estaba copiada en los scripts (transpone (84, 8400) y aplica
+sigmoid a todas las logits); "despues" umbraliza el max-logit y solo procesa candidatos.
+Ambas deben devolver las mismas cajas, scores y clases; si no, el script termina con error.
+
+Salida sintetica (1, 84, 8400) float32 con la mayoria de logits muy negativas y unos pocos
+objetos por frame, parecida a un YOLOv8n real en camara de vigilancia.
+
+Ejemplo:
+  python bench/bench_yolov8_post.py
+  python bench/bench_yolov8_post.py --objetos 10 --conf 0.25
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.nms import nms_greedy  # noqa: E402
+from utils.yolov8_post import postprocess_yolov8_ultralytics, sigmoid  # noqa: E402
+
+
+def postprocess_antes(pred: np.ndarray, conf_thres: float, iou_thres: float):
+    """Copia de la version previa (transpose + sigmoid completa + NMS greedy)."""
+    if pred.ndim == 3:
+        pred = pred[0]
+    pred = pred.T
+    boxes_xywh = pred[:, :4]
+    cls_prob = sigmoid(pred[:, 4:])
+    scores = np.max(cls_prob, axis=1)
+    class_ids = np.argmax(cls_prob, axis=1)
+    mask = scores >= conf_thres
+    boxes_xywh = boxes_xywh[mask]
+    scores = scores[mask]
+    class_ids = class_ids[mask]
+    if len(scores) == 0:
+        return None, None, None
+    cx, cy, w, h = boxes_xywh[:, 0], boxes_xywh[:, 1], boxes_xywh[:, 2], boxes_xywh[:, 3]
+    xyxy = np.stack([cx - w / 2.0, cy - h / 2.0, cx + w / 2.0, cy + h / 2.0], axis=1)
+    keep = nms_greedy(xyxy, scores, iou_thres)
+    return xyxy[keep], scores[keep], class_ids[keep]
+
+
+def pred_sintetica(n_objetos: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n = 8400
+    pred = np.empty((1, 84, n), dtype=np.float32)
+    pred[0, 0:2] = rng.uniform(0, 640, size=(2, n))
+    pred[0, 2:4] = rng.uniform(8, 200, size=(2, n))
+    pred[0, 4:] = rng.normal(-9.0, 2.0, size=(80, n))
+    for _ in range(n_objetos):
+        anclas = rng.choice(n, size=12, replace=False)
+        pred[0, 4 + int(rng.integers(0, 80)), anclas] = rng.normal(2.0, 1.5, size=12)
+        centro = rng.uniform(100, 500, size=(2, 1))
+        pred[0, 0:2][:, anclas] = centro + rng.normal(0, 3, size=(2, 12))
+    return pred
+
+
+def _iguales(a, b) -> bool:
+    if a[0] is None or b[0] is None:
+        return a[0] is None and b[0] is None
+    return all(np.array_equal(x, y) for x, y in zip(a, b))
+
+
+def _ms(fn, iters: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / iters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark postproceso YOLOv8.")
+    parser.add_argument("--objetos", type=int, default=4, help="Objetos sinteticos por frame.")
+    parser.add_argument("--conf", type=float, default=0.65)
+    parser.add_argument("--iou", type=float, default=0.55)
+    parser.add_argument("--iters", type=int, default=50)
+    args = parser.parse_args()
+
+    for seed in range(20):
+        pred = pred_sintetica(args.objetos, seed)
+        for conf in (0.25, args.conf):
+            antes = postprocess_antes(pred, conf, args.iou)
+            despues = postprocess_yolov8_ultralytics(pred, conf, args.iou)
+            if not _iguales(antes, despues):
+                raise SystemExit(f"seed={seed} conf={conf}: resultados distintos")
+    print("Equivalencia antes/despues OK (20 frames)")
+
+    pred = pred_sintetica(args.objetos, 0)
+    t_antes = _ms(lambda: postprocess_antes(pred, args.conf, args.iou), args.iters)
+    t_despues = _ms(lambda: postprocess_yolov8_ultralytics(pred, args.conf, args.iou), args.iters)
+    t_person = _ms(
+        lambda: postprocess_yolov8_ultralytics(pred, args.conf, args.iou, clases=(0,)),
+        args.iters,
+    )
+    print(
+        f"ms/frame | antes={t_antes:.3f} | despues={t_despues:.3f} "
+        f"(x{t_antes / max(t_despues, 1e-9):.1f}) | solo person={t_person:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
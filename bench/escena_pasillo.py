@@ -0,0 +1,125 @@
+"""
+Escena sintetica de pasillo compartida por los benchmarks de video: fondo fijo, personas
+recortadas de imagenes del repo con la caja de su cara conocida, ruido de sensor y escritura /
+lectura MJPG (como un clip grabado).
+
+No es un benchmark: los ``bench_*.py`` lo importan como ``bench.escena_pasillo``.
+
+Ejemplo:
+    rng = np.random.default_rng(0)
+    fondo = fondo_pasillo(rng)
+    persona, cara = recorte_persona("persona_a")  # cara relativa al recorte
+    ruidos = ruidos_sensor(rng, 8)
+    frames = []
+    for i in range(100):
+        frame = fondo.copy()
+        pegar(frame, persona, 5 * i, ALTO - persona.shape[0])
+        frames.append(con_ruido(frame, ruidos[i % len(ruidos)]))
+    escribir_video(ruta, frames, fps=10)
+    frames, fps = leer_video(ruta)
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+ANCHO, ALTO = 640, 480
+# (imagen, recorte persona, cara en la imagen) de RetinaFace sobre la imagen original.
+PERSONAS = {
+    "persona_a": ("Retinaface-Models/test.jpg", (262, 40, 516, 427), (302, 74, 476, 300)),
+    "persona_b": ("images/lily2.jpg", (790, 30, 1080, 460), (868, 90, 999, 256)),
+}
+
+
+def fondo_pasillo(
+    rng: np.random.Generator, ancho: int = ANCHO, alto: int = ALTO, puertas: bool = False
+) -> np.ndarray:
+    """Pasillo dibujado (suelo, paredes y opcionalmente puertas) con textura suave; sin caras."""
+    fondo = np.full((alto, ancho, 3), 150, dtype=np.uint8)
+    fuga = (ancho // 2, alto // 3)
+    cv2.fillPoly(fondo, [np.array([(0, alto), (ancho, alto), fuga])], (95, 105, 110))  # suelo
+    cv2.fillPoly(fondo, [np.array([(0, 0), (0, alto), fuga])], (170, 175, 165))  # pared izquierda
+    cv2.fillPoly(fondo, [np.array([(ancho, 0), (ancho, alto), fuga])], (160, 165, 175))  # pared derecha
+    if puertas:
+        for x0, x1 in ((40, 110), (ancho - 110, ancho - 40)):
+            cv2.rectangle(fondo, (x0, 140), (x1, 380), (60, 80, 110), -1)
+    textura = cv2.GaussianBlur(rng.normal(0, 12, (alto, ancho, 3)), (0, 0), 3)
+    return np.clip(fondo + textura, 0, 255).astype(np.uint8)
+
+
+def recorte_persona(nombre: str = "persona_a") -> tuple[np.ndarray, np.ndarray]:
+    """Recorte BGR de ``PERSONAS[nombre]`` y caja ``(4,)`` float32 de su cara dentro del recorte."""
+    img, (x0, y0, x1, y1), cara = PERSONAS[nombre]
+    imagen = cv2.imread(str(ROOT / img))
+    if imagen is None:
+        raise SystemExit(f"No se pudo leer la imagen de prueba: {ROOT / img}")
+    caja = np.array(cara, dtype=np.float32) - np.array([x0, y0, x0, y0], dtype=np.float32)
+    return imagen[y0:y1, x0:x1], caja
+
+
+def ruidos_sensor(rng: np.random.Generator, n: int, ancho: int = ANCHO, alto: int = ALTO) -> list[np.ndarray]:
+    """``n`` patrones de ruido int16 (sigma 3) que se rotan entre frames."""
+    return [rng.normal(0, 3, (alto, ancho, 3)).astype(np.int16) for _ in range(n)]
+
+
+def con_ruido(frame: np.ndarray, ruido: np.ndarray) -> np.ndarray:
+    return np.clip(frame.astype(np.int16) + ruido, 0, 255).astype(np.uint8)
+
+
+def posicion(trayectoria, t: float):
+    """
+    ``trayectoria``: lista de ``(t_seg, *valores)`` interpolada linealmente. Valores en ``t`` o
+    None fuera del tramo (la persona no esta en escena).
+    """
+    if not trayectoria[0][0] <= t <= trayectoria[-1][0]:
+        return None
+    for (t0, *a), (t1, *b) in zip(trayectoria, trayectoria[1:]):
+        if t0 <= t <= t1:
+            u = (t - t0) / (t1 - t0)
+            return tuple(va + u * (vb - va) for va, vb in zip(a, b))
+    return None
+
+
+def pegar(frame: np.ndarray, sprite: np.ndarray, x: int, y: int) -> None:
+    """Copia ``sprite`` con su esquina en ``(x, y)``, recortado a los bordes del frame."""
+    ph, pw = sprite.shape[:2]
+    alto, ancho = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + pw, ancho), min(y + ph, alto)
+    if x1 > x0 and y1 > y0:
+        frame[y0:y1, x0:x1] = sprite[y0 - y : y1 - y, x0 - x : x1 - x]
+
+
+def escribir_video(path: Path, frames: Iterable[np.ndarray], fps: float) -> None:
+    """MJPG (como un clip grabado); el tamano es el del primer frame."""
+    vw = None
+    try:
+        for frame in frames:
+            if vw is None:
+                alto, ancho = frame.shape[:2]
+                vw = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (ancho, alto))
+                if not vw.isOpened():
+                    raise SystemExit(f"No se pudo crear el video de prueba: {path}")
+            vw.write(frame)
+    finally:
+        if vw is not None:
+            vw.release()
+
+
+def leer_video(path: Path) -> tuple[list[np.ndarray], float]:
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise SystemExit(f"No se pudo abrir el video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames, fps
@@ -7,7 +7,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(me
 
 # 1. CONFIGURACIONES GENERALES
 # 1.1 Captura
-MODO = os.getenv("CONFIG_MODO", "USB").upper()     # RTSP, SNAP, USB
+MODO = os.getenv("CONFIG_MODO", "USB").upper()     # RTSP, SNAP, USB, FILE (video local)
 MAX_FPS = float(os.getenv("MAX_FPS", 2.0))
 WARMUP_FRAMES = int(os.getenv("WARMUP_FRAMES", 15))
 DISPLAY_IS_ENABLE = (
@@ -21,10 +21,24 @@ CAP_FRAME_HEIGHT = int(os.getenv("CAP_FRAME_HEIGHT", 480))  #  High 1920    Medi
 REINTENTO_SEG = float(os.getenv("REINTENTO_SEG", "10"))
 HTTP_TIMEOUT_S = float(os.getenv("HTTP_TIMEOUT_S", "10"))
 LOG_CADA_N_FRAMES = int(os.getenv("LOG_CADA_N_FRAMES", "10"))
+ANILLO_FRAMES = int(os.getenv("ANILLO_FRAMES", "0"))  # >0: buffers de frame reutilizados (sin copia)
+# SNAP asincrono (utils.snap_async): 0 = un hilo con requests por camara; >0 = peticiones HTTP
+# en vuelo entre todas las camaras SNAP, con conexiones keep-alive compartidas.
+SNAP_EN_VUELO = int(os.getenv("SNAP_EN_VUELO", "0"))
+SNAP_EN_VUELO_POR_CAMARA = int(os.getenv("SNAP_EN_VUELO_POR_CAMARA", "2"))
+
+# 1.3 Varias camaras en un proceso (utils.multi_camera): JSON con una lista de fuentes
+# [{"nombre": "puerta", "modo": "RTSP", "url": "rtsp://..."}, {"modo": "FILE", "url": "a.mp4"}]
+# Vacio = una sola fuente con MODO.
+CAMARAS_CONFIG = os.getenv("CAMARAS_CONFIG", "")
+POLITICA_SCHEDULER = os.getenv("POLITICA_SCHEDULER", "round_robin")  # round_robin, mas_antiguo
 
 # 2. HARDWARE LOCAL (CAMARA USB)
 USB_INDEX = int(os.getenv("USB_DEVICE_INDEX", 0))
 
+# 2.1 Video local (modo FILE, pruebas sin camara)
+FILE_VIDEO_PATH = os.getenv("FILE_VIDEO_PATH", "")
+
 # 3. CONFIGURACIONES Camara IP
 _user = os.getenv("IP_CAM_USER", "angelcam")
 _pass = os.getenv("IP_CAM_PASS", "angelCamara")
@@ -33,11 +47,16 @@ _host_ip = os.getenv("IP_CAM", "192.168.1.16")  # info dispositivo; info red
 # 3.1 RTSP
 _port = os.getenv("IP_CAM_RTSP_PORT", "554")   # info dispositivo; info avanzada
 _route_rtsp_quality_low = os.getenv("IP_CAM_RTSP_ROUTE", "Preview_01_sub")
-_route_rtsp_quality_high = os.getenv("IP_CAM_RTSP_ROUTE", "Preview_01_main")
+_route_rtsp_quality_high = os.getenv("IP_CAM_RTSP_ROUTE_HIGH", "Preview_01_main")
 
 IP_CAM_RTSP_URL = f"rtsp://{_user}:{_pass}@{_host_ip}:{_port}/{_route_rtsp_quality_low}"
 IP_CAM_RTSP_URL_HIGH = f"rtsp://{_user}:{_pass}@{_host_ip}:{_port}/{_route_rtsp_quality_high}"
 
+# 3.1.1 Doble stream (utils.dual_stream): detectar en el sub, recortar caras del main
+DOBLE_STREAM_SLOTS_MAIN = int(os.getenv("DOBLE_STREAM_SLOTS_MAIN", "6"))  # historial del main
+DOBLE_STREAM_MAX_DESFASE_S = float(os.getenv("DOBLE_STREAM_MAX_DESFASE_S", "0.15"))
+DOBLE_STREAM_RETARDO_MAIN_S = float(os.getenv("DOBLE_STREAM_RETARDO_MAIN_S", "0.0"))  # calibrar
+
 # 3.2 SNAP
 _route_snap_quality_high = os.getenv("IP_CAM_ROUTE_SNAP_HIGH_RES", "width=2560&height=1920")
 _route_snap_quality_low= os.getenv("IP_CAM_ROUTE_SNAP_LOW_RES", "width=640&height=480")
@@ -55,6 +74,7 @@ SNAP_HTTP_URL_RES_LOW = (
 SNAP_HTTP_URL = SNAP_HTTP_URL_RES_LOW
 
 # 4. RUTAS DE LOS MODELOS RKNN
+BACKEND_INFERENCIA = os.getenv("BACKEND_INFERENCIA", "onnx").lower()  # onnx, rknn (NPU), mock (salidas grabadas)
 #RETINAFACE_MODEL = os.getenv("RETINAFACE_PATH", "./models/retinaface.rknn")
 #MOBILEFACENET_MODEL = os.getenv("MOBILEFACENET_PATH", "./models/mobilefacenet.rknn")
 
@@ -67,8 +87,8 @@ def validar_todo():
         f"Display: {DISPLAY_IS_ENABLE}"
     )
 
-    if MODO not in ["RTSP", "SNAP", "USB"]:
-        logging.critical(f"CONFIG ERROR: Modo '{MODO}' desconocido. Usar RTSP, SNAP o USB.")
+    if MODO not in ["RTSP", "SNAP", "USB", "FILE"]:
+        logging.critical(f"CONFIG ERROR: Modo '{MODO}' desconocido. Usar RTSP, SNAP, USB o FILE.")
         sys.exit(1)
 
     if MAX_FPS <= 0:
@@ -86,3 +106,32 @@ def validar_todo():
     if MODO == "SNAP" and not SNAP_HTTP_URL:
         logging.critical("CONFIG ERROR: Modo SNAP sin URL configurada.")
         sys.exit(1)
+
+    if MODO == "FILE" and not CAMARAS_CONFIG and not os.path.isfile(FILE_VIDEO_PATH):
+        logging.critical(f"CONFIG ERROR: Modo FILE sin video valido (FILE_VIDEO_PATH='{FILE_VIDEO_PATH}').")
+        sys.exit(1)
+
+    if CAMARAS_CONFIG and not os.path.isfile(CAMARAS_CONFIG):
+        logging.critical(f"CONFIG ERROR: No existe CAMARAS_CONFIG '{CAMARAS_CONFIG}'.")
+        sys.exit(1)
+
+    if DOBLE_STREAM_SLOTS_MAIN < 3 or DOBLE_STREAM_MAX_DESFASE_S <= 0:
+        logging.critical("CONFIG ERROR: DOBLE_STREAM_SLOTS_MAIN debe ser >= 3 y DOBLE_STREAM_MAX_DESFASE_S > 0.")
+        sys.exit(1)
+
+    if SNAP_EN_VUELO < 0 or SNAP_EN_VUELO_POR_CAMARA < 1:
+        logging.critical("CONFIG ERROR: SNAP_EN_VUELO debe ser >= 0 y SNAP_EN_VUELO_POR_CAMARA >= 1.")
+        sys.exit(1)
+
+    if BACKEND_INFERENCIA not in ["onnx", "rknn", "mock"]:
+        logging.critical(
+            f"CONFIG ERROR: BACKEND_INFERENCIA '{BACKEND_INFERENCIA}' desconocido. Usar onnx, rknn o mock."
+        )
+        sys.exit(1)
+
+    if POLITICA_SCHEDULER not in ["round_robin", "mas_antiguo"]:
+        logging.critical(
+            f"CONFIG ERROR: POLITICA_SCHEDULER '{POLITICA_SCHEDULER}' desconocida. "
+            "Usar round_robin o mas_antiguo."
+        )
+        sys.exit(1)
@@ -2,11 +2,12 @@
 RetinaFace (.rknn) en placa Rockchip: inferencia RKNNLite desde snapshots HTTP
 (cmd=Snap) de camara IP.
 
-El postproceso sigue en utils (letterbox + retinaface_dets_desde_rknn_outputs).
+El postproceso sigue en utils (letterbox + retinaface_dets_topk_desde_rknn_outputs).
 
 python3 RetinaFace_lite_from_api_snap.py
 python3 RetinaFace_lite_from_api_snap.py --display
 python3 RetinaFace_lite_from_api_snap.py --no-save
+python3 RetinaFace_lite_from_api_snap.py --res-full --decode-reducido
 
 """
 import argparse
@@ -49,10 +50,11 @@ from utils.aux_tools_retinaface import (
     RETINAFACE_INPUT_HEIGHT,
     RETINAFACE_INPUT_WIDTH,
     RETINAFACE_LETTERBOX_FILL,
-    retinaface_dets_desde_rknn_outputs,
+    retinaface_dets_topk_desde_rknn_outputs,
 )
 
-from utils.image_utils import letterbox_bgr
+from utils.backend_inferencia import EntradaModelo, preprocesador
+from utils.jpeg_reducido import FrameReducido, decodificar_reducido
 
 # --- Misma camara / Snap que model_api_snap.py (ajustar IP y credenciales) ---
 USER_CAM = "angelcam"
@@ -81,9 +83,13 @@ RETINAFACE_SCORE_PRE_NMS = 0.02
 RETINAFACE_SCORE_DETECCION = 0.2
 
 
+# Session: conexion keep-alive reutilizada entre snapshots (sin TCP nuevo por frame).
+_SESION_SNAP = requests.Session()
+
+
 def obtener_frame_snap(url: str) -> np.ndarray | None:
     try:
-        response = requests.get(url, timeout=HTTP_TIMEOUT_S, verify=False)
+        response = _SESION_SNAP.get(url, timeout=HTTP_TIMEOUT_S, verify=False)
     except requests.exceptions.RequestException as e:
         print(f"Error de conexion Snap: {e}")
         return None
@@ -92,11 +98,28 @@ def obtener_frame_snap(url: str) -> np.ndarray | None:
         print(f"Error HTTP Snap: {response.status_code}")
         return None
 
-    image_array = np.asarray(bytearray(response.content), dtype=np.uint8)
+    image_array = np.frombuffer(response.content, dtype=np.uint8)
     frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
     return frame
 
 
+def obtener_snap_reducido(url: str) -> FrameReducido | None:
+    """Como ``obtener_frame_snap`` pero decodificando al menor tamano que cubre 320x320."""
+    try:
+        response = _SESION_SNAP.get(url, timeout=HTTP_TIMEOUT_S, verify=False)
+    except requests.exceptions.RequestException as e:
+        print(f"Error de conexion Snap: {e}")
+        return None
+
+    if response.status_code != 200:
+        print(f"Error HTTP Snap: {response.status_code}")
+        return None
+
+    return decodificar_reducido(
+        response.content, (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT)
+    )
+
+
 def construir_file_path_dia() -> str:
     dd_mm = time.strftime("%d_%m")
     file_name_img = f"{FILE_BASE_NAME_IMG}_{dd_mm}.jpg"
@@ -137,9 +160,20 @@ def main() -> None:
         action="store_true",
         help="No guardar imagen con detecciones.",
     )
+    parser.add_argument(
+        "--res-full",
+        action="store_true",
+        help="Pedir el Snap a 2560x1920 (SNAP_HTTP_URL_RES_FULL).",
+    )
+    parser.add_argument(
+        "--decode-reducido",
+        action="store_true",
+        help="Decodificar el JPEG a 1/2, 1/4 u 1/8 (IMREAD_REDUCED_COLOR_*) segun la entrada 320x320; "
+        "las cajas se informan en coordenadas del Snap completo.",
+    )
     args = parser.parse_args()
 
-    snap_url = SNAP_HTTP_URL
+    snap_url = SNAP_HTTP_URL_RES_FULL if args.res_full else SNAP_HTTP_URL
 
     if not Path(args.model_path).is_file():
         raise SystemExit(f"No existe el modelo: {args.model_path}")
@@ -152,6 +186,9 @@ def main() -> None:
     if rknn.init_runtime() != 0:
         rknn.release()
         raise SystemExit("init_runtime failed")
+    preparar_entrada = preprocesador(
+        EntradaModelo("NHWC", "uint8", "RGB", RETINAFACE_INPUT_HEIGHT, RETINAFACE_INPUT_WIDTH, batch_max=1)
+    )
 
     if args.display:
         print("Snap API lista. Modo display (q o ESC para salir).")
@@ -182,7 +219,12 @@ def main() -> None:
                     continue
                 next_due = cv2.getTickCount() + periodo_analisis_ticks
 
-            frame = obtener_frame_snap(snap_url)
+            snap = None
+            if args.decode_reducido:
+                snap = obtener_snap_reducido(snap_url)
+                frame = snap.frame if snap is not None else None
+            else:
+                frame = obtener_frame_snap(snap_url)
             if frame is None:
                 continue
 
@@ -190,19 +232,13 @@ def main() -> None:
             log_fps_analisis(frame_count, t0_tick, frame)
 
             img_height, img_width = frame.shape[:2]
-            letterbox_img, lb_meta = letterbox_bgr(
-                frame,
-                (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT),
-                RETINAFACE_LETTERBOX_FILL,
-            )
-            infer_rgb = cv2.cvtColor(letterbox_img, cv2.COLOR_BGR2RGB)
-            input_tensor = np.expand_dims(infer_rgb, axis=0)
+            input_tensor, lb_meta = preparar_entrada.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
 
             outputs = rknn.inference(inputs=[input_tensor])
             if not outputs:
                 continue
 
-            dets = retinaface_dets_desde_rknn_outputs(
+            dets = retinaface_dets_topk_desde_rknn_outputs(
                 outputs,
                 img_width=img_width,
                 img_height=img_height,
@@ -217,6 +253,10 @@ def main() -> None:
             if n_faces > 0:
                 msg_parts = [f"face({float(row[4]):.2f})" for row in dets]
                 print("Detecciones: " + ", ".join(msg_parts))
+                if snap is not None and snap.factor > 1:
+                    # Cajas en el Snap completo; snap.recorte(caja) decodifica a full res si hace falta.
+                    cajas = snap.a_completa(dets)[:, :4].astype(int).tolist()
+                    print(f"  decode 1/{snap.factor}, cajas {snap.ancho_completo}x{snap.alto_completo}: {cajas}")
 
             for data in dets:
                 text = "{:.4f}".format(float(data[4]))
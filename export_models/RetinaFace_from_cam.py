@@ -2,15 +2,20 @@
 RetinaFace con ONNX en PC (OnnxRuntime) desde camara USB.
 
 Misma inferencia y postproceso que RetinaFace_from_img_onnx / RetinaFace_from_cam
-(letterbox, tensor segun firma ONNX, retinaface_dets_desde_rknn_outputs).
+(letterbox, tensor segun firma ONNX, retinaface_dets_topk_desde_rknn_outputs).
 
 Captura alineada con RetinaFace_from_ip_cam.py: buffer corto, hilo de ultimo frame,
 limite MAX_FPS_ANALISIS, log periodico, guardado con intervalo, reconexion si falla
 el frame (solo cambia la fuente: USB en lugar de RTSP).
 
+Con --keyframe-cada N el bucle va a N x MAX_FPS_ANALISIS: RetinaFace solo cada N frames (el
+mismo coste de detector) y en los intermedios las cajas y landmarks se propagan con flujo
+optico (utils.propagacion_cajas.PropagadorCajas); el display no salta cada 500 ms.
+
 Ejemplo:
   python export_models/RetinaFace_from_cam.py --display
   python export_models/RetinaFace_from_cam.py --camera 1 --no-save
+  python export_models/RetinaFace_from_cam.py --display --keyframe-cada 8
 """
 from __future__ import annotations
 
@@ -52,12 +57,11 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from utils.aux_tools_retinaface import (  # noqa: E402
-    RETINAFACE_INPUT_HEIGHT,
-    RETINAFACE_INPUT_WIDTH,
     RETINAFACE_LETTERBOX_FILL,
-    retinaface_dets_desde_rknn_outputs,
+    preprocesador_retinaface_onnx,
+    retinaface_dets_topk_desde_rknn_outputs,
 )
-from utils.image_utils import letterbox_bgr  # noqa: E402
+from utils.propagacion_cajas import PropagadorCajas  # noqa: E402
 
 # --- Misma politica de captura que RetinaFace_from_ip_cam.py (fuente = USB) ---
 USAR_HILO_CAPTURA = True
@@ -69,41 +73,10 @@ FILE_DIR = "camara_snap"
 FILE_BASE_NAME_IMG = "latest_retinaface_usb"
 REINTENTO_CAPTURA_SEG = 10
 
-RETINAFACE_MEAN_BGR = np.array([104.0, 117.0, 123.0], dtype=np.float32)
 RETINAFACE_SCORE_PRE_NMS = 0.02
 RETINAFACE_SCORE_DETECCION = 0.2
 
 
-def _preprocess_for_onnx(inp0_meta: ort.NodeArg, canvas_bgr: np.ndarray) -> np.ndarray:
-    if canvas_bgr.dtype != np.uint8:
-        canvas_bgr = canvas_bgr.astype(np.uint8)
-    x32 = canvas_bgr.astype(np.float32)
-    dims = inp0_meta.shape
-
-    nchw = False
-    nhwc = False
-    if len(dims) == 4 and dims[1] == 3:
-        nchw = True
-    elif len(dims) == 4 and dims[-1] == 3:
-        nhwc = True
-    elif len(dims) == 4 and dims[1] == RETINAFACE_INPUT_WIDTH:
-        nhwc = True
-    else:
-        nchw = True
-
-    if nhwc:
-        x32 -= RETINAFACE_MEAN_BGR.reshape(1, 1, 3)
-        return np.expand_dims(x32, axis=0)
-
-    if nchw:
-        chw = np.transpose(x32, (2, 0, 1))
-        feed = np.expand_dims(chw, axis=0)
-        feed -= RETINAFACE_MEAN_BGR.reshape(1, 3, 1, 1)
-        return feed
-
-    raise RuntimeError("Forma de entrada ONNX no soportada: " + repr(dims))
-
-
 def configurar_buffer_camara(cap: cv2.VideoCapture) -> None:
     try:
         cap.set(cv2.CAP_PROP_BUFFERSIZE, TAMANO_BUFFER_CAMARA)
@@ -227,6 +200,12 @@ def main() -> None:
         action="store_true",
         help="No guardar imagenes con detecciones.",
     )
+    parser.add_argument(
+        "--keyframe-cada",
+        type=int,
+        default=0,
+        help="RetinaFace cada N frames y flujo optico en los intermedios (0 = en todos).",
+    )
     parser.add_argument(
         "--providers",
         type=str,
@@ -242,6 +221,7 @@ def main() -> None:
     session = ort.InferenceSession(args.model_path, providers=providers)
     inp0 = session.get_inputs()[0]
     input_name = inp0.name
+    preparar_entrada = preprocesador_retinaface_onnx(inp0)  # layout y tensor fijados una vez
 
     cap = abrir_usb_con_calentamiento(args.camera)
     while cap is None:
@@ -270,9 +250,27 @@ def main() -> None:
     else:
         print("Camara USB lista. Sin display (Ctrl+C para salir).")
 
+    def detectar(frame: np.ndarray) -> np.ndarray:
+        img_height, img_width = frame.shape[:2]
+        tensor, lb_meta = preparar_entrada.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
+        ort_outputs = session.run(None, {input_name: tensor})
+        return retinaface_dets_topk_desde_rknn_outputs(
+            list(ort_outputs),
+            img_width=img_width,
+            img_height=img_height,
+            aspect_ratio=lb_meta.aspect_ratio,
+            offset_x=lb_meta.offset_x,
+            offset_y=lb_meta.offset_y,
+            score_deteccion=RETINAFACE_SCORE_DETECCION,
+            score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
+        )
+
+    propagador = PropagadorCajas(args.keyframe_cada) if args.keyframe_cada > 0 else None
+    # Con keyframes el bucle va N veces mas rapido; RetinaFace sigue a MAX_FPS_ANALISIS.
+    fps_bucle = MAX_FPS_ANALISIS * (args.keyframe_cada if propagador is not None else 1)
     periodo_analisis_ticks = (
-        int(cv2.getTickFrequency() / MAX_FPS_ANALISIS)
-        if MAX_FPS_ANALISIS > 0
+        int(cv2.getTickFrequency() / fps_bucle)
+        if fps_bucle > 0
         else 0
     )
     next_due = cv2.getTickCount()
@@ -341,28 +339,13 @@ def main() -> None:
             frame_count += 1
             log_fps_analisis(frame_count, t0_tick, frame)
 
-            img_height, img_width = frame.shape[:2]
-            letterbox_img, lb_meta = letterbox_bgr(
-                frame,
-                (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT),
-                RETINAFACE_LETTERBOX_FILL,
-            )
-            tensor = _preprocess_for_onnx(inp0, letterbox_img)
-            ort_outputs = session.run(None, {input_name: tensor})
-
-            dets = retinaface_dets_desde_rknn_outputs(
-                list(ort_outputs),
-                img_width=img_width,
-                img_height=img_height,
-                aspect_ratio=lb_meta.aspect_ratio,
-                offset_x=lb_meta.offset_x,
-                offset_y=lb_meta.offset_y,
-                score_deteccion=RETINAFACE_SCORE_DETECCION,
-                score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
-            )
+            if propagador is not None:
+                dets, es_keyframe = propagador.procesar(frame, detectar)
+            else:
+                dets, es_keyframe = detectar(frame), True
 
             n_faces = dets.shape[0]
-            if n_faces > 0:
+            if n_faces > 0 and es_keyframe:
                 msg_parts = [f"face({float(row[4]):.2f})" for row in dets]
                 print("Detecciones: " + ", ".join(msg_parts))
 
@@ -404,6 +387,8 @@ def main() -> None:
                 if key == ord("q") or key == 27:
                     break
     finally:
+        if propagador is not None:
+            print(f"Keyframes: {propagador.resumen()}")
         if grabber is not None:
             grabber.stop()
         cap.release()
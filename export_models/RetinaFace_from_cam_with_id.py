@@ -1,11 +1,40 @@
 """
-RetinaFace ONNX (USB) + MobileFaceNet ONNX: embedding de la mejor cara y comparacion
-con un vector de referencia (.npy), p. ej. embeddings/angel1.npy.
-
-Misma captura que RetinaFace_from_cam.py. Preproceso MobileFaceNet alineado con
+RetinaFace ONNX (USB) + MobileFaceNet ONNX: embedding de todas las caras con score suficiente
+y comparacion con un vector de referencia (.npy), p. ej. embeddings/angel1.npy, o
+identificacion 1:N contra todos los .npy de un directorio o un almacen empaquetado
+(--galeria-dir, utils.face_gallery / utils.embedding_store).
+
+Las caras del frame se embeben en lote (utils.face_embedding.EmbedderMobileFaceNet): una sola
+llamada ORT si el ONNX tiene batch dinamico (export_models/exp_mobilefacenet_batch_onnx.py ->
+mobilenet_modelos/MobileFaceNet_batch.onnx); con el ONNX original, una llamada por cara.
+
+Misma captura que RetinaFace_from_cam.py, pero el hilo escribe en un anillo de buffers
+reutilizados (utils.frame_ring.UltimoFrameAnillo) y el bucle presta el frame sin copiarlo; solo
+se copia si hay que dibujar (caras o --display). Preproceso MobileFaceNet alineado con
 face_embedding_from_image.py (RGB, ImageNet normalize, 112x112).
 
-Constantes: MIN_SCORE_MEJOR_CARA_EMBEDDING, SIM_MIN_MATCH_VERIFICACION, FACE_CROP_MARGIN_FRAC.
+Con --rtsp-dual la fuente es la camara IP en doble stream (utils.dual_stream): RetinaFace sobre
+el sub stream (IP_CAM_RTSP_URL) y, si hay caras aptas, MobileFaceNet sobre recortes del frame
+del main stream (IP_CAM_RTSP_URL_HIGH) mas proximo en el tiempo. Sin frame main alineado se
+recorta del sub stream.
+
+Las caras se siguen entre frames (utils.tracker_caras.TrackerCaras, SORT con Kalman y
+landmarks) y cada track guarda su identidad: MobileFaceNet solo se ejecuta para tracks nuevos,
+con similitud cerca del umbral, con la cara bastante mas grande que al embeber o tras
+REFRESCO_IDENTIDAD_SEG. --sin-tracker embebe todas las caras aptas de cada frame.
+
+Con --mejor-toma K (utils.mejor_toma.SelectorMejorToma) esas caras no se embeben en el acto: el
+track acumula candidatas durante VENTANA_MEJOR_TOMA_SEG, puntuadas por score, tamano, nitidez
+(varianza del Laplaciano) y frontalidad (landmarks), y solo se embeben las K mejores. Hasta
+entonces el track sale sin identidad (ESPERA).
+
+Con --keyframe-cada N (utils.propagacion_cajas.PropagadorCajas) el bucle va a N x
+MAX_FPS_ANALISIS: RetinaFace y MobileFaceNet solo corren cada N frames y en los intermedios las
+cajas se propagan con flujo optico; el tracker las sigue recibiendo y cada cara conserva la
+identidad de su track.
+
+Constantes: MIN_SCORE_MEJOR_CARA_EMBEDDING, SIM_MIN_MATCH_VERIFICACION, FACE_CROP_MARGIN_FRAC,
+MAX_CARAS_POR_LOTE.
 
 En PC:
     pip install onnxruntime
@@ -15,13 +44,19 @@ ENV:
 Ejemplo:
   python export_models/RetinaFace_from_cam_with_id.py --display
   python export_models/RetinaFace_from_cam_with_id.py --display --ref-embedding embeddings/angel2.npy
+  python export_models/RetinaFace_from_cam_with_id.py --display \
+      --mobilefacenet-onnx mobilenet_modelos/MobileFaceNet_batch.onnx
+  python export_models/RetinaFace_from_cam_with_id.py --display --galeria-dir embeddings
+  python export_models/RetinaFace_from_cam_with_id.py --display --galeria-dir embeddings_store
+  python export_models/RetinaFace_from_cam_with_id.py --rtsp-dual --galeria-dir embeddings
+  python export_models/RetinaFace_from_cam_with_id.py --display --galeria-dir embeddings --mejor-toma 3
+  python export_models/RetinaFace_from_cam_with_id.py --display --galeria-dir embeddings --keyframe-cada 4
 """
 from __future__ import annotations
 
 import argparse
 import os
 import sys
-import threading
 import time
 from pathlib import Path
 
@@ -55,13 +90,20 @@ ROOT = _project_root_with_utils(Path(__file__).resolve().parent)
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from configs import settings as s  # noqa: E402
 from utils.aux_tools_retinaface import (  # noqa: E402
-    RETINAFACE_INPUT_HEIGHT,
-    RETINAFACE_INPUT_WIDTH,
     RETINAFACE_LETTERBOX_FILL,
-    retinaface_dets_desde_rknn_outputs,
+    preprocesador_retinaface_onnx,
+    retinaface_dets_topk_desde_rknn_outputs,
 )
-from utils.image_utils import letterbox_bgr  # noqa: E402
+from utils.dual_stream import CapturaDobleStream  # noqa: E402
+from utils.face_embedding import EmbedderMobileFaceNet  # noqa: E402
+from utils.embedding_store import AlmacenEmbeddings, es_almacen  # noqa: E402
+from utils.face_gallery import GaleriaEmbeddings  # noqa: E402
+from utils.frame_ring import FramePrestado, UltimoFrameAnillo  # noqa: E402
+from utils.mejor_toma import ParametrosMejorToma, SelectorMejorToma, embeddings_de_tomas  # noqa: E402
+from utils.propagacion_cajas import PropagadorCajas  # noqa: E402
+from utils.tracker_caras import PoliticaIdentidad, TrackerCaras  # noqa: E402
 
 # --- Misma politica de captura que RetinaFace_from_ip_cam.py (fuente = USB) ---
 USAR_HILO_CAPTURA = True
@@ -73,88 +115,21 @@ FILE_DIR = "camara_snap"
 FILE_BASE_NAME_IMG = "latest_retinaface_usb"
 REINTENTO_CAPTURA_SEG = 10
 
-RETINAFACE_MEAN_BGR = np.array([104.0, 117.0, 123.0], dtype=np.float32)
 RETINAFACE_SCORE_PRE_NMS = 0.02
 RETINAFACE_SCORE_DETECCION = 0.2
 
-# Mejor cara: score minimo RetinaFace para calcular embedding (mismo criterio que face_embedding_from_image).
+# Score minimo RetinaFace de cada cara para calcular su embedding (mismo criterio que face_embedding_from_image).
 MIN_SCORE_MEJOR_CARA_EMBEDDING = 0.90
 # Similitud coseno minima (vectores L2=1) para considerar coincidencia con la referencia.
 SIM_MIN_MATCH_VERIFICACION = 0.45
 # Margen al recortar la caja antes de 112x112.
 FACE_CROP_MARGIN_FRAC = 0.15
-
-_IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32).reshape(1, 1, 3)
-_IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape(1, 1, 3)
-_MOBILEFACENET_HW = (112, 112)
-
-
-def _preprocess_for_onnx(inp0_meta: ort.NodeArg, canvas_bgr: np.ndarray) -> np.ndarray:
-    if canvas_bgr.dtype != np.uint8:
-        canvas_bgr = canvas_bgr.astype(np.uint8)
-    x32 = canvas_bgr.astype(np.float32)
-    dims = inp0_meta.shape
-
-    nchw = False
-    nhwc = False
-    if len(dims) == 4 and dims[1] == 3:
-        nchw = True
-    elif len(dims) == 4 and dims[-1] == 3:
-        nhwc = True
-    elif len(dims) == 4 and dims[1] == RETINAFACE_INPUT_WIDTH:
-        nhwc = True
-    else:
-        nchw = True
-
-    if nhwc:
-        x32 -= RETINAFACE_MEAN_BGR.reshape(1, 1, 3)
-        return np.expand_dims(x32, axis=0)
-
-    if nchw:
-        chw = np.transpose(x32, (2, 0, 1))
-        feed = np.expand_dims(chw, axis=0)
-        feed -= RETINAFACE_MEAN_BGR.reshape(1, 3, 1, 1)
-        return feed
-
-    raise RuntimeError("Forma de entrada ONNX no soportada: " + repr(dims))
-
-
-def _bbox_crop_with_margin(
-    det: np.ndarray, img_w: int, img_h: int, margin: float
-) -> tuple[int, int, int, int]:
-    x1, y1, x2, y2 = det[0], det[1], det[2], det[3]
-    bw = max(x2 - x1, 1.0)
-    bh = max(y2 - y1, 1.0)
-    mx = bw * margin
-    my = bh * margin
-    nx1 = int(np.floor(x1 - mx))
-    ny1 = int(np.floor(y1 - my))
-    nx2 = int(np.ceil(x2 + mx))
-    ny2 = int(np.ceil(y2 + my))
-    nx1 = max(0, nx1)
-    ny1 = max(0, ny1)
-    nx2 = min(img_w - 1, nx2)
-    ny2 = min(img_h - 1, ny2)
-    if nx2 <= nx1 or ny2 <= ny1:
-        return int(x1), int(y1), int(x2), int(y2)
-    return nx1, ny1, nx2, ny2
-
-
-def _crop_bgr_to_mobilefacenet_nchw(face_bgr: np.ndarray) -> np.ndarray:
-    if face_bgr.size == 0:
-        raise ValueError("recorte vacio")
-    rgb = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
-    resized = cv2.resize(rgb, _MOBILEFACENET_HW, interpolation=cv2.INTER_LINEAR)
-    norm = (resized - _IMAGENET_MEAN) / _IMAGENET_STD
-    chw = np.transpose(norm, (2, 0, 1))
-    return np.expand_dims(chw.astype(np.float32), axis=0)
-
-
-def _l2_normalize(vec: np.ndarray) -> np.ndarray:
-    n = float(np.linalg.norm(vec.reshape(-1), ord=2))
-    if n < 1e-12:
-        return vec
-    return (vec / n).astype(np.float32)
+# Caras por llamada MobileFaceNet (solo si el ONNX tiene batch dinamico; si no, una por llamada).
+MAX_CARAS_POR_LOTE = 8
+# Segundos maximos con la identidad de un track sin volver a embeber su cara.
+REFRESCO_IDENTIDAD_SEG = 5.0
+# Con --mejor-toma: segundos que un track acumula candidatas antes de embeber las mejores.
+VENTANA_MEJOR_TOMA_SEG = 2.0
 
 
 def configurar_buffer_camara(cap: cv2.VideoCapture) -> None:
@@ -198,7 +173,7 @@ def abrir_usb_con_calentamiento(device_index: int) -> cv2.VideoCapture | None:
 
 
 def esperar_primer_frame_grabber(
-    grabber: "UltimoFrameCamara", timeout_seg: float = 2.0
+    grabber: "UltimoFrameAnillo", timeout_seg: float = 2.0
 ) -> bool:
     t_ini = time.time()
     while (time.time() - t_ini) < timeout_seg:
@@ -209,48 +184,6 @@ def esperar_primer_frame_grabber(
     return False
 
 
-class UltimoFrameCamara:
-    """
-    Un solo hilo llama a cap.read(); el bucle principal copia el ultimo frame.
-    Evita que mientras ONNX infiere se acumulen frames viejos en el buffer.
-    """
-
-    def __init__(self, cap: cv2.VideoCapture) -> None:
-        self._cap = cap
-        self._lock = threading.Lock()
-        self._frame: np.ndarray | None = None
-        self._running = False
-        self._thread: threading.Thread | None = None
-
-    def start(self) -> None:
-        self._running = True
-        self._thread = threading.Thread(target=self._loop, daemon=True)
-        self._thread.start()
-
-    def _loop(self) -> None:
-        while self._running:
-            ok, frame = self._cap.read()
-            if ok and frame is not None:
-                with self._lock:
-                    self._frame = frame
-            else:
-                with self._lock:
-                    self._frame = None
-                time.sleep(0.001)
-
-    def read_copy(self) -> tuple[bool, np.ndarray | None]:
-        with self._lock:
-            if self._frame is None:
-                return False, None
-            return True, self._frame.copy()
-
-    def stop(self) -> None:
-        self._running = False
-        if self._thread is not None:
-            self._thread.join()
-            self._thread = None
-
-
 def main() -> None:
     _repo = ROOT
     default_onnx = _repo / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
@@ -278,6 +211,15 @@ def main() -> None:
         default=str(default_ref),
         help="Embedding referencia .npy (mismo pipeline que face_embedding_from_image)",
     )
+    parser.add_argument(
+        "--galeria-dir",
+        type=str,
+        default=None,
+        help=(
+            "Directorio con un .npy por identidad o almacen empaquetado (utils.embedding_store): "
+            "identificacion 1:N (ignora --ref-embedding)."
+        ),
+    )
     parser.add_argument(
         "--camera",
         type=int,
@@ -294,6 +236,31 @@ def main() -> None:
         action="store_true",
         help="No guardar imagenes con detecciones.",
     )
+    parser.add_argument(
+        "--rtsp-dual",
+        action="store_true",
+        help="Camara IP: detectar en el sub stream y embeber recortes del main stream "
+        "(IP_CAM_RTSP_URL / IP_CAM_RTSP_URL_HIGH de configs.settings; ignora --camera).",
+    )
+    parser.add_argument(
+        "--sin-tracker",
+        action="store_true",
+        help="Embeber todas las caras aptas de cada frame (sin cache de identidad por track).",
+    )
+    parser.add_argument(
+        "--mejor-toma",
+        type=int,
+        default=0,
+        metavar="K",
+        help="Por track, embeber solo las K caras de mas calidad de cada ventana de "
+        "VENTANA_MEJOR_TOMA_SEG (media de sus embeddings). 0 = desactivado.",
+    )
+    parser.add_argument(
+        "--keyframe-cada",
+        type=int,
+        default=0,
+        help="RetinaFace cada N frames y flujo optico en los intermedios (0 = en todos).",
+    )
     parser.add_argument(
         "--providers",
         type=str,
@@ -306,29 +273,68 @@ def main() -> None:
         raise SystemExit(f"No existe el ONNX RetinaFace: {args.model_path}")
     if not Path(args.mobilefacenet_onnx).is_file():
         raise SystemExit(f"No existe el ONNX MobileFaceNet: {args.mobilefacenet_onnx}")
-    ref_path = Path(args.ref_embedding)
-    if not ref_path.is_file():
-        raise SystemExit(f"No existe el embedding referencia: {ref_path}")
-
-    ref_vec = np.load(str(ref_path)).astype(np.float32).reshape(-1)
-    if ref_vec.size != 128:
-        raise SystemExit(
-            f"Embedding referencia debe tener 128 valores, tiene {ref_vec.size}: {ref_path}"
-        )
-    ref_vec = _l2_normalize(ref_vec)
+    if args.galeria_dir is not None:
+        ref_path = Path(args.galeria_dir)
+        if not ref_path.is_dir():
+            raise SystemExit(f"No existe el directorio de galeria: {ref_path}")
+        try:
+            if es_almacen(ref_path):
+                galeria = AlmacenEmbeddings(ref_path).a_galeria()
+            else:
+                galeria = GaleriaEmbeddings.desde_directorio_npy(ref_path)
+        except ValueError as e:
+            raise SystemExit(f"Galeria con embeddings de tamano distinto de 128: {e}") from e
+        if len(galeria) == 0:
+            raise SystemExit(f"Galeria vacia (sin .npy): {ref_path}")
+    else:
+        ref_path = Path(args.ref_embedding)
+        if not ref_path.is_file():
+            raise SystemExit(f"No existe el embedding referencia: {ref_path}")
+
+        ref_vec = np.load(str(ref_path)).astype(np.float32).reshape(-1)
+        if ref_vec.size != 128:
+            raise SystemExit(
+                f"Embedding referencia debe tener 128 valores, tiene {ref_vec.size}: {ref_path}"
+            )
+        galeria = GaleriaEmbeddings(capacidad_inicial=1)
+        galeria.agregar(ref_path.stem, ref_vec)
 
     providers = [p.strip() for p in args.providers.split(",") if p.strip()]
     session = ort.InferenceSession(args.model_path, providers=providers)
     inp0 = session.get_inputs()[0]
     input_name = inp0.name
+    preparar_entrada = preprocesador_retinaface_onnx(inp0)  # layout y tensor fijados una vez
 
     session_mfn = ort.InferenceSession(args.mobilefacenet_onnx, providers=providers)
-    mfn_in = session_mfn.get_inputs()[0]
-    mfn_in_name = mfn_in.name
-    mfn_out_name = session_mfn.get_outputs()[0].name
+    embedder = EmbedderMobileFaceNet(session_mfn, max_batch=MAX_CARAS_POR_LOTE)
+    tracker = None
+    if not args.sin_tracker:
+        tracker = TrackerCaras(
+            politica=PoliticaIdentidad(
+                sim_match=SIM_MIN_MATCH_VERIFICACION, refresco_seg=REFRESCO_IDENTIDAD_SEG
+            )
+        )
 
-    cap = abrir_usb_con_calentamiento(args.camera)
-    while cap is None:
+    selector = None
+    if args.mejor_toma > 0:
+        if tracker is None:
+            raise SystemExit("--mejor-toma necesita el tracker (quita --sin-tracker).")
+        selector = SelectorMejorToma(
+            ParametrosMejorToma(
+                top_k=args.mejor_toma, ventana_seg=VENTANA_MEJOR_TOMA_SEG, margen=FACE_CROP_MARGIN_FRAC
+            )
+        )
+
+    cap = None
+    doble: CapturaDobleStream | None = None
+    if args.rtsp_dual:
+        # Cada stream reconecta en su propio hilo (CaptureCameras); el bucle solo espera frames.
+        doble = CapturaDobleStream(max_fps=0).start()
+        print(f"Doble stream RTSP: sub={s.IP_CAM_RTSP_URL.rsplit('/', 1)[-1]} "
+              f"main={s.IP_CAM_RTSP_URL_HIGH.rsplit('/', 1)[-1]}")
+    else:
+        cap = abrir_usb_con_calentamiento(args.camera)
+    while doble is None and cap is None:
         print(
             f"[RETRY] No se pudo abrir/calentar USB cam {args.camera}. "
             f"Reintento en {REINTENTO_CAPTURA_SEG}s..."
@@ -336,9 +342,9 @@ def main() -> None:
         time.sleep(REINTENTO_CAPTURA_SEG)
         cap = abrir_usb_con_calentamiento(args.camera)
 
-    grabber: UltimoFrameCamara | None = None
-    if USAR_HILO_CAPTURA:
-        grabber = UltimoFrameCamara(cap)
+    grabber: UltimoFrameAnillo | None = None
+    if USAR_HILO_CAPTURA and doble is None:
+        grabber = UltimoFrameAnillo(cap)
         grabber.start()
         if not esperar_primer_frame_grabber(grabber):
             grabber.stop()
@@ -349,8 +355,10 @@ def main() -> None:
             )
         print("Captura en hilo auxiliar activa (menos latencia por buffer).")
     print(
-        f"Referencia: {ref_path} | MobileFaceNet: {args.mobilefacenet_onnx} | "
-        f"min_score_emb={MIN_SCORE_MEJOR_CARA_EMBEDDING} sim_match>={SIM_MIN_MATCH_VERIFICACION}"
+        f"Referencia: {ref_path} ({len(galeria.identidades)} identidades) | MobileFaceNet: {args.mobilefacenet_onnx} | "
+        f"min_score_emb={MIN_SCORE_MEJOR_CARA_EMBEDDING} sim_match>={SIM_MIN_MATCH_VERIFICACION} | "
+        f"lote MobileFaceNet: "
+        f"{'dinamico' if embedder.batch_dinamico else f'fijo {embedder.batch_fijo}'}"
     )
 
     if args.display:
@@ -358,9 +366,12 @@ def main() -> None:
     else:
         print("Camara USB lista. Sin display (Ctrl+C para salir).")
 
+    propagador = PropagadorCajas(args.keyframe_cada) if args.keyframe_cada > 0 else None
+    # Con keyframes el bucle va N veces mas rapido; RetinaFace sigue a MAX_FPS_ANALISIS.
+    fps_bucle = MAX_FPS_ANALISIS * (args.keyframe_cada if propagador is not None else 1)
     periodo_analisis_ticks = (
-        int(cv2.getTickFrequency() / MAX_FPS_ANALISIS)
-        if MAX_FPS_ANALISIS > 0
+        int(cv2.getTickFrequency() / fps_bucle)
+        if fps_bucle > 0
         else 0
     )
     next_due = cv2.getTickCount()
@@ -382,8 +393,17 @@ def main() -> None:
                     continue
                 next_due = cv2.getTickCount() + periodo_analisis_ticks
 
-            if grabber is not None:
-                ok, frame = grabber.read_copy()
+            prestado: FramePrestado | None = None
+            t_frame = 0.0
+            if doble is not None:
+                ok, frame, _, t_frame = doble.sub.get_frame_info()
+                if not ok:
+                    time.sleep(0.005)
+                    continue
+            elif grabber is not None:
+                # Vista de solo lectura del anillo (sin copia); se libera antes de dibujar.
+                prestado = grabber.prestar()
+                ok, frame = (prestado is not None), (prestado.vista if prestado else None)
             else:
                 ok, frame = cap.read()
             if not ok or frame is None:
@@ -405,7 +425,7 @@ def main() -> None:
                     cap = abrir_usb_con_calentamiento(args.camera)
                     if cap is not None:
                         if USAR_HILO_CAPTURA:
-                            grabber = UltimoFrameCamara(cap)
+                            grabber = UltimoFrameAnillo(cap)
                             grabber.start()
                             if esperar_primer_frame_grabber(grabber):
                                 print("[RETRY] Camara USB reconectada. Captura en hilo reanudada.")
@@ -430,75 +450,162 @@ def main() -> None:
             log_fps_analisis(frame_count, t0_tick, frame)
 
             img_height, img_width = frame.shape[:2]
-            letterbox_img, lb_meta = letterbox_bgr(
-                frame,
-                (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT),
-                RETINAFACE_LETTERBOX_FILL,
-            )
-            tensor = _preprocess_for_onnx(inp0, letterbox_img)
-            ort_outputs = session.run(None, {input_name: tensor})
-
-            dets = retinaface_dets_desde_rknn_outputs(
-                list(ort_outputs),
-                img_width=img_width,
-                img_height=img_height,
-                aspect_ratio=lb_meta.aspect_ratio,
-                offset_x=lb_meta.offset_x,
-                offset_y=lb_meta.offset_y,
-                score_deteccion=RETINAFACE_SCORE_DETECCION,
-                score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
-            )
+            es_keyframe = propagador is None or propagador.es_keyframe()
+            if es_keyframe:
+                tensor, lb_meta = preparar_entrada.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
+                ort_outputs = session.run(None, {input_name: tensor})
+
+                dets = retinaface_dets_topk_desde_rknn_outputs(
+                    list(ort_outputs),
+                    img_width=img_width,
+                    img_height=img_height,
+                    aspect_ratio=lb_meta.aspect_ratio,
+                    offset_x=lb_meta.offset_x,
+                    offset_y=lb_meta.offset_y,
+                    score_deteccion=RETINAFACE_SCORE_DETECCION,
+                    score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
+                )
+                if propagador is not None:
+                    dets = propagador.keyframe(frame, dets)
+            else:
+                dets = propagador.propagar(frame)
 
             n_faces = dets.shape[0]
+            sims = np.full((n_faces,), np.nan, dtype=np.float32)
+            nombres: list[str | None] = [None] * n_faces
             sim_display = "--"
             match_display = ""
-            best_idx = -1
-            if n_faces > 0:
-                best_idx = int(np.argmax(dets[:, 4]))
-                best = dets[best_idx]
-                score_best = float(best[4])
-                if score_best >= MIN_SCORE_MEJOR_CARA_EMBEDDING:
-                    bx1, by1, bx2, by2 = _bbox_crop_with_margin(
-                        best, img_width, img_height, FACE_CROP_MARGIN_FRAC
+            t_tracker = t_frame if doble is not None else time.monotonic()
+            ids = tracker.actualizar(dets, t_tracker) if tracker is not None else None
+            if n_faces > 0 and not es_keyframe:
+                # Frame intermedio: sin MobileFaceNet, cada caja lleva la identidad de su track.
+                if tracker is not None:
+                    sims, nombres = tracker.identidades(ids)
+                    if not np.isnan(sims).all():
+                        n_match = int(np.sum(sims >= SIM_MIN_MATCH_VERIFICACION))
+                        sim_display = f"{float(np.nanmax(sims)):.3f}"
+                        match_display = f"MATCH {n_match}/{n_faces}" if n_match > 0 else "NO_MATCH"
+            elif n_faces > 0 and selector is not None:
+                try:
+                    # Mejor toma: las caras de tracks sin identidad fiable son candidatas (filtro por
+                    # calidad en lugar de MIN_SCORE); se embeben al cerrarse la ventana del track.
+                    pendientes = np.flatnonzero(tracker.pendientes_embedding(ids, t_tracker))
+                    main = (
+                        doble.prestar_main(t_frame, frame.shape)
+                        if doble is not None and pendientes.size > 0
+                        else None
                     )
-                    crop = frame[by1 : by2 + 1, bx1 : bx2 + 1].copy()
+                    if main is not None:
+                        # El selector copia los recortes: el frame main se libera al salir.
+                        with main:
+                            dets_main = main.a_main(dets[pendientes])
+                            for j, i in enumerate(pendientes):
+                                selector.agregar(int(ids[i]), main.vista, dets_main[j], t_tracker)
+                    else:
+                        for i in pendientes:
+                            selector.agregar(int(ids[i]), frame, dets[i], t_tracker)
+                    listos = selector.listos(t_tracker, tracker.tracks)
+                    if listos:
+                        res = galeria.buscar(embeddings_de_tomas(embedder, listos), k=1)
+                        tracker.registrar_identidades(
+                            [tomas.id_track for tomas in listos],
+                            [n[0] for n in res.nombres],
+                            res.sims[:, 0],
+                            t_tracker,
+                        )
+                    sims, nombres = tracker.identidades(ids)
+                    if np.isnan(sims).all():
+                        sim_display = "--"
+                        match_display = "ESPERA"
+                    else:
+                        n_match = int(np.sum(sims >= SIM_MIN_MATCH_VERIFICACION))
+                        sim_display = f"{float(np.nanmax(sims)):.3f}"
+                        match_display = f"MATCH {n_match}/{n_faces}" if n_match > 0 else "NO_MATCH"
+                except Exception:
+                    sim_display = "err"
+                    match_display = "CROP"
+            elif n_faces > 0:
+                aptas = np.flatnonzero(dets[:, 4] >= MIN_SCORE_MEJOR_CARA_EMBEDDING)
+                if aptas.size > 0:
                     try:
-                        feed_m = _crop_bgr_to_mobilefacenet_nchw(crop)
-                        out_m = session_mfn.run(
-                            [mfn_out_name], {mfn_in_name: feed_m}
-                        )[0]
-                        emb = _l2_normalize(
-                            np.asarray(out_m, dtype=np.float32).reshape(-1)
+                        # Con tracker solo las caras cuyo track no tiene identidad fiable.
+                        nuevas = (
+                            aptas[tracker.pendientes_embedding(ids[aptas], t_tracker)]
+                            if tracker is not None
+                            else aptas
                         )
-                        sim_v = float(np.dot(ref_vec, emb))
-                        sim_display = f"{sim_v:.3f}"
+                        main = (
+                            doble.prestar_main(t_frame, frame.shape)
+                            if doble is not None and nuevas.size > 0
+                            else None
+                        )
+                        if nuevas.size == 0:
+                            embs = None
+                        elif main is not None:
+                            # Mismas caras recortadas del frame main (sin copiar el frame).
+                            with main:
+                                embs = embedder.embeddings_de_dets(
+                                    main.vista, main.a_main(dets[nuevas]), FACE_CROP_MARGIN_FRAC
+                                )
+                        else:
+                            embs = embedder.embeddings_de_dets(
+                                frame, dets[nuevas], FACE_CROP_MARGIN_FRAC
+                            )
+                        if embs is not None:
+                            res = galeria.buscar(embs, k=1)
+                            sims[nuevas] = res.sims[:, 0]
+                            for j, i in enumerate(nuevas):
+                                nombres[i] = res.nombres[j][0]
+                            if tracker is not None:
+                                tracker.registrar_identidades(
+                                    ids[nuevas], [n[0] for n in res.nombres], res.sims[:, 0], t_tracker
+                                )
+                        if tracker is not None:
+                            sims[aptas], nombres_aptas = tracker.identidades(ids[aptas])
+                            for j, i in enumerate(aptas):
+                                nombres[i] = nombres_aptas[j]
+                        sim_max = float(np.nanmax(sims))
+                        n_match = int(np.sum(sims >= SIM_MIN_MATCH_VERIFICACION))
+                        sim_display = f"{sim_max:.3f}"
                         match_display = (
-                            "MATCH"
-                            if sim_v >= SIM_MIN_MATCH_VERIFICACION
-                            else "NO_MATCH"
+                            f"MATCH {n_match}/{aptas.size}" if n_match > 0 else "NO_MATCH"
                         )
                     except Exception:
                         sim_display = "err"
                         match_display = "CROP"
                 else:
-                    sim_display = f"sc{score_best:.2f}"
+                    sim_display = f"sc{float(np.max(dets[:, 4])):.2f}"
                     match_display = "BAJO"
 
-            if n_faces > 0:
-                msg_parts = [f"face({float(row[4]):.2f})" for row in dets]
-                extra = f" | ID sim={sim_display} {match_display}"
+            if n_faces > 0 and es_keyframe:
+                msg_parts = [
+                    f"face({float(row[4]):.2f}"
+                    + ("" if np.isnan(sims[i]) else f" {nombres[i]} sim={float(sims[i]):.3f}")
+                    + ")"
+                    for i, row in enumerate(dets)
+                ]
+                extra = f" | ID sim_max={sim_display} {match_display}"
                 print("Detecciones: " + ", ".join(msg_parts) + extra)
 
+            if prestado is not None:
+                # Dibujar / guardar / mostrar necesita un frame propio; sin caras ni display
+                # el frame no se copia nunca.
+                if n_faces > 0 or args.display:
+                    frame = prestado.copia()
+                grabber.liberar(prestado)
+
             for i, data in enumerate(dets):
                 score_f = float(data[4])
                 text = "{:.4f}".format(score_f)
+                if not np.isnan(sims[i]) and sims[i] >= SIM_MIN_MATCH_VERIFICACION:
+                    text += f" {nombres[i]}"
                 di = list(map(int, data))
                 color = (0, 0, 255)
                 thick = 2
-                if i == best_idx and match_display == "MATCH":
+                if not np.isnan(sims[i]) and sims[i] >= SIM_MIN_MATCH_VERIFICACION:
                     color = (0, 200, 0)
                     thick = 3
-                elif i == best_idx:
+                elif not np.isnan(sims[i]):
                     color = (0, 140, 255)
                     thick = 3
                 cv2.rectangle(
@@ -520,7 +627,7 @@ def main() -> None:
                 cv2.circle(frame, (di[13], di[14]), 1, (255, 0, 0), 5)
 
             if n_faces > 0:
-                bar = f"{ref_path.name} sim={sim_display} {match_display}"
+                bar = f"{ref_path.name} sim_max={sim_display} {match_display}"
                 cv2.rectangle(frame, (0, 0), (img_width, 36), (0, 0, 0), -1)
                 cv2.putText(
                     frame,
@@ -552,7 +659,17 @@ def main() -> None:
     finally:
         if grabber is not None:
             grabber.stop()
-        cap.release()
+        if propagador is not None:
+            print(f"Keyframes: {propagador.resumen()}")
+        if tracker is not None:
+            print(f"Tracker: {tracker.resumen()}")
+        if selector is not None:
+            print(f"Mejor toma: {selector.resumen()}")
+        if doble is not None:
+            print(doble.resumen())
+            doble.stop()
+        if cap is not None:
+            cap.release()
         if args.display:
             cv2.destroyAllWindows()
 
@@ -20,7 +20,6 @@ import sys
 from pathlib import Path
 
 import cv2
-import numpy as np
 
 
 def _project_root_with_utils(start_dir: Path) -> Path:
@@ -40,12 +39,10 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from utils.aux_tools_retinaface import (  # noqa: E402
-    RETINAFACE_INPUT_HEIGHT,
-    RETINAFACE_INPUT_WIDTH,
     RETINAFACE_LETTERBOX_FILL,
+    preprocesador_retinaface_onnx,
     retinaface_dets_desde_rknn_outputs,
 )
-from utils.image_utils import letterbox_bgr  # noqa: E402
 
 try:
     import onnxruntime as ort
@@ -57,49 +54,10 @@ except Exception as e:
         f"  Detalle: {e!r}"
     ) from e
 
-RETINAFACE_MEAN_BGR = np.array([104.0, 117.0, 123.0], dtype=np.float32)
-
 RETINAFACE_SCORE_PRE_NMS = 0.02
 RETINAFACE_SCORE_DETECCION = 0.2
 
 
-def _preprocess_for_onnx(inp0_meta: ort.NodeArg, canvas_bgr: np.ndarray) -> np.ndarray:
-    """
-    Canvas BGR uint8 (H,W,3) ya en 320x320 (letterbox).
-    Produce tensor listo para session.run segun firma ONNX (NCHW o NHWC).
-    """
-    if canvas_bgr.dtype != np.uint8:
-        canvas_bgr = canvas_bgr.astype(np.uint8)
-    x32 = canvas_bgr.astype(np.float32)
-    dims = inp0_meta.shape
-
-    # Detectar orden NCHW vs NHWC usando dimensiones conocidas para 320 entrada
-    nchw = False
-    nhwc = False
-    if len(dims) == 4 and dims[1] == 3:
-        nchw = True
-    elif len(dims) == 4 and dims[-1] == 3:
-        nhwc = True
-    elif len(dims) == 4 and dims[1] == RETINAFACE_INPUT_WIDTH:
-        # A veces [1,H,W,C]
-        nhwc = True
-    else:
-        # Por defecto: NCHW (export Rockchip habitual)
-        nchw = True
-
-    if nhwc:
-        x32 -= RETINAFACE_MEAN_BGR.reshape(1, 1, 3)
-        return np.expand_dims(x32, axis=0)
-
-    if nchw:
-        chw = np.transpose(x32, (2, 0, 1))
-        feed = np.expand_dims(chw, axis=0)
-        feed -= RETINAFACE_MEAN_BGR.reshape(1, 3, 1, 1)
-        return feed
-
-    raise RuntimeError("Forma de entrada ONNX no soportada: " + repr(dims))
-
-
 if __name__ == "__main__":
     _repo = ROOT
     _default_onnx = _repo / "Retinaface-Models" / "RetinaFace_mobile320.onnx"
@@ -144,18 +102,14 @@ if __name__ == "__main__":
     session = ort.InferenceSession(args.model_path, providers=providers)
     inp0 = session.get_inputs()[0]
     input_name = inp0.name
+    preparar_entrada = preprocesador_retinaface_onnx(inp0)  # layout y tensor fijados una vez
 
     img = cv2.imread(args.img)
     if img is None:
         raise SystemExit("No se pudo leer la imagen: " + args.img)
     img_height, img_width = img.shape[:2]
 
-    letterbox_img, lb_meta = letterbox_bgr(
-        img,
-        (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT),
-        RETINAFACE_LETTERBOX_FILL,
-    )
-    tensor = _preprocess_for_onnx(inp0, letterbox_img)
+    tensor, lb_meta = preparar_entrada.letterbox(img, RETINAFACE_LETTERBOX_FILL)
     ort_outputs = session.run(None, {input_name: tensor})
 
     dets = retinaface_dets_desde_rknn_outputs(
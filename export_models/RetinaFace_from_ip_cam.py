@@ -1,11 +1,16 @@
 """
 RetinaFace (.rknn) en placa Rockchip: camara IP por RTSP + inferencia RKNNLite.
 
-Postproceso en utils (letterbox + retinaface_dets_desde_rknn_outputs).
+Postproceso en utils (letterbox + retinaface_dets_topk_desde_rknn_outputs).
 
 python3 RetinaFace_lite_from_ip_cam.py
 python3 RetinaFace_lite_from_ip_cam.py --display
 python3 RetinaFace_lite_from_ip_cam.py --no-save
+python3 RetinaFace_lite_from_ip_cam.py --display --keyframe-cada 8
+
+Con --keyframe-cada N el bucle va a N x MAX_FPS_ANALISIS: la NPU solo infiere cada N frames
+(mismo coste que hoy) y en los intermedios las cajas y landmarks se propagan con flujo optico
+en CPU (utils.propagacion_cajas.PropagadorCajas).
 """
 
 import argparse
@@ -48,9 +53,10 @@ from utils.aux_tools_retinaface import (
     RETINAFACE_INPUT_HEIGHT,
     RETINAFACE_INPUT_WIDTH,
     RETINAFACE_LETTERBOX_FILL,
-    retinaface_dets_desde_rknn_outputs,
+    retinaface_dets_topk_desde_rknn_outputs,
 )
 from utils.image_utils import letterbox_bgr
+from utils.propagacion_cajas import PropagadorCajas
 
 # --- RTSP: mismos campos que detect_yolov8_rknn_lite_cam_ip_person.py ---
 USER_CAM = "angelcam"
@@ -199,6 +205,12 @@ def main() -> None:
         action="store_true",
         help="No guardar imagenes con detecciones.",
     )
+    parser.add_argument(
+        "--keyframe-cada",
+        type=int,
+        default=0,
+        help="RetinaFace cada N frames y flujo optico en los intermedios (0 = en todos).",
+    )
     args = parser.parse_args()
 
     rtsp_url = args.rtsp_url.strip() or RTSP_URL
@@ -245,9 +257,12 @@ def main() -> None:
     else:
         print("Camara lista. Sin display (Ctrl+C para salir).")
 
+    propagador = PropagadorCajas(args.keyframe_cada) if args.keyframe_cada > 0 else None
+    # Con keyframes el bucle va N veces mas rapido; la NPU sigue a MAX_FPS_ANALISIS.
+    fps_bucle = MAX_FPS_ANALISIS * (args.keyframe_cada if propagador is not None else 1)
     periodo_analisis_ticks = (
-        int(cv2.getTickFrequency() / MAX_FPS_ANALISIS)
-        if MAX_FPS_ANALISIS > 0
+        int(cv2.getTickFrequency() / fps_bucle)
+        if fps_bucle > 0
         else 0
     )
     next_due = cv2.getTickCount()
@@ -315,37 +330,43 @@ def main() -> None:
             frame_count += 1
             log_fps_analisis(frame_count, t0_tick, frame)
 
-            img_height, img_width = frame.shape[:2]
-            letterbox_img, lb_meta = letterbox_bgr(
-                frame,
-                (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT),
-                RETINAFACE_LETTERBOX_FILL,
-            )
-            infer_rgb = cv2.cvtColor(letterbox_img, cv2.COLOR_BGR2RGB)
-            input_tensor = np.expand_dims(infer_rgb, axis=0)
-
-            outputs = rknn.inference(inputs=[input_tensor])
-            if not outputs:
-                if args.display:
-                    cv2.imshow("retinaface rknn RTSP", frame)
-                    key = cv2.waitKey(1) & 0xFF
-                    if key == ord("q") or key == 27:
-                        break
-                continue
+            es_keyframe = propagador is None or propagador.es_keyframe()
+            if es_keyframe:
+                img_height, img_width = frame.shape[:2]
+                letterbox_img, lb_meta = letterbox_bgr(
+                    frame,
+                    (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT),
+                    RETINAFACE_LETTERBOX_FILL,
+                )
+                infer_rgb = cv2.cvtColor(letterbox_img, cv2.COLOR_BGR2RGB)
+                input_tensor = np.expand_dims(infer_rgb, axis=0)
 
-            dets = retinaface_dets_desde_rknn_outputs(
-                outputs,
-                img_width=img_width,
-                img_height=img_height,
-                aspect_ratio=lb_meta.aspect_ratio,
-                offset_x=lb_meta.offset_x,
-                offset_y=lb_meta.offset_y,
-                score_deteccion=RETINAFACE_SCORE_DETECCION,
-                score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
-            )
+                outputs = rknn.inference(inputs=[input_tensor])
+                if not outputs:
+                    if args.display:
+                        cv2.imshow("retinaface rknn RTSP", frame)
+                        key = cv2.waitKey(1) & 0xFF
+                        if key == ord("q") or key == 27:
+                            break
+                    continue
+
+                dets = retinaface_dets_topk_desde_rknn_outputs(
+                    outputs,
+                    img_width=img_width,
+                    img_height=img_height,
+                    aspect_ratio=lb_meta.aspect_ratio,
+                    offset_x=lb_meta.offset_x,
+                    offset_y=lb_meta.offset_y,
+                    score_deteccion=RETINAFACE_SCORE_DETECCION,
+                    score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
+                )
+                if propagador is not None:
+                    dets = propagador.keyframe(frame, dets)
+            else:
+                dets = propagador.propagar(frame)
 
             n_faces = dets.shape[0]
-            if n_faces > 0:
+            if n_faces > 0 and es_keyframe:
                 msg_parts = [f"face({float(row[4]):.2f})" for row in dets]
                 print("Detecciones: " + ", ".join(msg_parts))
 
@@ -387,6 +408,8 @@ def main() -> None:
                 if key == ord("q") or key == 27:
                     break
     finally:
+        if propagador is not None:
+            print(f"Keyframes: {propagador.resumen()}")
         if grabber is not None:
             grabber.stop()
         rknn.release()
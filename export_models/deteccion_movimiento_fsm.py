@@ -13,17 +13,23 @@ Copia ampliada de deteccion_movimiento.py con:
 Inferencia en MOV_*, FACE_PROCESSED, FACE_OUT. Sin modelo (--sin_modelo)
 permite probar la FSM en PC sin onnxruntime.
 
+MOG2 y la FSM viven en utils/compuerta_movimiento.py (CompuertaMovimiento), reutilizable
+delante de cualquier detector y con varias camaras (CompuertasCamaras).
+
+--roi: RetinaFace sobre recortes de los blobs de la mascara MOG2 (utils/roi_movimiento.py),
+con las detecciones devueltas a coordenadas del frame.
+
 Ejemplo:
   python export_models/deteccion_movimiento_fsm.py
   python export_models/deteccion_movimiento_fsm.py --timeout_seg 10 --ventana
   python export_models/deteccion_movimiento_fsm.py --sin_log_sensores
+  python export_models/deteccion_movimiento_fsm.py --roi --ancho 320 --alto 240
 """
 from __future__ import annotations
 
 import argparse
 import sys
 import time
-from enum import Enum
 from pathlib import Path
 
 import cv2
@@ -48,63 +54,33 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from utils.aux_tools_retinaface import (  # noqa: E402
-    RETINAFACE_INPUT_HEIGHT,
-    RETINAFACE_INPUT_WIDTH,
     RETINAFACE_LETTERBOX_FILL,
-    retinaface_dets_desde_rknn_outputs,
+    preprocesador_retinaface_onnx,
+    retinaface_dets_topk_desde_rknn_outputs,
 )
-from utils.image_utils import letterbox_bgr  # noqa: E402
-
-
-class FlowState(str, Enum):
-    IDLE = "IDLE"
-    MOV_DETECTED = "MOV_DETECTED"
-    MOV_OUT = "MOV_OUT"
-    FACE_PROCESSED = "FACE_PROCESSED"
-    FACE_OUT = "FACE_OUT"
-    FACE_PROCESSED_TIMEOUT = "FACE_PROCESSED_TIMEOUT"
+from utils.backend_inferencia import BackendORT, PreprocesadorEntrada  # noqa: E402
+from utils.compuerta_movimiento import (  # noqa: E402
+    CompuertaMovimiento,
+    FlowState,
+    ParametrosMovimiento,
+)
+from utils.roi_movimiento import DetectorROI, caja_frame, regiones_movimiento  # noqa: E402
 
 
-RETINAFACE_MEAN_BGR = np.array([104.0, 117.0, 123.0], dtype=np.float32)
 RETINAFACE_SCORE_PRE_NMS = 0.02
 RETINAFACE_SCORE_DETECCION = 0.2
 
 
-def _preprocess_for_onnx(inp0_meta, canvas_bgr: np.ndarray) -> np.ndarray:
-    if canvas_bgr.dtype != np.uint8:
-        canvas_bgr = canvas_bgr.astype(np.uint8)
-    x32 = canvas_bgr.astype(np.float32)
-    dims = inp0_meta.shape
-
-    if len(dims) == 4 and dims[1] == 3:
-        chw = np.transpose(x32, (2, 0, 1))
-        feed = np.expand_dims(chw, axis=0)
-        feed -= RETINAFACE_MEAN_BGR.reshape(1, 3, 1, 1)
-        return feed
-    if len(dims) == 4 and dims[-1] == 3:
-        x32 -= RETINAFACE_MEAN_BGR.reshape(1, 1, 3)
-        return np.expand_dims(x32, axis=0)
-    chw = np.transpose(x32, (2, 0, 1))
-    feed = np.expand_dims(chw, axis=0)
-    feed -= RETINAFACE_MEAN_BGR.reshape(1, 3, 1, 1)
-    return feed
-
-
 def retina_infer(
     session,
     input_name: str,
-    inp0_meta,
+    preparar_entrada: PreprocesadorEntrada,
     frame_bgr: np.ndarray,
 ) -> np.ndarray:
     h, w = frame_bgr.shape[:2]
-    letterbox_img, lb_meta = letterbox_bgr(
-        frame_bgr,
-        (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT),
-        RETINAFACE_LETTERBOX_FILL,
-    )
-    tensor = _preprocess_for_onnx(inp0_meta, letterbox_img)
+    tensor, lb_meta = preparar_entrada.letterbox(frame_bgr, RETINAFACE_LETTERBOX_FILL)
     ort_outputs = session.run(None, {input_name: tensor})
-    return retinaface_dets_desde_rknn_outputs(
+    return retinaface_dets_topk_desde_rknn_outputs(
         list(ort_outputs),
         img_width=w,
         img_height=h,
@@ -113,7 +89,6 @@ def retina_infer(
         offset_y=lb_meta.offset_y,
         score_deteccion=RETINAFACE_SCORE_DETECCION,
         score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
-        log_priors=False,
     )
 
 
@@ -148,6 +123,14 @@ def main() -> None:
         action="store_true",
         help="No cargar ONNX; solo MOG2 y estados (prueba de FSM).",
     )
+    parser.add_argument(
+        "--roi",
+        action="store_true",
+        help=(
+            "RetinaFace solo sobre los blobs de movimiento MOG2 (recortes) en lugar del "
+            "frame completo; sin blobs (persona quieta) usa el frame completo."
+        ),
+    )
     parser.add_argument(
         "--ventana",
         action="store_true",
@@ -167,21 +150,24 @@ def main() -> None:
 
     session = None
     input_name = ""
-    inp0 = None
+    preparar_entrada = None
+    detector_roi = None
     if not args.sin_modelo:
         try:
-            import onnxruntime as ort
+            import onnxruntime  # noqa: F401
         except ImportError as e:
             raise SystemExit(
                 "Instala onnxruntime o usa --sin_modelo. " + str(e)
             ) from e
         if not Path(args.model_path).is_file():
             raise SystemExit("No existe ONNX: " + args.model_path)
-        session = ort.InferenceSession(
-            args.model_path, providers=["CPUExecutionProvider"]
-        )
+        backend = BackendORT(args.model_path).cargar()
+        session = backend.session
         inp0 = session.get_inputs()[0]
         input_name = inp0.name
+        preparar_entrada = preprocesador_retinaface_onnx(inp0)
+        if args.roi:
+            detector_roi = DetectorROI(backend)
 
     cap = cv2.VideoCapture(args.camera)
     if not cap.isOpened():
@@ -189,26 +175,26 @@ def main() -> None:
             "No se abrio la camara {}. Prueba otro --camera.".format(args.camera)
         )
 
-    fgbg = cv2.createBackgroundSubtractorMOG2(
+    def log_transicion(_camara: str, antes: FlowState, despues: FlowState, motivo: str) -> None:
+        print("[FSM] {} -> {} ({})".format(antes.value, despues.value, motivo))
+
+    params = ParametrosMovimiento(
+        ancho=procesar_wh[0],
+        alto=procesar_wh[1],
         history=args.history,
-        varThreshold=args.var_threshold,
-        detectShadows=False,
+        var_threshold=args.var_threshold,
+        warmup=args.warmup,
+        movimiento_pixeles=args.movimiento_pixeles,
+        timeout_seg=T,
     )
+    compuerta = CompuertaMovimiento(params, al_transicion=log_transicion)
 
     print("Calibrando fondo...")
     for _ in range(args.warmup):
         ret, frame = cap.read()
-        if ret:
-            fgbg.apply(
-                cv2.resize(frame, procesar_wh, interpolation=cv2.INTER_AREA),
-                learningRate=0.5,
-            )
-        else:
+        if not ret:
             break
-
-    state: FlowState = FlowState.IDLE
-    t_ultimo_mov: float | None = None
-    t_ultima_cara: float | None = None
+        compuerta.evaluar(frame)
 
     print("Listo. Estados: {}. Ctrl+C salir.".format(", ".join(s.value for s in FlowState)))
 
@@ -221,80 +207,35 @@ def main() -> None:
                 break
 
             now = time.monotonic()
-            small_frame = cv2.resize(
-                frame, procesar_wh, interpolation=cv2.INTER_AREA
-            )
-            mask = fgbg.apply(small_frame)
-            pixel_count = int(cv2.countNonZero(mask))
-            hay_mov = pixel_count > args.movimiento_pixeles
+            # MOG2 + transiciones por movimiento (utils.compuerta_movimiento)
+            ejecutar_infer = compuerta.evaluar(frame, now) and session is not None
 
             if log_sensores:
-                if hay_mov:
-                    print(
-                        "[MOG2] MOV_DETECTED pixels={} umbral={}".format(
-                            pixel_count, args.movimiento_pixeles
-                        )
-                    )
-                else:
-                    print(
-                        "[MOG2] NOT_MOV pixels={} umbral={}".format(
-                            pixel_count, args.movimiento_pixeles
-                        )
-                    )
-
-            if hay_mov:
-                t_ultimo_mov = now
-
-            sin_mov_mog2 = (
-                t_ultimo_mov is not None and (now - t_ultimo_mov) >= T
-            )
-
-            # 1) Sin movimiento MOG2 T seg -> IDLE solo desde fase movimiento (no desde FACE_*)
-            if sin_mov_mog2 and state in (
-                FlowState.MOV_DETECTED,
-                FlowState.MOV_OUT,
-            ):
-                s_antes = state
-                state = FlowState.IDLE
-                t_ultima_cara = None
                 print(
-                    "[FSM] {} -> IDLE (timeout {:.1f} s sin movimiento MOG2)".format(
-                        s_antes.value, T
+                    "[MOG2] {} pixels={} umbral={}".format(
+                        "MOV_DETECTED" if compuerta.hay_mov else "NOT_MOV",
+                        compuerta.pixeles,
+                        args.movimiento_pixeles,
                     )
                 )
 
-            # 2) Transiciones por movimiento (MOG2)
-            s_antes_mog2 = state
-            if state == FlowState.IDLE:
-                if hay_mov:
-                    state = FlowState.MOV_DETECTED
-            elif state == FlowState.MOV_DETECTED:
-                if not hay_mov:
-                    state = FlowState.MOV_OUT
-            elif state == FlowState.MOV_OUT:
-                if hay_mov:
-                    state = FlowState.MOV_DETECTED
-            # FACE_*: no cambian por MOG2 salvo reset por sin_mov arriba
-
-            if state != s_antes_mog2:
-                print(
-                    "[FSM] {} -> {} (MOG2)".format(
-                        s_antes_mog2.value, state.value
-                    )
-                )
-
-            # 3) Inferencia facial
-            hay_cara = False
-            ejecutar_infer = state in (
-                FlowState.MOV_DETECTED,
-                FlowState.MOV_OUT,
-                FlowState.FACE_PROCESSED,
-                FlowState.FACE_OUT,
-            ) and session is not None
-
-            s_antes_infer = state
+            # Inferencia facial
             if ejecutar_infer:
-                dets = retina_infer(session, input_name, inp0, frame)
+                if detector_roi is not None:
+                    h, w = frame.shape[:2]
+                    cajas = regiones_movimiento(compuerta.mascara, (w, h))
+                    if len(cajas) == 0:
+                        cajas = caja_frame(w, h)
+                    dets = detector_roi.detectar(
+                        frame,
+                        cajas,
+                        score_deteccion=RETINAFACE_SCORE_DETECCION,
+                        score_pre_nms=RETINAFACE_SCORE_PRE_NMS,
+                    )
+                    if log_sensores:
+                        print("[ROI] regiones={}".format(cajas.tolist()))
+                else:
+                    dets = retina_infer(session, input_name, preparar_entrada, frame)
                 hay_cara = dets.shape[0] > 0
                 if log_sensores:
                     if hay_cara:
@@ -305,36 +246,11 @@ def main() -> None:
                         )
                     else:
                         print("[RetinaFace] NOT_FACE_IN_IMG")
-                if hay_cara:
-                    t_ultima_cara = now
-                    t_ultimo_mov = now
-                    state = FlowState.FACE_PROCESSED
-                elif state == FlowState.FACE_PROCESSED:
-                    state = FlowState.FACE_OUT
-                elif state == FlowState.FACE_OUT:
-                    if t_ultima_cara is not None and (now - t_ultima_cara) >= T:
-                        state = FlowState.FACE_PROCESSED_TIMEOUT
-
-            if ejecutar_infer and state != s_antes_infer:
-                print(
-                    "[FSM] {} -> {} (RetinaFace)".format(
-                        s_antes_infer.value, state.value
-                    )
-                )
-
-            # FACE_PROCESSED_TIMEOUT -> IDLE en el mismo tick
-            if state == FlowState.FACE_PROCESSED_TIMEOUT:
-                print(
-                    "[FSM] {} -> IDLE (sin cara durante {:.1f} s)".format(
-                        FlowState.FACE_PROCESSED_TIMEOUT.value, T
-                    )
-                )
-                state = FlowState.IDLE
-                t_ultima_cara = None
+                compuerta.registrar_resultado(hay_cara, now)
 
             if args.ventana:
                 vis = frame.copy()
-                msg = "estado: {}".format(state.value)
+                msg = "estado: {}".format(compuerta.state.value)
                 cv2.putText(
                     vis,
                     msg,
@@ -356,6 +272,14 @@ def main() -> None:
     except KeyboardInterrupt:
         print("Interrupcion.")
     finally:
+        print(
+            "Frames sin inferencia: {:.1f}% ({} de {}; {} de calibracion aparte)".format(
+                100.0 * compuerta.fraccion_omitida,
+                compuerta.decididos - compuerta.inferidos,
+                compuerta.decididos,
+                compuerta.calibracion,
+            )
+        )
         cap.release()
         if args.ventana:
             cv2.destroyAllWindows()
@@ -0,0 +1,109 @@
+"""
+Exporta mobilenet_modelos/MobileFaceNet.onnx -> mobilenet_modelos/MobileFaceNet_batch.onnx
+con batch dinamico (entrada (N, 3, 112, 112), salida (N, 128)).
+
+El ONNX original tiene batch fijo 1 en la entrada/salida y un Reshape a [1, -1] antes de la
+capa final. Se cambian las dimensiones 0 por el simbolo ``batch`` y las constantes de Reshape
+que empiezan en 1 por 0 (= copiar la dimension de entrada), sin tocar pesos.
+
+Al final valida con onnxruntime que un lote de 4 caras da los mismos embeddings que 4
+llamadas de batch 1.
+
+En PC:
+    pip install onnx onnxruntime
+
+Ejemplo:
+  python export_models/exp_mobilefacenet_batch_onnx.py
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import onnx
+    from onnx import numpy_helper
+except ImportError as e:
+    raise SystemExit("Instala onnx en el PC: pip install onnx") from e
+
+ROOT = Path(__file__).resolve().parent.parent
+ONNX_PATH = ROOT / "mobilenet_modelos" / "MobileFaceNet.onnx"
+ONNX_BATCH_PATH = ROOT / "mobilenet_modelos" / "MobileFaceNet_batch.onnx"
+BATCH_SIMBOLO = "batch"
+
+
+def _reshape_shape_inputs(graph: onnx.GraphProto) -> set[str]:
+    return {n.input[1] for n in graph.node if n.op_type == "Reshape" and len(n.input) > 1}
+
+
+def _batch_dinamico(model: onnx.ModelProto) -> int:
+    graph = model.graph
+    for vi in list(graph.input) + list(graph.output):
+        dim0 = vi.type.tensor_type.shape.dim[0]
+        dim0.ClearField("dim_value")
+        dim0.dim_param = BATCH_SIMBOLO
+
+    shapes = _reshape_shape_inputs(graph)
+    cambios = 0
+    for node in graph.node:
+        if node.op_type != "Constant" or node.output[0] not in shapes:
+            continue
+        for attr in node.attribute:
+            if attr.name != "value":
+                continue
+            val = numpy_helper.to_array(attr.t).copy()
+            if val.ndim == 1 and val.size >= 2 and val[0] == 1:
+                val[0] = 0
+                attr.t.CopyFrom(numpy_helper.from_array(val, attr.t.name))
+                cambios += 1
+    for init in graph.initializer:
+        if init.name not in shapes:
+            continue
+        val = numpy_helper.to_array(init).copy()
+        if val.ndim == 1 and val.size >= 2 and val[0] == 1:
+            val[0] = 0
+            init.CopyFrom(numpy_helper.from_array(val, init.name))
+            cambios += 1
+
+    del graph.value_info[:]
+    return cambios
+
+
+def _validar(path: Path) -> None:
+    import onnxruntime as ort
+
+    sess_1 = ort.InferenceSession(str(ONNX_PATH), providers=["CPUExecutionProvider"])
+    sess_n = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+    in_1, in_n = sess_1.get_inputs()[0].name, sess_n.get_inputs()[0].name
+    x = np.random.default_rng(0).normal(size=(4, 3, 112, 112)).astype(np.float32)
+    lote = sess_n.run(None, {in_n: x})[0]
+    uno_a_uno = np.concatenate([sess_1.run(None, {in_1: x[i : i + 1]})[0] for i in range(4)])
+    err = float(np.max(np.abs(lote - uno_a_uno)))
+    print(f"    lote={lote.shape} max_abs_diff={err:.2e}")
+    if lote.shape != (4, 128) or err > 1e-4:
+        raise SystemExit("Validacion fallida: el ONNX en lote no coincide con batch 1")
+
+
+def main() -> None:
+    if not ONNX_PATH.is_file():
+        raise SystemExit(f"No existe ONNX: {ONNX_PATH}")
+
+    print("--> load_onnx", ONNX_PATH)
+    model = onnx.load(str(ONNX_PATH))
+
+    print("--> batch dinamico")
+    cambios = _batch_dinamico(model)
+    print(f"    Reshape ajustados: {cambios}")
+    onnx.checker.check_model(model)
+
+    print("--> save", ONNX_BATCH_PATH)
+    onnx.save(model, str(ONNX_BATCH_PATH))
+
+    print("--> validar con onnxruntime")
+    _validar(ONNX_BATCH_PATH)
+    print("OK ->", ONNX_BATCH_PATH)
+
+
+if __name__ == "__main__":
+    main()
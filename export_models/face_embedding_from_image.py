@@ -10,6 +10,9 @@ El embedding se guarda en .npy (float32 shape (128,)); MobileFaceNet: RGB [0,1]
 Por defecto se crea la carpeta embeddings/ en la raiz del repo y el archivo se llama como la imagen
 (sin extension original), ej. test/micara1.jpg -> embeddings/micara1.npy.
 
+Con --store DIR el embedding se agrega al almacen empaquetado (utils.embedding_store: matriz
+memmap + indice con nombre, hash de la imagen y fecha) en lugar de escribir un .npy.
+
 Si la mejor cara tiene score RetinaFace por debajo de MIN_SCORE_MEJOR_CARA_EMBEDDING (constante
 en el script, defecto 0.90), se aborta sin generar embedding.
 
@@ -18,6 +21,7 @@ Ejemplo:
   python export_models/face_embedding_from_image.py --img test/otra.jpg
   python export_models/face_embedding_from_image.py --embedding-dir /tmp/mis_emb
   python export_models/face_embedding_from_image.py --embedding-out /ruta/custom.npy
+  python export_models/face_embedding_from_image.py --img test/otra.jpg --store embeddings_store
 """
 from __future__ import annotations
 
@@ -59,11 +63,12 @@ from utils.aux_tools_retinaface import (  # noqa: E402
     RETINAFACE_INPUT_HEIGHT,
     RETINAFACE_INPUT_WIDTH,
     RETINAFACE_LETTERBOX_FILL,
+    preprocesador_retinaface_onnx,
     retinaface_dets_desde_rknn_outputs,
 )
+from utils.embedding_store import AlmacenEmbeddings, hash_archivo  # noqa: E402
 from utils.image_utils import letterbox_bgr  # noqa: E402
 
-RETINAFACE_MEAN_BGR = np.array([104.0, 117.0, 123.0], dtype=np.float32)
 RETINAFACE_SCORE_PRE_NMS = 0.02
 RETINAFACE_SCORE_DETECCION = 0.2
 
@@ -76,26 +81,6 @@ _IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape(1, 1,
 _MOBILEFACENET_HW = (112, 112)
 
 
-def _preprocess_retinaface(inp0_meta: ort.NodeArg, canvas_bgr: np.ndarray) -> np.ndarray:
-    if canvas_bgr.dtype != np.uint8:
-        canvas_bgr = canvas_bgr.astype(np.uint8)
-    x32 = canvas_bgr.astype(np.float32)
-    dims = inp0_meta.shape
-    nchw = len(dims) == 4 and dims[1] == 3
-    nhwc = len(dims) == 4 and dims[-1] == 3
-    if len(dims) == 4 and dims[1] == RETINAFACE_INPUT_WIDTH:
-        nhwc = True
-    if not nchw and not nhwc:
-        nchw = True
-    if nhwc:
-        x32 -= RETINAFACE_MEAN_BGR.reshape(1, 1, 3)
-        return np.expand_dims(x32, axis=0)
-    chw = np.transpose(x32, (2, 0, 1))
-    feed = np.expand_dims(chw, axis=0)
-    feed -= RETINAFACE_MEAN_BGR.reshape(1, 3, 1, 1)
-    return feed
-
-
 def _bbox_crop_with_margin(
     det: np.ndarray, img_w: int, img_h: int, margin: float
 ) -> tuple[int, int, int, int]:
@@ -173,6 +158,18 @@ def main() -> None:
         default="",
         help="Ruta completa del .npy (si vacio: <embedding-dir>/<mismo nombre base que la imagen>.npy).",
     )
+    p.add_argument(
+        "--store",
+        type=str,
+        default="",
+        help="Directorio de almacen empaquetado: agrega el embedding alli en vez de escribir .npy.",
+    )
+    p.add_argument(
+        "--nombre",
+        type=str,
+        default="",
+        help="Identidad al usar --store (si vacio: nombre base de la imagen).",
+    )
     p.add_argument(
         "--save-crop",
         type=str,
@@ -234,7 +231,7 @@ def main() -> None:
         (RETINAFACE_INPUT_WIDTH, RETINAFACE_INPUT_HEIGHT),
         RETINAFACE_LETTERBOX_FILL,
     )
-    tensor_rf = _preprocess_retinaface(rf_in, letterbox_img)
+    tensor_rf = preprocesador_retinaface_onnx(rf_in)(letterbox_img)
     out_rf = sess_rf.run(None, {rf_name: tensor_rf})
     dets = retinaface_dets_desde_rknn_outputs(
         list(out_rf),
@@ -283,17 +280,25 @@ def main() -> None:
     emb = np.asarray(emb, dtype=np.float32).reshape(-1)
     emb = _l2_normalize(emb)
 
-    if args.embedding_out:
-        out_npy = Path(args.embedding_out)
-    else:
-        emb_dir = Path(args.embedding_dir)
-        out_npy = emb_dir / f"{img_path.stem}.npy"
-    out_npy.parent.mkdir(parents=True, exist_ok=True)
-    np.save(str(out_npy), emb)
-
     print("score_mejor_cara:", score)
     print("embedding_shape:", emb.shape, "L2_norm:", float(np.linalg.norm(emb)))
-    print("[guardado]", out_npy.resolve())
+
+    if args.store:
+        almacen = AlmacenEmbeddings(args.store)
+        nombre = args.nombre or img_path.stem
+        fila = almacen.agregar(nombre, emb, hash_origen=hash_archivo(img_path))
+        out_guardado = f"{Path(args.store).resolve()} fila={fila} nombre={nombre}"
+        print("[almacen]", out_guardado)
+    else:
+        if args.embedding_out:
+            out_npy = Path(args.embedding_out)
+        else:
+            emb_dir = Path(args.embedding_dir)
+            out_npy = emb_dir / f"{img_path.stem}.npy"
+        out_npy.parent.mkdir(parents=True, exist_ok=True)
+        np.save(str(out_npy), emb)
+        out_guardado = str(out_npy.resolve())
+        print("[guardado]", out_guardado)
 
     if args.meta_json:
         meta = {
@@ -302,7 +307,7 @@ def main() -> None:
             "mobilefacenet_onnx": str(mfn_onnx.resolve()),
             "score": score,
             "crop_box_xyxy": [x1, y1, x2, y2],
-            "embedding_npy": str(out_npy.resolve()),
+            "embedding_npy": out_guardado,
             "flip_avg": bool(args.flip_avg),
         }
         Path(args.meta_json).parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,98 @@
+"""
+Migra un directorio ``embeddings/*.npy`` (un archivo por persona, formato de
+face_embedding_from_image.py) a un almacen empaquetado ``utils.embedding_store``.
+
+Cada ``<nombre>.npy`` pasa a ser una fila con identidad ``<nombre>``. El hash de origen es el
+de la imagen ``<img-dir>/<nombre>.{jpg,jpeg,png}`` si existe (misma convencion de nombres que
+face_embedding_from_image.py); si no, queda en ceros. La fecha de enrolamiento es el mtime del
+``.npy``.
+
+Es re-ejecutable: se saltan las identidades que ya estan en el almacen.
+
+Ejemplo:
+  python export_models/migrar_embeddings_npy.py
+  python export_models/migrar_embeddings_npy.py --src embeddings --store embeddings_store \
+      --img-dir test
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.embedding_store import AlmacenEmbeddings, hash_archivo  # noqa: E402
+
+EXTENSIONES_IMG = (".jpg", ".jpeg", ".png")
+
+
+def _imagen_origen(img_dir: Path, nombre: str) -> Path | None:
+    for ext in EXTENSIONES_IMG:
+        p = img_dir / f"{nombre}{ext}"
+        if p.is_file():
+            return p
+    return None
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Migra embeddings/*.npy a un almacen memmap.")
+    p.add_argument("--src", type=str, default=str(ROOT / "embeddings"), help="Carpeta de .npy.")
+    p.add_argument(
+        "--store",
+        type=str,
+        default=str(ROOT / "embeddings_store"),
+        help="Directorio del almacen (se crea si no existe).",
+    )
+    p.add_argument(
+        "--img-dir",
+        type=str,
+        default=str(ROOT / "test"),
+        help="Carpeta de las imagenes de origen para el hash (opcional).",
+    )
+    args = p.parse_args()
+
+    src = Path(args.src)
+    paths = sorted(src.glob("*.npy"))
+    if not paths:
+        raise SystemExit(f"No hay .npy en {src}")
+
+    almacen = AlmacenEmbeddings(args.store)
+    ya = set(almacen.nombres())
+    img_dir = Path(args.img_dir)
+    t0 = time.perf_counter()
+    nuevos = saltados = 0
+    for path in paths:
+        nombre = path.stem
+        if nombre in ya:
+            saltados += 1
+            continue
+        emb = np.load(str(path)).astype(np.float32).reshape(-1)
+        if emb.size != almacen.dim:
+            print(f"[SKIP] {path.name}: {emb.size} valores (se esperan {almacen.dim})")
+            saltados += 1
+            continue
+        img = _imagen_origen(img_dir, nombre)
+        almacen.agregar(
+            nombre,
+            emb,
+            hash_origen=hash_archivo(img) if img is not None else b"",
+            t_enrolamiento=path.stat().st_mtime,
+        )
+        nuevos += 1
+        print(f"[OK] {nombre}" + (f" (origen {img.name})" if img is not None else ""))
+
+    dt = (time.perf_counter() - t0) * 1000.0
+    print(
+        f"Migrados {nuevos}, saltados {saltados} en {dt:.1f} ms -> "
+        f"{Path(args.store).resolve()} ({len(almacen)} filas)"
+    )
+
+
+if __name__ == "__main__":
+    main()
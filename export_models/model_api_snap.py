@@ -28,6 +28,8 @@ ROOT = Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from utils.yolov8_post import postprocess_yolov8_ultralytics, scale_boxes_to_frame
+
 try:
     from rknnlite.api import RKNNLite
 except ImportError as e:
@@ -57,6 +59,9 @@ SNAP_HTTP_URL = SNAP_HTTP_URL_RES_LOW
 INPUT_SIZE = 640
 OBJ_THRESH = 0.67
 NMS_THRESH = 0.54
+# Clases permitidas (indices COCO), recortadas antes del postproceso; None = todas.
+# Ej. solo personas: CLASES_PERMITIDAS = (0,)
+CLASES_PERMITIDAS: tuple[int, ...] | None = None
 MAX_FPS_ANALISIS = 2.0
 LOG_CADA_CAPS = 10
 HTTP_TIMEOUT_S = 10
@@ -89,69 +94,6 @@ _COLORS_BGR = [
 ]
 
 
-def sigmoid(x: np.ndarray) -> np.ndarray:
-    return 1.0 / (1.0 + np.exp(-np.clip(x, -88.0, 88.0)))
-
-
-def postprocess_yolov8_ultralytics(pred: np.ndarray, conf_thres: float, iou_thres: float):
-    if pred.ndim == 3:
-        pred = pred[0]
-    pred = pred.T
-    boxes_xywh = pred[:, :4]
-    cls_logits = pred[:, 4:]
-    cls_prob = sigmoid(cls_logits)
-    scores = np.max(cls_prob, axis=1)
-    class_ids = np.argmax(cls_prob, axis=1)
-
-    mask = scores >= conf_thres
-    boxes_xywh = boxes_xywh[mask]
-    scores = scores[mask]
-    class_ids = class_ids[mask]
-    if len(scores) == 0:
-        return None, None, None
-
-    cx, cy, w, h = boxes_xywh[:, 0], boxes_xywh[:, 1], boxes_xywh[:, 2], boxes_xywh[:, 3]
-    x1 = cx - w / 2.0
-    y1 = cy - h / 2.0
-    x2 = cx + w / 2.0
-    y2 = cy + h / 2.0
-    xyxy = np.stack([x1, y1, x2, y2], axis=1)
-
-    keep = []
-    order = scores.argsort()[::-1]
-    while order.size > 0:
-        i = order[0]
-        keep.append(i)
-        if order.size == 1:
-            break
-        rest = order[1:]
-        xx1 = np.maximum(xyxy[i, 0], xyxy[rest, 0])
-        yy1 = np.maximum(xyxy[i, 1], xyxy[rest, 1])
-        xx2 = np.minimum(xyxy[i, 2], xyxy[rest, 2])
-        yy2 = np.minimum(xyxy[i, 3], xyxy[rest, 3])
-        inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
-        area_i = (xyxy[i, 2] - xyxy[i, 0]) * (xyxy[i, 3] - xyxy[i, 1])
-        area_r = (xyxy[rest, 2] - xyxy[rest, 0]) * (xyxy[rest, 3] - xyxy[rest, 1])
-        union = area_i + area_r - inter
-        iou = inter / np.maximum(union, 1e-6)
-        inds = np.where(iou <= iou_thres)[0]
-        order = rest[inds]
-
-    keep = np.array(keep, dtype=np.int64)
-    return xyxy[keep], scores[keep], class_ids[keep]
-
-
-def scale_boxes_to_frame(xyxy: np.ndarray, frame_w: int, frame_h: int) -> np.ndarray:
-    sx = frame_w / float(INPUT_SIZE)
-    sy = frame_h / float(INPUT_SIZE)
-    out = xyxy.copy()
-    out[:, 0] *= sx
-    out[:, 2] *= sx
-    out[:, 1] *= sy
-    out[:, 3] *= sy
-    return out
-
-
 def log_fps_analisis(frame_count: int, t0_tick: int, frame: np.ndarray) -> None:
     if frame_count % LOG_CADA_CAPS != 0:
         return
@@ -162,9 +104,13 @@ def log_fps_analisis(frame_count: int, t0_tick: int, frame: np.ndarray) -> None:
     print(f"[LOG] frame={frame_count} size={w}x{h} fps_aprox={fps:.2f}")
 
 
+# Session: conexion keep-alive reutilizada entre snapshots (sin TCP nuevo por frame).
+_SESION_SNAP = requests.Session()
+
+
 def obtener_frame_snap(url: str) -> np.ndarray | None:
     try:
-        response = requests.get(url, timeout=HTTP_TIMEOUT_S, verify=False)
+        response = _SESION_SNAP.get(url, timeout=HTTP_TIMEOUT_S, verify=False)
     except requests.exceptions.RequestException as e:
         print(f"Error de conexion Snap: {e}")
         return None
@@ -173,8 +119,8 @@ def obtener_frame_snap(url: str) -> np.ndarray | None:
         print(f"Error HTTP Snap: {response.status_code}")
         return None
 
-    # Convertimos los bytes recibidos directamente en un array de numpy
-    image_array = np.asarray(bytearray(response.content), dtype=np.uint8)
+    # Vista numpy sobre los bytes recibidos (sin copia intermedia)
+    image_array = np.frombuffer(response.content, dtype=np.uint8)
 
     # Decodificamos el array a un formato que OpenCV entiende (BGR)
     frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
@@ -261,10 +207,10 @@ def main() -> None:
             if outputs:
                 pred = np.array(outputs[0])
                 boxes, scores, class_ids = postprocess_yolov8_ultralytics(
-                    pred, OBJ_THRESH, NMS_THRESH
+                    pred, OBJ_THRESH, NMS_THRESH, clases=CLASES_PERMITIDAS
                 )
                 if boxes is not None:
-                    boxes = scale_boxes_to_frame(boxes, fw, fh)
+                    boxes = scale_boxes_to_frame(boxes, fw, fh, INPUT_SIZE)
                     detected_labels: list[str] = []
                     for box, sc, cid in zip(boxes, scores, class_ids):
                         x1, y1, x2, y2 = [int(round(v)) for v in box]
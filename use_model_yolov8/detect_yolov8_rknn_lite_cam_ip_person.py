@@ -5,6 +5,11 @@ Uso en RK3568:
   python3 export_models/detect_yolov8_rknn_lite_cam_person.py
   python3 export_models/detect_yolov8_rknn_lite_cam_person.py --display
   python3 export_models/detect_yolov8_rknn_lite_cam_person.py --no-save
+  python3 export_models/detect_yolov8_rknn_lite_cam_person.py --display --keyframe-cada 8
+
+Con --keyframe-cada N el bucle va a N x MAX_FPS_ANALISIS: la NPU solo infiere cada N frames y
+en los intermedios las cajas se propagan con flujo optico en CPU
+(utils.propagacion_cajas.PropagadorCajas).
 
 Salir: tecla '"q' o ESC.
 """
@@ -24,6 +29,9 @@ ROOT = Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from utils.propagacion_cajas import PropagadorCajas
+from utils.yolov8_post import postprocess_yolov8_ultralytics, scale_boxes_to_frame
+
 try:
     from rknnlite.api import RKNNLite
 except ImportError as e:
@@ -46,6 +54,9 @@ RTSP_URL = f"rtsp://{USER_CAM}:{PASS_CAM}@{IP_CAM}:{RTSP_PORT_CAM}/{STREAM_CAM}"
 INPUT_SIZE = 640
 OBJ_THRESH = 0.66
 NMS_THRESH = 0.55
+# Clases permitidas (indices COCO), recortadas antes del postproceso; None = todas.
+# Ej. solo personas: CLASES_PERMITIDAS = (0,)
+CLASES_PERMITIDAS: tuple[int, ...] | None = None
 
 # Hilo de captura: la camara se lee al ritmo del driver; la inferencia RKNN no bloquea read().
 # Asi se reduce la latencia y el efecto "video a camara lenta" por buffer lleno.
@@ -88,74 +99,6 @@ _COLORS_BGR = [
 ]
 
 
-def sigmoid(x: np.ndarray) -> np.ndarray:
-    return 1.0 / (1.0 + np.exp(-np.clip(x, -88.0, 88.0)))
-
-
-def postprocess_yolov8_ultralytics(pred: np.ndarray, conf_thres: float, iou_thres: float):
-    """
-    pred: (1, 4+nc, 8400) salida tipica YOLOv8n COCO desde Ultralytics -> RKNN.
-    Todas las clases; score = max prob por ancla.
-    """
-    if pred.ndim == 3:
-        pred = pred[0]
-    pred = pred.T
-    boxes_xywh = pred[:, :4]
-    cls_logits = pred[:, 4:]
-    cls_prob = sigmoid(cls_logits)
-    scores = np.max(cls_prob, axis=1)
-    class_ids = np.argmax(cls_prob, axis=1)
-
-    mask = scores >= conf_thres
-    boxes_xywh = boxes_xywh[mask]
-    scores = scores[mask]
-    class_ids = class_ids[mask]
-    if len(scores) == 0:
-        return None, None, None
-
-    cx, cy, w, h = boxes_xywh[:, 0], boxes_xywh[:, 1], boxes_xywh[:, 2], boxes_xywh[:, 3]
-    x1 = cx - w / 2.0
-    y1 = cy - h / 2.0
-    x2 = cx + w / 2.0
-    y2 = cy + h / 2.0
-    xyxy = np.stack([x1, y1, x2, y2], axis=1)
-
-    keep = []
-    order = scores.argsort()[::-1]
-    while order.size > 0:
-        i = order[0]
-        keep.append(i)
-        if order.size == 1:
-            break
-        rest = order[1:]
-        xx1 = np.maximum(xyxy[i, 0], xyxy[rest, 0])
-        yy1 = np.maximum(xyxy[i, 1], xyxy[rest, 1])
-        xx2 = np.minimum(xyxy[i, 2], xyxy[rest, 2])
-        yy2 = np.minimum(xyxy[i, 3], xyxy[rest, 3])
-        inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
-        area_i = (xyxy[i, 2] - xyxy[i, 0]) * (xyxy[i, 3] - xyxy[i, 1])
-        area_r = (xyxy[rest, 2] - xyxy[rest, 0]) * (xyxy[rest, 3] - xyxy[rest, 1])
-        union = area_i + area_r - inter
-        iou = inter / np.maximum(union, 1e-6)
-        inds = np.where(iou <= iou_thres)[0]
-        order = rest[inds]
-
-    keep = np.array(keep, dtype=np.int64)
-    return xyxy[keep], scores[keep], class_ids[keep]
-
-
-def scale_boxes_to_frame(xyxy: np.ndarray, frame_w: int, frame_h: int) -> np.ndarray:
-    """De espacio 640x640 (letterbox implicito: resize directo) a tamano del frame."""
-    sx = frame_w / float(INPUT_SIZE)
-    sy = frame_h / float(INPUT_SIZE)
-    out = xyxy.copy()
-    out[:, 0] *= sx
-    out[:, 2] *= sx
-    out[:, 1] *= sy
-    out[:, 3] *= sy
-    return out
-
-
 def configurar_buffer_camara(cap: cv2.VideoCapture) -> None:
     try:
         cap.set(cv2.CAP_PROP_BUFFERSIZE, TAMANO_BUFFER_CAMARA)
@@ -266,6 +209,12 @@ def main() -> None:
         action="store_true",
         help="No guardar imagenes de deteccion.",
     )
+    parser.add_argument(
+        "--keyframe-cada",
+        type=int,
+        default=0,
+        help="Inferir cada N frames y propagar las cajas con flujo optico en los intermedios (0 = en todos).",
+    )
     args = parser.parse_args()
 
     if not RKNN_PATH.is_file():
@@ -309,9 +258,12 @@ def main() -> None:
     else:
         print("Camara lista. Modo sin display activo (salir con Ctrl+C).")
 
+    propagador = PropagadorCajas(args.keyframe_cada) if args.keyframe_cada > 0 else None
+    # Con keyframes el bucle va N veces mas rapido; la NPU sigue a MAX_FPS_ANALISIS.
+    fps_bucle = MAX_FPS_ANALISIS * (args.keyframe_cada if propagador is not None else 1)
     periodo_analisis_ticks = (
-        int(cv2.getTickFrequency() / MAX_FPS_ANALISIS)
-        if MAX_FPS_ANALISIS > 0
+        int(cv2.getTickFrequency() / fps_bucle)
+        if fps_bucle > 0
         else 0
     )
     next_due = cv2.getTickCount()
@@ -380,25 +332,41 @@ def main() -> None:
             log_fps_analisis(frame_count, t0_tick, frame)
 
             fh, fw = frame.shape[:2]
-            small = cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE))
-            rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
-            inp = np.expand_dims(rgb, 0)
-
-            outputs = rknn.inference(inputs=[inp])
-            if not outputs:
-                if args.display:
-                    cv2.imshow("yolov8 rknn RTSP", frame)
-                    key = cv2.waitKey(1) & 0xFF
-                    if key == ord("q") or key == 27:
-                        break
-                continue
-            pred = np.array(outputs[0])
+            es_keyframe = propagador is None or propagador.es_keyframe()
+            if es_keyframe:
+                small = cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE))
+                rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+                inp = np.expand_dims(rgb, 0)
+
+                outputs = rknn.inference(inputs=[inp])
+                if not outputs:
+                    if args.display:
+                        cv2.imshow("yolov8 rknn RTSP", frame)
+                        key = cv2.waitKey(1) & 0xFF
+                        if key == ord("q") or key == 27:
+                            break
+                    continue
+                pred = np.array(outputs[0])
 
-            boxes, scores, class_ids = postprocess_yolov8_ultralytics(
-                pred, OBJ_THRESH, NMS_THRESH
-            )
+                boxes, scores, class_ids = postprocess_yolov8_ultralytics(
+                    pred, OBJ_THRESH, NMS_THRESH, clases=CLASES_PERMITIDAS
+                )
+                if boxes is not None:
+                    boxes = scale_boxes_to_frame(boxes, fw, fh, INPUT_SIZE)
+                if propagador is not None:
+                    # [x1, y1, x2, y2, score, clase]: el propagador solo mueve la caja.
+                    propagador.keyframe(
+                        frame,
+                        np.column_stack((boxes, scores, class_ids))
+                        if boxes is not None
+                        else np.zeros((0, 6), dtype=np.float32),
+                    )
+            else:
+                dets = propagador.propagar(frame)
+                boxes, scores, class_ids = (
+                    (dets[:, :4], dets[:, 4], dets[:, 5]) if dets.shape[0] else (None, None, None)
+                )
             if boxes is not None:
-                boxes = scale_boxes_to_frame(boxes, fw, fh)
                 detected_labels: list[str] = []
                 for box, sc, cid in zip(boxes, scores, class_ids):
                     x1, y1, x2, y2 = [int(round(v)) for v in box]
@@ -420,8 +388,9 @@ def main() -> None:
                         color,
                         1,
                     )
-                detecciones_msg = "Detecciones: " + ", ".join(detected_labels)
-                print(detecciones_msg)
+                if es_keyframe:
+                    detecciones_msg = "Detecciones: " + ", ".join(detected_labels)
+                    print(detecciones_msg)
                 if not args.no_save:
                     now_tick_save = cv2.getTickCount()
                     dt_save_ticks = now_tick_save - last_save_tick
@@ -440,6 +409,8 @@ def main() -> None:
                 if key == ord("q") or key == 27:
                     break
     finally:
+        if propagador is not None:
+            print(f"Keyframes: {propagador.resumen()}")
         if grabber is not None:
             grabber.stop()
         rknn.release()
@@ -10,6 +10,7 @@ exp_yolov8n_rknn.py (mean 0, std 255 -> entrada uint8 NHWC).
 """
 from __future__ import annotations
 
+import sys
 from pathlib import Path
 
 import cv2
@@ -24,6 +25,10 @@ except ImportError as e:
     ) from e
 
 ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.yolov8_post import postprocess_yolov8_ultralytics  # noqa: E402
 
 # En la placa: misma ruta relativa al repo o absoluta
 RKNN_PATH = ROOT / "rknn-toolkit-lite" / "yolov8n.rknn"
@@ -32,6 +37,9 @@ IMG_PATH = ROOT / "images" / "lily2.jpg"
 INPUT_SIZE = 640
 OBJ_THRESH = 0.25
 NMS_THRESH = 0.45
+# Clases permitidas (indices COCO), recortadas antes del postproceso; None = todas.
+# Ej. solo personas: CLASES_PERMITIDAS = (0,)
+CLASES_PERMITIDAS: tuple[int, ...] | None = None
 
 CLASSES = (
     "person", "bicycle", "car", "motorbike", "aeroplane", "bus", "train", "truck", "boat",
@@ -47,62 +55,6 @@ CLASSES = (
 )
 
 
-def sigmoid(x: np.ndarray) -> np.ndarray:
-    return 1.0 / (1.0 + np.exp(-np.clip(x, -88.0, 88.0)))
-
-
-def postprocess_yolov8_ultralytics(pred: np.ndarray, conf_thres: float, iou_thres: float):
-    """
-    pred: (1, 4+nc, 8400) salida tipica YOLOv8n COCO desde Ultralytics -> RKNN.
-    """
-    if pred.ndim == 3:
-        pred = pred[0]
-    # (84, 8400) -> (8400, 84)
-    pred = pred.T
-    boxes_xywh = pred[:, :4]
-    cls_logits = pred[:, 4:]
-    cls_prob = sigmoid(cls_logits)
-    scores = np.max(cls_prob, axis=1)
-    class_ids = np.argmax(cls_prob, axis=1)
-
-    mask = scores >= conf_thres
-    boxes_xywh = boxes_xywh[mask]
-    scores = scores[mask]
-    class_ids = class_ids[mask]
-    if len(scores) == 0:
-        return None, None, None
-
-    cx, cy, w, h = boxes_xywh[:, 0], boxes_xywh[:, 1], boxes_xywh[:, 2], boxes_xywh[:, 3]
-    x1 = cx - w / 2.0
-    y1 = cy - h / 2.0
-    x2 = cx + w / 2.0
-    y2 = cy + h / 2.0
-    xyxy = np.stack([x1, y1, x2, y2], axis=1)
-
-    keep = []
-    order = scores.argsort()[::-1]
-    while order.size > 0:
-        i = order[0]
-        keep.append(i)
-        if order.size == 1:
-            break
-        rest = order[1:]
-        xx1 = np.maximum(xyxy[i, 0], xyxy[rest, 0])
-        yy1 = np.maximum(xyxy[i, 1], xyxy[rest, 1])
-        xx2 = np.minimum(xyxy[i, 2], xyxy[rest, 2])
-        yy2 = np.minimum(xyxy[i, 3], xyxy[rest, 3])
-        inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
-        area_i = (xyxy[i, 2] - xyxy[i, 0]) * (xyxy[i, 3] - xyxy[i, 1])
-        area_r = (xyxy[rest, 2] - xyxy[rest, 0]) * (xyxy[rest, 3] - xyxy[rest, 1])
-        union = area_i + area_r - inter
-        iou = inter / np.maximum(union, 1e-6)
-        inds = np.where(iou <= iou_thres)[0]
-        order = rest[inds]
-
-    keep = np.array(keep, dtype=np.int64)
-    return xyxy[keep], scores[keep], class_ids[keep]
-
-
 def main() -> None:
     if not RKNN_PATH.is_file():
         raise SystemExit(f"No existe el modelo: {RKNN_PATH}")
@@ -135,7 +87,7 @@ def main() -> None:
     print("Salida shape:", pred.shape)
 
     boxes, scores, classes = postprocess_yolov8_ultralytics(
-        pred, OBJ_THRESH, NMS_THRESH
+        pred, OBJ_THRESH, NMS_THRESH, clases=CLASES_PERMITIDAS
     )
     if boxes is None:
         print("Sin detecciones (revisa umbral o formato de salida).")
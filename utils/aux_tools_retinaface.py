@@ -8,20 +8,33 @@ Constantes por defecto alineadas al ejemplo MobileNet 0.25 entrada 320x320 (Zoo
 """
 from __future__ import annotations
 
+from functools import lru_cache
 from itertools import product
 from math import ceil
 from typing import Any
 
 import numpy as np
 
+from .backend_inferencia import PreprocesadorEntrada, entrada_desde_onnx
+from .nms import nms_greedy, nms_matriz
+
 # --- Tamano de entrada del modelo (MobileNet 0.25 tipico en Zoo) ---
 RETINAFACE_INPUT_HEIGHT = 320
 RETINAFACE_INPUT_WIDTH = 320
 RETINAFACE_INPUT_HW: tuple[int, int] = (RETINAFACE_INPUT_HEIGHT, RETINAFACE_INPUT_WIDTH)
+# Variante 640x640 del mismo modelo (ver Retinaface-Models/RK/RetinaFace_v0.PriorBox).
+RETINAFACE_INPUT_HW_640: tuple[int, int] = (640, 640)
+
+# Configuracion de anclas del entrenamiento original (una fila de min_sizes por step).
+RETINAFACE_MIN_SIZES: tuple[tuple[int, ...], ...] = ((16, 32), (64, 128), (256, 512))
+RETINAFACE_STEPS: tuple[int, ...] = (8, 16, 32)
 
 # Valor de relleno letterbox en el demo oficial (BGR constante por canal).
 RETINAFACE_LETTERBOX_FILL = 114
 
+# Media BGR restada a la entrada del ONNX (en el .rknn va dentro del modelo).
+RETINAFACE_MEAN_BGR = np.array([104.0, 117.0, 123.0], dtype=np.float32)
+
 # Escalado de cajas y landmarks del espacio normalizado [0,1] al tamano de entrada del modelo.
 RETINAFACE_BOX_SCALE = np.array(
     [
@@ -38,6 +51,15 @@ RETINAFACE_LANDMARK_SCALE = np.array(
 )
 
 
+def preprocesador_retinaface_onnx(inp0_meta: Any) -> PreprocesadorEntrada:
+    """
+    Preproceso RetinaFace para ``session.get_inputs()[0]``: layout decidido una vez y tensor
+    (1, 3, 320, 320) float32 preasignado, rellenado en cada frame sin asignar memoria.
+    Sustituye a ``_preprocess_for_onnx`` de los scripts (mismo resultado).
+    """
+    return PreprocesadorEntrada(entrada_desde_onnx(inp0_meta), RETINAFACE_MEAN_BGR)
+
+
 def prior_box(image_size: tuple[int, int], *, log_priors: bool = False) -> np.ndarray:
     """
     Genera priors (anclas) en coordenadas normalizadas para RetinaFace.
@@ -69,6 +91,69 @@ def prior_box(image_size: tuple[int, int], *, log_priors: bool = False) -> np.nd
     return output
 
 
+def prior_box_vectorizado(
+    image_size: tuple[int, int],
+    min_sizes: tuple[tuple[int, ...], ...] = RETINAFACE_MIN_SIZES,
+    steps: tuple[int, ...] = RETINAFACE_STEPS,
+) -> np.ndarray:
+    """
+    Mismas anclas que ``prior_box`` (mismo orden y mismos valores float64), pero generadas
+    con ``meshgrid`` por nivel en lugar de bucles Python anidados.
+
+    Orden por nivel: fila ``i``, columna ``j`` y luego cada ``min_size``.
+    """
+    img_h, img_w = int(image_size[0]), int(image_size[1])
+    niveles: list[np.ndarray] = []
+    for step, sizes in zip(steps, min_sizes):
+        fh, fw = ceil(img_h / step), ceil(img_w / step)
+        cx = (np.arange(fw, dtype=np.float64) + 0.5) * step / img_w
+        cy = (np.arange(fh, dtype=np.float64) + 0.5) * step / img_h
+        cy_grid, cx_grid = np.meshgrid(cy, cx, indexing="ij")
+        n_sizes = len(sizes)
+        nivel = np.empty((fh, fw, n_sizes, 4), dtype=np.float64)
+        nivel[..., 0] = cx_grid[..., np.newaxis]
+        nivel[..., 1] = cy_grid[..., np.newaxis]
+        nivel[..., 2] = np.array([m / img_w for m in sizes], dtype=np.float64)
+        nivel[..., 3] = np.array([m / img_h for m in sizes], dtype=np.float64)
+        niveles.append(nivel.reshape(-1, 4))
+    return np.concatenate(niveles, axis=0)
+
+
+@lru_cache(maxsize=8)
+def _prior_box_cacheado(
+    image_size: tuple[int, int],
+    min_sizes: tuple[tuple[int, ...], ...],
+    steps: tuple[int, ...],
+) -> np.ndarray:
+    priors = prior_box_vectorizado(image_size, min_sizes, steps).astype(np.float32)
+    priors.flags.writeable = False
+    return priors
+
+
+def prior_box_cacheado(
+    image_size: tuple[int, int] = RETINAFACE_INPUT_HW,
+    *,
+    min_sizes: tuple[tuple[int, ...], ...] = RETINAFACE_MIN_SIZES,
+    steps: tuple[int, ...] = RETINAFACE_STEPS,
+) -> np.ndarray:
+    """
+    Priors RetinaFace cacheados por (alto, ancho) y configuracion de anclas.
+
+    La primera llamada para una clave los genera con ``prior_box_vectorizado``; las
+    siguientes devuelven **el mismo** array ``float32`` de solo lectura (sin coste por frame).
+    Soporta 320x320 y 640x640 (``RETINAFACE_INPUT_HW_640``).
+
+    No modificar el resultado: si hace falta escribir, usar ``.copy()``.
+    """
+    key_sizes = tuple(tuple(int(m) for m in fila) for fila in min_sizes)
+    key_steps = tuple(int(st) for st in steps)
+    if len(key_sizes) != len(key_steps):
+        raise ValueError("min_sizes y steps deben tener la misma cantidad de niveles")
+    return _prior_box_cacheado(
+        (int(image_size[0]), int(image_size[1])), key_sizes, key_steps
+    )
+
+
 def box_decode(loc: np.ndarray, priors: np.ndarray) -> np.ndarray:
     """
     Decodifica regresiones loc respecto a priors (solo RetinaFace / mismo encoding).
@@ -107,40 +192,26 @@ def decode_landm(pre: np.ndarray, priors: np.ndarray) -> np.ndarray:
     )
 
 
+def decode_landm_candidatos(pre: np.ndarray, priors: np.ndarray) -> np.ndarray:
+    """
+    Igual que ``decode_landm`` pero en una sola operacion sobre la vista ``(N, 5, 2)``
+    (sin cinco slices concatenados). Mismas operaciones elemento a elemento: el resultado
+    es identico bit a bit. Pensado para decodificar solo los candidatos que pasan el score.
+    """
+    variances = [0.1, 0.2]
+    pts = pre.reshape(-1, 5, 2)
+    out = priors[:, np.newaxis, :2] + pts * variances[0] * priors[:, np.newaxis, 2:]
+    return out.reshape(-1, 10)
+
+
 def nms(dets: np.ndarray, thresh: float) -> list[int]:
     """
     NMS tipo RetinaFace demo: dets filas (x1, y1, x2, y2, score).
     Implementacion baseline con +1 en areas (igual al Zoo Python).
 
-    Solo garantizada para este flujo de cajas; otros modelos pueden necesitar otra metrica.
+    Delegado en ``utils.nms.nms_greedy`` (referencia); el camino rapido usa ``nms_matriz``.
     """
-    x1 = dets[:, 0]
-    y1 = dets[:, 1]
-    x2 = dets[:, 2]
-    y2 = dets[:, 3]
-    scores = dets[:, 4]
-
-    areas = (x2 - x1 + 1) * (y2 - y1 + 1)
-    order = scores.argsort()[::-1]
-
-    keep: list[int] = []
-    while order.size > 0:
-        i = int(order[0])
-        keep.append(i)
-        xx1 = np.maximum(x1[i], x1[order[1:]])
-        yy1 = np.maximum(y1[i], y1[order[1:]])
-        xx2 = np.minimum(x2[i], x2[order[1:]])
-        yy2 = np.minimum(y2[i], y2[order[1:]])
-
-        w = np.maximum(0.0, xx2 - xx1 + 1)
-        h = np.maximum(0.0, yy2 - yy1 + 1)
-        inter = w * h
-        ovr = inter / (areas[i] + areas[order[1:]] - inter)
-
-        inds = np.where(ovr <= thresh)[0]
-        order = order[inds + 1]
-
-    return keep
+    return nms_greedy(dets[:, :4], dets[:, 4], thresh, area_mas_uno=True).tolist()
 
 
 def split_outputs(outputs: list[Any]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
@@ -158,6 +229,15 @@ def split_outputs(outputs: list[Any]) -> tuple[np.ndarray, np.ndarray, np.ndarra
     return loc, conf, landm
 
 
+def _escalas_entrada(input_hw: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """Equivalentes a ``RETINAFACE_BOX_SCALE`` / ``RETINAFACE_LANDMARK_SCALE`` para otro tamano."""
+    h, w = int(input_hw[0]), int(input_hw[1])
+    return (
+        np.array([w, h, w, h], dtype=np.float64),
+        np.array([w, h] * 5, dtype=np.float64),
+    )
+
+
 def retinaface_dets_desde_rknn_outputs(
     outputs: list[Any],
     *,
@@ -170,6 +250,7 @@ def retinaface_dets_desde_rknn_outputs(
     score_pre_nms: float = 0.02,
     nms_iou: float = 0.5,
     log_priors: bool = False,
+    input_hw: tuple[int, int] = RETINAFACE_INPUT_HW,
 ) -> np.ndarray:
     """
     Postproceso completo de salidas ``rknn.inference`` para RetinaFace (MobileNet 0.25 / Zoo).
@@ -187,19 +268,25 @@ def retinaface_dets_desde_rknn_outputs(
             detecciones con ``score >= score_deteccion`` (lo define el script llamador).
         score_pre_nms: Filtro debil previo al NMS (tipico 0.02 en el demo Zoo).
         nms_iou: Umbral de solapamiento para ``nms`` (no es score de cara).
-        log_priors: Si True, ``prior_box`` imprime depuracion (por defecto silencioso).
+        log_priors: Si True, imprime tamano y num_priors (depuracion; por defecto silencioso).
+        input_hw: (alto, ancho) del tensor de entrada de la red; 320x320 por defecto,
+            ``RETINAFACE_INPUT_HW_640`` para la variante 640. Los priors salen de
+            ``prior_box_cacheado`` (se generan una vez por tamano, no por frame).
 
     Returns:
         ``ndarray`` forma ``(N, 15)``, ``float32``. Si no hay detecciones sobre el umbral,
         ``N == 0``. Orden: score descendente.
     """
     loc, conf, landmarks = split_outputs(outputs)
-    priors = prior_box(
-        (RETINAFACE_INPUT_HEIGHT, RETINAFACE_INPUT_WIDTH),
-        log_priors=log_priors,
-    )
+    priors = prior_box_cacheado(input_hw)
+    if log_priors:
+        print("image_size:", input_hw, " num_priors=", priors.shape[0])
+    if tuple(input_hw) == RETINAFACE_INPUT_HW:
+        box_scale, landmark_scale = RETINAFACE_BOX_SCALE, RETINAFACE_LANDMARK_SCALE
+    else:
+        box_scale, landmark_scale = _escalas_entrada(input_hw)
     boxes = box_decode(loc.squeeze(0), priors)
-    boxes = boxes * RETINAFACE_BOX_SCALE // 1
+    boxes = boxes * box_scale // 1
     boxes[..., 0::2] = np.clip(
         (boxes[..., 0::2] - offset_x) / aspect_ratio,
         0,
@@ -212,7 +299,7 @@ def retinaface_dets_desde_rknn_outputs(
     )
     scores = conf.squeeze(0)[:, 1]
     landmarks = decode_landm(landmarks.squeeze(0), priors)
-    landmarks = landmarks * RETINAFACE_LANDMARK_SCALE // 1
+    landmarks = landmarks * landmark_scale // 1
     landmarks[..., 0::2] = np.clip(
         (landmarks[..., 0::2] - offset_x) / aspect_ratio,
         0,
@@ -243,3 +330,137 @@ def retinaface_dets_desde_rknn_outputs(
     mask = dets[:, 4] >= score_deteccion
     dets = dets[mask]
     return dets
+
+
+def _des_letterbox_xy(
+    coords: np.ndarray,
+    *,
+    img_width: int,
+    img_height: int,
+    aspect_ratio: float,
+    offset_x: int,
+    offset_y: int,
+) -> np.ndarray:
+    """Pasa columnas x (pares) e y (impares) del lienzo al frame original, con clip (in place)."""
+    coords[..., 0::2] = np.clip((coords[..., 0::2] - offset_x) / aspect_ratio, 0, img_width)
+    coords[..., 1::2] = np.clip((coords[..., 1::2] - offset_y) / aspect_ratio, 0, img_height)
+    return coords
+
+
+def retinaface_candidatos_desde_outputs(
+    outputs: list[Any],
+    *,
+    img_width: int,
+    img_height: int,
+    aspect_ratio: float,
+    offset_x: int,
+    offset_y: int,
+    score_pre_nms: float = 0.02,
+    top_k: int | None = None,
+    input_hw: tuple[int, int] = RETINAFACE_INPUT_HW,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Etapa de decode de ``retinaface_dets_topk_desde_rknn_outputs`` (sin NMS): candidatos con
+    ``score > score_pre_nms`` decodificados y des-letterbox, score descendente.
+
+    Returns:
+        ``(dets, landms)``: ``(M, 5)`` ``float32`` ``[x1, y1, x2, y2, score]`` y ``(M, 10)``.
+    """
+    loc, conf, landmarks = split_outputs(outputs)
+    priors = prior_box_cacheado(input_hw)
+    if tuple(input_hw) == RETINAFACE_INPUT_HW:
+        box_scale, landmark_scale = RETINAFACE_BOX_SCALE, RETINAFACE_LANDMARK_SCALE
+    else:
+        box_scale, landmark_scale = _escalas_entrada(input_hw)
+
+    scores_all = conf.squeeze(0)[:, 1]
+    inds = np.where(scores_all > score_pre_nms)[0]
+    if top_k is not None and inds.size > top_k:
+        mejores = np.argpartition(scores_all[inds], inds.size - top_k)[inds.size - top_k :]
+        inds = np.sort(inds[mejores])
+
+    scores = scores_all[inds]
+    order = scores.argsort()[::-1]
+    sel = inds[order]
+    scores = scores[order]
+    priors_sel = priors[sel]
+    letterbox_kw = dict(
+        img_width=img_width,
+        img_height=img_height,
+        aspect_ratio=aspect_ratio,
+        offset_x=offset_x,
+        offset_y=offset_y,
+    )
+
+    boxes = box_decode(loc.squeeze(0)[sel], priors_sel)
+    boxes = _des_letterbox_xy(boxes * box_scale // 1, **letterbox_kw)
+    landms = decode_landm_candidatos(landmarks.squeeze(0)[sel], priors_sel)
+    landms = _des_letterbox_xy(landms * landmark_scale // 1, **letterbox_kw)
+
+    dets = np.hstack((boxes, scores[:, np.newaxis])).astype(np.float32, copy=False)
+    return dets, landms
+
+
+def retinaface_nms_candidatos(
+    dets: np.ndarray,
+    landms: np.ndarray,
+    *,
+    score_deteccion: float,
+    nms_iou: float = 0.5,
+) -> np.ndarray:
+    """Etapa NMS + umbral final sobre la salida de ``retinaface_candidatos_desde_outputs``."""
+    keep = nms_matriz(dets[:, :4], dets[:, 4], nms_iou, area_mas_uno=True)
+    dets = np.concatenate((dets[keep, :], landms[keep]), axis=1)
+    return dets[dets[:, 4] >= score_deteccion]
+
+
+def retinaface_dets_topk_desde_rknn_outputs(
+    outputs: list[Any],
+    *,
+    img_width: int,
+    img_height: int,
+    aspect_ratio: float,
+    offset_x: int,
+    offset_y: int,
+    score_deteccion: float,
+    score_pre_nms: float = 0.02,
+    nms_iou: float = 0.5,
+    top_k: int | None = None,
+    input_hw: tuple[int, int] = RETINAFACE_INPUT_HW,
+) -> np.ndarray:
+    """
+    Misma salida que ``retinaface_dets_desde_rknn_outputs`` pero filtrando **antes** de decodificar.
+
+    Primero umbraliza ``conf[:, 1] > score_pre_nms`` (y opcionalmente se queda con los
+    ``top_k`` mejores); solo esos candidatos pasan por ``box_decode``,
+    ``decode_landm_candidatos``, des-letterbox y clip. Con 0-3 caras en escena se decodifican
+    decenas de anclas en vez de las 4200 completas.
+
+    Con ``top_k=None`` el resultado es identico bit a bit al de la funcion original (mismos
+    valores, dtype y orden). Con ``top_k`` solo cambia si habia mas candidatos que ``top_k``.
+
+    Es la composicion de ``retinaface_candidatos_desde_outputs`` (decode) y
+    ``retinaface_nms_candidatos`` (NMS), separadas para medir cada etapa.
+
+    Args:
+        top_k: Maximo de candidatos (por score) que entran al decode y al NMS; ``None`` = todos.
+        Resto: igual que ``retinaface_dets_desde_rknn_outputs``.
+
+    Returns:
+        ``ndarray`` forma ``(N, 15)``: ``[x1, y1, x2, y2, score, 10 coords landmarks]`` en
+        pixeles del frame original, score descendente.
+    """
+    dets, landms = retinaface_candidatos_desde_outputs(
+        outputs,
+        img_width=img_width,
+        img_height=img_height,
+        aspect_ratio=aspect_ratio,
+        offset_x=offset_x,
+        offset_y=offset_y,
+        score_pre_nms=score_pre_nms,
+        top_k=top_k,
+        input_hw=input_hw,
+    )
+    return retinaface_nms_candidatos(
+        dets, landms, score_deteccion=score_deteccion, nms_iou=nms_iou
+    )
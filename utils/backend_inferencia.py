@@ -0,0 +1,459 @@
+"""
+Backends de inferencia intercambiables: ONNX Runtime (CPU, x86 / CI), RKNNLite (NPU Rockchip)
+y un mock determinista que reproduce salidas grabadas.
+
+Todos exponen la misma interfaz:
+
+- ``cargar()``: abre el modelo (devuelve el propio backend).
+- ``entrada``: ``EntradaModelo`` con layout (NCHW / NHWC), dtype, orden de canales, alto/ancho
+  y batch fijo (0 = dinamico), fijada una sola vez al cargar.
+- ``infer_batch(lote)``: lista de salidas con la dimension 0 = ``len(lote)``. Si el modelo fija
+  el batch B se recorre el lote en tandas de B y se concatenan las salidas; una tanda corta se
+  rellena con ceros hasta B y solo se devuelven sus filas reales.
+- ``liberar()`` (o ``with``).
+
+El preproceso se elige una vez por backend con ``preprocesador(backend.entrada, media_bgr)``
+en lugar de deducirlo de ``inp0_meta.shape`` en cada frame:
+
+- ONNX (RetinaFace exportado de PyTorch): float32 BGR menos la media, NCHW.
+- RKNN: uint8 RGB NHWC sin normalizar (media y escala van dentro del .rknn).
+
+Ejemplo:
+    det = crear_backend(s.BACKEND_INFERENCIA, ruta_modelo).cargar()
+    preparar = preprocesador(det.entrada, RETINAFACE_MEAN_BGR)
+    outputs = det.infer_batch(preparar(letterbox_img))
+
+Para desarrollar / perfilar sin placa: ``GrabadorSalidas(BackendORT(...).cargar())`` guarda las
+salidas reales en un ``.npz`` y ``BackendMock(ruta_npz)`` las reproduce en el mismo orden.
+"""
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from .image_utils import LetterboxDestino, LetterboxMeta
+
+BACKENDS = ("onnx", "rknn", "mock")
+
+
+class EntradaModelo(NamedTuple):
+    """Formato de entrada que espera el modelo (lo que debe producir el preproceso)."""
+
+    layout: str  # "NCHW" o "NHWC"
+    dtype: str  # "float32" o "uint8"
+    orden_canales: str  # "BGR" o "RGB"
+    alto: int
+    ancho: int
+    batch_max: int  # batch fijo del modelo; 0 = batch dinamico
+
+    def forma(self, n: int = 1) -> tuple[int, int, int, int]:
+        if self.layout == "NCHW":
+            return (n, 3, self.alto, self.ancho)
+        return (n, self.alto, self.ancho, 3)
+
+
+class BackendInferencia:
+    """Interfaz comun; las subclases implementan ``cargar`` y ``_inferir``."""
+
+    nombre = "base"
+    rellena_lote = True  # tandas cortas rellenadas hasta el batch fijo (B > 1)
+
+    def __init__(self) -> None:
+        self.entrada: EntradaModelo | None = None
+        self.llamadas = 0  # llamadas al runtime (con batch fijo 1, una por elemento del lote)
+        self._relleno: np.ndarray | None = None
+
+    def cargar(self) -> "BackendInferencia":
+        raise NotImplementedError
+
+    def _inferir(self, lote: np.ndarray) -> list[np.ndarray]:
+        raise NotImplementedError
+
+    def infer_batch(self, lote: np.ndarray) -> list[np.ndarray]:
+        if self.entrada is None:
+            raise RuntimeError(f"Backend {self.nombre} sin cargar")
+        n = lote.shape[0]
+        b = self.entrada.batch_max
+        if b == 0 or n == b:
+            self.llamadas += 1
+            return self._inferir(lote)
+        partes = []
+        for i in range(0, n, b):
+            self.llamadas += 1
+            partes.append(self._inferir_tanda(lote[i : i + b]))
+        if len(partes) == 1:
+            return partes[0]
+        return [np.concatenate(salidas, axis=0) for salidas in zip(*partes)]
+
+    def _inferir_tanda(self, tanda: np.ndarray) -> list[np.ndarray]:
+        """Tanda de como mucho B filas; con batch fijo B > 1 la corta va en un buffer de B filas."""
+        b = self.entrada.batch_max
+        k = tanda.shape[0]
+        if k == b or not self.rellena_lote:
+            return self._inferir(tanda)
+        relleno = self._relleno
+        if relleno is None or relleno.shape[1:] != tanda.shape[1:] or relleno.dtype != tanda.dtype:
+            relleno = self._relleno = np.zeros((b, *tanda.shape[1:]), dtype=tanda.dtype)
+        relleno[:k] = tanda
+        relleno[k:] = 0
+        return [o[:k] for o in self._inferir(relleno)]
+
+    def liberar(self) -> None:
+        pass
+
+    def __enter__(self) -> "BackendInferencia":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.liberar()
+
+
+class BackendORT(BackendInferencia):
+    """ONNX Runtime; ``session`` queda accesible (p. ej. para ``EmbedderMobileFaceNet``)."""
+
+    nombre = "onnx"
+
+    def __init__(
+        self,
+        ruta: str | Path,
+        hilos: int = 0,
+        providers: list[str] | None = None,
+        orden_canales: str = "BGR",
+        hilos_inter: int = 1,
+    ) -> None:
+        super().__init__()
+        self.ruta = str(ruta)
+        self.hilos = hilos  # intra_op_num_threads; 0 = valor por defecto de ORT (un hilo por nucleo)
+        self.hilos_inter = hilos_inter  # inter_op_num_threads (modo secuencial: 1 basta)
+        self.providers = providers or ["CPUExecutionProvider"]
+        self.orden_canales = orden_canales
+        self.session = None
+        self._nombre_entrada = ""
+
+    def cargar(self) -> "BackendORT":
+        import onnxruntime as ort
+
+        so = ort.SessionOptions()
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.inter_op_num_threads = self.hilos_inter
+        if self.hilos > 0:
+            so.intra_op_num_threads = self.hilos
+        self.session = ort.InferenceSession(self.ruta, so, providers=self.providers)
+        inp = self.session.get_inputs()[0]
+        self._nombre_entrada = inp.name
+        self.entrada = entrada_desde_onnx(inp, self.orden_canales)
+        return self
+
+    def _inferir(self, lote: np.ndarray) -> list[np.ndarray]:
+        return self.session.run(None, {self._nombre_entrada: lote})
+
+    def liberar(self) -> None:
+        self.session = None
+
+
+def entrada_desde_onnx(inp0_meta, orden_canales: str = "BGR") -> EntradaModelo:
+    """
+    ``EntradaModelo`` de la primera entrada ONNX (``session.get_inputs()[0]``): misma deteccion
+    de layout NCHW / NHWC que hacia ``_preprocess_for_onnx`` en cada frame, hecha una sola vez.
+    """
+    dims = list(inp0_meta.shape) if len(inp0_meta.shape) == 4 else [1, 3, 0, 0]
+    tipo = inp0_meta.type
+    nhwc = dims[1] != 3 and (dims[-1] == 3 or isinstance(dims[1], int))
+    h, w = (dims[1], dims[2]) if nhwc else (dims[2], dims[3])
+    dim0 = dims[0]
+    return EntradaModelo(
+        layout="NHWC" if nhwc else "NCHW",
+        dtype="uint8" if tipo == "tensor(uint8)" else "float32",
+        orden_canales=orden_canales,
+        alto=h if isinstance(h, int) else 0,
+        ancho=w if isinstance(w, int) else 0,
+        batch_max=dim0 if isinstance(dim0, int) and dim0 > 0 else 0,
+    )
+
+
+class BackendRKNNLite(BackendInferencia):
+    """
+    RKNNLite en la placa. El .rknn no expone su forma de entrada en RKNN-Toolkit-Lite2:
+    ``alto`` / ``ancho`` se pasan (320x320 RetinaFace, 640x640 YOLOv8). Entrada uint8 RGB NHWC,
+    batch 1. ``core_mask``: p. ej. ``RKNNLite.NPU_CORE_0`` (None = valor por defecto).
+    """
+
+    nombre = "rknn"
+
+    def __init__(
+        self, ruta: str | Path, alto: int = 320, ancho: int = 320, core_mask: int | None = None
+    ) -> None:
+        super().__init__()
+        self.ruta = str(ruta)
+        self.core_mask = core_mask
+        self._forma = (alto, ancho)
+        self._rknn = None
+
+    def cargar(self) -> "BackendRKNNLite":
+        try:
+            from rknnlite.api import RKNNLite
+        except ImportError as e:
+            raise RuntimeError(
+                "Backend rknn sin rknnlite: instalar RKNN-Toolkit-Lite2 en la placa."
+            ) from e
+        rknn = RKNNLite()
+        if rknn.load_rknn(self.ruta) != 0:
+            raise RuntimeError(f"load_rknn fallo: {self.ruta}")
+        ret = rknn.init_runtime() if self.core_mask is None else rknn.init_runtime(core_mask=self.core_mask)
+        if ret != 0:
+            rknn.release()
+            raise RuntimeError("init_runtime fallo")
+        self._rknn = rknn
+        self.entrada = EntradaModelo("NHWC", "uint8", "RGB", *self._forma, batch_max=1)
+        return self
+
+    def _inferir(self, lote: np.ndarray) -> list[np.ndarray]:
+        outputs = self._rknn.inference(inputs=[lote])
+        if not outputs:
+            raise RuntimeError("rknn.inference sin salidas")
+        return list(outputs)
+
+    def liberar(self) -> None:
+        if self._rknn is not None:
+            self._rknn.release()
+            self._rknn = None
+
+
+class GrabadorSalidas(BackendInferencia):
+    """Envuelve un backend cargado y guarda cada salida por elemento para ``BackendMock``."""
+
+    def __init__(self, backend: BackendInferencia) -> None:
+        super().__init__()
+        self.backend = backend
+        self.nombre = backend.nombre
+        self.entrada = backend.entrada
+        self._muestras: list[list[np.ndarray]] = []
+
+    def cargar(self) -> "GrabadorSalidas":
+        return self
+
+    def infer_batch(self, lote: np.ndarray) -> list[np.ndarray]:
+        salidas = self.backend.infer_batch(lote)
+        self.llamadas = self.backend.llamadas
+        for i in range(lote.shape[0]):
+            self._muestras.append([np.array(o[i : i + 1]) for o in salidas])
+        return salidas
+
+    def guardar(self, ruta: str | Path) -> int:
+        """Escribe el ``.npz`` (entrada + salidas en orden); devuelve las muestras grabadas."""
+        arrays = {
+            f"m{k:06d}_s{j}": o for k, salidas in enumerate(self._muestras) for j, o in enumerate(salidas)
+        }
+        meta = {"entrada": self.entrada._asdict(), "backend": self.nombre, "muestras": len(self._muestras)}
+        np.savez_compressed(ruta, _meta=np.array(json.dumps(meta)), **arrays)
+        return len(self._muestras)
+
+    def liberar(self) -> None:
+        self.backend.liberar()
+
+
+class BackendMock(BackendInferencia):
+    """
+    Reproduce en bucle las salidas grabadas con ``GrabadorSalidas`` (una muestra por elemento
+    del lote, en el orden grabado). Comprueba forma y dtype del lote contra la entrada grabada,
+    de modo que un preproceso equivocado falla igual que con el backend real.
+    """
+
+    nombre = "mock"
+    # Las muestras se graban por elemento real del lote: filas de relleno desalinearian la cola.
+    rellena_lote = False
+
+    def __init__(self, ruta: str | Path, latencia_ms: float = 0.0) -> None:
+        super().__init__()
+        self.ruta = str(ruta)
+        self.latencia_ms = latencia_ms  # simula el tiempo del acelerador (sleep, libera el GIL)
+        self.backend_grabado = ""
+        self._muestras: list[list[np.ndarray]] = []
+        self._siguiente = 0
+
+    def cargar(self) -> "BackendMock":
+        with np.load(self.ruta) as datos:
+            meta = json.loads(str(datos["_meta"]))
+            n = meta["muestras"]
+            salidas_por_muestra = sum(1 for k in datos.files if k.startswith("m000000_"))
+            self._muestras = [
+                [datos[f"m{k:06d}_s{j}"] for j in range(salidas_por_muestra)] for k in range(n)
+            ]
+        if not self._muestras:
+            raise RuntimeError(f"Grabacion sin muestras: {self.ruta}")
+        self.backend_grabado = meta["backend"]
+        self.entrada = EntradaModelo(**meta["entrada"])
+        self._siguiente = 0
+        return self
+
+    def _inferir(self, lote: np.ndarray) -> list[np.ndarray]:
+        esperada = self.entrada.forma(lote.shape[0])[1:]
+        if lote.shape[1:] != esperada or lote.dtype != np.dtype(self.entrada.dtype):
+            raise ValueError(
+                f"Lote {lote.shape} {lote.dtype} != entrada grabada {esperada} {self.entrada.dtype}"
+            )
+        if self.latencia_ms > 0:
+            time.sleep(self.latencia_ms / 1000.0)
+        elegidas = []
+        for _ in range(lote.shape[0]):
+            elegidas.append(self._muestras[self._siguiente])
+            self._siguiente = (self._siguiente + 1) % len(self._muestras)
+        return [np.concatenate(salidas, axis=0) for salidas in zip(*elegidas)]
+
+
+def crear_backend(tipo: str, ruta: str | Path, **kwargs) -> BackendInferencia:
+    """``tipo`` en ``BACKENDS`` (p. ej. ``settings.BACKEND_INFERENCIA`` o un flag ``--backend``)."""
+    tipo = tipo.lower()
+    if tipo == "onnx":
+        return BackendORT(ruta, **kwargs)
+    if tipo == "rknn":
+        return BackendRKNNLite(ruta, **kwargs)
+    if tipo == "mock":
+        return BackendMock(ruta, **kwargs)
+    raise ValueError(f"Backend desconocido '{tipo}'. Usar uno de {BACKENDS}.")
+
+
+class PreprocesadorEntrada:
+    """
+    ``canvas_bgr (H, W, 3) uint8 -> tensor (1, ...)`` para ``entrada``, con el layout decidido una
+    vez y el tensor preasignado: cada llamada rellena el mismo buffer sin asignar memoria.
+
+    - float32: ``cv2.add(canvas, -media, dtype=CV_32F)`` (conversion + resta fusionadas, como
+      ``cv2.dnn.blobFromImage``) y, en NCHW, ``cv2.split`` directo a los planos del tensor.
+    - uint8 (RKNN): ``cvtColor`` BGR -> RGB directo al tensor NHWC; sin media (va en el .rknn).
+
+    ``letterbox(frame, fill)`` hace ademas el letterbox sobre buffers propios (ver
+    ``utils.image_utils.LetterboxDestino``).
+
+    El tensor devuelto es siempre el mismo array: consumirlo (``infer_batch``) antes de la
+    siguiente llamada. Si el modelo no fija alto / ancho, el buffer se crea con el primer canvas
+    y solo se rehace si cambia su tamano.
+    """
+
+    def __init__(self, entrada: EntradaModelo, media_bgr: np.ndarray | None = None) -> None:
+        self.entrada = entrada
+        self._rgb = entrada.orden_canales == "RGB"
+        self._nchw = entrada.layout == "NCHW"
+        self._float = entrada.dtype != "uint8"
+        media = np.zeros(3, dtype=np.float64) if media_bgr is None else np.asarray(media_bgr, np.float64)
+        if self._rgb:
+            media = media[::-1]
+        self._escalar = (-float(media[0]), -float(media[1]), -float(media[2]), 0.0)
+        self.tensor: np.ndarray | None = None
+        self._letterbox: LetterboxDestino | None = None
+        self._meta_tensor: LetterboxMeta | None = None  # letterbox cuyas barras estan en el tensor
+        if entrada.alto > 0 and entrada.ancho > 0:
+            self._preparar_buffers(entrada.alto, entrada.ancho)
+
+    def _preparar_buffers(self, alto: int, ancho: int) -> None:
+        dtype = np.float32 if self._float else np.uint8
+        forma = self.entrada._replace(alto=alto, ancho=ancho).forma(1)
+        self.tensor = np.empty(forma, dtype=dtype)
+        # Intermedios: RGB uint8 si hace falta cambiar canales fuera del tensor; HWC float32 en NCHW.
+        fuera = self._float or self._nchw
+        self._rgb_u8 = np.empty((alto, ancho, 3), dtype=np.uint8) if self._rgb and fuera else None
+        self._hwc_f32 = np.empty((alto, ancho, 3), dtype=np.float32) if self._float and self._nchw else None
+        self._planos = [self.tensor[0, c] for c in range(3)] if self._nchw else None
+        self._tensor_hwc = None if self._nchw else self.tensor[0]
+        self._letterbox = None
+        self._meta_tensor = None
+
+    def _escribir(self, img_bgr: np.ndarray, rgb_u8, hwc_f32, planos, tensor_hwc) -> None:
+        """Canvas (o ROI) BGR uint8 -> region equivalente del tensor (o de sus planos)."""
+        if not self._float and not self._nchw:
+            if self._rgb:
+                cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB, dst=tensor_hwc)
+            else:
+                np.copyto(tensor_hwc, img_bgr)
+            return
+        img = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB, dst=rgb_u8) if self._rgb else img_bgr
+        if not self._float:
+            cv2.split(img, planos)
+        elif self._nchw:
+            cv2.add(img, self._escalar, dst=hwc_f32, dtype=cv2.CV_32F)
+            cv2.split(hwc_f32, planos)
+        else:
+            cv2.add(img, self._escalar, dst=tensor_hwc, dtype=cv2.CV_32F)
+
+    def __call__(self, canvas_bgr: np.ndarray) -> np.ndarray:
+        if canvas_bgr.dtype != np.uint8:
+            canvas_bgr = canvas_bgr.astype(np.uint8)
+        alto, ancho = canvas_bgr.shape[:2]
+        if self.tensor is None or (alto, ancho) != self._hw_tensor():
+            if self.entrada.alto > 0 and self.entrada.ancho > 0:
+                raise ValueError(
+                    f"Canvas {ancho}x{alto} != entrada del modelo {self.entrada.ancho}x{self.entrada.alto}"
+                )
+            self._preparar_buffers(alto, ancho)
+        if self._letterbox is not None:
+            # El canvas pisa todo el tensor: barras del letterbox a rehacer en la siguiente llamada.
+            self._meta_tensor = None
+            if self._letterbox.destino is self._tensor_hwc:
+                self._letterbox.invalidar()
+        self._escribir(canvas_bgr, self._rgb_u8, self._hwc_f32, self._planos, self._tensor_hwc)
+        return self.tensor
+
+    def letterbox(self, frame_bgr: np.ndarray, fill_value: int) -> tuple[np.ndarray, LetterboxMeta]:
+        """
+        Letterbox + preproceso del frame completo: ``(tensor, meta)`` igual que
+        ``self(letterbox_bgr(frame, (ancho, alto), fill_value)[0])`` pero sin lienzos nuevos y
+        convirtiendo solo el contenido; las barras del tensor se escriben una vez por resolucion.
+
+        - uint8 NHWC (RKNN): el resize escribe directamente en el tensor y el paso a RGB se hace
+          en su sitio sobre el contenido (las barras son grises, iguales en BGR y RGB).
+        - resto: resize al lienzo uint8 propio y conversion solo de la ROI al tensor.
+        """
+        if self.entrada.alto <= 0 or self.entrada.ancho <= 0:
+            raise ValueError("letterbox necesita un modelo con alto / ancho fijos")
+        lb = self._letterbox
+        if lb is None or lb.fill_value != fill_value:
+            en_tensor = not self._float and not self._nchw
+            lb = LetterboxDestino(
+                (self.entrada.ancho, self.entrada.alto), fill_value, self._tensor_hwc if en_tensor else None
+            )
+            self._letterbox = lb
+            self._meta_tensor = None
+        _, meta = lb(frame_bgr)
+        en_tensor = lb.destino is self._tensor_hwc
+        if meta is not self._meta_tensor:
+            # Resolucion nueva (o tensor pisado por una llamada directa): barras + vistas de la ROI.
+            if not en_tensor:
+                self._escribir(lb.destino, self._rgb_u8, self._hwc_f32, self._planos, self._tensor_hwc)
+            elif self._rgb:
+                cv2.cvtColor(lb.roi, cv2.COLOR_BGR2RGB, dst=lb.roi)
+            self._preparar_roi(meta, lb.roi.shape[1], lb.roi.shape[0])
+            self._meta_tensor = meta
+            return self.tensor, meta
+        if en_tensor:
+            if self._rgb:
+                cv2.cvtColor(lb.roi, cv2.COLOR_BGR2RGB, dst=lb.roi)
+        else:
+            self._escribir(lb.roi, *self._roi)
+        return self.tensor, meta
+
+    def _preparar_roi(self, meta: LetterboxMeta, ancho: int, alto: int) -> None:
+        filas = slice(meta.offset_y, meta.offset_y + alto)
+        cols = slice(meta.offset_x, meta.offset_x + ancho)
+
+        def vista(a):
+            return None if a is None else a[filas, cols]
+
+        planos = None if self._planos is None else [p[filas, cols] for p in self._planos]
+        self._roi = (vista(self._rgb_u8), vista(self._hwc_f32), planos, vista(self._tensor_hwc))
+
+    def _hw_tensor(self) -> tuple[int, int]:
+        forma = self.tensor.shape
+        return (forma[2], forma[3]) if self._nchw else (forma[1], forma[2])
+
+
+def preprocesador(entrada: EntradaModelo, media_bgr: np.ndarray | None = None) -> PreprocesadorEntrada:
+    """
+    Preproceso de ``entrada`` decidido una vez (``media_bgr`` solo se resta en entradas float32;
+    en RKNN va dentro del modelo).
+    """
+    return PreprocesadorEntrada(entrada, media_bgr)
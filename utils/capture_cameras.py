@@ -6,19 +6,70 @@ import logging
 import requests
 import numpy as np
 from configs import settings as s
+from utils.frame_ring import AnilloFrames, FramePrestado
+from utils.jpeg_reducido import FrameReducido, decodificar_reducido
 
 
 class CaptureCameras:
-    def __init__(self):
-        self.mode = s.MODO
-        self.rtsp_url = s.IP_CAM_RTSP_URL
-        self.snap_url = s.SNAP_HTTP_URL
-        self.usb_index = s.USB_INDEX
+    """
+    Una fuente de captura en su propio hilo (RTSP, SNAP, USB o FILE).
+
+    Sin argumentos usa la configuracion global de ``configs.settings``. Los argumentos
+    permiten crear varias fuentes en un mismo proceso (ver ``utils.multi_camera``):
+
+    - ``url``: URL RTSP, URL SNAP o ruta de video (modo FILE) segun ``modo``.
+    - ``evento_frame``: ``threading.Event`` que se activa en cada frame publicado, para que
+      un consumidor comun espere a varias camaras sin sondear.
+
+    - ``anillo_slots`` (> 0): RTSP/USB/FILE hacen ``cap.retrieve`` dentro de un
+      ``utils.frame_ring.AnilloFrames`` preasignado (sin asignacion por frame). El consumidor
+      usa ``prestar_frame`` / ``liberar_frame``; ``get_frame`` sigue funcionando pero copia.
+      SNAP ignora el anillo (``imdecode`` siempre asigna).
+    - ``anillo``: destino ya creado con ``escribir_desde(cap)`` / ``invalidar()``, p. ej. un
+      ``utils.shm_frame_bus.BusFramesCompartido`` para escribir en memoria compartida.
+
+    - ``entrada_detector`` (ancho, alto), solo SNAP: decodifica el JPEG al menor tamano que
+      cubre la entrada del detector (``IMREAD_REDUCED_COLOR_2/4/8``, ver
+      ``utils.jpeg_reducido``). ``get_frame`` entrega el frame reducido y ``get_frame_snap``
+      el ``FrameReducido`` para volver a coordenadas / recortes de resolucion completa.
+
+    El modo FILE reproduce un video local al ritmo de su FPS y lo reabre al terminar (sustituto
+    de una camara RTSP para pruebas).
+    """
+
+    def __init__(
+        self,
+        nombre: str | None = None,
+        modo: str | None = None,
+        url: str | None = None,
+        usb_index: int | None = None,
+        max_fps: float | None = None,
+        reintento_seg: float | None = None,
+        evento_frame: threading.Event | None = None,
+        anillo_slots: int | None = None,
+        anillo=None,
+        entrada_detector: tuple[int, int] | None = None,
+    ):
+        self.mode = (modo or s.MODO).upper()
+        self.nombre = nombre or self.mode
+        self.rtsp_url = url if url is not None and self.mode == "RTSP" else s.IP_CAM_RTSP_URL
+        self.snap_url = url if url is not None and self.mode == "SNAP" else s.SNAP_HTTP_URL
+        self.file_path = url if self.mode == "FILE" else s.FILE_VIDEO_PATH
+        self.usb_index = s.USB_INDEX if usb_index is None else usb_index
         self.warmup_frames = s.WARMUP_FRAMES
         self.buffer_size = s.BUFFER_SIZE
-        self.reintento_seg = s.REINTENTO_SEG
+        self.reintento_seg = s.REINTENTO_SEG if reintento_seg is None else reintento_seg
         self.http_timeout_s = s.HTTP_TIMEOUT_S
-        self.max_fps = s.MAX_FPS
+        self.max_fps = s.MAX_FPS if max_fps is None else max_fps
+        self.evento_frame = evento_frame
+        self.entrada_detector = tuple(entrada_detector) if entrada_detector else None
+        anillo_slots = s.ANILLO_FRAMES if anillo_slots is None else anillo_slots
+        if anillo is not None:
+            self.anillo = anillo
+        elif anillo_slots > 0 and self.mode != "SNAP":
+            self.anillo = AnilloFrames(anillo_slots)
+        else:
+            self.anillo = None
 
         if self.max_fps > 0:
             self._periodo_ticks = int(cv2.getTickFrequency() / self.max_fps)
@@ -29,11 +80,15 @@ class CaptureCameras:
         self._t0_tick = cv2.getTickCount()
 
         self.latest_frame = None
+        self.latest_snap: FrameReducido | None = None
+        self.latest_seq = 0
+        self.latest_ts = 0.0
         self.new_frame_available = False
         self.is_running = False
         self.lock = threading.Lock()
         self.thread = None
         self.cap = None
+        self._sesion_http = None
 
     def start(self):
         self.is_running = True
@@ -43,6 +98,8 @@ class CaptureCameras:
             self.thread = threading.Thread(target=self._snap_loop, name="H_Snap")
         elif self.mode == "USB":
             self.thread = threading.Thread(target=self._usb_loop, name="H_USB")
+        elif self.mode == "FILE":
+            self.thread = threading.Thread(target=self._file_loop, name="H_File")
         else:
             logging.critical(f"Modo de captura no soportado: {self.mode}")
             self.is_running = False
@@ -84,17 +141,33 @@ class CaptureCameras:
                 return True
         return False
 
+    def _retrieve_y_publicar(self) -> None:
+        """Tras un grab(): retrieve a un array nuevo o, con anillo, a un buffer reutilizado."""
+        if self.anillo is not None:
+            frame = self.anillo.escribir_desde(self.cap)
+            if frame is not None:
+                self._publicar_frame(frame)
+            return
+        ret, frame = self.cap.retrieve()
+        if ret and frame is not None and frame.size > 0:
+            self._publicar_frame(frame)
+
     def _publicar_frame(self, frame: np.ndarray) -> None:
+        self._frame_count += 1
         with self.lock:
-            self.latest_frame = frame
+            # Con anillo no se guarda referencia: el buffer se reutiliza (ver prestar_frame).
+            self.latest_frame = frame if self.anillo is None else None
+            self.latest_seq = self._frame_count
+            self.latest_ts = time.monotonic()
             self.new_frame_available = True
-        self._frame_count += 1
+        if self.evento_frame is not None:
+            self.evento_frame.set()
         if self._frame_count % s.LOG_CADA_N_FRAMES == 0:
             dt = (cv2.getTickCount() - self._t0_tick) / cv2.getTickFrequency()
             fps = self._frame_count / dt if dt > 0 else 0.0
             h, w = frame.shape[:2]
             logging.info(
-                f"[{self.mode}] frame={self._frame_count} "
+                f"[{self.nombre}] frame={self._frame_count} "
                 f"size={w}x{h} fps_aprox={fps:.2f}"
             )
 
@@ -126,7 +199,10 @@ class CaptureCameras:
                 finally:
                     self.cap = None
             self.latest_frame = None
+            self.latest_snap = None
             self.new_frame_available = False
+        if self.anillo is not None:
+            self.anillo.invalidar()
 
     def _rtsp_loop(self):
         while self.is_running:
@@ -147,12 +223,10 @@ class CaptureCameras:
                 if not self._toca_capturar_stream():
                     continue
 
-                ret, frame = self.cap.retrieve()
-                if ret and frame is not None and frame.size > 0:
-                    self._publicar_frame(frame)
+                self._retrieve_y_publicar()
 
             except (cv2.error, Exception) as e:
-                logging.error(f"Error RTSP: {e}. Cooldown activo.")
+                logging.error(f"Error RTSP [{self.nombre}]: {e}. Cooldown activo.")
                 self._hard_reset_resources()
                 time.sleep(self.reintento_seg)
 
@@ -178,42 +252,120 @@ class CaptureCameras:
                 if not self._toca_capturar_stream():
                     continue
 
-                ret, frame = self.cap.retrieve()
-                if ret and frame is not None and frame.size > 0:
-                    self._publicar_frame(frame)
+                self._retrieve_y_publicar()
 
             except (cv2.error, Exception) as e:
-                logging.error(f"Error USB: {e}. Cooldown activo.")
+                logging.error(f"Error USB [{self.nombre}]: {e}. Cooldown activo.")
+                self._hard_reset_resources()
+                time.sleep(self.reintento_seg)
+
+    def _file_loop(self):
+        """Video local en bucle al ritmo de su FPS; al terminar se reabre sin cooldown."""
+        periodo_s = 0.0
+        siguiente = 0.0
+        while self.is_running:
+            try:
+                if self.cap is None or not self.cap.isOpened():
+                    self.cap = cv2.VideoCapture(self.file_path)
+                    if not self.cap.isOpened():
+                        raise cv2.error(f"No se pudo abrir video: {self.file_path}")
+                    fps_video = self.cap.get(cv2.CAP_PROP_FPS)
+                    periodo_s = 1.0 / fps_video if fps_video and fps_video > 0 else 0.04
+                    siguiente = time.monotonic()
+                    self._next_due_tick = cv2.getTickCount()  # reinicia reloj
+
+                espera = siguiente - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+                siguiente += periodo_s
+
+                if not self.cap.grab():
+                    with self.lock:
+                        self.cap.release()
+                        self.cap = None
+                    continue
+
+                if not self._toca_capturar_stream():
+                    continue
+
+                self._retrieve_y_publicar()
+
+            except (cv2.error, Exception) as e:
+                logging.error(f"Error FILE [{self.nombre}]: {e}. Cooldown activo.")
                 self._hard_reset_resources()
                 time.sleep(self.reintento_seg)
 
     def _snap_loop(self):
+        # Session: reutiliza la conexion keep-alive entre snapshots (sin TCP nuevo por frame).
+        # Varias peticiones en vuelo y varias camaras: utils.snap_async.ClienteSnapAsync.
+        self._sesion_http = requests.Session()
         while self.is_running:
             try:
                 if not self._toca_capturar_snap():
                     time.sleep(0.001)
                     continue
 
-                response = requests.get(self.snap_url, timeout=self.http_timeout_s)
+                response = self._sesion_http.get(self.snap_url, timeout=self.http_timeout_s)
                 if response.status_code != 200:
                     raise requests.RequestException(f"HTTP {response.status_code}")
 
-                image_array = np.asarray(bytearray(response.content), dtype=np.uint8)
-                frame = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-                if frame is not None and frame.size > 0:
-                    self._publicar_frame(frame)
+                snap = decodificar_reducido(response.content, self.entrada_detector)
+                if snap is not None:
+                    with self.lock:
+                        self.latest_snap = snap
+                    self._publicar_frame(snap.frame)
 
             except (requests.RequestException, Exception) as e:
-                logging.error(f"Error Snap HTTP: {e}. Cooldown activo.")
+                logging.error(f"Error Snap HTTP [{self.nombre}]: {e}. Cooldown activo.")
+                self._sesion_http.close()
                 time.sleep(self.reintento_seg)
+        self._sesion_http.close()
 
     def get_frame(self):
+        ok, frame, _, _ = self.get_frame_info()
+        return ok, frame
+
+    def get_frame_info(self):
+        """Como ``get_frame`` pero con numero de secuencia y ``time.monotonic()`` de captura."""
+        if self.anillo is not None:
+            prestado = self.prestar_frame()
+            if prestado is None:
+                return False, None, 0, 0.0
+            with prestado:
+                return True, prestado.copia(), prestado.seq, prestado.t_captura
         with self.lock:
             if self.new_frame_available:
                 self.new_frame_available = False
-                return True, self.latest_frame
+                return True, self.latest_frame, self.latest_seq, self.latest_ts
+            return False, None, 0, 0.0
+
+    def get_frame_snap(self) -> tuple[bool, FrameReducido | None]:
+        """SNAP: como ``get_frame`` pero con el ``FrameReducido`` (frame + JPEG original)."""
+        with self.lock:
+            if self.new_frame_available and self.latest_snap is not None:
+                self.new_frame_available = False
+                return True, self.latest_snap
             return False, None
 
+    def prestar_frame(self) -> FramePrestado | None:
+        """
+        Modo anillo: presta el frame nuevo (vista de solo lectura, sin copia) o None.
+        Devolver con ``liberar_frame`` (o ``with``) en cuanto se termine de leer.
+        """
+        if self.anillo is None:
+            raise RuntimeError("prestar_frame requiere anillo_slots > 0")
+        with self.lock:
+            if not self.new_frame_available:
+                return None
+            self.new_frame_available = False
+        return self.anillo.prestar()
+
+    def liberar_frame(self, prestado: FramePrestado) -> None:
+        self.anillo.liberar(prestado)
+
+    def hay_frame_nuevo(self) -> bool:
+        return self.new_frame_available
+
     def stop(self):
         self.is_running = False
         if self.thread and self.thread.is_alive():
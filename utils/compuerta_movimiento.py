@@ -0,0 +1,237 @@
+"""
+Compuerta de movimiento (MOG2 + ``FlowState``) delante de cualquier detector: decide por
+camara en que frames merece la pena inferir. Extraida de
+``export_models/deteccion_movimiento_fsm.py`` (misma maquina de estados y mismos umbrales).
+
+Por frame, ``evaluar(frame, t)``:
+
+1. MOG2 sobre el frame reducido a ``ancho x alto``; hay movimiento si los pixeles de primer
+   plano superan ``movimiento_pixeles``.
+2. Sin movimiento durante ``timeout_seg`` en MOV_DETECTED / MOV_OUT -> IDLE (una persona quieta
+   ya detectada, en FACE_*, no se expulsa por falta de movimiento de fondo).
+3. Transiciones por MOG2: IDLE -> MOV_DETECTED <-> MOV_OUT.
+4. Devuelve True si el estado pide inferencia (MOV_*, FACE_PROCESSED, FACE_OUT).
+
+Tras inferir, ``registrar_resultado(hay_deteccion, t)``: con deteccion -> FACE_PROCESSED; sin
+ella FACE_PROCESSED -> FACE_OUT y, tras ``timeout_seg`` sin detecciones,
+FACE_PROCESSED_TIMEOUT -> IDLE. El detector da igual (RetinaFace, YOLOv8 filtrando personas...):
+solo importa si encontro algo.
+
+``t`` es el instante del frame en segundos (``FrameCamara.t_captura`` de
+``utils.multi_camera``, o indice / fps al reproducir un video grabado), asi los timeouts no
+dependen de lo que tarde el consumidor.
+
+``CompuertasCamaras`` mantiene una compuerta por nombre de camara (se crean al ver el primer
+frame), la fraccion de frames sin inferencia de cada una (sobre los frames posteriores a la
+calibracion del fondo, que se cuentan aparte) y una ``Etapa`` para
+``utils.pipeline_etapas`` que filtra los ``FrameCamara`` sin movimiento.
+
+Ejemplo:
+    compuertas = CompuertasCamaras(ParametrosMovimiento(timeout_seg=10.0))
+    gestor = GestorCamaras(fuentes).start()
+    while True:
+        item = gestor.siguiente_frame(timeout=1.0)
+        if item is None or not compuertas.evaluar(item.nombre, item.frame, item.t_captura):
+            continue
+        dets = detectar(item.frame)
+        compuertas.registrar_resultado(item.nombre, len(dets) > 0, item.t_captura)
+    print(compuertas.resumen())
+"""
+from __future__ import annotations
+
+import time
+from enum import Enum
+from typing import Any, Callable, NamedTuple
+
+import cv2
+import numpy as np
+
+from .pipeline_etapas import Etapa
+
+
+class FlowState(str, Enum):
+    IDLE = "IDLE"
+    MOV_DETECTED = "MOV_DETECTED"
+    MOV_OUT = "MOV_OUT"
+    FACE_PROCESSED = "FACE_PROCESSED"
+    FACE_OUT = "FACE_OUT"
+    FACE_PROCESSED_TIMEOUT = "FACE_PROCESSED_TIMEOUT"
+
+
+ESTADOS_CON_INFERENCIA = (
+    FlowState.MOV_DETECTED,
+    FlowState.MOV_OUT,
+    FlowState.FACE_PROCESSED,
+    FlowState.FACE_OUT,
+)
+
+
+class ParametrosMovimiento(NamedTuple):
+    """Valores por defecto = flags de ``deteccion_movimiento_fsm.py``."""
+
+    ancho: int = 320
+    alto: int = 240
+    history: int = 20
+    var_threshold: int = 40
+    warmup: int = 20  # frames de calibracion del fondo (learningRate 0.5, sin inferencia)
+    movimiento_pixeles: int = 1000
+    timeout_seg: float = 10.0
+
+
+# (camara, estado_antes, estado_despues, motivo)
+Transicion = Callable[[str, FlowState, FlowState, str], None]
+
+
+class CompuertaMovimiento:
+    """MOG2 + ``FlowState`` de una camara."""
+
+    def __init__(
+        self,
+        params: ParametrosMovimiento = ParametrosMovimiento(),
+        nombre: str = "",
+        al_transicion: Transicion | None = None,
+    ) -> None:
+        self.params = params
+        self.nombre = nombre
+        self.al_transicion = al_transicion
+        self._fgbg = cv2.createBackgroundSubtractorMOG2(
+            history=params.history,
+            varThreshold=params.var_threshold,
+            detectShadows=False,
+        )
+        self._reducido = np.empty((params.alto, params.ancho, 3), dtype=np.uint8)
+        self.mascara = np.zeros((params.alto, params.ancho), dtype=np.uint8)  # primer plano del ultimo frame
+        self.state = FlowState.IDLE
+        self.t_ultimo_mov: float | None = None
+        self.t_ultima_deteccion: float | None = None
+        self.pixeles = 0  # pixeles de primer plano del ultimo frame
+        self.hay_mov = False
+        self.frames = 0  # frames evaluados (incluida la calibracion)
+        self.calibracion = 0  # frames de calibracion del fondo (ni inferidos ni omitidos)
+        self.inferidos = 0  # frames con evaluar() == True
+
+    @property
+    def decididos(self) -> int:
+        """Frames tras la calibracion: los que la compuerta deja pasar u omite."""
+        return self.frames - self.calibracion
+
+    @property
+    def fraccion_omitida(self) -> float:
+        return 1.0 - self.inferidos / self.decididos if self.decididos else 0.0
+
+    def _cambiar(self, nuevo: FlowState, motivo: str) -> None:
+        if nuevo != self.state and self.al_transicion is not None:
+            self.al_transicion(self.nombre, self.state, nuevo, motivo)
+        self.state = nuevo
+
+    def evaluar(self, frame_bgr: np.ndarray, t: float | None = None) -> bool:
+        """Aplica MOG2 y las transiciones por movimiento; True si hay que inferir este frame."""
+        now = time.monotonic() if t is None else t
+        p = self.params
+        self.frames += 1
+        cv2.resize(frame_bgr, (p.ancho, p.alto), dst=self._reducido, interpolation=cv2.INTER_AREA)
+        if self.frames <= p.warmup:
+            self._fgbg.apply(self._reducido, learningRate=0.5)
+            self.calibracion += 1
+            return False
+        self._fgbg.apply(self._reducido, self.mascara)
+        self.pixeles = int(cv2.countNonZero(self.mascara))
+        self.hay_mov = self.pixeles > p.movimiento_pixeles
+        if self.hay_mov:
+            self.t_ultimo_mov = now
+
+        # 1) Sin movimiento MOG2 T seg -> IDLE solo desde fase movimiento (no desde FACE_*)
+        sin_mov = self.t_ultimo_mov is not None and (now - self.t_ultimo_mov) >= p.timeout_seg
+        if sin_mov and self.state in (FlowState.MOV_DETECTED, FlowState.MOV_OUT):
+            self.t_ultima_deteccion = None
+            self._cambiar(FlowState.IDLE, f"timeout {p.timeout_seg:.1f} s sin movimiento MOG2")
+
+        # 2) Transiciones por movimiento (MOG2); FACE_* no cambian por MOG2
+        if self.state == FlowState.IDLE and self.hay_mov:
+            self._cambiar(FlowState.MOV_DETECTED, "MOG2")
+        elif self.state == FlowState.MOV_DETECTED and not self.hay_mov:
+            self._cambiar(FlowState.MOV_OUT, "MOG2")
+        elif self.state == FlowState.MOV_OUT and self.hay_mov:
+            self._cambiar(FlowState.MOV_DETECTED, "MOG2")
+
+        inferir = self.state in ESTADOS_CON_INFERENCIA
+        if inferir:
+            self.inferidos += 1
+        return inferir
+
+    def registrar_resultado(self, hay_deteccion: bool, t: float | None = None) -> None:
+        """Resultado del detector en el frame para el que ``evaluar`` devolvio True."""
+        now = time.monotonic() if t is None else t
+        if hay_deteccion:
+            self.t_ultima_deteccion = now
+            self.t_ultimo_mov = now
+            self._cambiar(FlowState.FACE_PROCESSED, "deteccion")
+        elif self.state == FlowState.FACE_PROCESSED:
+            self._cambiar(FlowState.FACE_OUT, "deteccion")
+        elif self.state == FlowState.FACE_OUT:
+            if self.t_ultima_deteccion is not None and (now - self.t_ultima_deteccion) >= self.params.timeout_seg:
+                self._cambiar(FlowState.FACE_PROCESSED_TIMEOUT, "deteccion")
+
+        # FACE_PROCESSED_TIMEOUT -> IDLE en el mismo tick
+        if self.state == FlowState.FACE_PROCESSED_TIMEOUT:
+            self.t_ultima_deteccion = None
+            self._cambiar(FlowState.IDLE, f"sin deteccion durante {self.params.timeout_seg:.1f} s")
+
+
+class CompuertasCamaras:
+    """Una ``CompuertaMovimiento`` por camara (clave = nombre, como en ``GestorCamaras``)."""
+
+    def __init__(
+        self,
+        params: ParametrosMovimiento = ParametrosMovimiento(),
+        params_por_camara: dict[str, ParametrosMovimiento] | None = None,
+        al_transicion: Transicion | None = None,
+    ) -> None:
+        self.params = params
+        self.params_por_camara = params_por_camara or {}
+        self.al_transicion = al_transicion
+        self.compuertas: dict[str, CompuertaMovimiento] = {}
+
+    def compuerta(self, nombre: str) -> CompuertaMovimiento:
+        c = self.compuertas.get(nombre)
+        if c is None:
+            c = CompuertaMovimiento(self.params_por_camara.get(nombre, self.params), nombre, self.al_transicion)
+            self.compuertas[nombre] = c
+        return c
+
+    def evaluar(self, nombre: str, frame_bgr: np.ndarray, t: float | None = None) -> bool:
+        return self.compuerta(nombre).evaluar(frame_bgr, t)
+
+    def registrar_resultado(self, nombre: str, hay_deteccion: bool, t: float | None = None) -> None:
+        self.compuerta(nombre).registrar_resultado(hay_deteccion, t)
+
+    def etapa(self, nombre: str = "movimiento") -> Etapa:
+        """
+        ``Etapa`` para ``PipelineEtapas`` que recibe ``FrameCamara`` y solo deja pasar los que
+        piden inferencia. La etapa que conoce el resultado del detector debe llamar a
+        ``registrar_resultado(item.nombre, hay_deteccion, item.t_captura)``.
+        """
+
+        def filtrar(item: Any) -> Any | None:
+            return item if self.evaluar(item.nombre, item.frame, item.t_captura) else None
+
+        return Etapa(nombre, filtrar)
+
+    def estadisticas(self) -> dict[str, dict[str, Any]]:
+        return {
+            nombre: {
+                "frames": c.frames,
+                "calibracion": c.calibracion,
+                "inferidos": c.inferidos,
+                "fraccion_omitida": c.fraccion_omitida,
+                "estado": c.state.value,
+            }
+            for nombre, c in self.compuertas.items()
+        }
+
+    def resumen(self) -> str:
+        return " | ".join(
+            f"{nombre}: inferidos={e['inferidos']}/{e['frames'] - e['calibracion']} "
+            f"omitidos={100.0 * e['fraccion_omitida']:.1f}% calibracion={e['calibracion']} estado={e['estado']}"
+            for nombre, e in self.estadisticas().items()
+        )
@@ -0,0 +1,160 @@
+"""
+Doble stream RTSP de la misma camara: deteccion sobre el sub stream (``IP_CAM_RTSP_URL``,
+640x480) y recorte de caras a resolucion completa desde el main stream
+(``IP_CAM_RTSP_URL_HIGH``, 2560x1920) solo cuando hay detecciones.
+
+Cada stream corre en su ``CaptureCameras`` (hilo y reconexion propios). El main stream
+decodifica dentro de un ``utils.frame_ring.AnilloFrames`` de ``slots_main`` buffers
+reutilizados, que conserva los ultimos frames con su instante de captura. Al detectar en un
+frame del sub stream capturado en ``t_sub``, ``prestar_main(t_sub, ...)`` presta (sin copia)
+el frame main mas proximo a ``t_sub + retardo_main_s``:
+
+- ``retardo_main_s``: cuanto mas tarde llega al proceso el main stream que el sub para el mismo
+  instante (decodificar 2560x1920 tarda mas). Calibrar una vez por camara; 0 por defecto.
+- ``max_desfase_s``: si el frame main mas proximo esta mas lejos, no se usa (la cara pudo
+  moverse); el llamador recorta del sub stream como antes.
+
+``modo`` es el de ``CaptureCameras`` salvo SNAP (ValueError): SNAP ignora el anillo y el main
+stream no tendria frames que prestar.
+
+Las cajas pasan del sub al main escalando por eje (ambos streams cubren el mismo campo de
+vision). Los instantes son ``time.monotonic()`` al publicar cada frame: los PTS de dos sesiones
+RTSP distintas no comparten origen en OpenCV.
+
+Ejemplo:
+    doble = CapturaDobleStream().start()
+    ok, frame, seq, t_sub = doble.sub.get_frame_info()
+    dets = detectar(frame)
+    main = doble.prestar_main(t_sub, frame.shape)
+    if main is not None:
+        with main:
+            embs = embedder.embeddings_de_dets(main.vista, main.a_main(dets))
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from configs import settings as s
+
+from .capture_cameras import CaptureCameras
+from .frame_ring import FramePrestado
+
+
+class FrameMainAlineado:
+    """Frame main prestado para un frame del sub stream; liberar (o ``with``) tras recortar."""
+
+    __slots__ = ("_prestado", "vista", "desfase_s", "escala_xy")
+
+    def __init__(
+        self, prestado: FramePrestado, desfase_s: float, escala_xy: tuple[float, float]
+    ) -> None:
+        self._prestado = prestado
+        self.vista = prestado.vista
+        self.desfase_s = desfase_s  # t_main - (t_sub + retardo_main_s)
+        self.escala_xy = escala_xy
+
+    def a_main(self, dets: np.ndarray) -> np.ndarray:
+        """Copia de ``dets`` (cajas ``(N, 4)`` o filas RetinaFace ``(N, 15)``) en pixeles main."""
+        out = np.array(dets, dtype=np.float32, copy=True)
+        if out.size == 0:
+            return out
+        sx, sy = self.escala_xy
+        cols = out.shape[1]
+        out[:, [0, 2] + list(range(5, cols, 2))] *= sx
+        out[:, [1, 3] + list(range(6, cols, 2))] *= sy
+        return out
+
+    def liberar(self) -> None:
+        self.vista = None
+        self._prestado.liberar()
+
+    def __enter__(self) -> "FrameMainAlineado":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.liberar()
+
+
+class CapturaDobleStream:
+    """Sub stream para detectar + anillo del main stream para recortes alineados en el tiempo."""
+
+    def __init__(
+        self,
+        url_sub: str | None = None,
+        url_main: str | None = None,
+        modo: str = "RTSP",
+        max_fps: float | None = None,
+        slots_main: int | None = None,
+        max_desfase_s: float | None = None,
+        retardo_main_s: float | None = None,
+        evento_frame=None,
+    ) -> None:
+        if modo.upper() == "SNAP":
+            raise ValueError("CapturaDobleStream necesita modo RTSP, USB o FILE (SNAP no usa el anillo main)")
+        self.max_desfase_s = s.DOBLE_STREAM_MAX_DESFASE_S if max_desfase_s is None else max_desfase_s
+        self.retardo_main_s = (
+            s.DOBLE_STREAM_RETARDO_MAIN_S if retardo_main_s is None else retardo_main_s
+        )
+        slots_main = s.DOBLE_STREAM_SLOTS_MAIN if slots_main is None else slots_main
+        self.sub = CaptureCameras(
+            nombre="sub",
+            modo=modo,
+            url=url_sub or s.IP_CAM_RTSP_URL,
+            max_fps=max_fps,
+            evento_frame=evento_frame,
+        )
+        # Main: todos los frames al anillo (max_fps=0) para tener historial denso que alinear.
+        self.main = CaptureCameras(
+            nombre="main",
+            modo=modo,
+            url=url_main or s.IP_CAM_RTSP_URL_HIGH,
+            max_fps=0,
+            anillo_slots=slots_main,
+        )
+        self.alineados = 0
+        self.sin_main = 0  # sin frame main o fuera de max_desfase_s
+        self._desfase_abs_total = 0.0
+
+    def start(self) -> "CapturaDobleStream":
+        self.main.start()
+        self.sub.start()
+        return self
+
+    def stop(self) -> None:
+        self.sub.is_running = False
+        self.main.is_running = False
+        self.sub.stop()
+        self.main.stop()
+
+    @property
+    def desfase_medio_ms(self) -> float:
+        return self._desfase_abs_total * 1000.0 / self.alineados if self.alineados else 0.0
+
+    def prestar_main(
+        self, t_sub: float, forma_sub: tuple[int, ...]
+    ) -> FrameMainAlineado | None:
+        """
+        Frame main mas proximo a ``t_sub + retardo_main_s`` (``t_sub`` = ``time.monotonic()``
+        de ``get_frame_info`` del sub stream) o None si no hay uno dentro de ``max_desfase_s``.
+        """
+        objetivo = t_sub + self.retardo_main_s
+        prestado = self.main.anillo.prestar_cercano(objetivo)
+        if prestado is None:
+            self.sin_main += 1
+            return None
+        desfase = prestado.t_captura - objetivo
+        if abs(desfase) > self.max_desfase_s:
+            prestado.liberar()
+            self.sin_main += 1
+            return None
+        h_sub, w_sub = forma_sub[:2]
+        h_main, w_main = prestado.vista.shape[:2]
+        self.alineados += 1
+        self._desfase_abs_total += abs(desfase)
+        return FrameMainAlineado(prestado, desfase, (w_main / w_sub, h_main / h_sub))
+
+    def resumen(self) -> str:
+        return (
+            f"main alineados={self.alineados} sin_main={self.sin_main} "
+            f"desfase_medio={self.desfase_medio_ms:.1f}ms"
+        )
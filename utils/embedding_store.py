@@ -0,0 +1,167 @@
+"""
+Almacen de embeddings empaquetado: una matriz float32 append-only + un indice binario.
+
+En vez de un ``<nombre>.npy`` por persona (N aperturas de archivo al arrancar), el directorio
+del almacen tiene tres archivos:
+
+- ``embeddings.f32``: filas ``(dim,)`` float32 L2-normalizadas, sin cabecera; se abre con
+  ``np.memmap`` (el SO pagina solo lo que se lee).
+- ``indice.bin``: un registro fijo ``INDICE_DTYPE`` por fila (identidad, hash de la imagen de
+  origen, instante de enrolamiento); tambien se lee con ``np.memmap``.
+- ``almacen.json``: version y ``dim``.
+
+Enrolar agrega al final de ambos archivos (nunca se reescribe la matriz). El numero de filas
+validas es el de registros completos del indice: se escribe la matriz primero y el indice
+despues. Un alta cortada deja como mucho una fila huerfana (o parcial) en la matriz y un
+registro parcial al final del indice; la lectura los ignora y el siguiente alta trunca ambos
+archivos a ``n`` filas antes de escribir.
+
+Migracion desde ``embeddings/*.npy``: ``export_models/migrar_embeddings_npy.py``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .face_embedding import MOBILEFACENET_EMB_DIM, l2_normalize_filas
+from .face_gallery import GaleriaEmbeddings
+
+ALMACEN_VERSION = 1
+ARCHIVO_MATRIZ = "embeddings.f32"
+ARCHIVO_INDICE = "indice.bin"
+ARCHIVO_META = "almacen.json"
+NOMBRE_MAX_BYTES = 64
+HASH_BYTES = 16
+
+INDICE_DTYPE = np.dtype(
+    [
+        ("nombre", f"S{NOMBRE_MAX_BYTES}"),
+        ("hash_origen", np.uint8, (HASH_BYTES,)),
+        ("t_enrolamiento", "<f8"),
+    ]
+)
+
+
+def hash_archivo(path: str | Path) -> bytes:
+    """Primeros ``HASH_BYTES`` del SHA-256 del archivo (imagen de origen)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.digest()[:HASH_BYTES]
+
+
+def es_almacen(directorio: str | Path) -> bool:
+    return (Path(directorio) / ARCHIVO_META).is_file()
+
+
+class AlmacenEmbeddings:
+    """
+    Almacen en ``directorio`` (se crea si no existe).
+
+    ``matriz`` e ``indice`` son memmaps de solo lectura de las filas validas; se vuelven a
+    abrir tras cada ``agregar``.
+    """
+
+    def __init__(self, directorio: str | Path, dim: int = MOBILEFACENET_EMB_DIM) -> None:
+        self.directorio = Path(directorio)
+        self._path_matriz = self.directorio / ARCHIVO_MATRIZ
+        self._path_indice = self.directorio / ARCHIVO_INDICE
+        path_meta = self.directorio / ARCHIVO_META
+        if path_meta.is_file():
+            meta = json.loads(path_meta.read_text(encoding="utf-8"))
+            if meta.get("version") != ALMACEN_VERSION:
+                raise ValueError(f"Version de almacen no soportada: {meta.get('version')}")
+            self.dim = int(meta["dim"])
+        else:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            self.dim = dim
+            self._path_matriz.touch()
+            self._path_indice.touch()
+            path_meta.write_text(
+                json.dumps({"version": ALMACEN_VERSION, "dim": dim, "dtype": "float32"}),
+                encoding="utf-8",
+            )
+        self._matriz: np.ndarray | None = None
+        self._indice: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return self._path_indice.stat().st_size // INDICE_DTYPE.itemsize
+
+    def _abrir(self) -> None:
+        n = len(self)
+        if n == 0:
+            self._matriz = np.zeros((0, self.dim), dtype=np.float32)
+            self._indice = np.zeros((0,), dtype=INDICE_DTYPE)
+            return
+        self._matriz = np.memmap(self._path_matriz, dtype=np.float32, mode="r", shape=(n, self.dim))
+        self._indice = np.memmap(self._path_indice, dtype=INDICE_DTYPE, mode="r", shape=(n,))
+
+    @property
+    def matriz(self) -> np.ndarray:
+        """``(n, dim)`` float32 L2-normalizado (memmap de solo lectura)."""
+        if self._matriz is None:
+            self._abrir()
+        return self._matriz
+
+    @property
+    def indice(self) -> np.ndarray:
+        """``(n,)`` registros ``INDICE_DTYPE`` (memmap de solo lectura)."""
+        if self._indice is None:
+            self._abrir()
+        return self._indice
+
+    def nombres(self) -> list[str]:
+        return [b.decode("utf-8") for b in self.indice["nombre"].tolist()]
+
+    def agregar(
+        self,
+        nombre: str,
+        emb: np.ndarray,
+        *,
+        hash_origen: bytes = b"",
+        t_enrolamiento: float | None = None,
+    ) -> int:
+        """Agrega un embedding ``(dim,)`` al final; devuelve su fila."""
+        nombre_b = nombre.encode("utf-8")
+        if len(nombre_b) > NOMBRE_MAX_BYTES:
+            raise ValueError(f"Nombre de mas de {NOMBRE_MAX_BYTES} bytes: {nombre!r}")
+        emb = np.asarray(emb, dtype=np.float32).reshape(1, -1)
+        if emb.shape[1] != self.dim:
+            raise ValueError(f"Embedding de {emb.shape[1]} valores, el almacen usa {self.dim}")
+        registro = np.zeros((1,), dtype=INDICE_DTYPE)
+        registro["nombre"] = nombre_b
+        registro["hash_origen"][0, : len(hash_origen[:HASH_BYTES])] = np.frombuffer(
+            hash_origen[:HASH_BYTES], dtype=np.uint8
+        )
+        registro["t_enrolamiento"] = time.time() if t_enrolamiento is None else t_enrolamiento
+
+        # Libera los memmaps antes de tocar los archivos.
+        self._matriz = None
+        self._indice = None
+        fila = len(self)
+        fila_bytes = self.dim * 4
+        with open(self._path_matriz, "r+b") as f:
+            f.truncate(fila * fila_bytes)  # descarta una fila huerfana de un alta cortada
+            f.seek(fila * fila_bytes)
+            f.write(l2_normalize_filas(emb).tobytes())
+        with open(self._path_indice, "r+b") as f:
+            f.truncate(fila * INDICE_DTYPE.itemsize)  # descarta un registro parcial
+            f.seek(fila * INDICE_DTYPE.itemsize)
+            f.write(registro.tobytes())
+        return fila
+
+    def buscar_hash(self, hash_origen: bytes) -> np.ndarray:
+        """Filas enroladas desde una imagen con ese hash (evita duplicar al migrar)."""
+        h = np.frombuffer(hash_origen[:HASH_BYTES], dtype=np.uint8)
+        if len(self) == 0 or h.size != HASH_BYTES:
+            return np.zeros((0,), dtype=np.int64)
+        return np.flatnonzero(np.all(self.indice["hash_origen"] == h, axis=1))
+
+    def a_galeria(self) -> GaleriaEmbeddings:
+        """``GaleriaEmbeddings`` con una copia contigua de la matriz (sin renormalizar)."""
+        return GaleriaEmbeddings.desde_matriz(self.nombres(), self.matriz, normalizadas=True)
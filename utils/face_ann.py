@@ -0,0 +1,218 @@
+"""
+Indice aproximado (ANN) IVF / IVF-PQ en NumPy puro para galerias grandes de embeddings.
+
+Opcional: para pocas decenas de miles de identidades ``GaleriaEmbeddings.buscar`` (exacto) ya
+es barato; esto es para 100k+ en la CPU del RK3568.
+
+- Cuantizador grueso: k-means (``nlist`` centroides) sobre los embeddings L2-normalizados;
+  cada embedding va a la lista invertida de su centroide mas cercano.
+- Busqueda: se eligen las ``nprobe`` listas con mayor ``q . c`` y solo se puntuan sus filas.
+  ``nprobe`` cambia recall por latencia (``nprobe = nlist`` equivale a exacto en modo plano).
+- Con ``m_pq > 0`` cada fila guarda en vez del vector el residuo ``x - c`` cuantizado por
+  producto (``m_pq`` subespacios, 256 centroides, un ``uint8`` por subespacio) y se puntua con
+  tablas por consulta (ADC): ``q . x ~= q . c + sum_j LUT_j[codigo_j]``.
+
+Los ids son enteros (p. ej. fila de ``AlmacenEmbeddings`` / ``GaleriaEmbeddings``).
+Se serializa con ``np.savez`` (sin pickle).
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from .face_embedding import l2_normalize_filas
+
+PQ_CENTROIDES = 256
+KMEANS_ITERS = 12
+KMEANS_MAX_MUESTRAS_POR_CENTROIDE = 64
+ANN_FORMATO_VERSION = 1
+
+
+def _asignar(x: np.ndarray, centroides: np.ndarray) -> np.ndarray:
+    """Indice del centroide mas cercano (L2) de cada fila de ``x``."""
+    c2 = np.einsum("ij,ij->i", centroides, centroides)
+    return np.argmin(c2[np.newaxis, :] - 2.0 * (x @ centroides.T), axis=1)
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """Lloyd sobre ``x`` (N, D) float32; devuelve ``(k, D)`` centroides."""
+    rng = np.random.default_rng(seed)
+    n = x.shape[0]
+    if n < k:
+        raise ValueError(f"k-means necesita al menos {k} muestras, hay {n}")
+    muestras = KMEANS_MAX_MUESTRAS_POR_CENTROIDE * k
+    if n > muestras:
+        x = x[rng.choice(n, size=muestras, replace=False)]
+        n = muestras
+    centroides = x[rng.choice(n, size=k, replace=False)].copy()
+    for _ in range(iters):
+        asign = _asignar(x, centroides)
+        sumas = np.zeros_like(centroides)
+        np.add.at(sumas, asign, x)
+        cuentas = np.bincount(asign, minlength=k)
+        vacios = cuentas == 0
+        centroides[~vacios] = sumas[~vacios] / cuentas[~vacios, np.newaxis]
+        if np.any(vacios):
+            # Reubica centroides vacios en muestras al azar.
+            centroides[vacios] = x[rng.choice(n, size=int(vacios.sum()), replace=False)]
+    return centroides.astype(np.float32)
+
+
+class IndiceIVF:
+    """
+    Listas invertidas sobre un cuantizador k-means; planas (``m_pq=0``) o PQ de residuos.
+
+    Flujo: ``entrenar(embs)`` -> ``agregar(embs, ids)`` -> ``buscar(probes, k, nprobe)``.
+    """
+
+    def __init__(self, nlist: int, m_pq: int = 0, nprobe: int = 8) -> None:
+        if nlist < 1:
+            raise ValueError("nlist debe ser >= 1")
+        self.nlist = nlist
+        self.m_pq = m_pq
+        self.nprobe = nprobe
+        self.dim = 0
+        self.centroides: np.ndarray | None = None
+        self.codebooks: np.ndarray | None = None  # (m_pq, 256, dim / m_pq)
+        # Almacenamiento compacto: filas ordenadas por lista + offsets (nlist + 1).
+        self._offsets = np.zeros((nlist + 1,), dtype=np.int64)
+        self._ids = np.zeros((0,), dtype=np.int64)
+        self._datos: np.ndarray | None = None  # (n, dim) float32 o (n, m_pq) uint8
+        self._pendientes: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return int(self._ids.size) + sum(p[1].size for p in self._pendientes)
+
+    @property
+    def entrenado(self) -> bool:
+        return self.centroides is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria de centroides, codebooks, ids y datos (sin pendientes)."""
+        total = self._offsets.nbytes + self._ids.nbytes
+        for arr in (self.centroides, self.codebooks, self._datos):
+            if arr is not None:
+                total += arr.nbytes
+        return total
+
+    def entrenar(self, embs: np.ndarray, seed: int = 0) -> None:
+        x = l2_normalize_filas(embs)
+        self.dim = x.shape[1]
+        self.centroides = kmeans(x, self.nlist, seed=seed)
+        if self.m_pq > 0:
+            if self.dim % self.m_pq:
+                raise ValueError(f"dim {self.dim} no divisible por m_pq {self.m_pq}")
+            residuos = x - self.centroides[_asignar(x, self.centroides)]
+            sub = self.dim // self.m_pq
+            self.codebooks = np.stack(
+                [
+                    kmeans(residuos[:, j * sub : (j + 1) * sub], PQ_CENTROIDES, seed=seed + 1 + j)
+                    for j in range(self.m_pq)
+                ]
+            )
+        self._datos = self._vacio()
+
+    def _vacio(self) -> np.ndarray:
+        if self.m_pq > 0:
+            return np.zeros((0, self.m_pq), dtype=np.uint8)
+        return np.zeros((0, self.dim), dtype=np.float32)
+
+    def _codificar(self, residuos: np.ndarray) -> np.ndarray:
+        sub = self.dim // self.m_pq
+        codigos = np.empty((residuos.shape[0], self.m_pq), dtype=np.uint8)
+        for j in range(self.m_pq):
+            codigos[:, j] = _asignar(residuos[:, j * sub : (j + 1) * sub], self.codebooks[j])
+        return codigos
+
+    def agregar(self, embs: np.ndarray, ids: np.ndarray) -> None:
+        """Asigna cada embedding a su lista; se consolida en la siguiente busqueda."""
+        if not self.entrenado:
+            raise RuntimeError("IndiceIVF.agregar antes de entrenar")
+        x = l2_normalize_filas(embs)
+        listas = _asignar(x, self.centroides)
+        datos = self._codificar(x - self.centroides[listas]) if self.m_pq > 0 else x
+        self._pendientes.append((listas, np.asarray(ids, dtype=np.int64).reshape(-1), datos))
+
+    def _consolidar(self) -> None:
+        if not self._pendientes:
+            return
+        lista_actual = np.repeat(np.arange(self.nlist), np.diff(self._offsets))
+        listas = np.concatenate([lista_actual] + [p[0] for p in self._pendientes])
+        ids = np.concatenate([self._ids] + [p[1] for p in self._pendientes])
+        datos = np.concatenate([self._datos] + [p[2] for p in self._pendientes])
+        orden = np.argsort(listas, kind="stable")
+        self._ids = ids[orden]
+        self._datos = np.ascontiguousarray(datos[orden])
+        self._offsets[1:] = np.cumsum(np.bincount(listas, minlength=self.nlist))
+        self._pendientes = []
+
+    def buscar(
+        self, probes: np.ndarray, k: int = 1, nprobe: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        ``(ids, sims)`` de forma ``(Q, k)``; ``-1`` / ``-inf`` si hay menos de k candidatos.
+
+        Con PQ las similitudes son aproximadas (ADC).
+        """
+        if not self.entrenado:
+            raise RuntimeError("IndiceIVF.buscar antes de entrenar")
+        self._consolidar()
+        q = l2_normalize_filas(np.asarray(probes, dtype=np.float32).reshape(-1, self.dim))
+        nprobe = min(self.nprobe if nprobe is None else nprobe, self.nlist)
+        ids_out = np.full((q.shape[0], k), -1, dtype=np.int64)
+        sims_out = np.full((q.shape[0], k), -np.inf, dtype=np.float32)
+
+        coarse = q @ self.centroides.T
+        listas_q = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        sub = self.dim // self.m_pq if self.m_pq > 0 else 0
+        for i in range(q.shape[0]):
+            tramos = [(self._offsets[l], self._offsets[l + 1]) for l in listas_q[i]]
+            filas = np.concatenate([np.arange(a, b) for a, b in tramos])
+            if filas.size == 0:
+                continue
+            if self.m_pq > 0:
+                # LUT (m_pq, 256): producto de cada sub-vector de q con cada centroide PQ.
+                lut = np.einsum("js,jcs->jc", q[i].reshape(self.m_pq, sub), self.codebooks)
+                base = np.repeat(coarse[i, listas_q[i]], [b - a for a, b in tramos])
+                sims = base + lut[np.arange(self.m_pq), self._datos[filas]].sum(axis=1)
+            else:
+                sims = self._datos[filas] @ q[i]
+            kk = min(k, filas.size)
+            top = np.argpartition(-sims, kk - 1)[:kk] if kk < filas.size else np.arange(kk)
+            top = top[np.argsort(-sims[top], kind="stable")]
+            ids_out[i, :kk] = self._ids[filas[top]]
+            sims_out[i, :kk] = sims[top]
+        return ids_out, sims_out
+
+    def guardar(self, path: str | Path) -> None:
+        if not self.entrenado:
+            raise RuntimeError("IndiceIVF.guardar antes de entrenar")
+        self._consolidar()
+        extra = {"codebooks": self.codebooks} if self.codebooks is not None else {}
+        np.savez(
+            str(path),
+            version=np.int64(ANN_FORMATO_VERSION),
+            params=np.array([self.nlist, self.m_pq, self.nprobe, self.dim], dtype=np.int64),
+            centroides=self.centroides,
+            offsets=self._offsets,
+            ids=self._ids,
+            datos=self._datos,
+            **extra,
+        )
+
+    @classmethod
+    def cargar(cls, path: str | Path) -> "IndiceIVF":
+        with np.load(str(path), allow_pickle=False) as z:
+            if int(z["version"]) != ANN_FORMATO_VERSION:
+                raise ValueError(f"Version de indice ANN no soportada: {int(z['version'])}")
+            nlist, m_pq, nprobe, dim = (int(v) for v in z["params"])
+            indice = cls(nlist, m_pq=m_pq, nprobe=nprobe)
+            indice.dim = dim
+            indice.centroides = z["centroides"]
+            indice.codebooks = z["codebooks"] if "codebooks" in z.files else None
+            indice._offsets = z["offsets"]
+            indice._ids = z["ids"]
+            indice._datos = z["datos"]
+        return indice
@@ -0,0 +1,143 @@
+"""
+Embeddings faciales MobileFaceNet (ONNX) para varias caras por frame.
+
+Preproceso alineado con ``export_models/face_embedding_from_image.py``: recorte BGR con margen,
+RGB [0, 1], resize 112x112, Normalize ImageNet, NCHW.
+
+``EmbedderMobileFaceNet`` rellena un buffer preasignado ``(max_batch, 3, 112, 112)`` con todas
+las caras del frame y hace **una sola** llamada ``session.run`` si el modelo acepta batch
+dinamico (ver ``export_models/exp_mobilefacenet_batch_onnx.py``). Con el ONNX original
+(batch fijo 1) recorre el mismo buffer cara a cara.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+import cv2
+import numpy as np
+
+MOBILEFACENET_HW = (112, 112)
+MOBILEFACENET_EMB_DIM = 128
+FACE_CROP_MARGIN_FRAC = 0.15
+
+_IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32).reshape(1, 1, 3)
+_IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32).reshape(1, 1, 3)
+
+
+def bbox_crop_with_margin(
+    det: np.ndarray, img_w: int, img_h: int, margin: float
+) -> tuple[int, int, int, int]:
+    """Caja ``det[:4]`` ampliada ``margin`` por lado y recortada al frame (coords inclusivas)."""
+    x1, y1, x2, y2 = det[0], det[1], det[2], det[3]
+    bw = max(x2 - x1, 1.0)
+    bh = max(y2 - y1, 1.0)
+    mx = bw * margin
+    my = bh * margin
+    nx1 = max(0, int(np.floor(x1 - mx)))
+    ny1 = max(0, int(np.floor(y1 - my)))
+    nx2 = min(img_w - 1, int(np.ceil(x2 + mx)))
+    ny2 = min(img_h - 1, int(np.ceil(y2 + my)))
+    if nx2 <= nx1 or ny2 <= ny1:
+        return int(x1), int(y1), int(x2), int(y2)
+    return nx1, ny1, nx2, ny2
+
+
+def crop_bgr_a_mobilefacenet(face_bgr: np.ndarray, out_chw: np.ndarray) -> np.ndarray:
+    """
+    BGR uint8 (H, W, 3) -> float32 (3, 112, 112) escrito en ``out_chw`` (p. ej. una fila del lote).
+
+    Mismas operaciones que ``_crop_bgr_to_mobilefacenet_nchw`` de los scripts (mismo resultado).
+    """
+    if face_bgr.size == 0:
+        raise ValueError("recorte vacio")
+    rgb = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+    resized = cv2.resize(rgb, MOBILEFACENET_HW, interpolation=cv2.INTER_LINEAR)
+    norm = (resized - _IMAGENET_MEAN) / _IMAGENET_STD
+    out_chw[...] = np.transpose(norm, (2, 0, 1))
+    return out_chw
+
+
+def l2_normalize_filas(embs: np.ndarray) -> np.ndarray:
+    """Normaliza L2 cada fila de ``embs`` (N, D); filas casi nulas se dejan igual."""
+    embs = np.asarray(embs, dtype=np.float32)
+    norms = np.linalg.norm(embs, axis=1, keepdims=True)
+    return np.where(norms < 1e-12, embs, embs / np.maximum(norms, 1e-12)).astype(
+        np.float32, copy=False
+    )
+
+
+def acepta_batch_dinamico(session: Any) -> bool:
+    """True si la dimension 0 de la entrada ONNX es simbolica (nombre, None o -1)."""
+    dim0 = session.get_inputs()[0].shape[0]
+    return not isinstance(dim0, int) or dim0 < 1
+
+
+class EmbedderMobileFaceNet:
+    """
+    Embeddings MobileFaceNet para todas las caras de un frame con un buffer preasignado.
+
+    - ``batch_dinamico`` (detectado de la firma ONNX): una llamada ``session.run`` con
+      ``buffer[:n]`` por cada tanda de hasta ``max_batch`` caras.
+    - Batch fijo ``B > 1``: tandas de ``B`` caras; una tanda incompleta se rellena con las
+      filas sobrantes del buffer y la salida se recorta a las caras reales.
+    - Batch fijo 1 (ONNX original): fallback que recorre ``buffer[i:i+1]`` con una llamada
+      por cara; mismo preproceso y mismo resultado.
+    """
+
+    def __init__(self, session: Any, max_batch: int = 8) -> None:
+        if max_batch < 1:
+            raise ValueError("max_batch debe ser >= 1")
+        self._session = session
+        self._in_name = session.get_inputs()[0].name
+        self._out_name = session.get_outputs()[0].name
+        self.batch_dinamico = acepta_batch_dinamico(session)
+        # 0 con batch dinamico; si no, el batch que exige el ONNX.
+        self.batch_fijo = 0 if self.batch_dinamico else int(session.get_inputs()[0].shape[0])
+        if self.batch_fijo > 1:
+            max_batch = self.batch_fijo
+        self.max_batch = max_batch
+        # Ceros: las filas de relleno de una tanda incompleta son siempre un tensor valido.
+        self._buffer = np.zeros((max_batch, 3, *MOBILEFACENET_HW), dtype=np.float32)
+        self.llamadas_run = 0
+
+    def _run(self, feed: np.ndarray) -> np.ndarray:
+        self.llamadas_run += 1
+        out = self._session.run([self._out_name], {self._in_name: feed})[0]
+        return np.asarray(out, dtype=np.float32).reshape(feed.shape[0], -1)
+
+    def embeddings_de_crops(self, crops_bgr: list[np.ndarray]) -> np.ndarray:
+        """Embeddings L2-normalizados ``(N, 128)`` de recortes BGR ya hechos."""
+        n = len(crops_bgr)
+        if n == 0:
+            return np.zeros((0, MOBILEFACENET_EMB_DIM), dtype=np.float32)
+        salida = np.empty((n, MOBILEFACENET_EMB_DIM), dtype=np.float32)
+        for ini in range(0, n, self.max_batch):
+            tanda = crops_bgr[ini : ini + self.max_batch]
+            k = len(tanda)
+            for i, crop in enumerate(tanda):
+                crop_bgr_a_mobilefacenet(crop, self._buffer[i])
+            if self.batch_dinamico:
+                salida[ini : ini + k] = self._run(self._buffer[:k])
+            elif self.batch_fijo > 1:
+                salida[ini : ini + k] = self._run(self._buffer)[:k]
+            else:
+                for i in range(k):
+                    salida[ini + i] = self._run(self._buffer[i : i + 1])[0]
+        return l2_normalize_filas(salida)
+
+    def embeddings_de_dets(
+        self,
+        frame_bgr: np.ndarray,
+        dets: np.ndarray,
+        margin: float = FACE_CROP_MARGIN_FRAC,
+    ) -> np.ndarray:
+        """
+        Recorta cada fila de ``dets`` (``[x1, y1, x2, y2, ...]`` en pixeles del frame) con
+        ``margin`` y devuelve ``(N, 128)`` en el mismo orden que ``dets``.
+        """
+        h, w = frame_bgr.shape[:2]
+        crops = []
+        for det in dets:
+            x1, y1, x2, y2 = bbox_crop_with_margin(det, w, h, margin)
+            crops.append(frame_bgr[y1 : y2 + 1, x1 : x2 + 1])
+        return self.embeddings_de_crops(crops)
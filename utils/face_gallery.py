@@ -0,0 +1,155 @@
+"""
+Galeria de embeddings faciales para identificacion 1:N (MobileFaceNet, 128-d).
+
+Todas las identidades enroladas viven en **una** matriz contigua ``float32`` de filas
+L2-normalizadas; la similitud coseno contra un lote de sondas es un solo producto matricial
+``probes @ M.T``. El top-k sale de ``argpartition`` (O(N)) y solo se ordenan esos k.
+
+Alta y baja no reconstruyen la matriz:
+
+- ``agregar`` escribe en la siguiente fila libre (capacidad que crece x2, amortizado O(1)).
+- ``quitar`` mueve la ultima fila al hueco (swap-with-last), O(filas quitadas).
+
+Una identidad puede tener varios embeddings (varias fotos); cada fila guarda su nombre.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from .face_embedding import MOBILEFACENET_EMB_DIM, l2_normalize_filas
+
+
+class ResultadoBusqueda(NamedTuple):
+    """
+    Resultado de ``GaleriaEmbeddings.buscar`` para Q sondas y k vecinos.
+
+    - filas: ``(Q, k)`` indice de fila en la galeria (-1 si la galeria tiene menos de k filas).
+    - sims: ``(Q, k)`` similitud coseno, descendente por sonda (``-inf`` en huecos).
+    - nombres: lista Q x k con la identidad de cada fila (``None`` en huecos).
+    """
+
+    filas: np.ndarray
+    sims: np.ndarray
+    nombres: list[list[str | None]]
+
+
+class GaleriaEmbeddings:
+    """Matriz contigua de embeddings L2-normalizados + nombre por fila."""
+
+    def __init__(self, dim: int = MOBILEFACENET_EMB_DIM, capacidad_inicial: int = 1024) -> None:
+        self.dim = dim
+        self._matriz = np.empty((max(1, capacidad_inicial), dim), dtype=np.float32)
+        self._nombres: list[str] = []
+        self._filas_por_nombre: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._nombres)
+
+    @property
+    def matriz(self) -> np.ndarray:
+        """Vista ``(n, dim)`` de solo las filas ocupadas (no copiar para buscar)."""
+        return self._matriz[: len(self._nombres)]
+
+    @property
+    def identidades(self) -> list[str]:
+        return list(self._filas_por_nombre)
+
+    def _asegurar_capacidad(self, n_total: int) -> None:
+        cap = self._matriz.shape[0]
+        if n_total <= cap:
+            return
+        while cap < n_total:
+            cap *= 2
+        nueva = np.empty((cap, self.dim), dtype=np.float32)
+        nueva[: len(self._nombres)] = self._matriz[: len(self._nombres)]
+        self._matriz = nueva
+
+    def agregar(self, nombre: str, embs: np.ndarray) -> None:
+        """Enrola uno ``(dim,)`` o varios ``(m, dim)`` embeddings bajo ``nombre``."""
+        embs = np.asarray(embs, dtype=np.float32).reshape(-1, self.dim)
+        n0 = len(self._nombres)
+        self._asegurar_capacidad(n0 + embs.shape[0])
+        self._matriz[n0 : n0 + embs.shape[0]] = l2_normalize_filas(embs)
+        filas = self._filas_por_nombre.setdefault(nombre, [])
+        for i in range(embs.shape[0]):
+            self._nombres.append(nombre)
+            filas.append(n0 + i)
+
+    def quitar(self, nombre: str) -> int:
+        """Da de baja todas las filas de ``nombre``; devuelve cuantas se quitaron."""
+        filas = self._filas_por_nombre.pop(nombre, None)
+        if not filas:
+            return 0
+        for fila in sorted(filas, reverse=True):
+            ultima = len(self._nombres) - 1
+            if fila != ultima:
+                nombre_ultima = self._nombres[ultima]
+                self._matriz[fila] = self._matriz[ultima]
+                self._nombres[fila] = nombre_ultima
+                filas_ultima = self._filas_por_nombre[nombre_ultima]
+                filas_ultima[filas_ultima.index(ultima)] = fila
+            self._nombres.pop()
+        return len(filas)
+
+    def nombre_de_fila(self, fila: int) -> str:
+        return self._nombres[fila]
+
+    def buscar(self, probes: np.ndarray, k: int = 1) -> ResultadoBusqueda:
+        """
+        Top-k por similitud coseno para un lote de sondas ``(Q, dim)`` (o una ``(dim,)``).
+
+        Las sondas se normalizan aqui; un solo ``matmul`` ``(Q, dim) x (dim, n)``.
+        """
+        probes = l2_normalize_filas(np.asarray(probes, dtype=np.float32).reshape(-1, self.dim))
+        q = probes.shape[0]
+        n = len(self._nombres)
+        filas = np.full((q, k), -1, dtype=np.int64)
+        sims = np.full((q, k), -np.inf, dtype=np.float32)
+        if n == 0 or q == 0:
+            return ResultadoBusqueda(filas, sims, [[None] * k for _ in range(q)])
+
+        todas = probes @ self.matriz.T
+        kk = min(k, n)
+        if kk < n:
+            top = np.argpartition(todas, n - kk, axis=1)[:, n - kk :]
+        else:
+            top = np.broadcast_to(np.arange(n), (q, n))
+        top_sims = np.take_along_axis(todas, top, axis=1)
+        orden = np.argsort(-top_sims, axis=1)
+        filas[:, :kk] = np.take_along_axis(top, orden, axis=1)
+        sims[:, :kk] = np.take_along_axis(top_sims, orden, axis=1)
+        nombres = [
+            [self._nombres[f] if f >= 0 else None for f in fila_q] for fila_q in filas
+        ]
+        return ResultadoBusqueda(filas, sims, nombres)
+
+    @classmethod
+    def desde_matriz(
+        cls, nombres: list[str], embs: np.ndarray, *, normalizadas: bool = False
+    ) -> "GaleriaEmbeddings":
+        """
+        Galeria de una copia contigua de ``embs`` ``(n, dim)`` (p. ej. un ``np.memmap``).
+
+        Con ``normalizadas=True`` se copia tal cual (filas ya L2=1, como en ``AlmacenEmbeddings``).
+        """
+        if len(nombres) == 0:
+            return cls()
+        embs = np.asarray(embs).reshape(len(nombres), -1)
+        galeria = cls(dim=embs.shape[1], capacidad_inicial=len(nombres))
+        galeria._matriz[: len(nombres)] = embs if normalizadas else l2_normalize_filas(embs)
+        galeria._nombres = list(nombres)
+        for fila, nombre in enumerate(galeria._nombres):
+            galeria._filas_por_nombre.setdefault(nombre, []).append(fila)
+        return galeria
+
+    @classmethod
+    def desde_directorio_npy(cls, directorio: str | Path) -> "GaleriaEmbeddings":
+        """Una identidad por ``<nombre>.npy`` (formato de ``face_embedding_from_image.py``)."""
+        paths = sorted(Path(directorio).glob("*.npy"))
+        galeria = cls(capacidad_inicial=max(1, len(paths)))
+        for p in paths:
+            galeria.agregar(p.stem, np.load(str(p)))
+        return galeria
@@ -0,0 +1,233 @@
+"""
+Anillo de buffers de frame preasignados para pasar frames del hilo de captura al consumidor
+sin asignar ni copiar por frame.
+
+``AnilloFrames`` tiene ``n_slots`` arrays reutilizados: el hilo de captura hace
+``cap.retrieve(buffer)`` sobre un slot libre (OpenCV escribe en el array si forma y tipo
+coinciden) y lo publica con un numero de secuencia. El consumidor **presta** el ultimo frame:
+recibe una vista de solo lectura que sigue siendo valida hasta ``liberar``; mientras tanto el
+escritor no toca ese slot. Con ``n_slots >= prestamos_simultaneos + 2`` el escritor siempre
+tiene slot libre.
+
+Un solo escritor por anillo (el hilo de captura); consumidores en cualquier hilo.
+
+Los slots no publicados por ultima vez guardan los frames anteriores: ``prestar_cercano(t)``
+presta el de captura mas proxima a ``t`` (alinear dos streams de la misma camara, ver
+``utils.dual_stream``). Un slot elegido para escribir deja de ser visible hasta publicarse.
+
+A 2560x1920 cada frame son ~14 MB: ``cap.read()`` + ``.copy()`` asigna y copia eso en cada
+lectura; aqui solo se asigna al arrancar o si cambia la resolucion.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+ANILLO_SLOTS_DEFECTO = 3
+
+
+class FramePrestado:
+    """Vista de solo lectura de un slot del anillo; usar como context manager o ``liberar``."""
+
+    __slots__ = ("_anillo", "slot", "seq", "t_captura", "vista")
+
+    def __init__(
+        self, anillo: "AnilloFrames", slot: int, seq: int, t_captura: float, vista: np.ndarray
+    ) -> None:
+        self._anillo = anillo
+        self.slot = slot
+        self.seq = seq
+        self.t_captura = t_captura
+        self.vista = vista
+
+    def copia(self) -> np.ndarray:
+        """Copia escribible (para dibujar o guardar mas alla del prestamo)."""
+        return self.vista.copy()
+
+    def liberar(self) -> None:
+        self._anillo.liberar(self)
+
+    def __enter__(self) -> "FramePrestado":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.liberar()
+
+
+class AnilloFrames:
+    """``n_slots`` buffers reutilizados con secuencia y prestamos contados por slot."""
+
+    def __init__(self, n_slots: int = ANILLO_SLOTS_DEFECTO) -> None:
+        if n_slots < 2:
+            raise ValueError("n_slots debe ser >= 2")
+        self.n_slots = n_slots
+        self._buffers: list[np.ndarray | None] = [None] * n_slots
+        self._prestamos = [0] * n_slots
+        self._seq_slot = [0] * n_slots
+        self._ts_slot = [0.0] * n_slots
+        self._ultimo = -1
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.asignaciones = 0  # buffers creados (arranque o cambio de resolucion)
+        self.sin_slot = 0  # frames descartados porque todos los slots estaban prestados
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def _slot_libre(self) -> int:
+        """
+        Slot no prestado y distinto del ultimo publicado; el de secuencia mas vieja. Queda
+        reservado (secuencia 0) para que ``prestar_cercano`` no lo preste mientras se escribe.
+        """
+        with self._lock:
+            libres = [
+                i for i in range(self.n_slots) if i != self._ultimo and self._prestamos[i] == 0
+            ]
+            if not libres:
+                return -1
+            slot = min(libres, key=lambda i: self._seq_slot[i])
+            self._seq_slot[slot] = 0
+            return slot
+
+    def _publicar(self, slot: int) -> int:
+        with self._lock:
+            self._seq += 1
+            self._seq_slot[slot] = self._seq
+            self._ts_slot[slot] = time.monotonic()
+            self._ultimo = slot
+            return self._seq
+
+    def escribir_desde(self, cap: cv2.VideoCapture) -> np.ndarray | None:
+        """
+        ``cap.retrieve`` (tras un ``grab`` del llamador) dentro de un slot libre y lo publica.
+
+        Devuelve el buffer escrito (solo para logs; no guardarlo) o None si no hubo frame o no
+        habia slot libre.
+        """
+        slot = self._slot_libre()
+        if slot < 0:
+            self.sin_slot += 1
+            return None
+        buf = self._buffers[slot]
+        ret, img = cap.retrieve(buf) if buf is not None else cap.retrieve()
+        if not ret or img is None or img.size == 0:
+            return None
+        if img is not buf:
+            # Primer frame o cambio de resolucion: OpenCV asigno uno nuevo; pasa a ser el slot.
+            self._buffers[slot] = img
+            self.asignaciones += 1
+        self._publicar(slot)
+        return img
+
+    def escribir(self, frame: np.ndarray) -> None:
+        """Copia ``frame`` en un slot libre (fuentes que ya entregan un array, p. ej. imdecode)."""
+        slot = self._slot_libre()
+        if slot < 0:
+            self.sin_slot += 1
+            return
+        buf = self._buffers[slot]
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = self._buffers[slot] = np.empty_like(frame)
+            self.asignaciones += 1
+        np.copyto(buf, frame)
+        self._publicar(slot)
+
+    def invalidar(self) -> None:
+        """Sin frame valido (fallo de lectura): ``prestar`` devuelve None hasta el siguiente."""
+        with self._lock:
+            self._ultimo = -1
+
+    def prestar(self, despues_de: int = 0) -> FramePrestado | None:
+        """
+        Presta el ultimo frame si su secuencia es > ``despues_de`` (0 = cualquiera).
+
+        La vista es de solo lectura y valida hasta ``liberar``.
+        """
+        with self._lock:
+            slot = self._ultimo
+            if slot < 0 or self._seq_slot[slot] <= despues_de:
+                return None
+            self._prestamos[slot] += 1
+            vista = self._buffers[slot].view()
+            vista.flags.writeable = False
+            return FramePrestado(self, slot, self._seq_slot[slot], self._ts_slot[slot], vista)
+
+    def prestar_cercano(self, t_objetivo: float) -> FramePrestado | None:
+        """
+        Presta el frame publicado cuyo ``time.monotonic()`` de captura esta mas cerca de
+        ``t_objetivo`` (el ultimo o uno anterior aun no reescrito); None si no hay ninguno.
+        """
+        with self._lock:
+            candidatos = [
+                i for i in range(self.n_slots)
+                if self._seq_slot[i] > 0 and self._buffers[i] is not None
+            ]
+            if self._ultimo < 0 or not candidatos:
+                return None
+            slot = min(candidatos, key=lambda i: abs(self._ts_slot[i] - t_objetivo))
+            self._prestamos[slot] += 1
+            vista = self._buffers[slot].view()
+            vista.flags.writeable = False
+            return FramePrestado(self, slot, self._seq_slot[slot], self._ts_slot[slot], vista)
+
+    def liberar(self, prestado: FramePrestado) -> None:
+        with self._lock:
+            if prestado.vista is None:
+                return  # ya liberado
+            self._prestamos[prestado.slot] -= 1
+            prestado.vista = None
+
+
+class UltimoFrameAnillo:
+    """
+    Hilo que hace ``grab`` + ``retrieve`` en un ``AnilloFrames`` (reemplazo de
+    ``UltimoFrameCamara`` de los scripts, sin ``.copy()`` por lectura).
+
+    ``prestar()`` / ``liberar()`` para uso sin copia; ``read_copy()`` por compatibilidad.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, n_slots: int = ANILLO_SLOTS_DEFECTO) -> None:
+        self._cap = cap
+        self.anillo = AnilloFrames(n_slots)
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while self._running:
+            if not self._cap.grab():
+                self.anillo.invalidar()
+                time.sleep(0.001)
+                continue
+            sin_slot = self.anillo.sin_slot
+            if self.anillo.escribir_desde(self._cap) is None and self.anillo.sin_slot == sin_slot:
+                # retrieve fallido (no es falta de slot): igual que read() fallido.
+                self.anillo.invalidar()
+                time.sleep(0.001)
+
+    def prestar(self, despues_de: int = 0) -> FramePrestado | None:
+        return self.anillo.prestar(despues_de)
+
+    def liberar(self, prestado: FramePrestado) -> None:
+        self.anillo.liberar(prestado)
+
+    def read_copy(self) -> tuple[bool, np.ndarray | None]:
+        prestado = self.anillo.prestar()
+        if prestado is None:
+            return False, None
+        with prestado:
+            return True, prestado.copia()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -69,21 +69,91 @@ def letterbox_bgr(
     target_width, target_height = out_wh[0], out_wh[1]
     image_height, image_width = image_bgr.shape[:2]
 
-    aspect_ratio = min(target_width / image_width, target_height / image_height)
-    new_width = int(image_width * aspect_ratio)
-    new_height = int(image_height * aspect_ratio)
-
+    meta, (new_width, new_height) = _letterbox_geometria(image_width, image_height, out_wh)
     resized = cv2.resize(image_bgr, (new_width, new_height), interpolation=cv2.INTER_AREA)
 
     canvas = (np.ones((target_height, target_width, 3), dtype=np.uint8) * fill_value).astype(
         np.uint8
     )
-    offset_x = (target_width - new_width) // 2
-    offset_y = (target_height - new_height) // 2
+    offset_x, offset_y = meta.offset_x, meta.offset_y
     canvas[offset_y : offset_y + new_height, offset_x : offset_x + new_width] = resized
+    return canvas, meta
 
+
+def _letterbox_geometria(
+    image_width: int, image_height: int, out_wh: tuple[int, int]
+) -> tuple[LetterboxMeta, tuple[int, int]]:
+    """Meta del letterbox y (ancho, alto) del contenido redimensionado dentro del lienzo."""
+    target_width, target_height = out_wh[0], out_wh[1]
+    aspect_ratio = min(target_width / image_width, target_height / image_height)
+    new_width = int(image_width * aspect_ratio)
+    new_height = int(image_height * aspect_ratio)
+    offset_x = (target_width - new_width) // 2
+    offset_y = (target_height - new_height) // 2
     meta = LetterboxMeta(aspect_ratio=aspect_ratio, offset_x=offset_x, offset_y=offset_y)
-    return canvas, meta
+    return meta, (new_width, new_height)
+
+
+class LetterboxDestino:
+    """
+    ``letterbox_bgr`` escribiendo en un lienzo fijo ``destino`` (``(out_h, out_w, 3)`` uint8),
+    p. ej. el tensor de entrada NHWC preasignado del modelo.
+
+    - ``cv2.resize(dst=roi)`` redimensiona directamente sobre la vista del contenido; no hay
+      lienzo nuevo ni copia intermedia.
+    - ``LetterboxMeta``, la vista ROI y el relleno de las barras se calculan solo cuando cambia
+      la resolucion de entrada (una vez para una camara fija): las barras se rellenan entonces
+      con ``fill_value`` y el resize nunca las toca.
+
+    Mismo resultado pixel a pixel que ``letterbox_bgr``. El lienzo devuelto es siempre
+    ``destino``: consumirlo antes de la siguiente llamada. Si otro codigo escribe en las barras
+    (p. ej. un ``cvtColor`` sobre todo el lienzo con un relleno no gris), llamar a ``invalidar``.
+    """
+
+    def __init__(
+        self,
+        out_wh: tuple[int, int],
+        fill_value: int,
+        destino: np.ndarray | None = None,
+    ) -> None:
+        ancho, alto = out_wh
+        if destino is None:
+            destino = np.empty((alto, ancho, 3), dtype=np.uint8)
+        if destino.shape != (alto, ancho, 3) or destino.dtype != np.uint8:
+            raise ValueError(f"destino debe ser ({alto}, {ancho}, 3) uint8, no {destino.shape} {destino.dtype}")
+        self.out_wh = (ancho, alto)
+        self.fill_value = fill_value
+        self.destino = destino
+        self.meta: LetterboxMeta | None = None
+        self.roi: np.ndarray | None = None
+        self._wh_entrada: tuple[int, int] | None = None
+        self._wh_contenido = (0, 0)
+
+    def invalidar(self) -> None:
+        """Fuerza recalcular meta y rellenar de nuevo las barras en la siguiente llamada."""
+        self._wh_entrada = None
+
+    def _preparar(self, image_width: int, image_height: int) -> None:
+        self.meta, self._wh_contenido = _letterbox_geometria(image_width, image_height, self.out_wh)
+        new_width, new_height = self._wh_contenido
+        ox, oy = self.meta.offset_x, self.meta.offset_y
+        d = self.destino
+        # Solo las barras: arriba / abajo y izquierda / derecha del contenido.
+        d[:oy] = self.fill_value
+        d[oy + new_height :] = self.fill_value
+        d[oy : oy + new_height, :ox] = self.fill_value
+        d[oy : oy + new_height, ox + new_width :] = self.fill_value
+        self.roi = d[oy : oy + new_height, ox : ox + new_width]
+        self._wh_entrada = (image_width, image_height)
+
+    def __call__(self, image_bgr: np.ndarray) -> tuple[np.ndarray, LetterboxMeta]:
+        if image_bgr.ndim != 3 or image_bgr.shape[2] != 3:
+            raise ValueError("image_bgr debe ser (H, W, 3) BGR")
+        image_height, image_width = image_bgr.shape[:2]
+        if (image_width, image_height) != self._wh_entrada:
+            self._preparar(image_width, image_height)
+        cv2.resize(image_bgr, self._wh_contenido, dst=self.roi, interpolation=cv2.INTER_AREA)
+        return self.destino, self.meta
 
 
 def ajustar_frame_manteniendo_aspect_ratio(frame, max_ancho, max_alto):
@@ -0,0 +1,174 @@
+"""
+Decodificacion JPEG a resolucion reducida para detectores de entrada pequena.
+
+Un snapshot de 2560x1920 (``SNAP_HTTP_URL_RES_FULL``) se decodifica entero y a continuacion se
+reduce a 320x320 (RetinaFace) o 640x640 (YOLOv8). libjpeg puede escalar durante la IDCT: con
+``IMREAD_REDUCED_COLOR_2/4/8`` la salida es 1/2, 1/4 u 1/8 del tamano (redondeando hacia
+arriba) y la decodificacion es mucho mas barata.
+
+``factor_reduccion`` elige el mayor factor cuya salida sigue cubriendo la entrada del modelo
+(no se amplia nunca). ``FrameReducido`` guarda el JPEG original para:
+
+- ``a_completa(dets)``: pasar cajas / landmarks del frame reducido a coordenadas del JPEG
+  completo (escala exacta por eje, el redondeo de libjpeg incluido).
+- ``recorte(caja)``: recorte a resolucion completa bajo demanda (p. ej. para el embedding
+  facial); la decodificacion completa se hace una sola vez y solo si se pide.
+
+Ejemplo:
+    snap = decodificar_reducido(cuerpo_http, (320, 320))
+    dets = detectar(snap.frame)                 # coordenadas del frame reducido
+    dets_full = snap.a_completa(dets)           # coordenadas 2560x1920
+    cara = snap.recorte(dets_full[0, :4], margen=0.1)
+"""
+from __future__ import annotations
+
+import numpy as np
+import cv2
+
+FLAGS_REDUCCION = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Marcadores SOF (Start Of Frame) con dimensiones; C4 (DHT), C8 (JPG) y CC (DAC) no lo son.
+_MARCADORES_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def dimensiones_jpeg(cuerpo: bytes | np.ndarray) -> tuple[int, int] | None:
+    """(ancho, alto) leidos de la cabecera SOF del JPEG sin decodificar; None si no es JPEG."""
+    datos = memoryview(cuerpo).cast("B")
+    if len(datos) < 4 or datos[0] != 0xFF or datos[1] != 0xD8:
+        return None
+    i = 2
+    n = len(datos)
+    while i + 4 <= n:
+        if datos[i] != 0xFF:
+            return None
+        marcador = datos[i + 1]
+        if marcador == 0xFF:  # relleno entre segmentos
+            i += 1
+            continue
+        if marcador in (0xD8, 0x01) or 0xD0 <= marcador <= 0xD7:
+            i += 2
+            continue
+        largo = (datos[i + 2] << 8) | datos[i + 3]
+        if marcador in _MARCADORES_SOF:
+            if i + 9 > n:
+                return None
+            alto = (datos[i + 5] << 8) | datos[i + 6]
+            ancho = (datos[i + 7] << 8) | datos[i + 8]
+            return ancho, alto
+        if marcador == 0xDA:  # inicio de datos sin SOF previo
+            return None
+        i += 2 + largo
+    return None
+
+
+def factor_reduccion(
+    ancho: int, alto: int, entrada_wh: tuple[int, int], letterbox: bool = True
+) -> int:
+    """
+    Mayor factor de ``FLAGS_REDUCCION`` cuya salida (``ceil(lado / f)``) sigue cubriendo la
+    entrada del detector.
+
+    - ``letterbox=True`` (RetinaFace): basta con cubrir el contenido del letterbox, es decir el
+      lado limitante (``f <= max(ancho / w_in, alto / h_in)``).
+    - ``letterbox=False`` (resize directo, YOLOv8): ambos lados deben cubrir la entrada.
+    """
+    w_in, h_in = entrada_wh
+    rx, ry = ancho / w_in, alto / h_in
+    # Letterbox: la escala la fija el lado que mas reduce (r = min(w_in/ancho, h_in/alto)).
+    limite = max(rx, ry) if letterbox else min(rx, ry)
+    for f in (8, 4, 2):
+        if f <= limite:
+            return f
+    return 1
+
+
+class FrameReducido:
+    """Frame decodificado a 1/``factor`` con el JPEG original para volver a resolucion completa."""
+
+    __slots__ = ("frame", "factor", "ancho_completo", "alto_completo", "_cuerpo", "_completo")
+
+    def __init__(
+        self,
+        frame: np.ndarray,
+        factor: int,
+        ancho_completo: int,
+        alto_completo: int,
+        cuerpo: bytes | np.ndarray,
+    ) -> None:
+        self.frame = frame
+        self.factor = factor
+        self.ancho_completo = ancho_completo
+        self.alto_completo = alto_completo
+        self._cuerpo = cuerpo
+        self._completo: np.ndarray | None = frame if factor == 1 else None
+
+    @property
+    def escala_xy(self) -> tuple[float, float]:
+        """Multiplicadores reducido -> completo (exactos: libjpeg redondea el tamano hacia arriba)."""
+        h, w = self.frame.shape[:2]
+        return self.ancho_completo / w, self.alto_completo / h
+
+    def a_completa(self, dets: np.ndarray) -> np.ndarray:
+        """
+        Copia de ``dets`` en coordenadas del JPEG completo.
+
+        Acepta cajas ``(N, 4)`` o filas RetinaFace ``(N, 15)`` (``x1, y1, x2, y2, score`` +
+        5 landmarks ``x, y``); el score (columna 4) no se toca.
+        """
+        out = np.array(dets, dtype=np.float32, copy=True)
+        if self.factor == 1 or out.size == 0:
+            return out
+        sx, sy = self.escala_xy
+        cols = out.shape[1]
+        xs = [0, 2] + list(range(5, cols, 2))
+        ys = [1, 3] + list(range(6, cols, 2))
+        out[:, xs] *= sx
+        out[:, ys] *= sy
+        return out
+
+    def completo(self) -> np.ndarray:
+        """Decodificacion a resolucion completa (perezosa, una vez por frame)."""
+        if self._completo is None:
+            self._completo = cv2.imdecode(
+                np.frombuffer(self._cuerpo, dtype=np.uint8), cv2.IMREAD_COLOR
+            )
+        return self._completo
+
+    def recorte(self, caja: np.ndarray | tuple, margen: float = 0.0) -> np.ndarray:
+        """
+        Recorte (vista) del frame completo; ``caja`` = ``x1, y1, x2, y2`` en coordenadas
+        completas (ver ``a_completa``) y ``margen`` relativo al lado de la caja.
+        """
+        x1, y1, x2, y2 = (float(v) for v in caja[:4])
+        mx, my = (x2 - x1) * margen, (y2 - y1) * margen
+        x1 = max(0, int(x1 - mx))
+        y1 = max(0, int(y1 - my))
+        x2 = min(self.ancho_completo, int(np.ceil(x2 + mx)))
+        y2 = min(self.alto_completo, int(np.ceil(y2 + my)))
+        return self.completo()[y1:y2, x1:x2]
+
+
+def decodificar_reducido(
+    cuerpo: bytes | np.ndarray,
+    entrada_wh: tuple[int, int] | None,
+    letterbox: bool = True,
+) -> FrameReducido | None:
+    """
+    ``imdecode`` al menor tamano que cubre ``entrada_wh`` (None = completo). El buffer se pasa
+    con ``np.frombuffer`` (sin copia). Devuelve None si el JPEG no se puede decodificar.
+    """
+    factor = 1
+    dims = dimensiones_jpeg(cuerpo)
+    if entrada_wh is not None and dims is not None:
+        factor = factor_reduccion(dims[0], dims[1], entrada_wh, letterbox)
+    frame = cv2.imdecode(np.frombuffer(cuerpo, dtype=np.uint8), FLAGS_REDUCCION[factor])
+    if frame is None or frame.size == 0:
+        return None
+    if dims is None:  # sin SOF legible solo se decodifica completo (factor 1)
+        dims = (frame.shape[1], frame.shape[0])
+    return FrameReducido(frame, factor, dims[0], dims[1], cuerpo)
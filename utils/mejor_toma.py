@@ -0,0 +1,227 @@
+"""
+Seleccion de la mejor toma por track antes de MobileFaceNet: en lugar de embeber cada cara que
+supera ``MIN_SCORE_MEJOR_CARA_EMBEDDING``, cada track (``utils.tracker_caras``) acumula
+candidatas durante ``ventana_seg`` y solo se embeben las ``top_k`` de mayor calidad.
+
+Calidad de una deteccion RetinaFace (``calidad_cara``), cada termino en [0, 1]:
+
+- score: el del detector.
+- tamano: ancho de la caja / ``tam_ref`` (MobileFaceNet recibe 112x112; una cara mas pequena se
+  amplia sin detalle).
+- nitidez: varianza del Laplaciano del recorte en gris reducido a 64x64 (independiente del
+  tamano), ``v / (v + nitidez_ref)``.
+- frontal: de los 5 landmarks; alabeo (angulo de la linea de los ojos), giro (desplazamiento de
+  la nariz sobre el eje de los ojos) y cabeceo (altura de la nariz entre ojos y boca). El
+  recorte no se alinea, asi que una cabeza inclinada 25 grados ya baja mucho la similitud.
+
+Total = media geometrica ponderada (``PesosCalidad``): un termino malo hunde la toma aunque el
+resto sea bueno. Candidatas por debajo de ``calidad_min`` no entran en el buffer. Coste por cara:
+un ``cvtColor`` + ``resize`` + ``Laplacian`` sobre el recorte (~0.2 ms); el recorte con margen
+solo se copia si entra en el top-k.
+
+``SelectorMejorToma.listos(t, activos)`` entrega las ventanas cerradas (``ventana_seg`` desde la
+primera candidata); las de tracks que ya no estan activos se descartan. ``embeddings_de_tomas``
+embebe todas las tomas de todos los tracks listos en una llamada ``embeddings_de_crops`` y
+devuelve un embedding por track (media L2-normalizada de sus tomas).
+
+Ejemplo:
+    ids = tracker.actualizar(dets, t)
+    for i in np.flatnonzero(tracker.pendientes_embedding(ids, t)):
+        selector.agregar(int(ids[i]), frame, dets[i], t)
+    listos = selector.listos(t, tracker.tracks)
+    if listos:
+        res = galeria.buscar(embeddings_de_tomas(embedder, listos), k=1)
+        tracker.registrar_identidades([l.id_track for l in listos], [n[0] for n in res.nombres], res.sims[:, 0], t)
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import time
+from typing import Any, Iterable, NamedTuple
+
+import cv2
+import numpy as np
+
+from .face_embedding import (
+    FACE_CROP_MARGIN_FRAC,
+    MOBILEFACENET_EMB_DIM,
+    bbox_crop_with_margin,
+    l2_normalize_filas,
+)
+
+LADO_NITIDEZ = 64
+# Los landmarks RetinaFace subestiman el alabeo (~0.6 x el real): 30 aqui son ~50 grados.
+ALABEO_MAX_GRADOS = 30.0
+GIRO_MAX = 0.6  # desplazamiento de la nariz / distancia entre ojos
+CABECEO_CENTRO = 0.5  # altura nariz / altura boca (desde los ojos); 0.4-0.6 en caras frontales
+CABECEO_MAX = 0.5
+
+
+class PesosCalidad(NamedTuple):
+    score: float = 1.0
+    tamano: float = 1.0
+    nitidez: float = 1.0
+    frontal: float = 2.0
+
+
+class ParametrosMejorToma(NamedTuple):
+    top_k: int = 1
+    ventana_seg: float = 2.0
+    calidad_min: float = 0.3
+    tam_ref: float = 80.0  # ancho de cara (px) con tamano = 1
+    nitidez_ref: float = 1000.0  # varianza del Laplaciano con nitidez = 0.5 (nitida ~4000)
+    margen: float = FACE_CROP_MARGIN_FRAC
+    pesos: PesosCalidad = PesosCalidad()
+
+
+class CalidadCara(NamedTuple):
+    total: float
+    score: float
+    tamano: float
+    nitidez: float
+    frontal: float
+
+
+class TomasTrack(NamedTuple):
+    """Ventana cerrada de un track: recortes BGR (con margen) de mejor a peor calidad."""
+
+    id_track: int
+    recortes: list[np.ndarray]
+    calidades: list[CalidadCara]
+
+
+def frontalidad(landmarks: np.ndarray) -> float:
+    """[0, 1] a partir de los 5 landmarks RetinaFace (ojo izq, ojo der, nariz, boca izq, boca der)."""
+    ojo_i, ojo_d, nariz, boca_i, boca_d = np.asarray(landmarks, dtype=np.float32).reshape(5, 2)
+    eje = ojo_d - ojo_i
+    dist_ojos = float(np.hypot(eje[0], eje[1]))
+    if dist_ojos < 1.0:
+        return 0.0
+    u = eje / dist_ojos
+    v = np.array([-u[1], u[0]], dtype=np.float32)
+    centro_ojos = (ojo_i + ojo_d) / 2
+    alabeo = abs(float(np.degrees(np.arctan2(u[1], u[0]))))
+    giro = abs(float(np.dot(nariz - centro_ojos, u))) / dist_ojos
+    alto_boca = float(np.dot((boca_i + boca_d) / 2 - centro_ojos, v))
+    cabeceo = float(np.dot(nariz - centro_ojos, v)) / alto_boca if alto_boca > 1.0 else 0.0
+    return (
+        max(0.0, 1.0 - alabeo / ALABEO_MAX_GRADOS)
+        * max(0.0, 1.0 - giro / GIRO_MAX)
+        * max(0.0, 1.0 - abs(cabeceo - CABECEO_CENTRO) / CABECEO_MAX)
+    )
+
+
+def nitidez_laplaciana(frame_bgr: np.ndarray, caja: np.ndarray) -> float:
+    """Varianza del Laplaciano del recorte ``caja`` en gris reducido a 64x64."""
+    h, w = frame_bgr.shape[:2]
+    x1, y1 = max(0, int(caja[0])), max(0, int(caja[1]))
+    x2, y2 = min(w, int(np.ceil(caja[2]))), min(h, int(np.ceil(caja[3])))
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return 0.0
+    gris = cv2.cvtColor(frame_bgr[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+    gris = cv2.resize(gris, (LADO_NITIDEZ, LADO_NITIDEZ), interpolation=cv2.INTER_AREA)
+    _, desv = cv2.meanStdDev(cv2.Laplacian(gris, cv2.CV_16S, ksize=3))
+    return float(desv[0, 0]) ** 2
+
+
+def calidad_cara(
+    frame_bgr: np.ndarray, det: np.ndarray, params: ParametrosMejorToma = ParametrosMejorToma()
+) -> CalidadCara:
+    """Calidad de ``det`` (fila ``(15,)`` RetinaFace en pixeles de ``frame_bgr``)."""
+    score = float(np.clip(det[4], 0.0, 1.0))
+    tamano = min(1.0, float(det[2] - det[0]) / params.tam_ref)
+    v = nitidez_laplaciana(frame_bgr, det)
+    nitidez = v / (v + params.nitidez_ref)
+    frontal = frontalidad(det[5:15])
+    p = params.pesos
+    terminos = ((score, p.score), (tamano, p.tamano), (nitidez, p.nitidez), (frontal, p.frontal))
+    log_total = sum(w * np.log(max(x, 1e-6)) for x, w in terminos) / sum(w for _, w in terminos)
+    return CalidadCara(float(np.exp(log_total)), score, tamano, nitidez, frontal)
+
+
+class _Ventana:
+    def __init__(self, t_inicio: float) -> None:
+        self.t_inicio = t_inicio
+        self.mejores: list[tuple[float, int, np.ndarray, CalidadCara]] = []  # min-heap de top_k
+
+
+class SelectorMejorToma:
+    """Buffer de las ``top_k`` mejores tomas por track dentro de ``ventana_seg``."""
+
+    def __init__(self, params: ParametrosMejorToma = ParametrosMejorToma()) -> None:
+        if params.top_k < 1:
+            raise ValueError("top_k debe ser >= 1")
+        self.params = params
+        self._ventanas: dict[int, _Ventana] = {}
+        self._orden = itertools.count()  # desempate estable en el heap
+        self.candidatas = 0
+        self.descartadas = 0  # por debajo de calidad_min
+        self.tomas = 0  # recortes entregados para embeber
+        self.ventanas = 0  # ventanas cerradas con tomas
+        self.ms_calidad = 0.0
+
+    def en_espera(self, id_track: int) -> bool:
+        return id_track in self._ventanas
+
+    def agregar(self, id_track: int, frame_bgr: np.ndarray, det: np.ndarray, t: float | None = None) -> CalidadCara:
+        """Puntua ``det`` y, si esta entre las ``top_k`` de la ventana del track, copia su recorte."""
+        now = time.monotonic() if t is None else t
+        t0 = time.perf_counter()
+        calidad = calidad_cara(frame_bgr, det, self.params)
+        self.candidatas += 1
+        if calidad.total < self.params.calidad_min:
+            self.descartadas += 1
+        else:
+            ventana = self._ventanas.get(id_track)
+            if ventana is None:
+                ventana = self._ventanas[id_track] = _Ventana(now)
+            heap = ventana.mejores
+            if len(heap) < self.params.top_k or calidad.total > heap[0][0]:
+                h, w = frame_bgr.shape[:2]
+                x1, y1, x2, y2 = bbox_crop_with_margin(det, w, h, self.params.margen)
+                entrada = (calidad.total, next(self._orden), frame_bgr[y1 : y2 + 1, x1 : x2 + 1].copy(), calidad)
+                if len(heap) < self.params.top_k:
+                    heapq.heappush(heap, entrada)
+                else:
+                    heapq.heapreplace(heap, entrada)
+        self.ms_calidad += (time.perf_counter() - t0) * 1000.0
+        return calidad
+
+    def listos(self, t: float | None, activos: Iterable[int]) -> list[TomasTrack]:
+        """Ventanas cerradas de los tracks ``activos``; las de tracks desaparecidos se tiran."""
+        now = time.monotonic() if t is None else t
+        activos = set(activos)
+        salida = []
+        for id_track in list(self._ventanas):
+            ventana = self._ventanas[id_track]
+            if id_track not in activos:
+                del self._ventanas[id_track]
+            elif now - ventana.t_inicio >= self.params.ventana_seg:
+                del self._ventanas[id_track]
+                mejores = sorted(ventana.mejores, reverse=True)
+                salida.append(TomasTrack(id_track, [m[2] for m in mejores], [m[3] for m in mejores]))
+                self.tomas += len(mejores)
+                self.ventanas += 1
+        return salida
+
+    def resumen(self) -> str:
+        ms = self.ms_calidad / self.candidatas if self.candidatas else 0.0
+        return (
+            f"candidatas={self.candidatas} descartadas={self.descartadas} ventanas={self.ventanas} "
+            f"tomas={self.tomas} calidad {ms:.3f} ms/cara"
+        )
+
+
+def embeddings_de_tomas(embedder: Any, listos: list[TomasTrack]) -> np.ndarray:
+    """
+    ``(len(listos), 128)``: todas las tomas en una llamada ``embeddings_de_crops`` y, por track,
+    la media L2-normalizada de sus embeddings.
+    """
+    if not listos:
+        return np.zeros((0, MOBILEFACENET_EMB_DIM), dtype=np.float32)
+    recortes = [r for tomas in listos for r in tomas.recortes]
+    embs = embedder.embeddings_de_crops(recortes)
+    limites = np.cumsum([0] + [len(tomas.recortes) for tomas in listos])
+    medias = np.stack([embs[a:b].mean(axis=0) for a, b in zip(limites[:-1], limites[1:])])
+    return l2_normalize_filas(medias)
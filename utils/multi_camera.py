@@ -0,0 +1,198 @@
+"""
+Varias camaras en un solo proceso: N ``CaptureCameras`` (cada una con su hilo y su politica de
+reconexion) y un planificador que entrega sus frames a **un** consumidor de inferencia, asi un
+solo modelo cargado atiende a todas las camaras.
+
+Cada fuente solo guarda su ultimo frame (como ``CaptureCameras``); si el consumidor va mas
+lento que las camaras, los frames intermedios se descartan y se cuentan por camara.
+
+Politicas (``GestorCamaras(politica=...)``):
+
+- ``round_robin``: recorre las camaras en orden empezando tras la ultima servida y entrega la
+  primera con frame nuevo.
+- ``mas_antiguo``: entre las camaras con frame nuevo, la que lleva mas tiempo sin ser servida
+  (ninguna camara rapida acapara al consumidor).
+
+Config: lista de dicts (o JSON, ver ``configs.settings.CAMARAS_CONFIG``) con claves
+``nombre``, ``modo`` (RTSP / SNAP / USB / FILE), ``url``, ``usb_index``, ``max_fps``,
+``reintento_seg``, ``anillo_slots``, ``entrada_detector`` (SNAP: ``[ancho, alto]`` del
+detector para decodificar el JPEG reducido); las que falten toman el valor global de settings.
+
+Con ``snap_en_vuelo > 0`` (por defecto ``configs.settings.SNAP_EN_VUELO``) las fuentes SNAP no
+usan un hilo ``requests`` cada una: comparten un ``utils.snap_async.ClienteSnapAsync`` con
+conexiones keep-alive y hasta ``snap_en_vuelo`` peticiones en vuelo entre todas.
+
+Ejemplo:
+    gestor = GestorCamaras(cargar_config_camaras("camaras.json")).start()
+    while True:
+        item = gestor.siguiente_frame(timeout=1.0)
+        if item is not None:
+            procesar(item.nombre, item.frame)
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from configs import settings as s
+
+from .capture_cameras import CaptureCameras
+from .snap_async import ClienteSnapAsync
+
+POLITICAS_SCHEDULER = ("round_robin", "mas_antiguo")
+CLAVES_FUENTE = (
+    "nombre", "modo", "url", "usb_index", "max_fps", "reintento_seg", "anillo_slots",
+    "entrada_detector",
+)
+
+
+class FrameCamara(NamedTuple):
+    """Frame entregado por ``GestorCamaras.siguiente_frame``."""
+
+    nombre: str
+    frame: np.ndarray
+    seq: int
+    t_captura: float  # time.monotonic() al publicarse en la fuente
+
+
+class EstadisticasCamara:
+    """Contadores por camara (los actualiza solo el hilo consumidor)."""
+
+    def __init__(self) -> None:
+        self.servidos = 0
+        self.descartados = 0
+        self.ultimo_seq = 0
+        self.ultimo_servicio = 0.0
+        self.espera_ms_total = 0.0
+
+    @property
+    def espera_ms_media(self) -> float:
+        return self.espera_ms_total / self.servidos if self.servidos else 0.0
+
+
+def cargar_config_camaras(config: str | Path | list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Lista de fuentes desde un JSON (ruta) o una lista ya cargada; valida claves."""
+    if isinstance(config, (str, Path)):
+        config = json.loads(Path(config).read_text(encoding="utf-8"))
+    if not isinstance(config, list) or not config:
+        raise ValueError("La config de camaras debe ser una lista no vacia")
+    fuentes = []
+    for i, fuente in enumerate(config):
+        desconocidas = set(fuente) - set(CLAVES_FUENTE)
+        if desconocidas:
+            raise ValueError(f"Fuente {i}: claves desconocidas {sorted(desconocidas)}")
+        fuente = dict(fuente)
+        fuente.setdefault("nombre", f"cam{i}")
+        fuentes.append(fuente)
+    nombres = [f["nombre"] for f in fuentes]
+    if len(set(nombres)) != len(nombres):
+        raise ValueError(f"Nombres de camara repetidos: {nombres}")
+    return fuentes
+
+
+class GestorCamaras:
+    """N fuentes ``CaptureCameras`` + planificador justo hacia un unico consumidor."""
+
+    def __init__(
+        self,
+        fuentes: list[dict[str, Any]],
+        politica: str = "round_robin",
+        snap_en_vuelo: int | None = None,
+    ) -> None:
+        if politica not in POLITICAS_SCHEDULER:
+            raise ValueError(f"Politica desconocida: {politica} (usar {POLITICAS_SCHEDULER})")
+        self.politica = politica
+        self._evento = threading.Event()
+        snap_en_vuelo = s.SNAP_EN_VUELO if snap_en_vuelo is None else snap_en_vuelo
+        fuentes = cargar_config_camaras(fuentes)
+        snap = [
+            f for f in fuentes
+            if snap_en_vuelo > 0 and (f.get("modo") or s.MODO).upper() == "SNAP"
+        ]
+        self._capturas = [
+            CaptureCameras(evento_frame=self._evento, **f) for f in fuentes if f not in snap
+        ]
+        self._cliente_snap = (
+            ClienteSnapAsync(snap, en_vuelo=snap_en_vuelo, evento_frame=self._evento)
+            if snap
+            else None
+        )
+        por_nombre = {c.nombre: c for c in self._capturas}
+        if self._cliente_snap is not None:
+            por_nombre.update({c.nombre: c for c in self._cliente_snap.camaras})
+        self.camaras = [por_nombre[f["nombre"]] for f in fuentes]  # orden de la config
+        self.estadisticas = {c.nombre: EstadisticasCamara() for c in self.camaras}
+        self._siguiente_rr = 0
+
+    def start(self) -> "GestorCamaras":
+        for camara in self._capturas:
+            camara.start()
+        if self._cliente_snap is not None:
+            self._cliente_snap.start()
+        return self
+
+    def stop(self) -> None:
+        for camara in self._capturas:
+            camara.is_running = False
+        if self._cliente_snap is not None:
+            self._cliente_snap.stop()
+        for camara in self._capturas:
+            camara.stop()
+
+    def _elegir(self):
+        n = len(self.camaras)
+        if self.politica == "round_robin":
+            for k in range(n):
+                camara = self.camaras[(self._siguiente_rr + k) % n]
+                if camara.hay_frame_nuevo():
+                    self._siguiente_rr = (self._siguiente_rr + k + 1) % n
+                    return camara
+            return None
+        listas = [c for c in self.camaras if c.hay_frame_nuevo()]
+        if not listas:
+            return None
+        return min(listas, key=lambda c: self.estadisticas[c.nombre].ultimo_servicio)
+
+    def siguiente_frame(self, timeout: float | None = None) -> FrameCamara | None:
+        """
+        Siguiente frame segun la politica; espera hasta ``timeout`` s (None = sin limite)
+        a que alguna camara publique. Devuelve None si vence el timeout.
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Limpiar antes de mirar: un frame publicado despues vuelve a activar el evento.
+            self._evento.clear()
+            camara = self._elegir()
+            if camara is not None:
+                ok, frame, seq, ts = camara.get_frame_info()
+                if ok and frame is not None:
+                    return self._registrar(camara.nombre, frame, seq, ts)
+                continue
+            restante = None if limite is None else limite - time.monotonic()
+            if restante is not None and restante <= 0:
+                return None
+            self._evento.wait(restante)
+
+    def _registrar(self, nombre: str, frame: np.ndarray, seq: int, ts: float) -> FrameCamara:
+        est = self.estadisticas[nombre]
+        ahora = time.monotonic()
+        if est.ultimo_seq and seq > est.ultimo_seq + 1:
+            est.descartados += seq - est.ultimo_seq - 1
+        est.ultimo_seq = seq
+        est.servidos += 1
+        est.ultimo_servicio = ahora
+        est.espera_ms_total += (ahora - ts) * 1000.0
+        return FrameCamara(nombre, frame, seq, ts)
+
+    def resumen(self) -> str:
+        partes = [
+            f"{nombre}: servidos={e.servidos} descartados={e.descartados} "
+            f"espera_media={e.espera_ms_media:.1f}ms"
+            for nombre, e in self.estadisticas.items()
+        ]
+        return " | ".join(partes)
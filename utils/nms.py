@@ -0,0 +1,175 @@
+"""
+NMS (non-maximum suppression) compartido por RetinaFace y YOLOv8.
+
+Dos convenciones de area, seleccionables con ``area_mas_uno``:
+
+- ``area_mas_uno=True``: area = (x2 - x1 + 1) * (y2 - y1 + 1), como el demo RetinaFace del
+  Zoo Rockchip (``aux_tools_retinaface.nms``); cajas en pixeles enteros.
+- ``area_mas_uno=False``: area = (x2 - x1) * (y2 - y1), como el postproceso YOLOv8
+  (Ultralytics); cajas continuas.
+
+``nms_matriz`` calcula matrices IoU par a par por bloques y luego recorre solo los indices
+que siguen vivos; ``nms_greedy`` es el bucle original (una pasada de IoU por caja retenida) y
+se mantiene como referencia para comprobar equivalencia (ver ``bench/bench_nms.py``).
+
+Ambas devuelven los mismos indices en el mismo orden (score descendente).
+"""
+from __future__ import annotations
+
+import numpy as np
+
+# Candidatos por bloque en ``nms_matriz``: la matriz mas grande es NMS_BLOQUE x N.
+NMS_BLOQUE = 64
+
+
+def _areas(boxes: np.ndarray, area_mas_uno: bool) -> np.ndarray:
+    extra = 1.0 if area_mas_uno else 0.0
+    return (boxes[:, 2] - boxes[:, 0] + extra) * (boxes[:, 3] - boxes[:, 1] + extra)
+
+
+def iou_matriz(
+    boxes_a: np.ndarray,
+    boxes_b: np.ndarray,
+    *,
+    area_mas_uno: bool = False,
+) -> np.ndarray:
+    """
+    IoU par a par entre ``boxes_a`` (N, 4) y ``boxes_b`` (M, 4) en formato ``x1, y1, x2, y2``.
+
+    Returns:
+        Matriz ``(N, M)``; ``[i, j]`` es el IoU entre ``boxes_a[i]`` y ``boxes_b[j]``.
+    """
+    extra = 1.0 if area_mas_uno else 0.0
+    ax1, ay1, ax2, ay2 = (np.ascontiguousarray(boxes_a[:, k])[:, np.newaxis] for k in range(4))
+    bx1, by1, bx2, by2 = (np.ascontiguousarray(boxes_b[:, k]) for k in range(4))
+    # Operaciones in place sobre dos buffers (N, M) para no crear un temporal por paso.
+    inter = np.minimum(ax2, bx2)
+    inter -= np.maximum(ax1, bx1)
+    inter += extra
+    np.maximum(inter, 0.0, out=inter)
+    alto = np.minimum(ay2, by2)
+    alto -= np.maximum(ay1, by1)
+    alto += extra
+    np.maximum(alto, 0.0, out=alto)
+    inter *= alto
+    union = alto
+    np.add(_areas(boxes_a, area_mas_uno)[:, np.newaxis], _areas(boxes_b, area_mas_uno), out=union)
+    union -= inter
+    np.maximum(union, 1e-6, out=union)
+    inter /= union
+    return inter
+
+
+def nms_greedy(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_thres: float,
+    *,
+    area_mas_uno: bool = False,
+) -> np.ndarray:
+    """
+    NMS greedy de referencia: una pasada vectorizada por cada caja retenida.
+
+    Es el mismo algoritmo que tenian ``aux_tools_retinaface.nms`` y el bucle de
+    ``postprocess_yolov8_ultralytics``; se conserva para tests de equivalencia.
+
+    Returns:
+        Indices (int64) de las cajas retenidas, en orden de score descendente.
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    extra = 1.0 if area_mas_uno else 0.0
+    areas = _areas(boxes, area_mas_uno)
+    order = scores.argsort()[::-1]
+
+    keep: list[int] = []
+    while order.size > 0:
+        i = int(order[0])
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(x1[i], x1[rest])
+        yy1 = np.maximum(y1[i], y1[rest])
+        xx2 = np.minimum(x2[i], x2[rest])
+        yy2 = np.minimum(y2[i], y2[rest])
+        inter = np.maximum(0.0, xx2 - xx1 + extra) * np.maximum(0.0, yy2 - yy1 + extra)
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        order = rest[iou <= iou_thres]
+    return np.array(keep, dtype=np.int64)
+
+
+def nms_matriz(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_thres: float,
+    *,
+    area_mas_uno: bool = False,
+    class_ids: np.ndarray | None = None,
+    bloque: int = NMS_BLOQUE,
+) -> np.ndarray:
+    """
+    NMS con matrices IoU por bloques (mismo resultado que ``nms_greedy``).
+
+    Los candidatos, ordenados por score, se procesan en bloques de ``bloque``:
+
+    1. Matriz IoU ``bloque x bloque`` en una sola operacion; el greedy dentro del bloque
+       solo indexa filas de esa matriz (sin recalcular intersecciones).
+    2. Matriz IoU ``retenidos_del_bloque x resto`` en una sola operacion; se descartan de
+       golpe todos los candidatos posteriores suprimidos por el bloque.
+
+    Con pocos candidatos (caso tipico RetinaFace) es un unico bloque = matriz completa. Con
+    cientos o miles (escenas concurridas, YOLOv8 con umbral bajo) el numero de pares es el
+    mismo que en el greedy, pero en ``N / bloque`` llamadas NumPy en vez de una por caja
+    retenida, y la memoria queda acotada a ``bloque x N``.
+
+    Args:
+        boxes: ``(N, 4)`` en ``x1, y1, x2, y2``.
+        scores: ``(N,)``.
+        iou_thres: Se suprime una caja si su IoU con una retenida es ``> iou_thres``.
+        area_mas_uno: Convencion de area (ver docstring del modulo).
+        class_ids: Si se pasa, NMS por clase en un solo lote: cada clase se desplaza a una
+            region disjunta (offset ``class_id * (max_coord + 1)``) para que cajas de clases
+            distintas nunca se solapen.
+        bloque: Candidatos por bloque.
+
+    Returns:
+        Indices (int64) retenidos, en orden de score descendente.
+    """
+    if boxes.shape[0] == 0:
+        return np.zeros((0,), dtype=np.int64)
+    if class_ids is not None:
+        boxes = desplazar_por_clase(boxes, class_ids)
+
+    order = scores.argsort()[::-1]
+    ordenadas = boxes[order]
+
+    keep: list[np.ndarray] = []
+    vivos = np.arange(order.size)
+    while vivos.size > 0:
+        actual, resto = vivos[:bloque], vivos[bloque:]
+        cajas_bloque = ordenadas[actual]
+        suprime = iou_matriz(cajas_bloque, cajas_bloque, area_mas_uno=area_mas_uno) > iou_thres
+
+        retenidos: list[int] = []
+        pendientes = np.arange(actual.size)
+        while pendientes.size > 0:
+            i = int(pendientes[0])
+            retenidos.append(i)
+            pendientes = pendientes[1:]
+            pendientes = pendientes[~suprime[i, pendientes]]
+        retenidos_idx = actual[retenidos]
+        keep.append(retenidos_idx)
+
+        if resto.size > 0:
+            iou_resto = iou_matriz(
+                ordenadas[retenidos_idx], ordenadas[resto], area_mas_uno=area_mas_uno
+            )
+            resto = resto[~(iou_resto > iou_thres).any(axis=0)]
+        vivos = resto
+    return order[np.concatenate(keep)]
+
+
+def desplazar_por_clase(boxes: np.ndarray, class_ids: np.ndarray) -> np.ndarray:
+    """Copia de ``boxes`` con offset por clase para NMS por clase en un solo lote."""
+    if boxes.shape[0] == 0:
+        return boxes.copy()
+    offset = float(np.max(boxes[:, :4])) + 1.0
+    return boxes[:, :4] + (np.asarray(class_ids, dtype=np.float64) * offset)[:, np.newaxis]
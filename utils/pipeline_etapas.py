@@ -0,0 +1,297 @@
+"""
+Pipeline por etapas (captura -> preproceso -> inferencia -> postproceso) con un hilo por etapa
+y colas acotadas entre ellas.
+
+En los ``main()`` de los scripts todo va en serie en un hilo: mientras Python decodifica,
+dibuja y guarda el frame N, la NPU (o ORT) esta parada. Aqui cada etapa corre en su hilo: con
+el frame N en postproceso, el N+1 ya esta en el acelerador. ORT, RKNNLite y casi todo OpenCV
+liberan el GIL, asi que las etapas se solapan de verdad.
+
+- Cada cola de entrada tiene ``capacidad`` items y politica **descartar el mas antiguo**: una
+  etapa lenta no hace crecer la latencia, solo pierde frames viejos (contados por etapa).
+- ``Etapa(nombre, fn, al_descartar)``: ``fn(dato) -> dato`` para la siguiente etapa (``None``
+  = filtrar el item). ``al_descartar(dato)`` se llama con los items que la cola tira, con
+  los que hacen fallar ``fn`` y con los que quedan sin procesar al parar (p. ej. devolver un
+  buffer a su ``PoolBuffers``).
+- La salida de la ultima etapa queda en una cola acotada que el hilo principal lee con
+  ``obtener`` (``imshow`` / ``waitKey`` deben ir en el hilo principal).
+- ``estadisticas()`` / ``resumen()``: por etapa, profundidad de cola actual y maxima,
+  descartes, procesados y latencia de ``fn`` (media / p95 en ms); mas la latencia extremo a
+  extremo desde ``poner``.
+
+Buffers reutilizados entre etapas (p. ej. el tensor de ``PreprocesadorEntrada``, que siempre
+devuelve el mismo array): con etapas en paralelo el preproceso del frame N+1 pisaria el tensor
+que la inferencia aun lee. ``PoolBuffers`` presta uno por item y la etapa que lo consume (o
+``al_descartar``) lo devuelve.
+
+Ejemplo:
+    pool = PoolBuffers(lambda: preprocesador_retinaface_onnx(inp0), n=4)
+    def preproceso(frame):
+        prep = pool.tomar()
+        tensor, meta = prep.letterbox(frame, RETINAFACE_LETTERBOX_FILL)
+        return frame, prep, tensor, meta
+    def inferencia(item):
+        frame, prep, tensor, meta = item
+        outputs = backend.infer_batch(tensor)
+        pool.devolver(prep)
+        return frame, outputs, meta
+    pipe = PipelineEtapas([
+        Etapa("preproceso", preproceso),
+        Etapa("inferencia", inferencia, al_descartar=lambda it: pool.devolver(it[1])),
+        Etapa("postproceso", decodificar_y_dibujar),
+    ]).start()
+    pipe.poner(frame)
+    res = pipe.obtener(timeout=0.01)
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+VENTANA_LATENCIAS = 256  # muestras recientes para media / p95 por etapa
+
+
+class ColaDescarte:
+    """Cola acotada: ``poner`` con la cola llena tira el item mas antiguo (y lo devuelve)."""
+
+    def __init__(self, capacidad: int) -> None:
+        if capacidad < 1:
+            raise ValueError("capacidad debe ser >= 1")
+        self.capacidad = capacidad
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self._cerrada = False
+        self.descartados = 0
+        self.profundidad_max = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def poner(self, item: Any) -> Any | None:
+        """
+        Encola ``item``; devuelve el item descartado para hacerle sitio (o None). Con la cola
+        cerrada no encola nada y devuelve el propio ``item``.
+        """
+        descartado = None
+        with self._cond:
+            if self._cerrada:
+                return item
+            if len(self._items) >= self.capacidad:
+                descartado = self._items.popleft()
+                self.descartados += 1
+            self._items.append(item)
+            self.profundidad_max = max(self.profundidad_max, len(self._items))
+            self._cond.notify()
+        return descartado
+
+    def tomar(self, timeout: float | None = None) -> Any | None:
+        """Item mas antiguo; None si vence ``timeout`` o la cola esta cerrada y vacia."""
+        with self._cond:
+            if not self._items and not self._cerrada:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def cerrar(self) -> list[Any]:
+        """Despierta a los lectores y devuelve los items pendientes."""
+        with self._cond:
+            self._cerrada = True
+            pendientes = list(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+        return pendientes
+
+
+class PoolBuffers:
+    """
+    ``n`` objetos reutilizables (creados con ``crear()``) prestados entre etapas. Para que
+    ``tomar`` no bloquee: ``n >= capacidad + 2`` (la cola de la etapa que los consume, el item
+    en curso en esa etapa y el que se esta escribiendo).
+    """
+
+    def __init__(self, crear: Callable[[], Any], n: int) -> None:
+        self._libres: queue.SimpleQueue = queue.SimpleQueue()
+        self.n = n
+        for _ in range(n):
+            self._libres.put(crear())
+
+    def tomar(self, timeout: float | None = None) -> Any:
+        """Bloquea hasta que haya uno libre (``queue.Empty`` si vence ``timeout``)."""
+        return self._libres.get(timeout=timeout)
+
+    def devolver(self, obj: Any) -> None:
+        self._libres.put(obj)
+
+    @property
+    def libres(self) -> int:
+        return self._libres.qsize()
+
+
+class Etapa:
+    """Etapa del pipeline: ``fn(dato) -> dato`` en su propio hilo."""
+
+    def __init__(
+        self,
+        nombre: str,
+        fn: Callable[[Any], Any],
+        al_descartar: Callable[[Any], None] | None = None,
+    ) -> None:
+        self.nombre = nombre
+        self.fn = fn
+        self.al_descartar = al_descartar
+        self.procesados = 0
+        self.filtrados = 0
+        self.errores = 0
+        self._latencias_ms: deque[float] = deque(maxlen=VENTANA_LATENCIAS)
+
+
+class ResultadoPipeline(NamedTuple):
+    """Salida de la ultima etapa."""
+
+    seq: int  # orden de entrada en ``poner`` (hay huecos si se descartaron frames)
+    t_entrada: float  # time.monotonic() en ``poner``
+    dato: Any
+
+
+class _Paquete(NamedTuple):
+    seq: int
+    t_entrada: float
+    dato: Any
+
+
+def _resumen_latencias(muestras) -> tuple[float, float]:
+    if not muestras:
+        return 0.0, 0.0
+    arr = np.fromiter(muestras, dtype=np.float64)
+    return float(arr.mean()), float(np.percentile(arr, 95))
+
+
+class PipelineEtapas:
+    """Etapas encadenadas con ``ColaDescarte`` de ``capacidad`` items a la entrada de cada una."""
+
+    def __init__(self, etapas: list[Etapa], capacidad: int = 2, capacidad_salida: int | None = None) -> None:
+        if not etapas:
+            raise ValueError("El pipeline necesita al menos una etapa")
+        self.etapas = etapas
+        self._colas = [ColaDescarte(capacidad) for _ in etapas]
+        self._salida = ColaDescarte(capacidad_salida or capacidad)
+        self._hilos: list[threading.Thread] = []
+        self._running = False
+        self._seq = 0
+        self._lat_total_ms: deque[float] = deque(maxlen=VENTANA_LATENCIAS)
+        self.entregados = 0
+
+    def start(self) -> "PipelineEtapas":
+        self._running = True
+        for i, etapa in enumerate(self.etapas):
+            hilo = threading.Thread(target=self._bucle, args=(i,), name=f"etapa-{etapa.nombre}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        return self
+
+    def poner(self, dato: Any) -> int:
+        """Entra un item (p. ej. el frame capturado); devuelve su ``seq``."""
+        self._seq += 1
+        self._encolar(0, _Paquete(self._seq, time.monotonic(), dato))
+        return self._seq
+
+    def obtener(self, timeout: float | None = None) -> ResultadoPipeline | None:
+        paquete = self._salida.tomar(timeout)
+        if paquete is None:
+            return None
+        self._lat_total_ms.append((time.monotonic() - paquete.t_entrada) * 1000.0)
+        self.entregados += 1
+        return ResultadoPipeline(*paquete)
+
+    def _encolar(self, i: int, paquete: _Paquete) -> None:
+        cola = self._colas[i] if i < len(self._colas) else self._salida
+        descartado = cola.poner(paquete)
+        if descartado is not None and i < len(self.etapas):
+            self._descartar(self.etapas[i], descartado)
+
+    @staticmethod
+    def _descartar(etapa: Etapa, paquete: _Paquete) -> None:
+        if etapa.al_descartar is not None:
+            try:
+                etapa.al_descartar(paquete.dato)
+            except Exception:
+                log.exception("al_descartar de la etapa %s", etapa.nombre)
+
+    def _bucle(self, i: int) -> None:
+        etapa = self.etapas[i]
+        cola = self._colas[i]
+        while self._running:
+            paquete = cola.tomar(timeout=0.1)
+            if paquete is None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                salida = etapa.fn(paquete.dato)
+            except Exception:
+                etapa.errores += 1
+                log.exception("Etapa %s: error con el item %d", etapa.nombre, paquete.seq)
+                self._descartar(etapa, paquete)  # p. ej. devolver su buffer al pool
+                continue
+            etapa._latencias_ms.append((time.perf_counter() - t0) * 1000.0)
+            etapa.procesados += 1
+            if salida is None:
+                etapa.filtrados += 1
+                continue
+            self._encolar(i + 1, paquete._replace(dato=salida))
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """
+        Para los hilos; los items pendientes de cada cola pasan por ``al_descartar``, igual que
+        los que una etapa termina despues de cerrarse la cola siguiente.
+        """
+        self._running = False
+        for etapa, cola in zip(self.etapas, self._colas):
+            for paquete in cola.cerrar():
+                self._descartar(etapa, paquete)
+        self._salida.cerrar()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos = []
+
+    def estadisticas(self) -> dict[str, dict[str, float]]:
+        out: dict[str, dict[str, float]] = {}
+        for etapa, cola in zip(self.etapas, self._colas):
+            media, p95 = _resumen_latencias(etapa._latencias_ms)
+            out[etapa.nombre] = {
+                "profundidad": len(cola),
+                "profundidad_max": cola.profundidad_max,
+                "descartados": cola.descartados,
+                "procesados": etapa.procesados,
+                "filtrados": etapa.filtrados,
+                "errores": etapa.errores,
+                "latencia_media_ms": media,
+                "latencia_p95_ms": p95,
+            }
+        media, p95 = _resumen_latencias(self._lat_total_ms)
+        out["total"] = {
+            "profundidad": len(self._salida),
+            "profundidad_max": self._salida.profundidad_max,
+            "descartados": self._salida.descartados,
+            "procesados": self.entregados,
+            "latencia_media_ms": media,
+            "latencia_p95_ms": p95,
+        }
+        return out
+
+    def resumen(self) -> str:
+        partes = []
+        for nombre, e in self.estadisticas().items():
+            partes.append(
+                f"{nombre}: cola={e['profundidad']}/{e['profundidad_max']} desc={e['descartados']} "
+                f"n={e['procesados']} {e['latencia_media_ms']:.1f}/{e['latencia_p95_ms']:.1f}ms"
+            )
+        return " | ".join(partes)
@@ -0,0 +1,219 @@
+"""
+Pool de N sesiones del mismo modelo (``utils.backend_inferencia``), cada una en su hilo, con
+reparto round-robin y resultados por ``concurrent.futures.Future``.
+
+Los scripts crean un solo ``RKNNLite()`` / ``ort.InferenceSession``: una inferencia a la vez
+aunque la NPU admita varios contextos en paralelo (o los nucleos del RK3588) y aunque la CPU
+tenga nucleos libres mientras ORT ejecuta capas pequenas con pocos hilos.
+
+- ``crear(i) -> BackendInferencia`` sin cargar; el hilo ``i`` lo carga y es el unico que lo
+  usa (los contextos RKNNLite y las sesiones ORT no se comparten entre hilos). Con
+  ``nucleos`` el hilo se fija a un nucleo de CPU antes de cargar (Linux), asi los hilos
+  intra-op que cree ORT heredan la afinidad.
+- ``enviar(lote, camara) -> Future`` reparte round-robin entre sesiones. Cada camara lleva su
+  ``seq``; ``obtener()`` entrega los resultados en orden de envio por camara aunque las
+  sesiones terminen desordenadas (un frame lento no deja pasar al siguiente de su camara).
+- ``fabrica_backend(tipo, ruta, ...)``: ``crear`` para ``crear_backend``; ORT con hilos
+  intra / inter-op explicitos por sesion, RKNN con un ``core_mask`` por sesion.
+
+El lote no se copia: no reutilizar su buffer (p. ej. el tensor de ``PreprocesadorEntrada``)
+hasta que su ``Future`` termine. Con ``PoolBuffers`` de ``utils.pipeline_etapas``:
+``fut.add_done_callback(lambda _f: buffers.devolver(prep))``.
+
+Ejemplo:
+    pool = PoolInferencia(fabrica_backend("onnx", ruta, hilos_ort=1), n=2).start()
+    prep = preprocesador(pool.entrada, RETINAFACE_MEAN_BGR)
+    fut = pool.enviar(prep.letterbox(frame, RETINAFACE_LETTERBOX_FILL)[0], camara="puerta")
+    res = pool.obtener(timeout=0.1)  # ResultadoPool(camara, seq, salidas, error)
+    pool.stop()
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from .backend_inferencia import BackendInferencia, EntradaModelo, crear_backend
+
+log = logging.getLogger(__name__)
+
+_FIN = None  # centinela en la cola de cada sesion
+
+
+class ResultadoPool(NamedTuple):
+    """Resultado entregado por ``obtener`` (en orden de ``seq`` dentro de cada camara)."""
+
+    camara: str
+    seq: int
+    salidas: list[np.ndarray] | None
+    error: BaseException | None
+
+
+class _Sesion:
+    def __init__(self, indice: int, nucleo: int | None) -> None:
+        self.indice = indice
+        self.nucleo = nucleo
+        self.cola: queue.SimpleQueue = queue.SimpleQueue()
+        self.backend: BackendInferencia | None = None
+        self.hilo: threading.Thread | None = None
+        self.inferencias = 0
+
+
+def fabrica_backend(
+    tipo: str,
+    ruta,
+    hilos_ort: int = 1,
+    hilos_inter_ort: int = 1,
+    core_masks: list[int] | None = None,
+    **kwargs,
+) -> Callable[[int], BackendInferencia]:
+    """
+    ``crear(i)`` para ``PoolInferencia``. ORT: ``hilos_ort`` intra-op y ``hilos_inter_ort``
+    inter-op por sesion (N sesiones x ``hilos_ort`` <= nucleos). RKNN: la sesion ``i`` usa
+    ``core_masks[i % len]`` (p. ej. ``[RKNNLite.NPU_CORE_0, RKNNLite.NPU_CORE_1, ...]`` en
+    RK3588; en RK3568, con un solo nucleo NPU, None y los contextos se turnan).
+    """
+    tipo = tipo.lower()
+
+    def crear(i: int) -> BackendInferencia:
+        extra = dict(kwargs)
+        if tipo == "onnx":
+            extra.setdefault("hilos", hilos_ort)
+            extra.setdefault("hilos_inter", hilos_inter_ort)
+        elif tipo == "rknn" and core_masks:
+            extra.setdefault("core_mask", core_masks[i % len(core_masks)])
+        return crear_backend(tipo, ruta, **extra)
+
+    return crear
+
+
+class PoolInferencia:
+    """N backends del mismo modelo, uno por hilo, con reparto round-robin."""
+
+    def __init__(
+        self,
+        crear: Callable[[int], BackendInferencia],
+        n: int,
+        nucleos: list[int] | None = None,
+    ) -> None:
+        if n < 1:
+            raise ValueError("El pool necesita al menos una sesion")
+        self._crear = crear
+        self.sesiones = [
+            _Sesion(i, nucleos[i % len(nucleos)] if nucleos else None) for i in range(n)
+        ]
+        self._siguiente = 0
+        self._lock = threading.Lock()
+        self._seq_envio: dict[str, int] = {}
+        self._seq_entrega: dict[str, int] = {}
+        self._terminados: dict[str, dict[int, ResultadoPool]] = {}
+        self._salida: queue.SimpleQueue = queue.SimpleQueue()
+        self.entrada: EntradaModelo | None = None
+
+    @property
+    def n(self) -> int:
+        return len(self.sesiones)
+
+    def start(self) -> "PoolInferencia":
+        """Arranca los hilos y espera a que cada uno cargue su backend (propaga el error)."""
+        listos: list[threading.Event] = []
+        errores: list[BaseException] = []
+        for sesion in self.sesiones:
+            listo = threading.Event()
+            sesion.hilo = threading.Thread(
+                target=self._bucle, args=(sesion, listo, errores), name=f"pool-inferencia-{sesion.indice}", daemon=True
+            )
+            sesion.hilo.start()
+            listos.append(listo)
+        for listo in listos:
+            listo.wait()
+        if errores:
+            self.stop()
+            raise errores[0]
+        self.entrada = self.sesiones[0].backend.entrada
+        return self
+
+    def _bucle(self, sesion: _Sesion, listo: threading.Event, errores: list[BaseException]) -> None:
+        try:
+            if sesion.nucleo is not None and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(0, {sesion.nucleo})  # pid 0 = este hilo en Linux
+            sesion.backend = self._crear(sesion.indice).cargar()
+        except BaseException as e:  # noqa: BLE001 - se relanza en start()
+            errores.append(e)
+            listo.set()
+            return
+        listo.set()
+        while True:
+            trabajo = sesion.cola.get()
+            if trabajo is _FIN:
+                break
+            fut, lote = trabajo
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(sesion.backend.infer_batch(lote))
+            except Exception as e:
+                log.exception("Sesion %d: error en infer_batch", sesion.indice)
+                fut.set_exception(e)
+            sesion.inferencias += 1
+        sesion.backend.liberar()
+
+    def enviar(self, lote: np.ndarray, camara: str = "") -> Future:
+        """Encola ``lote`` en la siguiente sesion (round-robin); ``result()`` = salidas."""
+        fut: Future = Future()
+        with self._lock:
+            sesion = self.sesiones[self._siguiente]
+            self._siguiente = (self._siguiente + 1) % len(self.sesiones)
+            seq = self._seq_envio.get(camara, 0)
+            self._seq_envio[camara] = seq + 1
+        fut.add_done_callback(lambda f: self._terminado(camara, seq, f))
+        sesion.cola.put((fut, lote))
+        return fut
+
+    def _terminado(self, camara: str, seq: int, fut: Future) -> None:
+        if fut.cancelled():
+            res = ResultadoPool(camara, seq, None, None)
+        elif fut.exception() is not None:
+            res = ResultadoPool(camara, seq, None, fut.exception())
+        else:
+            res = ResultadoPool(camara, seq, fut.result(), None)
+        # Reordenar: solo sale el siguiente seq esperado de la camara (y los consecutivos).
+        with self._lock:
+            pendientes = self._terminados.setdefault(camara, {})
+            pendientes[seq] = res
+            esperado = self._seq_entrega.get(camara, 0)
+            while esperado in pendientes:
+                self._salida.put(pendientes.pop(esperado))
+                esperado += 1
+            self._seq_entrega[camara] = esperado
+
+    def obtener(self, timeout: float | None = None) -> ResultadoPool | None:
+        """Siguiente resultado, en orden de envio dentro de cada camara (None si vence)."""
+        try:
+            return self._salida.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def en_vuelo(self) -> int:
+        with self._lock:
+            return sum(self._seq_envio.values()) - sum(self._seq_entrega.values())
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Termina lo ya encolado, libera cada backend en su hilo y para los hilos."""
+        for sesion in self.sesiones:
+            sesion.cola.put(_FIN)
+        for sesion in self.sesiones:
+            if sesion.hilo is not None:
+                sesion.hilo.join(timeout)
+                sesion.hilo = None
+
+    def __enter__(self) -> "PoolInferencia":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,201 @@
+"""
+Modo keyframe: el detector completo (RetinaFace, YOLOv8...) solo cada ``cada_n`` frames y, en
+los intermedios, las cajas del ultimo keyframe se propagan con flujo optico Lucas-Kanade en CPU.
+Cajas a la cadencia de la camara (dibujo, anonimizado) con el coste de detector de
+``1 / cada_n`` frames.
+
+Propagacion por caja (median flow, Kalal et al. 2010):
+
+1. Rejilla de ``puntos_lado x puntos_lado`` puntos dentro de la caja (las esquinas de una caja
+   de cara suelen caer en el fondo, que no se mueve con ella) mas los landmarks si los hay.
+2. ``cv2.calcOpticalFlowPyrLK`` hacia delante (frame anterior -> actual) y hacia atras; se
+   descartan los puntos con error ida-vuelta mayor que ``error_fb_max`` pixeles.
+3. Desplazamiento = mediana del de los puntos buenos; escala = mediana del cociente de
+   distancias entre pares de puntos. La caja y sus landmarks se trasladan y escalan alrededor
+   del centro.
+
+Una caja con menos de ``min_puntos`` buenos se da por perdida (se quita) y el siguiente frame
+es keyframe. Todo el flujo se calcula en gris reducido a ``ancho_flujo`` (una llamada LK para
+todas las cajas).
+
+``dets`` es cualquier ``(N, C)`` con ``[x1, y1, x2, y2, ...]`` en pixeles del frame; con
+``C >= 15`` (salida RetinaFace) las columnas 5:15 son los 5 landmarks y se propagan igual. El
+resto de columnas (score, clase) se copian del keyframe.
+
+Ejemplo:
+    propagador = PropagadorCajas(cada_n=5)
+    while True:
+        ok, frame = cap.read()
+        dets, keyframe = propagador.procesar(frame, detectar)  # detectar(frame) -> (N, 15)
+        dibujar(frame, dets)
+    print(propagador.resumen())
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable
+
+import cv2
+import numpy as np
+
+_CRITERIO_LK = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+
+
+class PropagadorCajas:
+    """Detector en keyframes + cajas propagadas por flujo optico en los frames intermedios."""
+
+    def __init__(
+        self,
+        cada_n: int = 5,
+        *,
+        ancho_flujo: int = 480,
+        puntos_lado: int = 5,
+        error_fb_max: float = 1.0,
+        min_puntos: int = 6,
+        ventana_lk: int = 15,
+        niveles_lk: int = 2,
+    ) -> None:
+        if cada_n < 1:
+            raise ValueError("cada_n debe ser >= 1")
+        self.cada_n = cada_n
+        self.ancho_flujo = ancho_flujo
+        self.puntos_lado = puntos_lado
+        self.error_fb_max = error_fb_max
+        self.min_puntos = min_puntos
+        self._ventana = (ventana_lk, ventana_lk)
+        self._niveles = niveles_lk
+        self._escala = 1.0  # pixeles reducidos / pixeles del frame
+        self._gris_completo: np.ndarray | None = None
+        self._gris: np.ndarray | None = None  # frame actual, reducido
+        self._gris_ant: np.ndarray | None = None  # frame anterior, reducido (intercambiables)
+        self.dets = np.zeros((0, 5), dtype=np.float32)  # ultimas cajas (keyframe o propagadas)
+        self._desde_keyframe = 0
+        self._forzar_keyframe = True
+        self.keyframes = 0
+        self.propagados = 0
+        self.perdidas = 0  # cajas quitadas por falta de puntos
+        self.ms_propagacion = 0.0
+
+    def es_keyframe(self) -> bool:
+        """True si el siguiente frame debe pasar por el detector."""
+        return self._forzar_keyframe or self._desde_keyframe >= self.cada_n
+
+    def _a_gris(self, frame_bgr: np.ndarray) -> np.ndarray:
+        """
+        Gris reducido a ``ancho_flujo`` en buffers reutilizados (alterna actual y anterior).
+        Gris antes de reducir y ``INTER_LINEAR``: ~0.5 ms en 640x480 frente a ~4 ms de
+        ``INTER_AREA`` sobre BGR.
+        """
+        h, w = frame_bgr.shape[:2]
+        self._escala = min(1.0, self.ancho_flujo / w)
+        tam = (max(1, round(w * self._escala)), max(1, round(h * self._escala)))
+        if self._gris is None or self._gris.shape != (tam[1], tam[0]):
+            # Resolucion nueva: sin frame anterior valido, el siguiente es keyframe.
+            self._gris = np.empty((tam[1], tam[0]), dtype=np.uint8)
+            self._gris_ant = np.empty_like(self._gris)
+            self._forzar_keyframe = True
+        self._gris, self._gris_ant = self._gris_ant, self._gris
+        if self._escala < 1.0:
+            if self._gris_completo is None or self._gris_completo.shape != (h, w):
+                self._gris_completo = np.empty((h, w), dtype=np.uint8)
+            cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY, dst=self._gris_completo)
+            cv2.resize(self._gris_completo, tam, dst=self._gris, interpolation=cv2.INTER_LINEAR)
+        else:
+            cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY, dst=self._gris)
+        return self._gris
+
+    def keyframe(self, frame_bgr: np.ndarray, dets: np.ndarray) -> np.ndarray:
+        """Fija ``dets`` (salida del detector sobre ``frame_bgr``) como cajas actuales."""
+        self._a_gris(frame_bgr)
+        self.dets = np.array(dets, dtype=np.float32, copy=True)
+        self._desde_keyframe = 1
+        self._forzar_keyframe = False
+        self.keyframes += 1
+        return self.dets
+
+    def _puntos_caja(self, det: np.ndarray) -> np.ndarray:
+        x1, y1, x2, y2 = det[:4]
+        # Rejilla en el 80% central de la caja.
+        mx, my = 0.1 * (x2 - x1), 0.1 * (y2 - y1)
+        xs = np.linspace(x1 + mx, x2 - mx, self.puntos_lado)
+        ys = np.linspace(y1 + my, y2 - my, self.puntos_lado)
+        rejilla = np.stack(np.meshgrid(xs, ys), axis=2).reshape(-1, 2)
+        if det.shape[0] >= 15:
+            rejilla = np.concatenate((rejilla, det[5:15].reshape(5, 2)))
+        return rejilla.astype(np.float32)
+
+    def propagar(self, frame_bgr: np.ndarray) -> np.ndarray:
+        """
+        Mueve las cajas actuales al ``frame_bgr`` por flujo optico desde el frame anterior.
+        Devuelve un array nuevo; los devueltos en frames anteriores no se modifican.
+        """
+        t0 = time.perf_counter()
+        gris = self._a_gris(frame_bgr)
+        self._desde_keyframe += 1
+        self.propagados += 1
+        if self.dets.shape[0] == 0 or self._forzar_keyframe:
+            self.ms_propagacion += (time.perf_counter() - t0) * 1000.0
+            return self.dets
+
+        puntos = [self._puntos_caja(det) for det in self.dets]
+        p0 = (np.concatenate(puntos) * self._escala).reshape(-1, 1, 2)
+        lk = dict(winSize=self._ventana, maxLevel=self._niveles, criteria=_CRITERIO_LK)
+        p1, st1, _ = cv2.calcOpticalFlowPyrLK(self._gris_ant, gris, p0, None, **lk)
+        p0b, st2, _ = cv2.calcOpticalFlowPyrLK(gris, self._gris_ant, p1, None, **lk)
+        error_fb = np.linalg.norm(p0 - p0b, axis=2).ravel() / self._escala
+        buenos = (st1.ravel() == 1) & (st2.ravel() == 1) & (error_fb <= self.error_fb_max)
+        p0 = p0.reshape(-1, 2) / self._escala
+        p1 = p1.reshape(-1, 2) / self._escala
+
+        h, w = frame_bgr.shape[:2]
+        # Array nuevo: las cajas ya devueltas (keyframe o frame anterior) no cambian.
+        nuevas = self.dets.copy()
+        mantener = np.ones((nuevas.shape[0],), dtype=bool)
+        ini = 0
+        for k, pts in enumerate(puntos):
+            sl = slice(ini, ini + pts.shape[0])
+            ini += pts.shape[0]
+            ok = buenos[sl]
+            if ok.sum() < self.min_puntos:
+                mantener[k] = False
+                continue
+            a, b = p0[sl][ok], p1[sl][ok]
+            desplazamiento = np.median(b - a, axis=0)
+            ia, ja = np.triu_indices(a.shape[0], k=1)
+            d_ant = np.linalg.norm(a[ia] - a[ja], axis=1)
+            d_act = np.linalg.norm(b[ia] - b[ja], axis=1)
+            validos = d_ant > 1e-3
+            escala = float(np.median(d_act[validos] / d_ant[validos])) if validos.any() else 1.0
+            det = nuevas[k]
+            centro = (det[:2] + det[2:4]) / 2
+            nuevo = centro + desplazamiento
+            det[0:4] = np.concatenate((nuevo + (det[:2] - centro) * escala, nuevo + (det[2:4] - centro) * escala))
+            if det.shape[0] >= 15:
+                lm = det[5:15].reshape(5, 2)
+                det[5:15] = (nuevo + (lm - centro) * escala).ravel()
+            # Caja que sale del frame: perdida.
+            if det[2] <= 0 or det[3] <= 0 or det[0] >= w or det[1] >= h:
+                mantener[k] = False
+        if not mantener.all():
+            self.perdidas += int((~mantener).sum())
+            nuevas = nuevas[mantener]
+            self._forzar_keyframe = True
+        self.dets = nuevas
+        self.ms_propagacion += (time.perf_counter() - t0) * 1000.0
+        return self.dets
+
+    def procesar(
+        self, frame_bgr: np.ndarray, detectar: Callable[[np.ndarray], np.ndarray]
+    ) -> tuple[np.ndarray, bool]:
+        """``(dets, es_keyframe)``: ``detectar(frame)`` en keyframes, propagacion en el resto."""
+        if self.es_keyframe():
+            return self.keyframe(frame_bgr, detectar(frame_bgr)), True
+        return self.propagar(frame_bgr), False
+
+    def resumen(self) -> str:
+        total = self.keyframes + self.propagados
+        ms = self.ms_propagacion / self.propagados if self.propagados else 0.0
+        return (
+            f"frames={total} keyframes={self.keyframes} propagados={self.propagados} "
+            f"({ms:.2f} ms/frame) cajas_perdidas={self.perdidas}"
+        )
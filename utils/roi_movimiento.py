@@ -0,0 +1,225 @@
+"""
+Inferencia por regiones de movimiento: RetinaFace sobre recortes de los blobs de la mascara
+MOG2 (``CompuertaMovimiento.mascara``) en lugar del frame completo letterbox a 320x320.
+
+``regiones_movimiento(mascara, frame_wh)``:
+
+1. Dilatacion de la mascara (une trozos de una misma persona) y
+   ``cv2.connectedComponentsWithStats``; se descartan blobs de menos de ``area_min`` pixeles.
+2. Cajas escaladas a coordenadas del frame, con ``margen`` alrededor (mas por arriba: la
+   cabeza se mueve menos que el cuerpo) y lado minimo ``lado_min`` (acota la ampliacion del
+   recorte al pasar al modelo).
+3. Fusion de cajas que se solapan (repetida hasta que no quede ninguna) y, si quedan mas de
+   ``max_regiones``, una sola caja que las cubre todas.
+4. Si las regiones cubren mas de ``fraccion_frame_max`` del frame, el frame completo (un recorte
+   casi igual de grande no aporta nada).
+
+``DetectorROI.detectar(frame, regiones)``: letterbox de cada recorte (vista, sin copia) sobre su
+propio ``PreprocesadorEntrada``; una llamada ``infer_batch`` con todo el lote si el modelo
+admite batch (con batch fijo B el lote se completa con filas a cero hasta un multiplo de B),
+si no una por recorte. Los candidatos de cada recorte se pasan a coordenadas del
+frame (desplazamiento del recorte) y un unico NMS elimina las caras repetidas en recortes
+solapados. Salida igual que ``retinaface_dets_topk_desde_rknn_outputs``: ``(N, 15)``.
+
+Una cara lejana de 30 px en un frame 640x480 llega al modelo con ~15 px en el letterbox del
+frame completo (por debajo del ancla minima de 16 px) y con 30-90 px desde un recorte. El
+coste por recorte es el de una inferencia 320x320: con la fusion y ``max_regiones`` suele ser
+una; el letterbox solo toca los pixeles del recorte.
+
+Sin regiones (persona quieta en FACE_*: MOG2 ya no la ve) el llamante decide; lo habitual es
+inferir el frame completo (``caja_frame``).
+
+Ejemplo:
+    if compuerta.evaluar(frame, t):
+        cajas = regiones_movimiento(compuerta.mascara, (w, h)) if roi else caja_frame(w, h)
+        dets = detector_roi.detectar(frame, cajas if len(cajas) else caja_frame(w, h))
+        compuerta.registrar_resultado(len(dets) > 0, t)
+"""
+from __future__ import annotations
+
+import cv2
+import numpy as np
+
+from .aux_tools_retinaface import (
+    RETINAFACE_INPUT_HW,
+    RETINAFACE_LETTERBOX_FILL,
+    RETINAFACE_MEAN_BGR,
+    retinaface_candidatos_desde_outputs,
+    retinaface_nms_candidatos,
+)
+from .backend_inferencia import BackendInferencia, preprocesador
+
+_NUCLEO_DILATACION = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+
+
+def caja_frame(ancho: int, alto: int) -> np.ndarray:
+    """Region = frame completo, ``(1, 4)`` int32 ``[x1, y1, x2, y2]``."""
+    return np.array([[0, 0, ancho, alto]], dtype=np.int32)
+
+
+def fusionar_cajas(cajas: np.ndarray) -> np.ndarray:
+    """Une cajas ``[x1, y1, x2, y2]`` que se solapan o se tocan hasta que no quede ninguna."""
+    cajas = [list(c) for c in cajas]
+    fusionadas = True
+    while fusionadas and len(cajas) > 1:
+        fusionadas = False
+        for i in range(len(cajas)):
+            for j in range(i + 1, len(cajas)):
+                a, b = cajas[i], cajas[j]
+                if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                    cajas[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del cajas[j]
+                    fusionadas = True
+                    break
+            if fusionadas:
+                break
+    return np.array(cajas, dtype=np.int32).reshape(-1, 4)
+
+
+def regiones_movimiento(
+    mascara: np.ndarray,
+    frame_wh: tuple[int, int],
+    *,
+    area_min: int = 60,
+    margen: float = 0.25,
+    lado_min: int = 96,
+    max_regiones: int = 3,
+    fraccion_frame_max: float = 0.6,
+) -> np.ndarray:
+    """
+    Cajas ``(K, 4)`` int32 ``[x1, y1, x2, y2]`` en pixeles del frame con el movimiento de
+    ``mascara`` (reducida, p. ej. 320x240); ``K = 0`` si no hay blobs.
+
+    Args:
+        area_min: Pixeles minimos de un blob en la mascara reducida.
+        margen: Fraccion del lado del blob anadida a cada lado (el doble por arriba).
+        lado_min: Lado minimo de la caja en pixeles del frame.
+        max_regiones: Con mas cajas tras fusionar, una sola que las cubre.
+        fraccion_frame_max: Si las cajas cubren mas de esta fraccion del frame, el frame entero.
+    """
+    w, h = frame_wh
+    mh, mw = mascara.shape[:2]
+    dilatada = cv2.dilate(mascara, _NUCLEO_DILATACION, iterations=2)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(dilatada, connectivity=8)
+    if n <= 1:
+        return np.zeros((0, 4), dtype=np.int32)
+    stats = stats[1:]  # 0 = fondo
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= area_min]
+    if stats.shape[0] == 0:
+        return np.zeros((0, 4), dtype=np.int32)
+
+    sx, sy = w / mw, h / mh
+    x = stats[:, cv2.CC_STAT_LEFT] * sx
+    y = stats[:, cv2.CC_STAT_TOP] * sy
+    bw = stats[:, cv2.CC_STAT_WIDTH] * sx
+    bh = stats[:, cv2.CC_STAT_HEIGHT] * sy
+    x1, x2 = x - margen * bw, x + bw + margen * bw
+    y1, y2 = y - 2 * margen * bh, y + bh + margen * bh
+    # Lado minimo, creciendo por igual a ambos lados.
+    faltan_x = np.maximum(lado_min - (x2 - x1), 0) / 2
+    faltan_y = np.maximum(lado_min - (y2 - y1), 0) / 2
+    x1, x2 = x1 - faltan_x, x2 + faltan_x
+    y1, y2 = y1 - faltan_y, y2 + faltan_y
+    cajas = np.stack(
+        (
+            np.clip(np.floor(x1), 0, w),
+            np.clip(np.floor(y1), 0, h),
+            np.clip(np.ceil(x2), 0, w),
+            np.clip(np.ceil(y2), 0, h),
+        ),
+        axis=1,
+    ).astype(np.int32)
+    cajas = fusionar_cajas(cajas)
+    if cajas.shape[0] > max_regiones:
+        cajas = np.array([[cajas[:, 0].min(), cajas[:, 1].min(), cajas[:, 2].max(), cajas[:, 3].max()]], dtype=np.int32)
+    area = ((cajas[:, 2] - cajas[:, 0]) * (cajas[:, 3] - cajas[:, 1])).sum()
+    if area > fraccion_frame_max * w * h:
+        return caja_frame(w, h)
+    return cajas
+
+
+class DetectorROI:
+    """RetinaFace sobre recortes del frame; salida en coordenadas del frame."""
+
+    def __init__(
+        self,
+        backend: BackendInferencia,
+        max_regiones: int = 3,
+        media_bgr: np.ndarray = RETINAFACE_MEAN_BGR,
+        fill_value: int = RETINAFACE_LETTERBOX_FILL,
+    ) -> None:
+        self.backend = backend
+        self.fill_value = fill_value
+        self.max_regiones = max_regiones
+        entrada = backend.entrada
+        # Un preprocesador por recorte: sus tensores deben vivir hasta infer_batch.
+        self._preps = [preprocesador(entrada, media_bgr) for _ in range(max_regiones)]
+        self._input_hw = (entrada.alto, entrada.ancho) if entrada.alto > 0 else RETINAFACE_INPUT_HW
+        self._batch_fijo = entrada.batch_max
+        self._lote = None
+        if entrada.batch_max != 1:
+            dtype = np.float32 if entrada.dtype == "float32" else np.uint8
+            self._lote = np.zeros(entrada.forma(self._filas_lote(max_regiones)), dtype=dtype)
+        self.recortes = 0  # recortes inferidos (para medir la carga)
+
+    def detectar(
+        self,
+        frame_bgr: np.ndarray,
+        regiones: np.ndarray,
+        *,
+        score_deteccion: float,
+        score_pre_nms: float = 0.02,
+        nms_iou: float = 0.5,
+    ) -> np.ndarray:
+        """``(N, 15)`` ``[x1, y1, x2, y2, score, 10 landmarks]`` en pixeles del frame."""
+        if len(regiones) > self.max_regiones:
+            raise ValueError(f"{len(regiones)} regiones > max_regiones={self.max_regiones}")
+        if len(regiones) == 0:
+            return np.zeros((0, 15), dtype=np.float32)
+        tensores, metas = [], []
+        for k, (x1, y1, x2, y2) in enumerate(regiones):
+            tensor, meta = self._preps[k].letterbox(frame_bgr[y1:y2, x1:x2], self.fill_value)
+            tensores.append(tensor)
+            metas.append(meta)
+        self.recortes += len(regiones)
+
+        if self._lote is not None:
+            lote = self._lote[: self._filas_lote(len(regiones))]
+            for k, tensor in enumerate(tensores):
+                lote[k] = tensor[0]
+            lote[len(regiones) :] = 0
+            salidas = self.backend.infer_batch(lote)
+            por_recorte = [[o[k : k + 1] for o in salidas] for k in range(len(regiones))]
+        else:
+            por_recorte = [self.backend.infer_batch(t) for t in tensores]
+
+        todas_dets, todas_landms = [], []
+        for (x1, y1, x2, y2), meta, outputs in zip(regiones, metas, por_recorte):
+            dets, landms = retinaface_candidatos_desde_outputs(
+                list(outputs),
+                img_width=int(x2 - x1),
+                img_height=int(y2 - y1),
+                aspect_ratio=meta.aspect_ratio,
+                offset_x=meta.offset_x,
+                offset_y=meta.offset_y,
+                score_pre_nms=score_pre_nms,
+                input_hw=self._input_hw,
+            )
+            dets[:, 0:4:2] += x1
+            dets[:, 1:4:2] += y1
+            landms[:, 0::2] += x1
+            landms[:, 1::2] += y1
+            todas_dets.append(dets)
+            todas_landms.append(landms)
+        return retinaface_nms_candidatos(
+            np.concatenate(todas_dets),
+            np.concatenate(todas_landms),
+            score_deteccion=score_deteccion,
+            nms_iou=nms_iou,
+        )
+
+    def _filas_lote(self, n: int) -> int:
+        """Filas del lote para ``n`` recortes: ``n`` con batch dinamico, multiplo de B si es fijo."""
+        if self._batch_fijo == 0:
+            return n
+        return -(-n // self._batch_fijo) * self._batch_fijo
@@ -0,0 +1,310 @@
+"""
+Bus de frames en memoria compartida (``multiprocessing.shared_memory``) para separar la
+captura y la inferencia en procesos distintos (sin GIL compartido, los 4 nucleos del RK3568).
+
+Un proceso de captura escribe los frames decodificados en un anillo de ``n_slots`` dentro de un
+bloque de memoria compartida con nombre; los procesos de inferencia se adjuntan por nombre y
+leen los frames como vistas NumPy del mismo bloque: sin pickle y sin copia.
+
+Disposicion del bloque (todo int64 / float64 alineado a 8 bytes)::
+
+    cabecera global (64 B): magic, version, n_slots, bytes_slot, seq_ultimo, slot_ultimo, ...
+    por slot: cabecera (64 B: candado, seq, alto, ancho, canales, t_captura) + pixeles
+
+Coherencia tipo seqlock: el escritor pone el candado del slot en impar mientras escribe y en
+par al terminar; el lector anota el candado al leer y, tras procesar la vista, comprueba con
+``sigue_valido`` que el escritor no haya reutilizado el slot (descartar el resultado si no).
+El escritor rota los slots, asi que un frame sigue valido durante ``n_slots - 1`` frames nuevos.
+
+Un solo escritor por bus. El escritor implementa ``escribir_desde(cap)`` / ``invalidar()`` como
+``utils.frame_ring.AnilloFrames``, asi ``CaptureCameras(anillo=bus)`` decodifica directamente
+en la memoria compartida. ``proceso_captura_bus`` es el destino de ``multiprocessing.Process``.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, NamedTuple
+
+import cv2
+import numpy as np
+
+BUS_MAGIC = 0x46524D42  # "FRMB"
+BUS_VERSION = 1
+_CABECERA_BYTES = 64
+_CABECERA_SLOT_BYTES = 64
+# Cabecera global (indices int64)
+_G_MAGIC, _G_VERSION, _G_NSLOTS, _G_BYTES_SLOT, _G_SEQ, _G_SLOT, _G_CERRADO = range(7)
+# Cabecera de slot (indices int64; t_captura es float64 en el indice _S_TS)
+_S_CANDADO, _S_SEQ, _S_ALTO, _S_ANCHO, _S_CANALES, _S_TS = range(6)
+_CANDADO_TRACKER = threading.Lock()
+
+
+class FrameBus(NamedTuple):
+    """Frame leido del bus: ``vista`` apunta a la memoria compartida (solo lectura)."""
+
+    slot: int
+    candado: int
+    seq: int
+    t_captura: float  # time.time() del escritor (reloj comun entre procesos)
+    vista: np.ndarray
+
+
+def _adjuntar_sin_tracker(nombre: str) -> shared_memory.SharedMemory:
+    """
+    Adjunta sin registrar el bloque en el resource_tracker del lector: en Python < 3.13 el
+    tracker lo borraria al salir el lector aunque el escritor siga vivo.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    from multiprocessing import resource_tracker
+
+    # No registrar (en vez de registrar y desregistrar): con fork el tracker es el mismo que
+    # el del escritor y desregistrar borraria tambien su registro. El parche solo ignora este
+    # bloque y solo dura el constructor; el candado evita que dos adjuntos lo pisen.
+    with _CANDADO_TRACKER:
+        registrar = resource_tracker.register
+
+        def _registrar(name: str, rtype: str) -> None:
+            if rtype == "shared_memory" and name.lstrip("/") == nombre.lstrip("/"):
+                return
+            registrar(name, rtype)
+
+        resource_tracker.register = _registrar
+        try:
+            return shared_memory.SharedMemory(name=nombre)
+        finally:
+            resource_tracker.register = registrar
+
+
+class BusFramesCompartido:
+    """Anillo de frames uint8 en memoria compartida; crear (escritor) o ``adjuntar`` (lector)."""
+
+    def __init__(
+        self,
+        nombre: str | None = None,
+        n_slots: int = 4,
+        max_bytes_frame: int = 2560 * 1920 * 3,
+        *,
+        _shm: shared_memory.SharedMemory | None = None,
+    ) -> None:
+        if _shm is None:
+            if n_slots < 2:
+                raise ValueError("n_slots debe ser >= 2")
+            bytes_slot = _CABECERA_SLOT_BYTES + ((max_bytes_frame + 63) // 64) * 64
+            self._shm = shared_memory.SharedMemory(
+                name=nombre, create=True, size=_CABECERA_BYTES + n_slots * bytes_slot
+            )
+            self.es_escritor = True
+            g = np.ndarray((8,), dtype=np.int64, buffer=self._shm.buf)
+            g[:] = 0
+            g[_G_MAGIC], g[_G_VERSION] = BUS_MAGIC, BUS_VERSION
+            g[_G_NSLOTS], g[_G_BYTES_SLOT] = n_slots, bytes_slot
+            g[_G_SLOT] = -1
+        else:
+            self._shm = _shm
+            self.es_escritor = False
+        self._g = np.ndarray((8,), dtype=np.int64, buffer=self._shm.buf)
+        if self._g[_G_MAGIC] != BUS_MAGIC or self._g[_G_VERSION] != BUS_VERSION:
+            raise ValueError(f"Bloque compartido '{self._shm.name}' no es un bus de frames v{BUS_VERSION}")
+        self.n_slots = int(self._g[_G_NSLOTS])
+        bytes_slot = int(self._g[_G_BYTES_SLOT])
+        self.max_bytes_frame = bytes_slot - _CABECERA_SLOT_BYTES
+        self._cab: list[np.ndarray] = []
+        self._ts: list[np.ndarray] = []
+        self._datos: list[np.ndarray] = []
+        for i in range(self.n_slots):
+            off = _CABECERA_BYTES + i * bytes_slot
+            self._cab.append(np.ndarray((8,), dtype=np.int64, buffer=self._shm.buf, offset=off))
+            self._ts.append(np.ndarray((8,), dtype=np.float64, buffer=self._shm.buf, offset=off))
+            self._datos.append(
+                np.ndarray(
+                    (self.max_bytes_frame,),
+                    dtype=np.uint8,
+                    buffer=self._shm.buf,
+                    offset=off + _CABECERA_SLOT_BYTES,
+                )
+            )
+        self._forma: tuple[int, ...] | None = None
+        self.descartados_por_tamano = 0
+
+    @property
+    def nombre(self) -> str:
+        return self._shm.name
+
+    @classmethod
+    def adjuntar(cls, nombre: str, timeout: float = 5.0) -> "BusFramesCompartido":
+        """Lector: espera hasta ``timeout`` s a que el escritor cree el bus."""
+        limite = time.monotonic() + timeout
+        while True:
+            try:
+                return cls(_shm=_adjuntar_sin_tracker(nombre))
+            except FileNotFoundError:
+                if time.monotonic() > limite:
+                    raise
+                time.sleep(0.02)
+
+    # --- escritor -------------------------------------------------------------------------
+
+    def _vista_slot(self, slot: int, forma: tuple[int, ...]) -> np.ndarray:
+        return self._datos[slot][: int(np.prod(forma))].reshape(forma)
+
+    def _iniciar_escritura(self) -> int:
+        slot = (int(self._g[_G_SLOT]) + 1) % self.n_slots
+        self._cab[slot][_S_CANDADO] += 1  # impar: escribiendo
+        return slot
+
+    def _terminar_escritura(self, slot: int, forma: tuple[int, ...]) -> int:
+        cab = self._cab[slot]
+        seq = int(self._g[_G_SEQ]) + 1
+        alto, ancho = forma[0], forma[1]
+        cab[_S_SEQ], cab[_S_ALTO], cab[_S_ANCHO] = seq, alto, ancho
+        cab[_S_CANALES] = forma[2] if len(forma) == 3 else 1
+        self._ts[slot][_S_TS] = time.time()
+        cab[_S_CANDADO] += 1  # par: listo
+        self._g[_G_SLOT] = slot
+        self._g[_G_SEQ] = seq
+        return seq
+
+    def _cancelar_escritura(self, slot: int) -> None:
+        self._cab[slot][_S_SEQ] = 0
+        self._cab[slot][_S_CANDADO] += 1
+
+    def _cabe(self, frame: np.ndarray) -> bool:
+        if frame.dtype != np.uint8 or frame.nbytes > self.max_bytes_frame:
+            self.descartados_por_tamano += 1
+            return False
+        return True
+
+    def publicar(self, frame: np.ndarray) -> int:
+        """Copia ``frame`` (uint8 HxW[xC]) al siguiente slot; devuelve su secuencia o 0."""
+        if not self._cabe(frame):
+            return 0
+        slot = self._iniciar_escritura()
+        try:
+            np.copyto(self._vista_slot(slot, frame.shape), frame)
+        except BaseException:
+            self._cancelar_escritura(slot)  # nunca dejar el candado impar
+            raise
+        return self._terminar_escritura(slot, frame.shape)
+
+    def _publicar_forma_nueva(self, img: np.ndarray) -> np.ndarray | None:
+        """Primer frame o cambio de resolucion: fija ``_forma`` solo si el frame cabe en un slot."""
+        if not self._cabe(img):
+            self._forma = None
+            return None
+        self._forma = img.shape
+        return img if self.publicar(img) else None
+
+    def escribir_desde(self, cap: cv2.VideoCapture) -> np.ndarray | None:
+        """
+        ``cap.retrieve`` (tras ``grab``) directo al slot en memoria compartida. El primer frame
+        (o un cambio de resolucion) se decodifica aparte una vez para conocer la forma; un frame
+        mayor que el slot se descarta (``descartados_por_tamano``) sin abrir escritura.
+        """
+        if self._forma is None:
+            ret, img = cap.retrieve()
+            if not ret or img is None or img.size == 0:
+                return None
+            return self._publicar_forma_nueva(img)
+        slot = self._iniciar_escritura()
+        try:
+            destino = self._vista_slot(slot, self._forma)
+            ret, img = cap.retrieve(destino)
+        except BaseException:
+            self._cancelar_escritura(slot)
+            raise
+        if not ret or img is None or img.size == 0:
+            self._cancelar_escritura(slot)
+            return None
+        if img is not destino:
+            # Cambio de resolucion: OpenCV asigno otro array.
+            self._cancelar_escritura(slot)
+            return self._publicar_forma_nueva(img)
+        self._terminar_escritura(slot, self._forma)
+        return destino
+
+    def invalidar(self) -> None:
+        self._g[_G_SLOT] = -1
+
+    # --- lector ---------------------------------------------------------------------------
+
+    @property
+    def seq(self) -> int:
+        return int(self._g[_G_SEQ])
+
+    @property
+    def cerrado(self) -> bool:
+        return bool(self._g[_G_CERRADO])
+
+    def ultimo(self, despues_de: int = 0) -> FrameBus | None:
+        """Ultimo frame publicado con secuencia > ``despues_de`` (None si no hay)."""
+        for _ in range(8):
+            slot = int(self._g[_G_SLOT])
+            if slot < 0:
+                return None
+            cab = self._cab[slot]
+            candado = int(cab[_S_CANDADO])
+            if candado & 1:
+                continue  # escribiendo; el siguiente intento vera el slot nuevo
+            seq = int(cab[_S_SEQ])
+            if seq <= despues_de:
+                return None
+            forma = (int(cab[_S_ALTO]), int(cab[_S_ANCHO]), int(cab[_S_CANALES]))
+            ts = float(self._ts[slot][_S_TS])
+            vista = self._vista_slot(slot, forma)
+            vista.flags.writeable = False
+            if int(cab[_S_CANDADO]) == candado:
+                return FrameBus(slot, candado, seq, ts, vista)
+        return None
+
+    def esperar(self, despues_de: int, timeout: float, sondeo_s: float = 0.001) -> FrameBus | None:
+        """``ultimo`` con espera activa suave hasta ``timeout`` s."""
+        limite = time.monotonic() + timeout
+        while True:
+            fb = self.ultimo(despues_de)
+            if fb is not None or self.cerrado or time.monotonic() > limite:
+                return fb
+            time.sleep(sondeo_s)
+
+    def sigue_valido(self, fb: FrameBus) -> bool:
+        """True si el escritor no reutilizo el slot desde que se leyo ``fb``."""
+        return int(self._cab[fb.slot][_S_CANDADO]) == fb.candado
+
+    def cerrar(self) -> None:
+        """Escritor: marca cerrado y borra el bloque. Lector: solo se desadjunta."""
+        self._cab, self._ts, self._datos = [], [], []
+        if self.es_escritor:
+            self._g[_G_CERRADO] = 1
+        del self._g
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # quedan vistas FrameBus vivas; el mapeo se libera con ellas
+        if self.es_escritor:
+            self._shm.unlink()
+
+
+def proceso_captura_bus(
+    nombre_bus: str,
+    fuente: dict[str, Any],
+    parar: Any,
+    n_slots: int = 4,
+    max_bytes_frame: int = 2560 * 1920 * 3,
+) -> None:
+    """
+    Destino de ``multiprocessing.Process``: ``CaptureCameras(**fuente)`` (hilo, reconexion,
+    modos RTSP/USB/FILE) escribiendo directamente en el bus hasta que ``parar`` se active.
+    """
+    from .capture_cameras import CaptureCameras
+
+    bus = BusFramesCompartido(nombre_bus, n_slots=n_slots, max_bytes_frame=max_bytes_frame)
+    camara = CaptureCameras(anillo=bus, **fuente).start()
+    try:
+        while not parar.wait(0.1):
+            pass
+    finally:
+        camara.stop()
+        bus.cerrar()
@@ -0,0 +1,361 @@
+"""
+Captura SNAP (``cmd=Snap`` por HTTP) asincrona para una o varias camaras: un unico hilo con un
+bucle asyncio, conexiones keep-alive reutilizadas y varias peticiones en vuelo a la vez.
+
+Frente a ``CaptureCameras._snap_loop`` (un ``requests.get`` bloqueante por frame):
+
+- Pool de conexiones por ``host:puerto``: no se abre un TCP nuevo por snapshot.
+- ``en_vuelo`` peticiones simultaneas como maximo entre todas las camaras y
+  ``en_vuelo_por_camara`` por camara: mientras la camara prepara un JPEG ya hay otra peticion
+  esperando, asi la latencia del snapshot no limita los FPS.
+- El cuerpo se decodifica con ``cv2.imdecode(np.frombuffer(body))`` sin copia intermedia, en
+  un hilo del executor (``imdecode`` libera el GIL) para no frenar el bucle.
+
+Con varias peticiones por camara las respuestas pueden llegar desordenadas: solo se publica un
+frame si su peticion es posterior a la del ultimo publicado.
+
+Cliente HTTP/1.1 minimo sobre ``asyncio.open_connection`` (sin dependencias nuevas): GET,
+``Content-Length`` o ``chunked``, ``http`` y ``https``. Las credenciales van en la query como
+en ``configs.settings.SNAP_HTTP_URL``.
+
+Con ``entrada_detector`` (ancho, alto) en la fuente, el JPEG se decodifica reducido al menor
+tamano que cubre la entrada del detector (``utils.jpeg_reducido``); ``get_frame_snap`` da el
+``FrameReducido`` para volver a resolucion completa.
+
+Cada ``CamaraSnapAsync`` expone la interfaz de consumo de ``CaptureCameras`` (``get_frame``,
+``get_frame_info``, ``hay_frame_nuevo``), asi ``utils.multi_camera.GestorCamaras`` las
+planifica igual que el resto de fuentes.
+
+Ejemplo:
+    cliente = ClienteSnapAsync([{"nombre": "puerta", "url": url, "max_fps": 5}], en_vuelo=4)
+    cliente.start()
+    ok, frame = cliente.camaras[0].get_frame()
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import ssl
+import threading
+import time
+from typing import Any
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+from configs import settings as s
+
+from .jpeg_reducido import FrameReducido, decodificar_reducido
+
+_LIMITE_CABECERAS = 64 * 1024
+
+
+class ErrorSnapHTTP(Exception):
+    """Respuesta HTTP invalida o con estado distinto de 200."""
+
+
+class _Conexion:
+    __slots__ = ("reader", "writer", "reutilizada")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.reutilizada = False
+
+    def cerrar(self) -> None:
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class _PoolConexiones:
+    """Conexiones keep-alive libres por (esquema, host, puerto)."""
+
+    def __init__(self) -> None:
+        self._libres: dict[tuple[str, str, int], list[_Conexion]] = {}
+        self.abiertas = 0  # conexiones TCP creadas (para comparar con peticiones hechas)
+
+    async def obtener(self, clave: tuple[str, str, int], timeout: float) -> _Conexion:
+        libres = self._libres.get(clave)
+        while libres:
+            conn = libres.pop()
+            if not conn.writer.is_closing() and not conn.reader.at_eof():
+                conn.reutilizada = True
+                return conn
+            conn.cerrar()
+        esquema, host, puerto = clave
+        ctx = ssl.create_default_context() if esquema == "https" else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, puerto, ssl=ctx, limit=_LIMITE_CABECERAS), timeout
+        )
+        self.abiertas += 1
+        return _Conexion(reader, writer)
+
+    def devolver(self, clave: tuple[str, str, int], conn: _Conexion) -> None:
+        self._libres.setdefault(clave, []).append(conn)
+
+    def cerrar(self) -> None:
+        for libres in self._libres.values():
+            for conn in libres:
+                conn.cerrar()
+        self._libres.clear()
+
+
+async def _leer_cuerpo(reader: asyncio.StreamReader, cabeceras: dict[str, str]) -> bytes:
+    if cabeceras.get("transfer-encoding", "").lower() == "chunked":
+        partes = []
+        while True:
+            linea = await reader.readline()
+            n = int(linea.split(b";", 1)[0].strip(), 16)
+            if n == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass  # trailers
+                return b"".join(partes)
+            partes.append(await reader.readexactly(n))
+            await reader.readexactly(2)
+    if "content-length" in cabeceras:
+        return await reader.readexactly(int(cabeceras["content-length"]))
+    return await reader.read()  # sin longitud: hasta que el servidor cierre
+
+
+async def _get(
+    pool: _PoolConexiones, url: str, timeout: float
+) -> bytes:
+    """GET sobre una conexion del pool; devuelve el cuerpo (bytes, sin copias extra)."""
+    partes = urlsplit(url)
+    esquema = partes.scheme or "http"
+    puerto = partes.port or (443 if esquema == "https" else 80)
+    clave = (esquema, partes.hostname or "", puerto)
+    ruta = partes.path or "/"
+    if partes.query:
+        ruta = f"{ruta}?{partes.query}"
+    peticion = (
+        f"GET {ruta} HTTP/1.1\r\nHost: {partes.netloc.rsplit('@', 1)[-1]}\r\n"
+        "Accept: image/jpeg\r\nConnection: keep-alive\r\n\r\n"
+    ).encode("latin-1")
+
+    for intento in range(2):
+        conn = await pool.obtener(clave, timeout)
+        try:
+            conn.writer.write(peticion)
+            estado = await asyncio.wait_for(conn.reader.readline(), timeout)
+            if not estado and conn.reutilizada and intento == 0:
+                # El servidor cerro la conexion ociosa: reintentar una vez con una nueva.
+                conn.cerrar()
+                continue
+            campos = estado.split(None, 2)
+            if len(campos) < 2 or not campos[0].startswith(b"HTTP/"):
+                raise ErrorSnapHTTP(f"Linea de estado invalida: {estado[:80]!r}")
+            cabeceras: dict[str, str] = {}
+            while True:
+                linea = await asyncio.wait_for(conn.reader.readline(), timeout)
+                if linea in (b"\r\n", b"\n", b""):
+                    break
+                k, _, v = linea.decode("latin-1").partition(":")
+                cabeceras[k.strip().lower()] = v.strip()
+            cuerpo = await asyncio.wait_for(_leer_cuerpo(conn.reader, cabeceras), timeout)
+        except BaseException:
+            conn.cerrar()
+            raise
+        sigue_abierta = (
+            cabeceras.get("connection", "").lower() != "close"
+            and not campos[0].startswith(b"HTTP/1.0")
+            and ("content-length" in cabeceras or "transfer-encoding" in cabeceras)
+        )
+        if sigue_abierta:
+            pool.devolver(clave, conn)
+        else:
+            conn.cerrar()
+        if campos[1] != b"200":
+            raise ErrorSnapHTTP(f"HTTP {campos[1].decode('latin-1')}")
+        return cuerpo
+    raise ErrorSnapHTTP("Conexion cerrada por el servidor")
+
+
+def decodificar_jpeg(cuerpo: bytes, flags: int = cv2.IMREAD_COLOR) -> np.ndarray | None:
+    """``imdecode`` directamente sobre el cuerpo HTTP (``np.frombuffer``: sin copia)."""
+    frame = cv2.imdecode(np.frombuffer(cuerpo, dtype=np.uint8), flags)
+    return frame if frame is not None and frame.size > 0 else None
+
+
+class CamaraSnapAsync:
+    """Ultimo frame de una camara SNAP (lo publica ``ClienteSnapAsync``)."""
+
+    def __init__(
+        self,
+        nombre: str,
+        url: str,
+        max_fps: float,
+        reintento_seg: float,
+        evento_frame: threading.Event | None = None,
+        entrada_detector: tuple[int, int] | None = None,
+    ) -> None:
+        self.nombre = nombre
+        self.snap_url = url
+        self.max_fps = max_fps
+        self.reintento_seg = reintento_seg
+        self.evento_frame = evento_frame
+        self.entrada_detector = tuple(entrada_detector) if entrada_detector else None
+        self.latest_frame: np.ndarray | None = None
+        self.latest_snap: FrameReducido | None = None
+        self.latest_seq = 0
+        self.latest_ts = 0.0
+        self.new_frame_available = False
+        self.lock = threading.Lock()
+        self.peticiones = 0
+        self.errores = 0
+        self.fuera_de_orden = 0  # respuestas descartadas por llegar tras una mas nueva
+        self._pedidas = 0
+        self._publicada = 0
+        self._siguiente = 0.0
+
+    def _publicar_frame(self, snap: FrameReducido, orden: int) -> None:
+        frame = snap.frame
+        with self.lock:
+            if orden <= self._publicada:
+                self.fuera_de_orden += 1
+                return
+            self._publicada = orden
+            self.latest_frame = frame
+            self.latest_snap = snap
+            self.latest_seq += 1
+            self.latest_ts = time.monotonic()
+            self.new_frame_available = True
+        if self.evento_frame is not None:
+            self.evento_frame.set()
+        if self.latest_seq % s.LOG_CADA_N_FRAMES == 0:
+            h, w = frame.shape[:2]
+            logging.info(f"[{self.nombre}] frame={self.latest_seq} size={w}x{h} (snap async)")
+
+    def get_frame(self):
+        ok, frame, _, _ = self.get_frame_info()
+        return ok, frame
+
+    def get_frame_info(self):
+        with self.lock:
+            if self.new_frame_available:
+                self.new_frame_available = False
+                return True, self.latest_frame, self.latest_seq, self.latest_ts
+            return False, None, 0, 0.0
+
+    def get_frame_snap(self) -> tuple[bool, FrameReducido | None]:
+        """Como ``get_frame`` pero con el ``FrameReducido`` (frame + JPEG original)."""
+        with self.lock:
+            if self.new_frame_available:
+                self.new_frame_available = False
+                return True, self.latest_snap
+            return False, None
+
+    def hay_frame_nuevo(self) -> bool:
+        return self.new_frame_available
+
+
+class ClienteSnapAsync:
+    """
+    Hilo con bucle asyncio que pide snapshots a varias camaras con un pool keep-alive.
+
+    ``fuentes``: dicts con ``nombre``, ``url`` y opcionalmente ``max_fps`` / ``reintento_seg``
+    (por defecto los de settings; ``max_fps`` 0 = sin limite, tan rapido como responda) y
+    ``entrada_detector``.
+    """
+
+    def __init__(
+        self,
+        fuentes: list[dict[str, Any]],
+        en_vuelo: int | None = None,
+        en_vuelo_por_camara: int | None = None,
+        evento_frame: threading.Event | None = None,
+        http_timeout_s: float | None = None,
+    ) -> None:
+        self.en_vuelo = max(1, s.SNAP_EN_VUELO) if en_vuelo is None else en_vuelo
+        self.en_vuelo_por_camara = (
+            s.SNAP_EN_VUELO_POR_CAMARA if en_vuelo_por_camara is None else en_vuelo_por_camara
+        )
+        if self.en_vuelo < 1 or self.en_vuelo_por_camara < 1:
+            raise ValueError("en_vuelo y en_vuelo_por_camara deben ser >= 1")
+        self.http_timeout_s = s.HTTP_TIMEOUT_S if http_timeout_s is None else http_timeout_s
+        self.camaras = [
+            CamaraSnapAsync(
+                nombre=f.get("nombre") or f"snap{i}",
+                url=f.get("url") or s.SNAP_HTTP_URL,
+                max_fps=s.MAX_FPS if f.get("max_fps") is None else f["max_fps"],
+                reintento_seg=s.REINTENTO_SEG if f.get("reintento_seg") is None else f["reintento_seg"],
+                evento_frame=evento_frame,
+                entrada_detector=f.get("entrada_detector"),
+            )
+            for i, f in enumerate(fuentes)
+        ]
+        self.pool = _PoolConexiones()
+        self.is_running = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "ClienteSnapAsync":
+        self.is_running = True
+        self._thread = threading.Thread(target=self._hilo, name="H_SnapAsync", daemon=True)
+        self._thread.start()
+        return self
+
+    def _hilo(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._principal())
+        finally:
+            self.pool.cerrar()
+            self._loop.close()
+
+    async def _principal(self) -> None:
+        semaforo = asyncio.Semaphore(self.en_vuelo)
+        tareas = [
+            asyncio.create_task(self._worker(camara, semaforo))
+            for camara in self.camaras
+            for _ in range(self.en_vuelo_por_camara)
+        ]
+        while self.is_running:
+            await asyncio.sleep(0.05)
+        for t in tareas:
+            t.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+
+    async def _esperar_turno(self, camara: CamaraSnapAsync) -> None:
+        """Respeta ``max_fps`` repartiendo los turnos entre los workers de la camara."""
+        if camara.max_fps <= 0:
+            return
+        ahora = time.monotonic()
+        turno = max(camara._siguiente, ahora)
+        camara._siguiente = turno + 1.0 / camara.max_fps
+        if turno > ahora:
+            await asyncio.sleep(turno - ahora)
+
+    async def _worker(self, camara: CamaraSnapAsync, semaforo: asyncio.Semaphore) -> None:
+        while self.is_running:
+            await self._esperar_turno(camara)
+            try:
+                async with semaforo:
+                    camara._pedidas += 1
+                    orden = camara._pedidas
+                    camara.peticiones += 1
+                    cuerpo = await _get(self.pool, camara.snap_url, self.http_timeout_s)
+                snap = await asyncio.to_thread(
+                    decodificar_reducido, cuerpo, camara.entrada_detector
+                )
+                if snap is not None:
+                    camara._publicar_frame(snap, orden)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                camara.errores += 1
+                logging.error(f"Error Snap HTTP [{camara.nombre}]: {e!r}. Cooldown activo.")
+                with camara.lock:
+                    camara.latest_frame = None
+                    camara.latest_snap = None
+                    camara.new_frame_available = False
+                await asyncio.sleep(camara.reintento_seg)
+
+    def stop(self) -> None:
+        self.is_running = False
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=3.0)
+        self._thread = None
@@ -0,0 +1,269 @@
+"""
+Tracker multi-cara estilo SORT (Kalman + asociacion por IoU y landmarks) para las detecciones
+RetinaFace ``(N, 15)`` y cache de la identidad de cada track: MobileFaceNet solo se vuelve a
+ejecutar cuando la decision guardada deja de ser fiable.
+
+Por frame, ``actualizar(dets, t)``:
+
+1. Prediccion Kalman de cada track (``cv2.KalmanFilter``, estado SORT
+   ``[cx, cy, area, aspecto, vcx, vcy, varea]``; medida ``[cx, cy, area, aspecto]``).
+2. Afinidad track/deteccion: IoU de la caja predicha y distancia media de los 5 landmarks
+   (los del track desplazados con la prediccion) normalizada por la diagonal de la deteccion.
+   Un par es candidato si ``IoU >= iou_min`` o ``distancia <= distancia_landmarks_max`` (a 2 fps
+   una cara que camina apenas solapa con la caja anterior, pero sus ojos siguen cerca).
+3. Emparejado voraz por afinidad descendente (con las pocas caras de un frame da el mismo
+   resultado que el hungaro de SORT sin depender de scipy). Detecciones sin track -> track
+   nuevo; tracks sin deteccion durante mas de ``max_perdidos`` frames analizados se borran.
+
+Devuelve el id de track de cada fila de ``dets``.
+
+Identidad por track (``IdentidadTrack``: nombre, similitud, instante y area de la cara al
+embeber). ``pendientes_embedding(ids, t)`` dice que caras hay que embeber; el motivo queda
+contado en ``motivos``:
+
+- ``nuevo``: el track aun no tiene identidad.
+- ``confianza``: la similitud guardada esta a menos de ``margen_confianza`` del umbral de
+  coincidencia (ni claramente la persona ni claramente otra).
+- ``crecimiento``: el area de la cara es ``crecimiento_area`` veces la del embedding (se acerca
+  a la camara: recorte con mas detalle).
+- ``refresco``: han pasado ``refresco_seg`` desde el ultimo embedding.
+
+Ejemplo:
+    tracker = TrackerCaras(politica=PoliticaIdentidad(sim_match=SIM_MIN_MATCH_VERIFICACION))
+    ids = tracker.actualizar(dets, t)
+    aptas = np.flatnonzero(dets[:, 4] >= MIN_SCORE_MEJOR_CARA_EMBEDDING)
+    nuevas = aptas[tracker.pendientes_embedding(ids[aptas], t)]
+    if nuevas.size:
+        res = galeria.buscar(embedder.embeddings_de_dets(frame, dets[nuevas]), k=1)
+        tracker.registrar_identidades(ids[nuevas], [n[0] for n in res.nombres], res.sims[:, 0], t)
+    sims, nombres = tracker.identidades(ids)
+    print(tracker.resumen())
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter
+from typing import NamedTuple, Sequence
+
+import cv2
+import numpy as np
+
+from .nms import iou_matriz
+
+
+class PoliticaIdentidad(NamedTuple):
+    """Cuando volver a embeber la cara de un track con identidad."""
+
+    sim_match: float = 0.45  # umbral de coincidencia (SIM_MIN_MATCH_VERIFICACION)
+    margen_confianza: float = 0.1
+    crecimiento_area: float = 1.5
+    refresco_seg: float = 5.0
+
+
+class IdentidadTrack(NamedTuple):
+    nombre: str | None
+    sim: float
+    t: float  # instante del embedding
+    area: float  # area de la caja al embeber
+
+
+def _caja_a_medida(caja: np.ndarray) -> np.ndarray:
+    w = max(float(caja[2] - caja[0]), 1.0)
+    h = max(float(caja[3] - caja[1]), 1.0)
+    return np.array(
+        [[caja[0] + w / 2], [caja[1] + h / 2], [w * h], [w / h]], dtype=np.float32
+    )
+
+
+def _estado_a_caja(estado: np.ndarray) -> np.ndarray:
+    cx, cy, area, aspecto = (float(v) for v in estado[:4, 0])
+    area = max(area, 1.0)
+    w = float(np.sqrt(area * max(aspecto, 1e-3)))
+    h = area / w
+    return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float32)
+
+
+class TrackCara:
+    """Un track: Kalman de la caja, ultima deteccion (caja, score, landmarks) e identidad."""
+
+    def __init__(self, id_track: int, det: np.ndarray) -> None:
+        self.id = id_track
+        kf = cv2.KalmanFilter(7, 4)
+        kf.transitionMatrix = np.eye(7, dtype=np.float32)
+        kf.transitionMatrix[0, 4] = kf.transitionMatrix[1, 5] = kf.transitionMatrix[2, 6] = 1.0
+        kf.measurementMatrix = np.eye(4, 7, dtype=np.float32)
+        # Covarianzas de SORT (Bewley et al. 2016).
+        kf.measurementNoiseCov = np.diag([1.0, 1.0, 10.0, 10.0]).astype(np.float32)
+        kf.processNoiseCov = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001]).astype(np.float32)
+        kf.errorCovPost = np.diag([10.0, 10.0, 10.0, 10.0, 10000.0, 10000.0, 10000.0]).astype(np.float32)
+        kf.statePost = np.zeros((7, 1), dtype=np.float32)
+        kf.statePost[:4] = _caja_a_medida(det)
+        self._kf = kf
+        self.caja = det[:4].astype(np.float32)  # ultima deteccion (no la estimacion Kalman)
+        self.score = float(det[4])
+        self.landmarks = det[5:15].astype(np.float32).reshape(5, 2)
+        self.prediccion = self.caja.copy()
+        self.hits = 1
+        self.perdidos = 0  # frames analizados seguidos sin deteccion
+        self.identidad: IdentidadTrack | None = None
+
+    @property
+    def area(self) -> float:
+        return float((self.caja[2] - self.caja[0]) * (self.caja[3] - self.caja[1]))
+
+    def predecir(self) -> np.ndarray:
+        if self._kf.statePost[2, 0] + self._kf.statePost[6, 0] <= 0:
+            self._kf.statePost[6, 0] = 0.0
+        self.prediccion = _estado_a_caja(self._kf.predict())
+        return self.prediccion
+
+    def landmarks_predichos(self) -> np.ndarray:
+        """Landmarks de la ultima deteccion desplazados como el centro predicho."""
+        c_ant = (self.caja[:2] + self.caja[2:4]) / 2
+        c_pred = (self.prediccion[:2] + self.prediccion[2:4]) / 2
+        return self.landmarks + (c_pred - c_ant)
+
+    def corregir(self, det: np.ndarray) -> None:
+        self._kf.correct(_caja_a_medida(det))
+        self.caja = det[:4].astype(np.float32)
+        self.score = float(det[4])
+        self.landmarks = det[5:15].astype(np.float32).reshape(5, 2)
+        self.hits += 1
+        self.perdidos = 0
+
+
+class TrackerCaras:
+    """Tracks de caras de una camara + cache de identidad por track."""
+
+    def __init__(
+        self,
+        *,
+        iou_min: float = 0.3,
+        distancia_landmarks_max: float = 0.5,
+        max_perdidos: int = 3,
+        politica: PoliticaIdentidad = PoliticaIdentidad(),
+    ) -> None:
+        self.iou_min = iou_min
+        self.distancia_landmarks_max = distancia_landmarks_max
+        self.max_perdidos = max_perdidos
+        self.politica = politica
+        self.tracks: dict[int, TrackCara] = {}
+        self._siguiente_id = 0
+        self.embeddings = 0  # caras que pidieron embedding (con SelectorMejorToma, candidatas)
+        self.reutilizadas = 0  # caras aptas con la identidad del track
+        self.motivos: Counter[str] = Counter()
+
+    def _afinidad(self, tracks: list[TrackCara], dets: np.ndarray) -> np.ndarray:
+        """``(T, N)`` afinidad ``IoU + (1 - distancia)``; ``-1`` en pares no candidatos."""
+        predichas = np.stack([tr.prediccion for tr in tracks])
+        iou = iou_matriz(predichas, dets[:, :4])
+        lm_tracks = np.stack([tr.landmarks_predichos() for tr in tracks])  # (T, 5, 2)
+        lm_dets = dets[:, 5:15].reshape(-1, 5, 2)  # (N, 5, 2)
+        dist = np.linalg.norm(lm_tracks[:, None] - lm_dets[None], axis=3).mean(axis=2)
+        diagonal = np.hypot(dets[:, 2] - dets[:, 0], dets[:, 3] - dets[:, 1])
+        dist = dist / np.maximum(diagonal, 1.0)[None, :]
+        candidato = (iou >= self.iou_min) | (dist <= self.distancia_landmarks_max)
+        return np.where(candidato, iou + np.maximum(1.0 - dist, 0.0), -1.0)
+
+    def actualizar(self, dets: np.ndarray, t: float | None = None) -> np.ndarray:
+        """
+        Asocia ``dets`` ``(N, 15)`` a los tracks y devuelve ``(N,)`` int con el id de track de
+        cada fila (tracks nuevos para las que no encajan con ninguno).
+        """
+        tracks = list(self.tracks.values())
+        for tr in tracks:
+            tr.predecir()
+        ids = np.full((dets.shape[0],), -1, dtype=np.int64)
+
+        if tracks and dets.shape[0]:
+            afinidad = self._afinidad(tracks, dets)
+            orden = np.argsort(-afinidad, axis=None)
+            usados_t, usados_d = set(), set()
+            for k in orden:
+                i, j = divmod(int(k), dets.shape[0])
+                if afinidad[i, j] < 0:
+                    break
+                if i in usados_t or j in usados_d:
+                    continue
+                usados_t.add(i)
+                usados_d.add(j)
+                tracks[i].corregir(dets[j])
+                ids[j] = tracks[i].id
+
+        asociados = set(ids[ids >= 0].tolist())
+        for tr in tracks:
+            if tr.id not in asociados:
+                tr.perdidos += 1
+                if tr.perdidos > self.max_perdidos:
+                    del self.tracks[tr.id]
+        for j in np.flatnonzero(ids < 0):
+            tr = TrackCara(self._siguiente_id, dets[j])
+            self._siguiente_id += 1
+            self.tracks[tr.id] = tr
+            ids[j] = tr.id
+        return ids
+
+    def motivo_embedding(self, id_track: int, t: float | None = None) -> str | None:
+        """Motivo para volver a embeber la cara del track (``None`` = vale la identidad guardada)."""
+        now = time.monotonic() if t is None else t
+        tr = self.tracks[id_track]
+        ident = tr.identidad
+        p = self.politica
+        if ident is None:
+            return "nuevo"
+        if abs(ident.sim - p.sim_match) < p.margen_confianza:
+            return "confianza"
+        if tr.area >= p.crecimiento_area * ident.area:
+            return "crecimiento"
+        if now - ident.t >= p.refresco_seg:
+            return "refresco"
+        return None
+
+    def pendientes_embedding(self, ids: Sequence[int], t: float | None = None) -> np.ndarray:
+        """Mascara ``(len(ids),)`` de las caras (ya aptas) que hay que embeber en este frame."""
+        pendientes = np.zeros((len(ids),), dtype=bool)
+        for k, id_track in enumerate(ids):
+            motivo = self.motivo_embedding(int(id_track), t)
+            if motivo is None:
+                self.reutilizadas += 1
+            else:
+                pendientes[k] = True
+                self.motivos[motivo] += 1
+        self.embeddings += int(pendientes.sum())
+        return pendientes
+
+    def registrar_identidades(
+        self,
+        ids: Sequence[int],
+        nombres: Sequence[str | None],
+        sims: Sequence[float],
+        t: float | None = None,
+    ) -> None:
+        """Guarda el resultado de ``galeria.buscar`` de las caras embebidas en sus tracks."""
+        now = time.monotonic() if t is None else t
+        for id_track, nombre, sim in zip(ids, nombres, sims):
+            tr = self.tracks[int(id_track)]
+            tr.identidad = IdentidadTrack(nombre, float(sim), now, tr.area)
+
+    def identidades(self, ids: Sequence[int]) -> tuple[np.ndarray, list[str | None]]:
+        """Similitud (``nan`` sin identidad) y nombre guardados para cada id de ``ids``."""
+        sims = np.full((len(ids),), np.nan, dtype=np.float32)
+        nombres: list[str | None] = [None] * len(ids)
+        for k, id_track in enumerate(ids):
+            ident = self.tracks[int(id_track)].identidad
+            if ident is not None:
+                sims[k] = ident.sim
+                nombres[k] = ident.nombre
+        return sims, nombres
+
+    @property
+    def fraccion_reutilizada(self) -> float:
+        total = self.embeddings + self.reutilizadas
+        return self.reutilizadas / total if total else 0.0
+
+    def resumen(self) -> str:
+        motivos = " ".join(f"{m}={n}" for m, n in sorted(self.motivos.items()))
+        return (
+            f"tracks={self._siguiente_id} activos={len(self.tracks)} embeddings={self.embeddings} "
+            f"reutilizadas={self.reutilizadas} ({100.0 * self.fraccion_reutilizada:.1f}%) [{motivos}]"
+        )
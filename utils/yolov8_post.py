@@ -0,0 +1,134 @@
+"""
+Postproceso YOLOv8 (salida Ultralytics ``(1, 4+nc, 8400)``) compartido por los scripts
+RKNN/ONNX de ``use_model_yolov8`` y ``export_models``.
+
+Diferencias con la version que estaba copiada en cada script (mismo resultado):
+
+- No transpone el tensor completo ni aplica sigmoid a las 80 x 8400 logits: como la
+  sigmoid es monotona, primero se umbraliza el **max-logit** por ancla y solo las anclas
+  candidatas pasan por sigmoid / argmax.
+- ``clases`` (lista permitida, p. ej. solo "person") recorta las filas de clase **antes**
+  de cualquier operacion.
+
+No aplicar a RetinaFace: ver ``aux_tools_retinaface``.
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+from .nms import nms_matriz
+
+YOLOV8_INPUT_SIZE = 640
+
+YOLOV8_COCO_CLASSES = (
+    "person", "bicycle", "car", "motorbike", "aeroplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat",
+    "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack",
+    "umbrella", "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball",
+    "kite", "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket",
+    "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair",
+    "sofa", "pottedplant", "bed", "diningtable", "toilet", "tvmonitor", "laptop", "mouse",
+    "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink", "refrigerator",
+    "book", "clock", "vase", "scissors", "teddy bear", "hair drier", "toothbrush",
+)
+
+# Margen en espacio logit para el prefiltro: absorbe el redondeo float32 de la sigmoid,
+# el umbral final se vuelve a comprobar sobre la probabilidad.
+_MARGEN_LOGIT = 1e-3
+
+
+def sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -88.0, 88.0)))
+
+
+def ids_clases(nombres: Sequence[str], catalogo: Sequence[str] = YOLOV8_COCO_CLASSES) -> tuple[int, ...]:
+    """Indices de ``nombres`` dentro de ``catalogo`` (p. ej. ``ids_clases(["person"]) == (0,)``)."""
+    faltan = [n for n in nombres if n not in catalogo]
+    if faltan:
+        raise ValueError(f"Clases desconocidas: {faltan}")
+    return tuple(catalogo.index(n) for n in nombres)
+
+
+def _umbral_logit(conf_thres: float) -> float:
+    if conf_thres <= 0.0:
+        return -np.inf
+    p = min(float(conf_thres), 1.0 - 1e-7)
+    return float(np.log(p / (1.0 - p))) - _MARGEN_LOGIT
+
+
+def postprocess_yolov8_ultralytics(
+    pred: np.ndarray,
+    conf_thres: float,
+    iou_thres: float,
+    *,
+    clases: Sequence[int] | None = None,
+):
+    """
+    pred: (1, 4+nc, 8400) salida tipica YOLOv8n COCO desde Ultralytics -> RKNN.
+
+    Args:
+        conf_thres: Umbral sobre la probabilidad (sigmoid) de la mejor clase.
+        iou_thres: Umbral IoU del NMS (``utils.nms.nms_matriz``, agnostico de clase).
+        clases: Indices de clase permitidos; ``None`` = todas. Los ``class_ids`` devueltos
+            siguen siendo los del modelo (COCO), no posiciones dentro de ``clases``.
+
+    Returns:
+        ``(xyxy, scores, class_ids)`` en el espacio de entrada del modelo, o
+        ``(None, None, None)`` si no hay detecciones.
+    """
+    if pred.ndim == 3:
+        pred = pred[0]
+    cls_logits = pred[4:]
+    ids = None
+    if clases is not None:
+        ids = np.asarray(clases, dtype=np.intp)
+        cls_logits = cls_logits[ids]
+    if cls_logits.shape[0] == 0:
+        return None, None, None
+
+    cand = np.flatnonzero(cls_logits.max(axis=0) >= _umbral_logit(conf_thres))
+    if cand.size == 0:
+        return None, None, None
+
+    cls_prob = sigmoid(cls_logits[:, cand])
+    scores = np.max(cls_prob, axis=0)
+    class_ids = np.argmax(cls_prob, axis=0)
+
+    mask = scores >= conf_thres
+    cand = cand[mask]
+    scores = scores[mask]
+    class_ids = class_ids[mask]
+    if len(scores) == 0:
+        return None, None, None
+    if ids is not None:
+        class_ids = ids[class_ids]
+
+    cx, cy, w, h = pred[0, cand], pred[1, cand], pred[2, cand], pred[3, cand]
+    x1 = cx - w / 2.0
+    y1 = cy - h / 2.0
+    x2 = cx + w / 2.0
+    y2 = cy + h / 2.0
+    xyxy = np.stack([x1, y1, x2, y2], axis=1)
+
+    keep = nms_matriz(xyxy, scores, iou_thres)
+    return xyxy[keep], scores[keep], class_ids[keep]
+
+
+def scale_boxes_to_frame(
+    xyxy: np.ndarray,
+    frame_w: int,
+    frame_h: int,
+    input_size: int = YOLOV8_INPUT_SIZE,
+) -> np.ndarray:
+    """De espacio input_size x input_size (letterbox implicito: resize directo) a tamano del frame."""
+    sx = frame_w / float(input_size)
+    sy = frame_h / float(input_size)
+    out = xyxy.copy()
+    out[:, 0] *= sx
+    out[:, 2] *= sx
+    out[:, 1] *= sy
+    out[:, 3] *= sy
+    return out